@@ -0,0 +1,270 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Request Bookkeeping Benchmark
+
+Measures the memory and time spent on the objects a session keeps for each
+outstanding call:
+
+- the size and the time to allocate and drop a call request record: a plain
+  class with ``__dict__``, a slotted class initialized through
+  ``Request.__init__()`` (as before), and ``CallRequest``, and what the
+  difference amounts to for a session doing 100k calls/sec
+- the memory held per outstanding call by ``ApplicationSession.call()``
+  (request record, Deferred, canceller), measured with ``tracemalloc``
+- the time per completed call through ``ApplicationSession.call()``
+
+No router and no network are involved: the session is connected to a stub
+transport that answers calls right away (or not at all).
+
+Usage:
+    python bookkeeping.py --calls 100000 --output build/bookkeeping.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict
+
+import txaio
+
+# Initialize txaio framework BEFORE importing autobahn
+txaio.use_twisted()
+
+from autobahn.twisted.wamp import ApplicationSession
+from autobahn.wamp import message, role
+from autobahn.wamp.request import CallRequest, Request
+from autobahn.wamp.serializer import JsonSerializer
+from autobahn.wamp.types import TransportDetails
+
+__all__ = [
+    "ChainedCallRequest",
+    "DictCallRequest",
+    "measure_records",
+    "measure_session",
+    "main",
+]
+
+
+class DictCallRequest:
+    """
+    A call request record with ``__dict__``, for comparison.
+    """
+
+    def __init__(self, request_id, procedure, on_reply, options):
+        self.request_id = request_id
+        self.on_reply = on_reply
+        self.procedure = procedure
+        self.options = options
+
+
+class ChainedCallRequest(Request):
+    """
+    A slotted call request record initialized through ``Request.__init__()``, as
+    ``CallRequest`` was before.
+    """
+
+    __slots__ = ("procedure", "options")
+
+    def __init__(self, request_id, procedure, on_reply, options):
+        Request.__init__(self, request_id, on_reply)
+        self.procedure = procedure
+        self.options = options
+
+
+class _Transport:
+    """
+    Answers calls with a result right away (or drops them).
+    """
+
+    def __init__(self, session, reply=True):
+        self._session = session
+        self._serializer = JsonSerializer()
+        self.reply = reply
+        session.onOpen(self)
+        roles = {"dealer": role.RoleDealerFeatures()}
+        session.onMessage(message.Welcome(1, roles))
+
+    def transport_details(self):
+        return TransportDetails()
+
+    def send(self, msg):
+        if self.reply and isinstance(msg, message.Call):
+            self._session.onMessage(message.Result(msg.request, args=[1]))
+
+    def isOpen(self):
+        return True
+
+
+def _best(fn, number, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(number)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def measure_records(count: int) -> Dict[str, Any]:
+    """
+    Measure the size and the time to allocate and drop a call request record.
+
+    :param count: Number of records per measurement.
+
+    :returns: Benchmark result.
+    """
+    results = []
+    for name, cls in [
+        ("dict", DictCallRequest),
+        ("chained", ChainedCallRequest),
+        ("slotted", CallRequest),
+    ]:
+
+        def run(n):
+            for i in range(n):
+                cls(i, "com.example.add", None, None)
+
+        record = cls(1, "com.example.add", None, None)
+        size = sys.getsizeof(record)
+        if hasattr(record, "__dict__"):
+            size += sys.getsizeof(record.__dict__)
+        results.append(
+            {
+                "record": name,
+                "bytes": size,
+                "ns_per_record": 1e9 * _best(run, count) / count,
+            }
+        )
+    return results
+
+
+def measure_session(calls: int) -> Dict[str, Any]:
+    """
+    Measure the memory per outstanding call and the time per completed call.
+
+    :param calls: Number of calls per measurement.
+
+    :returns: Benchmark result.
+    """
+    session = ApplicationSession()
+    transport = _Transport(session, reply=False)
+
+    # memory held per outstanding call
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    replies = [session.call("com.example.add", i, 2) for i in range(calls)]
+    outstanding = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    for request_id in list(session._call_reqs):
+        session.onMessage(message.Result(request_id, args=[1]))
+    del replies
+
+    # time per completed call
+    transport.reply = True
+
+    def run(n):
+        for i in range(n):
+            session.call("com.example.add", i, 2)
+
+    return {
+        "calls": calls,
+        "bytes_per_outstanding_call": outstanding / calls,
+        "us_per_call": 1e6 * _best(run, calls) / calls,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure the memory and time spent on call request bookkeeping"
+    )
+    parser.add_argument(
+        "--calls",
+        type=int,
+        default=100000,
+        help="Number of calls per measurement (default: 100000)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write results to this JSON file",
+    )
+    args = parser.parse_args(argv)
+
+    records = measure_records(args.calls)
+    print(f"{'record':<10} {'bytes':>8} {'ns/record':>10}")
+    for r in records:
+        print(f"{r['record']:<10} {r['bytes']:>8} {r['ns_per_record']:>10.1f}")
+
+    # at 100k calls/sec, one record is allocated and dropped per call
+    dict_record, chained_record, slotted_record = records
+    saved = {
+        "bytes_per_sec": 1e5 * (dict_record["bytes"] - slotted_record["bytes"]),
+        "cpu_ms_per_sec": 1e5
+        * 1e-6
+        * (chained_record["ns_per_record"] - slotted_record["ns_per_record"]),
+    }
+    print(
+        f"\nat 100k calls/sec vs. dict records: "
+        f"{saved['bytes_per_sec'] / 1e6:.1f} MB/sec less allocated, "
+        f"vs. chained init: {saved['cpu_ms_per_sec']:.1f} ms/sec less CPU time\n"
+    )
+
+    session = measure_session(args.calls)
+    print(
+        f"ApplicationSession.call(): "
+        f"{session['bytes_per_outstanding_call']:.0f} bytes/outstanding call, "
+        f"{session['us_per_call']:.2f} us/call"
+    )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_implementation(),
+                    "python_version": sys.version.split()[0],
+                    "records": records,
+                    "saved_at_100k_calls_per_sec": saved,
+                    "session": session,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+WAMP ID Generation Benchmark
+
+Measures the time per ID of the WAMP ID generators in ``autobahn.util``:
+``IdGenerator.next()`` (sequential request IDs), ``id()`` (pseudo-random),
+``rid()`` and ``RandomIdGenerator.next()`` (cryptographically strong random),
+together with the implementations they replaced: a Python counter with a
+wraparound check, ``random.randint()`` and one ``os.urandom()`` read per ID.
+
+Usage:
+    python ids.py --ids 1000000 --output build/ids.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import struct
+import sys
+import time
+from typing import Any, Dict
+
+from autobahn import util
+
+__all__ = ["LegacyIdGenerator", "legacy_id", "legacy_rid", "measure", "main"]
+
+
+class LegacyIdGenerator:
+    """
+    The previous sequential ID generator.
+    """
+
+    def __init__(self):
+        self._next = 0
+
+    def next(self):
+        self._next += 1
+        if self._next > 9007199254740992:
+            self._next = 1
+        return self._next
+
+
+def legacy_id():
+    """
+    The previous ``autobahn.util.id()``.
+    """
+    return random.randint(1, 9007199254740992)
+
+
+_WAMP_ID_MASK = struct.unpack(">Q", b"\x00\x1f\xff\xff\xff\xff\xff\xff")[0]
+
+
+def legacy_rid():
+    """
+    The previous ``autobahn.util.rid()``.
+    """
+    return struct.unpack(">Q", os.urandom(8))[0] & _WAMP_ID_MASK or 2**53
+
+
+def measure(name: str, fn, ids: int, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Measure the time per ID of an ID generating function.
+
+    :param name: Name of the generator.
+    :param fn: The function returning the next ID.
+    :param ids: Number of IDs per measurement.
+    :param repeat: Number of measurements (the median is reported).
+
+    :returns: Benchmark result.
+    """
+    elapsed = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(ids):
+            fn()
+        elapsed.append(time.perf_counter() - started)
+    return {
+        "generator": name,
+        "ids": ids,
+        "ns_per_id": 1e9 * statistics.median(elapsed) / ids,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure WAMP ID generation")
+    parser.add_argument(
+        "--ids",
+        type=int,
+        default=1000000,
+        help="Number of IDs per measurement (default: 1000000)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write results to this JSON file",
+    )
+    args = parser.parse_args(argv)
+
+    results = [
+        measure(name, fn, args.ids)
+        for name, fn in [
+            ("IdGenerator.next() (previous)", LegacyIdGenerator().next),
+            ("IdGenerator.next()", util.IdGenerator().next),
+            ("id() (previous)", legacy_id),
+            ("id()", util.id),
+            ("rid() (previous)", legacy_rid),
+            ("rid()", util.rid),
+            ("RandomIdGenerator.next()", util.RandomIdGenerator().next),
+        ]
+    ]
+    print(f"{'generator':<32} {'ns/id':>8}")
+    for r in results:
+        print(f"{r['generator']:<32} {r['ns_per_id']:>8.1f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_implementation(),
+                    "python_version": sys.version.split()[0],
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,503 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+WAMP Session Round-trip Benchmarks
+
+Benchmarks CALL -> INVOCATION -> YIELD -> RESULT and PUBLISH -> EVENT
+round-trips through ``ApplicationSession``, using a minimal in-process
+stand-in router (see ``router.py``) instead of a real WAMP router. Sessions
+are connected over in-memory transports, or over socket pairs using
+WAMP-over-RawSocket or WAMP-over-WebSocket (see ``transports.py``), so no
+network is involved.
+
+Usage:
+    # Run benchmark
+    python main.py run --transport websocket --serializer cbor --mode call \\
+        --sessions 4 --payload_size small --results build
+
+    # Generate HTML report
+    python main.py index --output build
+
+Latency service level objectives can be checked (e.g. in CI) using
+``--sla_p99`` and ``--sla_throughput``: the run fails if they are not met.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Dict, List
+
+import humanize
+import jinja2
+import txaio
+import vmprof
+
+# Initialize txaio framework BEFORE importing autobahn (the transports use Twisted)
+txaio.use_twisted()
+
+from twisted.internet import defer, task
+
+from autobahn import util
+from autobahn.twisted.wamp import ApplicationSession
+from autobahn.wamp.serializer import SERID_TO_SER
+from autobahn.wamp.types import ComponentConfig, PublishOptions
+
+from router import Router
+from transports import TRANSPORTS, connect
+
+__all__ = ["main_run", "main_index"]
+
+SERIALIZERS: List[str] = [
+    ser for ser in ["json", "msgpack", "cbor", "ubjson"] if ser in SERID_TO_SER
+]
+"""
+Serializers available in this installation.
+"""
+
+MODES = ["call", "publish"]
+"""
+Round-trip kinds: ``call`` measures CALL to RESULT (via INVOCATION and YIELD),
+``publish`` measures PUBLISH to EVENT (with the publisher awaiting PUBLISHED).
+"""
+
+PAYLOAD_SIZES: Dict[str, int] = {
+    "empty": 0,
+    "small": 256,
+    "medium": 4096,
+    "large": 65536,
+}
+"""
+Payload size categories (length of the string positional argument).
+"""
+
+REALM = "realm1"
+PROCEDURE = "com.example.bench.echo"
+TOPIC = "com.example.bench.topic"
+
+
+class BenchmarkSession(ApplicationSession):
+    """
+    Client session signaling when it has joined the realm.
+    """
+
+    def __init__(self, config=None):
+        ApplicationSession.__init__(self, config)
+        self.joined = defer.Deferred()
+
+    def onJoin(self, details):
+        self.joined.callback(self)
+
+
+def _percentile(values: List[int], p: float) -> int:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not values:
+        return 0
+    k = int(round(p / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(len(values) - 1, k))]
+
+
+def _results_key(
+    python: str,
+    transport: str,
+    serializer: str,
+    mode: str,
+    sessions: int,
+    payload_size: str,
+) -> str:
+    return f"{python}_{transport}_{serializer}_{mode}_{sessions}_{payload_size}"
+
+
+async def _run(reactor, args: argparse.Namespace) -> None:
+    python = "cpy" if platform.python_implementation() == "CPython" else "pypy"
+    key = _results_key(
+        python,
+        args.transport,
+        args.serializer,
+        args.mode,
+        args.sessions,
+        args.payload_size,
+    )
+    filename_profile = args.profile or os.path.join(
+        args.results, f"profile_{key}.dat"
+    )
+    filename_results = os.path.join(args.results, f"results_{key}.json")
+
+    router = Router()
+    serializer = SERID_TO_SER[args.serializer]()
+    payload = "x" * PAYLOAD_SIZES[args.payload_size]
+
+    # session 0 is the callee/subscriber, all others are callers/publishers
+    print(
+        f"Connecting {args.sessions + 1} sessions over {args.transport} "
+        f"using {args.serializer} .."
+    )
+    sessions: List[BenchmarkSession] = []
+    for _ in range(args.sessions + 1):
+        session = BenchmarkSession(ComponentConfig(realm=REALM))
+        connect(
+            reactor,
+            args.transport,
+            serializer,
+            router.session,
+            lambda session=session: session,
+        )
+        sessions.append(session)
+    await defer.gatherResults([session.joined for session in sessions])
+
+    backend, clients = sessions[0], sessions[1:]
+
+    latencies: List[int] = []
+    recording = [False]
+
+    if args.mode == "call":
+
+        def echo(value):
+            return value
+
+        await backend.register(echo, PROCEDURE)
+
+        async def run_client(session, count):
+            for _ in range(count):
+                started = time.perf_counter_ns()
+                await session.call(PROCEDURE, payload)
+                if recording[0]:
+                    latencies.append(time.perf_counter_ns() - started)
+
+        async def wait_done():
+            pass
+
+    else:
+        received = [0]
+        expected = [0]
+        done = [None]
+
+        def on_event(sent, value):
+            if recording[0]:
+                latencies.append(time.perf_counter_ns() - sent)
+            received[0] += 1
+            if done[0] is not None and received[0] == expected[0]:
+                done[0].callback(None)
+
+        await backend.subscribe(on_event, TOPIC)
+
+        options = PublishOptions(acknowledge=True)
+
+        async def run_client(session, count):
+            expected[0] += count
+            for _ in range(count):
+                await session.publish(
+                    TOPIC, time.perf_counter_ns(), payload, options=options
+                )
+
+        async def wait_done():
+            # PUBLISHED might overtake the last EVENTs on other connections
+            if received[0] < expected[0]:
+                done[0] = defer.Deferred()
+                await done[0]
+                done[0] = None
+
+    async def phase(count):
+        await defer.gatherResults(
+            [defer.ensureDeferred(run_client(client, count)) for client in clients]
+        )
+        await wait_done()
+
+    print(f"Warming up with {args.warmup} round-trips per session ..")
+    await phase(args.warmup)
+
+    print(f"Measuring {args.count} round-trips per session ..")
+    recording[0] = True
+    fd = os.open(filename_profile, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    vmprof.enable(fd, period=0.01)
+    started = time.perf_counter()
+    started_cpu = time.process_time()
+
+    await phase(args.count)
+
+    secs = time.perf_counter() - started
+    cpu_secs = time.process_time() - started_cpu
+    vmprof.disable()
+    os.close(fd)
+    recording[0] = False
+
+    for session in sessions:
+        session.leave()
+
+    latencies.sort()
+    total = len(latencies)
+    result = {
+        "python_version": sys.version,
+        "python": python,
+        "transport": args.transport,
+        "serializer": args.serializer,
+        "mode": args.mode,
+        "sessions": args.sessions,
+        "payload_size": args.payload_size,
+        "payload_bytes": len(payload),
+        "count": total,
+        "ops_per_sec": int(round(total / secs)),
+        "cpu_per_op": round(1000000.0 * cpu_secs / total, 3),
+        "latency_mean": round(sum(latencies) / total / 1000.0, 3),
+        "latency_p50": round(_percentile(latencies, 50) / 1000.0, 3),
+        "latency_p90": round(_percentile(latencies, 90) / 1000.0, 3),
+        "latency_p99": round(_percentile(latencies, 99) / 1000.0, 3),
+        "latency_max": round(latencies[-1] / 1000.0, 3),
+    }
+
+    with open(filename_results, "w") as f:
+        json.dump(result, f)
+
+    print(
+        f"Done: {result['ops_per_sec']} round-trips/sec, "
+        f"latency p50={result['latency_p50']} us, p99={result['latency_p99']} us, "
+        f"max={result['latency_max']} us, {result['cpu_per_op']} us CPU/round-trip"
+    )
+
+    violations = []
+    if args.sla_p99 is not None and result["latency_p99"] > args.sla_p99:
+        violations.append(
+            f"p99 latency {result['latency_p99']} us exceeds {args.sla_p99} us"
+        )
+    if (
+        args.sla_throughput is not None
+        and result["ops_per_sec"] < args.sla_throughput
+    ):
+        violations.append(
+            f"throughput {result['ops_per_sec']}/s below {args.sla_throughput}/s"
+        )
+    if violations:
+        raise Exception(f"SLA not met: {', '.join(violations)}")
+
+
+def main_run(args: argparse.Namespace) -> None:
+    """
+    Run WAMP session round-trip benchmark.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    task.react(lambda reactor: defer.ensureDeferred(_run(reactor, args)))
+
+
+def main_index(args: argparse.Namespace) -> None:
+    """
+    Generate HTML report index from benchmark results.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    output = args.output
+
+    templates = jinja2.Environment(
+        loader=jinja2.FileSystemLoader("templates"),
+        keep_trailing_newline=True,
+        autoescape=True,
+    )
+
+    template_index = templates.get_template("index.html")
+    template_flamegraph = templates.get_template("flamegraph.html")
+
+    # python -> mode -> payload_size -> list of results
+    report_data: Dict[str, Any] = {
+        "generated": util.utcnow(),
+        "modes": MODES,
+        "payload_sizes": list(PAYLOAD_SIZES),
+        "results": {
+            "cpy": {},
+            "pypy": {},
+        },
+    }
+
+    for fn in sorted(os.listdir(output)):
+        if not (fn.startswith("results_") and fn.endswith(".json")):
+            continue
+        with open(os.path.join(output, fn)) as f:
+            data = json.load(f)
+
+        key = _results_key(
+            data["python"],
+            data["transport"],
+            data["serializer"],
+            data["mode"],
+            data["sessions"],
+            data["payload_size"],
+        )
+        data["key"] = key
+        report_data["results"][data["python"]].setdefault(
+            data["mode"], {}
+        ).setdefault(data["payload_size"], []).append(data)
+        print(f"File added    : {fn}")
+
+        # Generate flamegraph HTML
+        with open(os.path.join(output, f"vmprof_{key}.html"), "w") as f:
+            s = template_flamegraph.render(
+                naturalsize=humanize.naturalsize,
+                intword=humanize.intword,
+                intcomma=humanize.intcomma,
+                sorted=sorted,
+                **data,
+            )
+            f.write(s)
+
+    # Generate index HTML
+    with open(os.path.join(output, "index.html"), "w") as f:
+        s = template_index.render(
+            naturalsize=humanize.naturalsize,
+            intword=humanize.intword,
+            intcomma=humanize.intcomma,
+            sorted=sorted,
+            **report_data,
+        )
+        f.write(s)
+
+    print(f"Report generated: {os.path.join(output, 'index.html')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WAMP Session Round-trip Benchmarks")
+    subparsers = parser.add_subparsers(
+        dest="command", title="commands", help="Command to run (required)"
+    )
+    subparsers.required = True
+
+    # Run benchmark subcommand
+    parser_run = subparsers.add_parser(
+        "run", help="Run WAMP session round-trip benchmark"
+    )
+
+    parser_run.add_argument(
+        "--transport",
+        dest="transport",
+        choices=TRANSPORTS,
+        default="memory",
+        help="Transport connecting sessions and router (default: memory)",
+    )
+
+    parser_run.add_argument(
+        "--serializer",
+        dest="serializer",
+        choices=SERIALIZERS,
+        default="cbor" if "cbor" in SERIALIZERS else "json",
+        help="WAMP serializer to use",
+    )
+
+    parser_run.add_argument(
+        "--mode",
+        dest="mode",
+        choices=MODES,
+        default="call",
+        help="Round-trip kind: call (RPC) or publish (PubSub)",
+    )
+
+    parser_run.add_argument(
+        "--sessions",
+        dest="sessions",
+        type=int,
+        default=1,
+        help="Number of concurrent calling/publishing sessions (default: 1)",
+    )
+
+    parser_run.add_argument(
+        "--payload_size",
+        dest="payload_size",
+        choices=list(PAYLOAD_SIZES),
+        default="small",
+        help="Payload size category",
+    )
+
+    parser_run.add_argument(
+        "--count",
+        dest="count",
+        type=int,
+        default=10000,
+        help="Number of measured round-trips per session (default: 10000)",
+    )
+
+    parser_run.add_argument(
+        "--warmup",
+        dest="warmup",
+        type=int,
+        default=1000,
+        help="Number of warm-up round-trips per session (default: 1000)",
+    )
+
+    parser_run.add_argument(
+        "--sla_p99",
+        dest="sla_p99",
+        type=float,
+        default=None,
+        help="Fail if the p99 latency (in microseconds) exceeds this value",
+    )
+
+    parser_run.add_argument(
+        "--sla_throughput",
+        dest="sla_throughput",
+        type=float,
+        default=None,
+        help="Fail if the throughput (round-trips/sec) is below this value",
+    )
+
+    parser_run.add_argument(
+        "--profile",
+        dest="profile",
+        type=str,
+        default=None,
+        help="vmprof profile output filename (.dat, default: <results>/profile_<config>.dat)",
+    )
+
+    parser_run.add_argument(
+        "--results",
+        dest="results",
+        type=str,
+        required=True,
+        help="Results output directory",
+    )
+
+    parser_run.set_defaults(func=main_run)
+
+    # Index generation subcommand
+    parser_index = subparsers.add_parser(
+        "index", help="Generate HTML report index from benchmark results"
+    )
+
+    parser_index.add_argument(
+        "--output",
+        dest="output",
+        type=str,
+        required=True,
+        help="Output directory for HTML report",
+    )
+
+    parser_index.set_defaults(func=main_index)
+
+    args = parser.parse_args()
+    args.func(args)
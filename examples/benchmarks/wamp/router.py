@@ -0,0 +1,288 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Minimal in-process WAMP router stand-in for benchmarks.
+
+This is *not* a WAMP router: it implements just enough of the Broker and
+Dealer roles to route PUBLISH, SUBSCRIBE, CALL and REGISTER by exact URI
+between sessions living in the same process, with no authentication,
+no authorization, no pattern-based subscriptions/registrations and no
+meta API. This is sufficient to measure the client-side cost of
+``ApplicationSession`` round-trips without a real Crossbar.io router.
+
+A :class:`RouterSession` implements
+:class:`autobahn.wamp.interfaces.ITransportHandler`, so it can be used as
+the session factory for any Autobahn WAMP transport factory, e.g.::
+
+    router = Router()
+    factory = WampWebSocketServerFactory(router.session, serializers=[...])
+"""
+
+from typing import Dict, Optional, Set, Tuple
+
+from autobahn import util
+from autobahn.wamp import message, role
+from autobahn.wamp.interfaces import ITransport, ITransportHandler
+
+__all__ = ["Router", "RouterSession"]
+
+
+class Router:
+    """
+    Router state shared by all router sessions: realm-less subscription and
+    registration tables plus outstanding invocations.
+    """
+
+    def __init__(self):
+        # topic -> (subscription ID, subscribers)
+        self._subscriptions: Dict[str, Tuple[int, Set["RouterSession"]]] = {}
+
+        # procedure -> (registration ID, callee)
+        self._registrations: Dict[str, Tuple[int, "RouterSession"]] = {}
+
+        # invocation request ID -> (caller, call request ID)
+        self._invocations: Dict[int, Tuple["RouterSession", int]] = {}
+
+        self._id_gen = util.IdGenerator()
+
+        self.sessions: Set["RouterSession"] = set()
+
+    def session(self) -> "RouterSession":
+        """
+        Session factory, to be used with Autobahn WAMP transport factories.
+        """
+        return RouterSession(self)
+
+    def _detach(self, session: "RouterSession") -> None:
+        self.sessions.discard(session)
+        for topic, (_, subscribers) in list(self._subscriptions.items()):
+            subscribers.discard(session)
+            if not subscribers:
+                del self._subscriptions[topic]
+        for procedure, (_, callee) in list(self._registrations.items()):
+            if callee is session:
+                del self._registrations[procedure]
+        for request, (caller, _) in list(self._invocations.items()):
+            if caller is session:
+                del self._invocations[request]
+
+
+class RouterSession(ITransportHandler):
+    """
+    Router side of a WAMP session.
+    """
+
+    ROLES = {
+        "broker": role.RoleBrokerFeatures(publisher_exclusion=True),
+        "dealer": role.RoleDealerFeatures(progressive_call_results=True),
+    }
+
+    def __init__(self, router: Router):
+        self._router = router
+        self._transport: Optional[ITransport] = None
+        self._session_id: Optional[int] = None
+        self._authid: Optional[str] = None
+
+    @property
+    def transport(self) -> Optional[ITransport]:
+        return self._transport
+
+    def onOpen(self, transport: ITransport) -> None:
+        self._transport = transport
+
+    def onClose(self, wasClean: bool) -> None:
+        self._router._detach(self)
+        self._transport = None
+        self._session_id = None
+
+    def _send(self, msg: message.Message) -> None:
+        if self._transport:
+            self._transport.send(msg)
+
+    def onMessage(self, msg: message.Message) -> None:
+        router = self._router
+
+        if self._session_id is None:
+            if isinstance(msg, message.Hello):
+                self._session_id = util.id()
+                self._authid = msg.authid or "anonymous"
+                router.sessions.add(self)
+                self._send(
+                    message.Welcome(
+                        self._session_id,
+                        self.ROLES,
+                        realm=msg.realm,
+                        authid=self._authid,
+                        authrole="anonymous",
+                        authmethod="anonymous",
+                    )
+                )
+            else:
+                self._send(
+                    message.Abort(
+                        "wamp.error.protocol_violation",
+                        f"expected HELLO, but received {msg.__class__.__name__}",
+                    )
+                )
+                self._transport.close()
+
+        elif isinstance(msg, message.Publish):
+            publication = router._id_gen.next()
+            if msg.topic in router._subscriptions:
+                subscription, subscribers = router._subscriptions[msg.topic]
+                event = message.Event(
+                    subscription,
+                    publication,
+                    args=msg.args,
+                    kwargs=msg.kwargs,
+                    payload=msg.payload,
+                    enc_algo=msg.enc_algo,
+                    enc_key=msg.enc_key,
+                    enc_serializer=msg.enc_serializer,
+                )
+                exclude_me = msg.exclude_me is None or msg.exclude_me
+                for subscriber in subscribers:
+                    if subscriber is not self or not exclude_me:
+                        subscriber._send(event)
+            if msg.acknowledge:
+                self._send(message.Published(msg.request, publication))
+
+        elif isinstance(msg, message.Subscribe):
+            if msg.topic not in router._subscriptions:
+                router._subscriptions[msg.topic] = (router._id_gen.next(), set())
+            subscription, subscribers = router._subscriptions[msg.topic]
+            subscribers.add(self)
+            self._send(message.Subscribed(msg.request, subscription))
+
+        elif isinstance(msg, message.Unsubscribe):
+            for topic, (subscription, subscribers) in list(
+                router._subscriptions.items()
+            ):
+                if subscription == msg.subscription:
+                    subscribers.discard(self)
+                    if not subscribers:
+                        del router._subscriptions[topic]
+                    break
+            self._send(message.Unsubscribed(msg.request))
+
+        elif isinstance(msg, message.Register):
+            if msg.procedure in router._registrations:
+                self._send(
+                    message.Error(
+                        message.Register.MESSAGE_TYPE,
+                        msg.request,
+                        "wamp.error.procedure_already_exists",
+                    )
+                )
+            else:
+                registration = router._id_gen.next()
+                router._registrations[msg.procedure] = (registration, self)
+                self._send(message.Registered(msg.request, registration))
+
+        elif isinstance(msg, message.Unregister):
+            for procedure, (registration, callee) in list(
+                router._registrations.items()
+            ):
+                if registration == msg.registration and callee is self:
+                    del router._registrations[procedure]
+                    break
+            self._send(message.Unregistered(msg.request))
+
+        elif isinstance(msg, message.Call):
+            if msg.procedure in router._registrations:
+                registration, callee = router._registrations[msg.procedure]
+                request = router._id_gen.next()
+                router._invocations[request] = (self, msg.request)
+                callee._send(
+                    message.Invocation(
+                        request,
+                        registration,
+                        args=msg.args,
+                        kwargs=msg.kwargs,
+                        payload=msg.payload,
+                        receive_progress=msg.receive_progress,
+                        enc_algo=msg.enc_algo,
+                        enc_key=msg.enc_key,
+                        enc_serializer=msg.enc_serializer,
+                    )
+                )
+            else:
+                self._send(
+                    message.Error(
+                        message.Call.MESSAGE_TYPE,
+                        msg.request,
+                        "wamp.error.no_such_procedure",
+                    )
+                )
+
+        elif isinstance(msg, message.Yield):
+            if msg.request in router._invocations:
+                if msg.progress:
+                    caller, call_request = router._invocations[msg.request]
+                else:
+                    caller, call_request = router._invocations.pop(msg.request)
+                caller._send(
+                    message.Result(
+                        call_request,
+                        args=msg.args,
+                        kwargs=msg.kwargs,
+                        payload=msg.payload,
+                        progress=msg.progress,
+                        enc_algo=msg.enc_algo,
+                        enc_key=msg.enc_key,
+                        enc_serializer=msg.enc_serializer,
+                    )
+                )
+
+        elif isinstance(msg, message.Error):
+            if (
+                msg.request_type == message.Invocation.MESSAGE_TYPE
+                and msg.request in router._invocations
+            ):
+                caller, call_request = router._invocations.pop(msg.request)
+                caller._send(
+                    message.Error(
+                        message.Call.MESSAGE_TYPE,
+                        call_request,
+                        msg.error,
+                        args=msg.args,
+                        kwargs=msg.kwargs,
+                        payload=msg.payload,
+                        enc_algo=msg.enc_algo,
+                        enc_key=msg.enc_key,
+                        enc_serializer=msg.enc_serializer,
+                    )
+                )
+
+        elif isinstance(msg, message.Goodbye):
+            self._send(message.Goodbye(reason="wamp.close.goodbye_and_out"))
+            router._detach(self)
+            self._session_id = None
+            self._transport.close()
+
+        else:
+            raise Exception(f"stand-in router: unsupported message {msg}")
@@ -0,0 +1,222 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Transports for connecting WAMP sessions in the same process.
+
+* ``memory``: a pair of in-memory WAMP transports. Messages are serialized
+  with the selected serializer and delivered on the next reactor iteration,
+  but there is no framing and no I/O.
+* ``rawsocket``: WAMP-over-RawSocket over a ``socket.socketpair()``.
+* ``websocket``: WAMP-over-WebSocket over a ``socket.socketpair()``.
+
+Socket pairs are real kernel sockets driven by the Twisted reactor, so the
+latter two include the full protocol stack and reactor I/O, but no network.
+"""
+
+import copy
+import socket
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+
+import txaio
+from twisted.internet.interfaces import IReactorSocket
+
+from autobahn.twisted.rawsocket import (
+    WampRawSocketClientFactory,
+    WampRawSocketServerFactory,
+)
+from autobahn.twisted.websocket import (
+    WampWebSocketClientFactory,
+    WampWebSocketServerFactory,
+)
+from autobahn.wamp.exception import TransportLost
+from autobahn.wamp.interfaces import (
+    IMessage,
+    ISerializer,
+    ITransport,
+    ITransportHandler,
+)
+from autobahn.wamp.types import TransportDetails
+
+__all__ = ["TRANSPORTS", "MemoryTransport", "connect"]
+
+TRANSPORTS = ["memory", "rawsocket", "websocket"]
+"""
+Available transports for connecting sessions.
+"""
+
+
+class MemoryTransport(ITransport):
+    """
+    One end of an in-memory WAMP transport pair.
+    """
+
+    def __init__(
+        self,
+        reactor,
+        handler: ITransportHandler,
+        serializer: ISerializer,
+        is_server: bool,
+    ):
+        self._reactor = reactor
+        self._handler = handler
+        self._serializer = serializer
+        self._peer: Optional["MemoryTransport"] = None
+        self._open = False
+        self._queue: Deque[Tuple[bytes, bool]] = deque()
+        self._flush_call = None
+        # a Future/Deferred that fires when the transport is closed
+        self.is_closed = txaio.create_future()
+        self._transport_details = TransportDetails(
+            channel_type=TransportDetails.CHANNEL_TYPE_MEMORY,
+            channel_framing=TransportDetails.CHANNEL_FRAMING_NONE,
+            channel_serializer=serializer.RAWSOCKET_SERIALIZER_ID,
+            is_server=is_server,
+            peer="memory",
+        )
+
+    @classmethod
+    def create_pair(
+        cls,
+        reactor,
+        server_handler: ITransportHandler,
+        client_handler: ITransportHandler,
+        serializer: ISerializer,
+    ) -> Tuple["MemoryTransport", "MemoryTransport"]:
+        """
+        Create a connected pair of transports and open both handlers.
+        """
+        server = cls(reactor, server_handler, copy.copy(serializer), True)
+        client = cls(reactor, client_handler, copy.copy(serializer), False)
+        server._peer = client
+        client._peer = server
+        server._open = client._open = True
+        server_handler.onOpen(server)
+        client_handler.onOpen(client)
+        return server, client
+
+    def send(self, msg: IMessage) -> None:
+        if not self._open:
+            raise TransportLost()
+        self._peer._enqueue(self._serializer.serialize(msg))
+
+    def _enqueue(self, data: Tuple[bytes, bool]) -> None:
+        # deliver on the next reactor iteration, in batches, like a socket would
+        self._queue.append(data)
+        if self._flush_call is None:
+            self._flush_call = self._reactor.callLater(0, self._flush)
+
+    def _flush(self) -> None:
+        self._flush_call = None
+        while self._queue and self._open:
+            payload, is_binary = self._queue.popleft()
+            for msg in self._serializer.unserialize(payload, is_binary):
+                self._handler.onMessage(msg)
+
+    def isOpen(self) -> bool:
+        return self._open
+
+    @property
+    def transport_details(self) -> TransportDetails:
+        return self._transport_details
+
+    def close(self) -> None:
+        for transport in (self, self._peer):
+            if transport._open:
+                transport._open = False
+                transport._queue.clear()
+                self._reactor.callLater(0, transport._handler.onClose, True)
+                txaio.resolve(transport.is_closed, transport)
+
+    def abort(self) -> None:
+        self.close()
+
+
+def _connect_socketpair(reactor, server_factory, client_factory) -> None:
+    if not IReactorSocket.providedBy(reactor):
+        raise Exception(f"reactor {reactor} does not support adopting sockets")
+    server_sock, client_sock = socket.socketpair()
+    for sock, factory in [
+        (server_sock, server_factory),
+        (client_sock, client_factory),
+    ]:
+        sock.setblocking(False)
+        reactor.adoptStreamConnection(sock.fileno(), socket.AF_UNIX, factory)
+        # the reactor has duplicated the file descriptor
+        sock.close()
+
+
+def connect(
+    reactor,
+    transport: str,
+    serializer: ISerializer,
+    server_session: Callable[[], ITransportHandler],
+    client_session: Callable[[], ITransportHandler],
+) -> None:
+    """
+    Connect a new client session to a new router-side session.
+
+    :param reactor: The Twisted reactor to use.
+    :param transport: The transport kind, one of :data:`TRANSPORTS`.
+    :param serializer: The WAMP serializer to use on both ends.
+    :param server_session: Factory for the router-side session.
+    :param client_session: Factory for the client-side session.
+    """
+    if transport == "memory":
+        MemoryTransport.create_pair(
+            reactor, server_session(), client_session(), serializer
+        )
+
+    elif transport == "rawsocket":
+        server_factory = WampRawSocketServerFactory(
+            server_session, serializers=[copy.copy(serializer)]
+        )
+        client_factory = WampRawSocketClientFactory(
+            client_session, serializer=copy.copy(serializer)
+        )
+        _connect_socketpair(reactor, server_factory, client_factory)
+
+    elif transport == "websocket":
+        url = "ws://localhost"
+        server_factory = WampWebSocketServerFactory(
+            server_session,
+            url=url,
+            serializers=[copy.copy(serializer)],
+            reactor=reactor,
+        )
+        client_factory = WampWebSocketClientFactory(
+            client_session,
+            url=url,
+            serializers=[copy.copy(serializer)],
+            reactor=reactor,
+        )
+        _connect_socketpair(reactor, server_factory, client_factory)
+
+    else:
+        raise Exception(
+            f"invalid transport '{transport}' (must be one of {TRANSPORTS})"
+        )
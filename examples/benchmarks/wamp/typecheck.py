@@ -0,0 +1,212 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Type Checking Overhead Benchmark
+
+Measures the cost of dispatching an INVOCATION to a registered procedure
+(through ``ApplicationSession.onMessage()``, up to sending the YIELD) with and
+without ``check_types=True``. For comparison, it also measures the type
+checking wrapper used before type hints were compiled at registration time
+(``inspect.getcallargs()`` and an ``async def`` wrapper on every call).
+
+No router and no network are involved: the session is connected to a stub
+transport that acknowledges registrations and drops everything else.
+
+Usage:
+    python typecheck.py --invocations 50000 --output build/typecheck.json
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Dict, Union
+
+import txaio
+
+# Initialize txaio framework BEFORE importing autobahn
+txaio.use_twisted()
+
+from autobahn.twisted.wamp import ApplicationSession
+from autobahn.wamp import message, role
+from autobahn.wamp.exception import TypeCheckError
+from autobahn.wamp.serializer import JsonSerializer
+from autobahn.wamp.types import TransportDetails
+
+__all__ = ["legacy_type_check", "measure", "main"]
+
+
+def legacy_type_check(func):
+    """
+    The type checking wrapper of ``ApplicationSession.type_check()`` before type
+    hints were compiled at registration time.
+    """
+
+    async def _type_check(*args, **kwargs):
+        arguments = inspect.getcallargs(func, *args, **kwargs)
+        response = []
+        for name, kind in func.__annotations__.items():
+            if name in arguments:
+                if getattr(kind, "__origin__", None) == Union:
+                    expected_types = [arg.__name__ for arg in kind.__args__]
+                    if not isinstance(arguments[name], kind.__args__):
+                        response.append(
+                            f"'{name}' expected types={expected_types} got={type(arguments[name]).__name__}"
+                        )
+                elif not isinstance(arguments[name], kind):
+                    response.append(
+                        f"'{name}' expected type={kind.__name__} got={type(arguments[name]).__name__}"
+                    )
+        if response:
+            raise TypeCheckError(", ".join(response))
+        return await txaio.as_future(func, *args, **kwargs)
+
+    return _type_check
+
+
+def add(a: int, b: int, c: Union[str, None] = None) -> int:
+    return a + b
+
+
+class _Transport:
+    """
+    Acknowledges registrations, drops all other messages.
+    """
+
+    def __init__(self, session):
+        self._session = session
+        self._serializer = JsonSerializer()
+        self._registration_id = 0
+        self.sent = 0
+        session.onOpen(self)
+        roles = {"dealer": role.RoleDealerFeatures()}
+        session.onMessage(message.Welcome(1, roles))
+
+    def transport_details(self):
+        return TransportDetails()
+
+    def send(self, msg):
+        self.sent += 1
+        if isinstance(msg, message.Register):
+            self._registration_id += 1
+            self._session.onMessage(
+                message.Registered(msg.request, self._registration_id)
+            )
+
+    def isOpen(self):
+        return True
+
+
+def measure(mode: str, invocations: int, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Measure the time per invocation of a procedure.
+
+    :param mode: ``unchecked``, ``legacy`` or ``checked``.
+    :param invocations: Number of invocations per measurement.
+    :param repeat: Number of measurements (the fastest is reported).
+
+    :returns: Benchmark result.
+    """
+    session = ApplicationSession()
+    transport = _Transport(session)
+    if mode == "legacy":
+        session.register(legacy_type_check(add), "com.example.add")
+    else:
+        session.register(add, "com.example.add", check_types=(mode == "checked"))
+    registration_id = transport._registration_id
+
+    msgs = [
+        message.Invocation(i + 1, registration_id, args=[i, 2], kwargs={"c": "x"})
+        for i in range(invocations)
+    ]
+
+    best = None
+    for _ in range(repeat):
+        sent = transport.sent
+        started = time.perf_counter()
+        for msg in msgs:
+            session.onMessage(msg)
+        elapsed = time.perf_counter() - started
+        if transport.sent - sent != invocations:
+            raise Exception(f"{mode}: not all invocations were answered")
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return {
+        "mode": mode,
+        "invocations": invocations,
+        "us_per_invocation": 1e6 * best / invocations,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure the overhead of check_types=True on invocations"
+    )
+    parser.add_argument(
+        "--invocations",
+        type=int,
+        default=50000,
+        help="Number of invocations per measurement (default: 50000)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write results to this JSON file",
+    )
+    args = parser.parse_args(argv)
+
+    results = [
+        measure(mode, args.invocations) for mode in ["unchecked", "legacy", "checked"]
+    ]
+    unchecked = results[0]["us_per_invocation"]
+    print(f"{'mode':<12} {'us/invocation':>14} {'overhead':>10}")
+    for r in results:
+        overhead = 100.0 * (r["us_per_invocation"] - unchecked) / unchecked
+        print(f"{r['mode']:<12} {r['us_per_invocation']:>14.2f} {overhead:>9.1f}%")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_implementation(),
+                    "python_version": sys.version.split()[0],
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
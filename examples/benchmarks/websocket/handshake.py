@@ -0,0 +1,213 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Opening Handshake Throughput Benchmark
+
+Measures how many WebSocket opening handshakes per second a server factory can
+process, which is what matters when many clients reconnect at once (e.g. after
+a node restart). Each handshake creates a server protocol on an in-memory
+transport, feeds it a complete HTTP upgrade request (with subprotocols and a
+permessage-deflate offer, as sent by browsers and Autobahn clients), and drops
+the connection again once the handshake response was sent.
+
+Also reports the time spent parsing the HTTP request header alone.
+
+Usage:
+    python handshake.py --handshakes 5000 --output build/handshake.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Dict
+
+import txaio
+
+# Initialize txaio framework BEFORE importing autobahn
+txaio.use_twisted()
+
+from twisted.internet.address import IPv4Address
+from twisted.internet.error import ConnectionDone
+from twisted.internet.task import Clock
+from twisted.internet.testing import StringTransport
+from twisted.python.failure import Failure
+
+from autobahn.twisted.websocket import WebSocketServerFactory, WebSocketServerProtocol
+from autobahn.websocket.compress import (
+    PerMessageDeflateOffer,
+    PerMessageDeflateOfferAccept,
+)
+from autobahn.websocket.protocol import parseHttpHeader
+
+__all__ = ["REQUEST", "measure_handshakes", "measure_parser", "main"]
+
+REQUEST = (
+    b"GET /ws HTTP/1.1\r\n"
+    b"Host: 127.0.0.1:9000\r\n"
+    b"User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101\r\n"
+    b"Accept: */*\r\n"
+    b"Accept-Language: en-US,en;q=0.5\r\n"
+    b"Accept-Encoding: gzip, deflate\r\n"
+    b"Sec-WebSocket-Version: 13\r\n"
+    b"Origin: http://127.0.0.1:9000\r\n"
+    b"Sec-WebSocket-Protocol: wamp.2.cbor, wamp.2.json\r\n"
+    b"Sec-WebSocket-Extensions: permessage-deflate; client_max_window_bits\r\n"
+    b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+    b"Connection: keep-alive, Upgrade\r\n"
+    b"Pragma: no-cache\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Upgrade: websocket\r\n"
+    b"\r\n"
+)
+"""
+The HTTP upgrade request sent by each client.
+"""
+
+
+class _ServerProtocol(WebSocketServerProtocol):
+    def onConnect(self, request):
+        return "wamp.2.json"
+
+
+def _accept_deflate(offers):
+    for offer in offers:
+        if isinstance(offer, PerMessageDeflateOffer):
+            return PerMessageDeflateOfferAccept(offer)
+
+
+def measure_handshakes(handshakes: int, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Measure opening handshake throughput of a server factory.
+
+    :param handshakes: Number of handshakes per measurement.
+    :param repeat: Number of measurements (the fastest is reported).
+
+    :returns: Benchmark result.
+    """
+    factory = WebSocketServerFactory("ws://127.0.0.1:9000", reactor=Clock())
+    factory.protocol = _ServerProtocol
+    factory.setProtocolOptions(
+        perMessageCompressionAccept=_accept_deflate, openHandshakeTimeout=0
+    )
+    addr = IPv4Address("TCP", "127.0.0.1", 50000)
+    done = Failure(ConnectionDone())
+
+    def handshake():
+        proto = factory.buildProtocol(addr)
+        proto.makeConnection(StringTransport(peerAddress=addr))
+        proto.dataReceived(REQUEST)
+        if proto.state != proto.STATE_OPEN:
+            raise Exception(f"handshake failed: {proto.wasNotCleanReason}")
+        proto.connectionLost(done)
+
+    # warm up
+    for _ in range(min(handshakes, 500)):
+        handshake()
+
+    best_wall = best_cpu = None
+    for _ in range(repeat):
+        started_wall = time.perf_counter()
+        started_cpu = time.process_time()
+        for _ in range(handshakes):
+            handshake()
+        wall = time.perf_counter() - started_wall
+        cpu = time.process_time() - started_cpu
+        if best_wall is None or wall < best_wall:
+            best_wall, best_cpu = wall, cpu
+
+    return {
+        "handshakes": handshakes,
+        "handshakes_per_sec": handshakes / best_wall,
+        "cpu_per_handshake": 1e6 * best_cpu / handshakes,
+    }
+
+
+def measure_parser(calls: int, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Measure parsing of the HTTP upgrade request header.
+
+    :param calls: Number of parses per measurement.
+    :param repeat: Number of measurements (the fastest is reported).
+
+    :returns: Benchmark result, in microseconds per parse.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(calls):
+            parseHttpHeader(REQUEST)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return {"calls": calls, "us_per_parse": 1e6 * best / calls}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure WebSocket opening handshake throughput"
+    )
+    parser.add_argument(
+        "--handshakes",
+        type=int,
+        default=5000,
+        help="Number of handshakes per measurement (default: 5000)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write results to this JSON file",
+    )
+    args = parser.parse_args(argv)
+
+    handshakes = measure_handshakes(args.handshakes)
+    parse = measure_parser(args.handshakes * 10)
+    print(f"{'handshakes/s':<24} {handshakes['handshakes_per_sec']:>10.0f}")
+    print(f"{'us CPU per handshake':<24} {handshakes['cpu_per_handshake']:>10.1f}")
+    print(f"{'us per header parse':<24} {parse['us_per_parse']:>10.2f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_implementation(),
+                    "python_version": sys.version.split()[0],
+                    "handshakes": handshakes,
+                    "parser": parse,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Hot-Path Logging Cost Benchmark
+
+Measures the cost of debug/trace log calls on the send and receive paths when
+the respective log level is disabled (the default "info" level):
+
+- per call: the log call patterns of ``WebSocketProtocol.sendData`` and of the
+  WAMP-over-WebSocket transport, with and without the ``log_enabled()`` guard
+- per message: CPU time per message over an in-memory loopback connection, with
+  the guards in place and with the guards forced open (which reproduces the
+  previous behavior of always constructing the log arguments)
+
+Usage:
+    python logcost.py --messages 20000 --output build/logcost.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+from typing import Any, Dict
+
+import txaio
+
+# Initialize txaio framework BEFORE importing autobahn (the loopback uses Twisted)
+txaio.use_twisted()
+
+import autobahn.websocket.protocol
+from autobahn.util import hltype, hlval, log_enabled
+from loopback import create_loopback
+
+__all__ = ["measure_calls", "measure_messages", "main"]
+
+
+class _Session:
+    _authid = "alice"
+    _session_id = 4079463716036234
+
+
+def measure_calls(calls: int) -> Dict[str, Any]:
+    """
+    Measure the cost of disabled log calls, with and without guard.
+
+    :param calls: Number of log calls per measurement.
+
+    :returns: Benchmark result, in nanoseconds per call.
+    """
+    log = txaio.make_logger()
+    session = _Session()
+    peer = "tcp4:127.0.0.1:54321"
+    data = b"x" * 256
+    msg = "Publish(request=1, topic='com.example.topic')"
+
+    def send_data():
+        log.debug(
+            "{func} sent {data_len} bytes for peer {peer}",
+            func=hltype(send_data),
+            peer=hlval(peer),
+            data_len=hlval(len(data)),
+        )
+
+    def send_data_guarded():
+        if log_enabled(log, "debug"):
+            send_data()
+
+    def wamp_send():
+        log.trace(
+            "\n{action1}{session}, {authid}{action2}\n  {message}\n{action3}",
+            action1=hlval("WAMP-Transmit(", color="red", bold=True),
+            authid=(
+                hlval(session._authid, color="red", bold=False)
+                if session._authid
+                else "-"
+            ),
+            session=(
+                hlval(session._session_id, color="red", bold=False)
+                if session._session_id
+                else "-"
+            ),
+            action2=hlval(") >>", color="red", bold=True),
+            action3=hlval(">>", color="red", bold=True),
+            message=msg,
+        )
+
+    def wamp_send_guarded():
+        if log_enabled(log, "trace"):
+            wamp_send()
+
+    result = {"calls": calls}
+    for name, fun in [
+        ("send_data", send_data),
+        ("send_data_guarded", send_data_guarded),
+        ("wamp_send", wamp_send),
+        ("wamp_send_guarded", wamp_send_guarded),
+    ]:
+        secs = min(timeit.repeat(fun, number=calls, repeat=3))
+        result[name] = 1e9 * secs / calls
+    return result
+
+
+def measure_messages(messages: int, guarded: bool) -> Dict[str, Any]:
+    """
+    Measure CPU time per message over a loopback connection.
+
+    :param messages: Number of messages to send.
+    :param guarded: When ``False``, force all ``log_enabled()`` guards in the
+        WebSocket protocol open, so that log arguments are always constructed.
+
+    :returns: Benchmark result.
+    """
+    if not guarded:
+        autobahn.websocket.protocol.log_enabled = lambda log, level: True
+    try:
+        lb = create_loopback()
+        payload = b"x" * 64
+
+        # warm up
+        for _ in range(1000):
+            lb.client.sendMessage(payload)
+        lb.flush()
+
+        started = time.process_time()
+        for i in range(messages):
+            lb.client.sendMessage(payload)
+            if i % 100 == 99:
+                lb.flush()
+        lb.flush()
+        ended = time.process_time()
+        lb.close()
+    finally:
+        autobahn.websocket.protocol.log_enabled = log_enabled
+
+    return {
+        "guarded": guarded,
+        "messages": messages,
+        "cpu_per_msg": 1e6 * (ended - started) / messages,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure the cost of disabled log calls on hot paths"
+    )
+    parser.add_argument(
+        "--messages",
+        type=int,
+        default=20000,
+        help="Number of messages (and log calls) per measurement (default: 20000)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write results to this JSON file",
+    )
+    args = parser.parse_args(argv)
+
+    calls = measure_calls(args.messages)
+    print(f"{'log call':<20} {'ns/call':>10}")
+    for name in ["send_data", "send_data_guarded", "wamp_send", "wamp_send_guarded"]:
+        print(f"{name:<20} {calls[name]:>10.0f}")
+
+    messages = [measure_messages(args.messages, guarded) for guarded in (False, True)]
+    print(f"{'mode':<20} {'us/msg':>10}")
+    for r in messages:
+        mode = "guarded" if r["guarded"] else "unguarded"
+        print(f"{mode:<20} {r['cpu_per_msg']:>10.2f}")
+    unguarded, guarded = messages
+    saved = unguarded["cpu_per_msg"] - guarded["cpu_per_msg"]
+    print(
+        f"guards save {saved:.2f} us per message "
+        f"({100.0 * saved / unguarded['cpu_per_msg']:.1f}%)"
+    )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_implementation(),
+                    "python_version": sys.version.split()[0],
+                    "calls": calls,
+                    "messages": messages,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
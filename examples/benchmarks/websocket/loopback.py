@@ -0,0 +1,233 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+In-memory loopback harness for WebSocket benchmarks.
+
+Connects an Autobahn WebSocket client protocol and server protocol over a
+pair of in-memory transports (``twisted.test.iosim``), so that the complete
+protocol stack (opening handshake, framing, masking, UTF-8 validation,
+fragmentation and permessage-compression) is exercised without any real
+network I/O getting into the measurements.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from twisted.internet.address import IPv4Address
+from twisted.internet.task import Clock
+from twisted.test import iosim
+
+from autobahn.twisted.websocket import (
+    WebSocketClientFactory,
+    WebSocketClientProtocol,
+    WebSocketServerFactory,
+    WebSocketServerProtocol,
+)
+from autobahn.websocket.compress import PERMESSAGE_COMPRESSION_EXTENSION
+
+__all__ = [
+    "COMPRESSIONS",
+    "BenchmarkServerProtocol",
+    "BenchmarkClientProtocol",
+    "Loopback",
+    "create_loopback",
+]
+
+COMPRESSIONS: List[str] = ["none"] + sorted(
+    name.replace("permessage-", "") for name in PERMESSAGE_COMPRESSION_EXTENSION
+)
+"""
+Compression variants available in this installation (``none`` plus the
+short names of all registered permessage-compression extensions).
+"""
+
+
+class BenchmarkServerProtocol(WebSocketServerProtocol):
+    """
+    Server protocol counting received messages and application payload bytes.
+    """
+
+    received_msgs = 0
+    received_bytes = 0
+
+    def onMessage(self, payload, isBinary):
+        self.received_msgs += 1
+        self.received_bytes += len(payload)
+
+
+class BenchmarkClientProtocol(WebSocketClientProtocol):
+    """
+    Client protocol used to push benchmark messages into the connection.
+    """
+
+
+class Loopback:
+    """
+    A connected client/server protocol pair over in-memory transports.
+    """
+
+    def __init__(
+        self,
+        client: BenchmarkClientProtocol,
+        server: BenchmarkServerProtocol,
+        pump: iosim.IOPump,
+    ):
+        self.client = client
+        self.server = server
+        self.pump = pump
+
+    def flush(self) -> None:
+        """
+        Move all pending bytes in both directions until the pipe is drained.
+        """
+        while self.pump.pump(advanceClock=False):
+            pass
+
+    def close(self) -> None:
+        """
+        Perform a WebSocket closing handshake and drop the connection.
+        """
+        self.client.sendClose(1000)
+        self.flush()
+        self.pump.flush()
+
+
+def _compression_options(
+    compression: str,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    if compression == "none":
+        return {}, {}
+
+    ext = PERMESSAGE_COMPRESSION_EXTENSION.get(f"permessage-{compression}")
+    if ext is None:
+        raise Exception(
+            f"compression '{compression}' not available (available: {COMPRESSIONS})"
+        )
+
+    # the brotli compressor is finished at the end of each message, and hence
+    # can't carry its context over to the next message
+    if compression == "brotli":
+        negotiate = {"request_no_context_takeover": True}
+    else:
+        negotiate = {}
+
+    def accept_offer(offers):
+        for offer in offers:
+            if isinstance(offer, ext["Offer"]):
+                return ext["OfferAccept"](offer, **negotiate)
+
+    def accept_response(response):
+        if isinstance(response, ext["Response"]):
+            return ext["ResponseAccept"](response)
+
+    server_options = {"perMessageCompressionAccept": accept_offer}
+    client_options = {
+        "perMessageCompressionOffers": [ext["Offer"](**negotiate)],
+        "perMessageCompressionAccept": accept_response,
+    }
+    return server_options, client_options
+
+
+def create_loopback(
+    mask: bool = True,
+    auto_fragment_size: int = 0,
+    compression: str = "none",
+    server_options: Optional[Dict[str, Any]] = None,
+    client_options: Optional[Dict[str, Any]] = None,
+    server_protocol: type = BenchmarkServerProtocol,
+    client_protocol: type = BenchmarkClientProtocol,
+) -> Loopback:
+    """
+    Create a connected WebSocket client/server pair with the opening handshake
+    completed.
+
+    :param mask: Iff ``True``, the client masks frames (as required by RFC6455).
+        When ``False``, the server is configured to accept unmasked client frames.
+    :param auto_fragment_size: Automatic fragmentation size used on both sides
+        (``0`` disables fragmentation).
+    :param compression: Either ``"none"`` or the short name of a permessage-compression
+        extension, e.g. ``"deflate"``.
+    :param server_options: Extra protocol options for the server factory.
+    :param client_options: Extra protocol options for the client factory.
+    :param server_protocol: Server protocol class to use.
+    :param client_protocol: Client protocol class to use.
+
+    :returns: The connected loopback.
+    """
+    url = "ws://127.0.0.1:9000"
+    clock = Clock()
+
+    server_compression, client_compression = _compression_options(compression)
+
+    server_factory = WebSocketServerFactory(url, reactor=clock)
+    server_factory.protocol = server_protocol
+    server_factory.setProtocolOptions(
+        requireMaskedClientFrames=mask,
+        autoFragmentSize=auto_fragment_size,
+        maxFramePayloadSize=0,
+        maxMessagePayloadSize=0,
+        openHandshakeTimeout=0,
+        closeHandshakeTimeout=0,
+        **server_compression,
+        **(server_options or {}),
+    )
+
+    client_factory = WebSocketClientFactory(url, reactor=clock)
+    client_factory.protocol = client_protocol
+    client_factory.setProtocolOptions(
+        maskClientFrames=mask,
+        autoFragmentSize=auto_fragment_size,
+        maxFramePayloadSize=0,
+        maxMessagePayloadSize=0,
+        openHandshakeTimeout=0,
+        closeHandshakeTimeout=0,
+        **client_compression,
+        **(client_options or {}),
+    )
+
+    server_address = IPv4Address("TCP", "127.0.0.1", 9000)
+    client_address = IPv4Address("TCP", "127.0.0.1", 31337)
+
+    server = server_factory.buildProtocol(client_address)
+    client = client_factory.buildProtocol(server_address)
+
+    server_transport = iosim.FakeTransport(
+        server, isServer=True, hostAddress=server_address, peerAddress=client_address
+    )
+    client_transport = iosim.FakeTransport(
+        client, isServer=False, hostAddress=client_address, peerAddress=server_address
+    )
+
+    pump = iosim.connect(server, server_transport, client, client_transport, clock=clock)
+    pump.flush()
+
+    if client.state != WebSocketClientProtocol.STATE_OPEN:
+        raise Exception("WebSocket opening handshake over loopback failed")
+
+    if compression != "none" and client._perMessageCompress is None:
+        raise Exception(f"compression '{compression}' was not negotiated")
+
+    return Loopback(client, server, pump)
@@ -0,0 +1,443 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+WebSocket Protocol Benchmarks
+
+Benchmarks the end-to-end performance of the Autobahn WebSocket protocol
+implementation (framing, masking, UTF-8 validation, fragmentation and
+permessage-compression) by driving ``WebSocketClientProtocol`` and
+``WebSocketServerProtocol`` over in-memory transports.
+
+Usage:
+    # Run benchmark
+    python main.py run --payload_size medium --mask on --fragment 0 \\
+        --compression deflate --results build
+
+    # Generate HTML report
+    python main.py index --output build
+
+NVX native acceleration (UTF-8 validation, XOR masking) is selected via the
+``AUTOBAHN_USE_NVX`` environment variable, as for the library itself.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from timeit import Timer
+from typing import Any, Dict, List, Optional
+
+import humanize
+import jinja2
+import txaio
+import vmprof
+
+# Initialize txaio framework BEFORE importing autobahn (the loopback uses Twisted)
+txaio.use_twisted()
+
+from autobahn import util
+from autobahn.websocket import USES_NVX
+
+from loopback import COMPRESSIONS, create_loopback
+
+__all__ = ["main_run", "main_index"]
+
+PAYLOAD_SIZES: Dict[str, int] = {
+    "tiny": 16,
+    "small": 256,
+    "medium": 4096,
+    "large": 65536,
+    "xl": 1048576,
+}
+"""
+Payload size categories (application payload bytes per message).
+"""
+
+FRAGMENT_SIZES: List[int] = [0, 1024, 16384]
+"""
+``autoFragmentSize`` values exercised by the benchmark suite (``0`` = no fragmentation).
+"""
+
+# total application payload pushed through the connection per iteration
+BYTES_PER_ITERATION = 16 * 1024 * 1024
+
+# message count bounds per iteration
+MIN_MSGS_PER_ITERATION = 50
+MAX_MSGS_PER_ITERATION = 20000
+
+# number of messages sent before the in-memory pipe is drained
+BATCH_SIZE = 50
+
+
+def _payload(size: int, seed: int = 42) -> bytes:
+    """
+    Create a deterministic, JSON-like text payload of exactly ``size`` bytes.
+
+    The payload is moderately compressible (like typical application data),
+    so that permessage-compression is measured under realistic conditions.
+    """
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size:
+        record = (
+            f'{{"id": {rng.randint(0, 2**31)}, "lat": {rng.uniform(-90, 90):.6f}, '
+            f'"lon": {rng.uniform(-180, 180):.6f}, "speed": {rng.randint(0, 250)}, '
+            f'"status": "{rng.choice(["ok", "warn", "error", "idle"])}"}}, '
+        )
+        parts.append(record)
+        total += len(record)
+    return "".join(parts).encode("utf8")[:size]
+
+
+def _results_key(
+    python: str,
+    nvx: str,
+    payload_size: str,
+    mask: str,
+    fragment: int,
+    compression: str,
+) -> str:
+    return f"{python}_{nvx}_{payload_size}_{mask}_{fragment}_{compression}"
+
+
+def main_run(args: argparse.Namespace) -> None:
+    """
+    Run WebSocket protocol benchmark.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    iterations = args.iterations
+    payload_size = args.payload_size
+    mask = args.mask
+    fragment = args.fragment
+    compression = args.compression
+
+    python = "cpy" if platform.python_implementation() == "CPython" else "pypy"
+    nvx = "nvx" if USES_NVX else "nonvx"
+
+    key = _results_key(python, nvx, payload_size, mask, fragment, compression)
+    filename_profile = args.profile or os.path.join(
+        args.results, f"profile_{key}.dat"
+    )
+    filename_results = os.path.join(args.results, f"results_{key}.json")
+
+    payload = _payload(PAYLOAD_SIZES[payload_size])
+    msgs_per_iteration = max(
+        MIN_MSGS_PER_ITERATION,
+        min(MAX_MSGS_PER_ITERATION, BYTES_PER_ITERATION // max(1, len(payload))),
+    )
+
+    print(
+        f"Setting up WebSocket loopback (mask={mask}, autoFragmentSize={fragment}, "
+        f"compression={compression}, nvx={USES_NVX}) .."
+    )
+    loopback = create_loopback(
+        mask=(mask == "on"),
+        auto_fragment_size=fragment,
+        compression=compression,
+    )
+    client = loopback.client
+    server = loopback.server
+
+    print(
+        f"Ok, connection open. Sending {msgs_per_iteration} messages of "
+        f"{len(payload)} bytes per iteration .."
+    )
+
+    def loop(results: Optional[Dict[str, Any]] = None) -> None:
+        """Inner benchmark loop."""
+        received_msgs = server.received_msgs
+        received_bytes = server.received_bytes
+        wire_bytes = client.trafficStats.outgoingOctetsWireLevel
+
+        started = time.perf_counter()
+        started_cpu = time.process_time()
+
+        for i in range(msgs_per_iteration):
+            client.sendMessage(payload, isBinary=False)
+            if i % BATCH_SIZE == BATCH_SIZE - 1:
+                loopback.flush()
+        loopback.flush()
+
+        secs = time.perf_counter() - started
+        cpu_secs = time.process_time() - started_cpu
+
+        total_cnt = server.received_msgs - received_msgs
+        total_bytes = server.received_bytes - received_bytes
+        total_wire_bytes = client.trafficStats.outgoingOctetsWireLevel - wire_bytes
+
+        if total_cnt != msgs_per_iteration:
+            raise Exception(
+                f"message loss: sent {msgs_per_iteration} messages, but received {total_cnt}"
+            )
+
+        msg_per_sec = int(round(float(total_cnt) / secs, 0))
+        bytes_per_sec = int(round(float(total_bytes) / secs, 0))
+        cpu_per_msg = 1000000.0 * cpu_secs / total_cnt
+
+        print(
+            f"Transferred {total_cnt} messages, {total_bytes} bytes in total "
+            f"({total_wire_bytes} bytes on the wire), {msg_per_sec} msgs/sec, "
+            f"{bytes_per_sec} bytes/sec, {cpu_per_msg:.2f} us CPU/msg"
+        )
+
+        if results is not None:
+            results["msg_bytes"] = len(payload)
+            results["wire_bytes"] = int(round(total_wire_bytes / total_cnt))
+            for k, v in [
+                ("msgs_per_sec", msg_per_sec),
+                ("bytes_per_sec", bytes_per_sec),
+                ("cpu_per_msg", cpu_per_msg),
+            ]:
+                if k not in results:
+                    results[k] = []
+                results[k].append(v)
+
+    # Warm-up phase
+    print(f"Warming up for {iterations} iterations ..")
+    t = Timer(lambda: loop())
+    t.timeit(number=iterations)
+
+    # Measurement phase with profiling
+    print(f"Measuring {iterations} iterations ..")
+    results: Dict[str, Any] = {}
+    fd = os.open(filename_profile, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+
+    vmprof.enable(fd, period=0.01)
+    t = Timer(lambda: loop(results))
+    t.timeit(number=iterations)
+    vmprof.disable()
+
+    os.close(fd)
+
+    loopback.close()
+
+    # Calculate averages
+    msgs_per_sec = int(
+        round(sum(results["msgs_per_sec"]) / len(results["msgs_per_sec"]))
+    )
+    bytes_per_sec = int(
+        round(sum(results["bytes_per_sec"]) / len(results["bytes_per_sec"]))
+    )
+    cpu_per_msg = round(sum(results["cpu_per_msg"]) / len(results["cpu_per_msg"]), 3)
+
+    # Save results
+    with open(filename_results, "w") as f:
+        obj = {
+            "python_version": sys.version,
+            "python": python,
+            "nvx": nvx,
+            "payload_size": payload_size,
+            "mask": mask,
+            "fragment": fragment,
+            "compression": compression,
+            "iterations": iterations,
+            "msgs_per_iteration": msgs_per_iteration,
+            "msg_bytes": results["msg_bytes"],
+            "wire_bytes": results["wire_bytes"],
+            "msgs_per_sec": msgs_per_sec,
+            "bytes_per_sec": bytes_per_sec,
+            "cpu_per_msg": cpu_per_msg,
+        }
+        json.dump(obj, f)
+
+    print(
+        f"Done: {msgs_per_sec} msgs/sec, {bytes_per_sec} bytes/sec, "
+        f"{cpu_per_msg} us CPU/msg"
+    )
+
+
+def main_index(args: argparse.Namespace) -> None:
+    """
+    Generate HTML report index from benchmark results.
+
+    Args:
+        args: Parsed command-line arguments
+    """
+    output = args.output
+
+    templates = jinja2.Environment(
+        loader=jinja2.FileSystemLoader("templates"),
+        keep_trailing_newline=True,
+        autoescape=True,
+    )
+
+    template_index = templates.get_template("index.html")
+    template_flamegraph = templates.get_template("flamegraph.html")
+
+    # python -> nvx -> payload_size -> list of results (one per configuration)
+    report_data: Dict[str, Any] = {
+        "generated": util.utcnow(),
+        "payload_sizes": list(PAYLOAD_SIZES),
+        "results": {
+            "cpy": {},
+            "pypy": {},
+        },
+    }
+
+    for _python in report_data["results"]:
+        for _nvx in ["nvx", "nonvx"]:
+            for _payload_size in PAYLOAD_SIZES:
+                for _mask in ["on", "off"]:
+                    for _fragment in FRAGMENT_SIZES:
+                        for _compression in COMPRESSIONS:
+                            key = _results_key(
+                                _python,
+                                _nvx,
+                                _payload_size,
+                                _mask,
+                                _fragment,
+                                _compression,
+                            )
+                            fn = os.path.join(output, f"results_{key}.json")
+                            if not os.path.isfile(fn):
+                                continue
+
+                            with open(fn) as f:
+                                data = json.load(f)
+                            data["key"] = key
+                            report_data["results"][_python].setdefault(
+                                _nvx, {}
+                            ).setdefault(_payload_size, []).append(data)
+                            print(f"File added    : {fn}")
+
+                            # Generate flamegraph HTML
+                            fn_html = os.path.join(output, f"vmprof_{key}.html")
+                            with open(fn_html, "w") as f:
+                                s = template_flamegraph.render(
+                                    naturalsize=humanize.naturalsize,
+                                    intword=humanize.intword,
+                                    intcomma=humanize.intcomma,
+                                    sorted=sorted,
+                                    **data,
+                                )
+                                f.write(s)
+
+    # Generate index HTML
+    with open(os.path.join(output, "index.html"), "w") as f:
+        s = template_index.render(
+            naturalsize=humanize.naturalsize,
+            intword=humanize.intword,
+            intcomma=humanize.intcomma,
+            sorted=sorted,
+            **report_data,
+        )
+        f.write(s)
+
+    print(f"Report generated: {os.path.join(output, 'index.html')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WebSocket Protocol Benchmarks")
+    subparsers = parser.add_subparsers(
+        dest="command", title="commands", help="Command to run (required)"
+    )
+    subparsers.required = True
+
+    # Run benchmark subcommand
+    parser_run = subparsers.add_parser("run", help="Run WebSocket protocol benchmark")
+
+    parser_run.add_argument(
+        "--iterations",
+        dest="iterations",
+        type=int,
+        default=10,
+        help="Number of iterations in the benchmarking loop (default: 10)",
+    )
+
+    parser_run.add_argument(
+        "--payload_size",
+        dest="payload_size",
+        choices=list(PAYLOAD_SIZES),
+        default="small",
+        help="Payload size category",
+    )
+
+    parser_run.add_argument(
+        "--mask",
+        dest="mask",
+        choices=["on", "off"],
+        default="on",
+        help="Mask client-to-server frames (off requires the server to accept unmasked frames)",
+    )
+
+    parser_run.add_argument(
+        "--fragment",
+        dest="fragment",
+        type=int,
+        default=0,
+        help="autoFragmentSize in bytes used on both ends (default: 0, no fragmentation)",
+    )
+
+    parser_run.add_argument(
+        "--compression",
+        dest="compression",
+        choices=COMPRESSIONS,
+        default="none",
+        help="permessage-compression extension to negotiate (default: none)",
+    )
+
+    parser_run.add_argument(
+        "--profile",
+        dest="profile",
+        type=str,
+        default=None,
+        help="vmprof profile output filename (.dat, default: <results>/profile_<config>.dat)",
+    )
+
+    parser_run.add_argument(
+        "--results",
+        dest="results",
+        type=str,
+        required=True,
+        help="Results output directory",
+    )
+
+    parser_run.set_defaults(func=main_run)
+
+    # Index generation subcommand
+    parser_index = subparsers.add_parser(
+        "index", help="Generate HTML report index from benchmark results"
+    )
+
+    parser_index.add_argument(
+        "--output",
+        dest="output",
+        type=str,
+        required=True,
+        help="Output directory for HTML report",
+    )
+
+    parser_index.set_defaults(func=main_index)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,147 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+WebSocket Per-Connection Memory Benchmark
+
+Measures the Python heap retained per idle WebSocket connection (client and
+server protocol of an opened in-memory loopback connection), with and without
+the ``compactConnection`` protocol option.
+
+Usage:
+    python memory.py --connections 1000 --output build/memory.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from typing import Any, Dict, List
+
+import txaio
+
+# Initialize txaio framework BEFORE importing autobahn (the loopback uses Twisted)
+txaio.use_twisted()
+
+from loopback import create_loopback
+
+__all__ = ["measure", "main"]
+
+
+def measure(connections: int, compact: bool) -> Dict[str, Any]:
+    """
+    Open ``connections`` idle loopback connections and measure the retained heap.
+
+    :param connections: Number of connections to open.
+    :param compact: Enable the ``compactConnection`` option on both sides.
+
+    :returns: Benchmark result.
+    """
+    options = {"compactConnection": compact}
+
+    # warm up caches, lazily created module state etc.
+    create_loopback(server_options=options, client_options=options)
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    loopbacks: List[Any] = []
+    for _ in range(connections):
+        lb = create_loopback(server_options=options, client_options=options)
+        loopbacks.append(lb)
+
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for lb in loopbacks:
+        lb.close()
+
+    retained = after - before
+    return {
+        "compact": compact,
+        "connections": connections,
+        "retained_bytes": retained,
+        "peak_bytes": peak - before,
+        "bytes_per_connection": retained / connections,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure memory retained per idle WebSocket connection"
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=1000,
+        help="Number of idle connections to open per mode (default: 1000)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write results to this JSON file",
+    )
+    args = parser.parse_args(argv)
+
+    results = [measure(args.connections, compact) for compact in (False, True)]
+
+    print(f"{'mode':<10} {'connections':>12} {'bytes/conn':>12} {'retained':>14}")
+    for r in results:
+        mode = "compact" if r["compact"] else "default"
+        print(
+            f"{mode:<10} {r['connections']:>12} "
+            f"{r['bytes_per_connection']:>12.0f} {r['retained_bytes']:>14}"
+        )
+    default, compact = results
+    saved = default["bytes_per_connection"] - compact["bytes_per_connection"]
+    print(
+        f"compact mode saves {saved:.0f} bytes per connection "
+        f"({100.0 * saved / default['bytes_per_connection']:.1f}%)"
+    )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_implementation(),
+                    "python_version": sys.version.split()[0],
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -37,7 +37,15 @@ from autobahn.asyncio.util import (
     get_serializers,
     transport_channel_id,
 )
-from autobahn.util import _LazyHexFormatter, hltype, public
+from autobahn.metrics import ConnectionMetrics
+from autobahn.util import (
+    ReadThrottle,
+    WriteFlowControl,
+    _LazyHexFormatter,
+    hltype,
+    log_enabled,
+    public,
+)
 from autobahn.wamp.exception import ProtocolError, SerializationError, TransportLost
 from autobahn.wamp.types import TransportDetails
 
@@ -125,6 +133,18 @@ class PrefixProtocol(asyncio.Protocol):
         self.transport.write(header)
         self.transport.write(data)
 
+    def sendStrings(self, strings):
+        """
+        Send several strings, written to the transport at once.
+        """
+        chunks = []
+        for data in strings:
+            if len(data) > self.max_length_send:
+                raise ValueError("Data too big")
+            chunks.append(struct.pack(self.prefix_format, len(data)))
+            chunks.append(data)
+        self.transport.write(b"".join(chunks))
+
     def ping(self, data):
         raise NotImplementedError()
 
@@ -210,9 +230,10 @@ class RawSocketProtocol(PrefixProtocol):
         raise NotImplementedError()
 
     def data_received(self, data):
-        self.log.debug(
-            "RawSocker Asyncio: data received {data}", data=_LazyHexFormatter(data)
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                "RawSocker Asyncio: data received {data}", data=_LazyHexFormatter(data)
+            )
         if self._handshake_done:
             return PrefixProtocol.data_received(self, data)
         else:
@@ -298,8 +319,55 @@ class RawSocketServerProtocol(RawSocketProtocol):
 
 # this is transport independent part of WAMP protocol
 class WampRawSocketMixinGeneral:
+    # read-side backpressure limits (0 = unlimited), set from the factory
+    _max_in_flight_messages = 0
+    _max_in_flight_bytes = 0
+    read_throttle = None
+
+    # write-side flow control (0 = disabled), set from the factory
+    _write_high_water_mark = 0
+    _write_low_water_mark = 0
+    write_flow = None
+
+    def collect_metrics(self, metrics):
+        """
+        Report the metrics of this connection: the statistics of the WAMP serializer
+        and session. The factory reports the metrics of all its connections
+        aggregated (see :mod:`autobahn.metrics`).
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        serializer = getattr(self, "_serializer", None)
+        if serializer is not None:
+            serializer.collect_metrics(metrics)
+        session = getattr(self, "_session", None)
+        collect_session = getattr(session, "collect_metrics", None)
+        if collect_session is not None:
+            collect_session(metrics)
+
     def _on_handshake_complete(self):
         self.log.debug("WampRawSocketProtocol: Handshake complete")
+        metrics = getattr(self.factory, "_connection_metrics", None)
+        if metrics is not None:
+            metrics.opened(self)
+
+        # pause reading while too many received messages are still being processed
+        if self._max_in_flight_messages or self._max_in_flight_bytes:
+            self.read_throttle = ReadThrottle(
+                self._pause_reading,
+                self._resume_reading,
+                self._max_in_flight_messages,
+                self._max_in_flight_bytes,
+            )
+
+        # asyncio calls pause_writing/resume_writing when the outgoing buffer fills up
+        if self._write_high_water_mark:
+            self.write_flow = WriteFlowControl()
+            self.transport.set_write_buffer_limits(
+                high=self._write_high_water_mark, low=self._write_low_water_mark
+            )
+
         # RawSocket connection established. Now let the user WAMP session factory
         # create a new WAMP session and fire off session open callback.
         try:
@@ -326,14 +394,25 @@ class WampRawSocketMixinGeneral:
             self.log.info("ApplicationSession started.")
 
     def stringReceived(self, payload):
-        self.log.debug(
-            "WampRawSocketProtocol: RX octets: {octets}",
-            octets=_LazyHexFormatter(payload),
-        )
+        debug = log_enabled(self.log, "debug")
+        if debug:
+            self.log.debug(
+                "WampRawSocketProtocol: RX octets: {octets}",
+                octets=_LazyHexFormatter(payload),
+            )
+        handler_futures = [] if self.read_throttle is not None else None
         try:
             for msg in self._serializer.unserialize(payload):
-                self.log.debug("WampRawSocketProtocol: RX WAMP message: {msg}", msg=msg)
-                self._session.onMessage(msg)
+                if debug:
+                    self.log.debug(
+                        "WampRawSocketProtocol: RX WAMP message: {msg}", msg=msg
+                    )
+                res = self._session.onMessage(msg)
+                if handler_futures is not None and txaio.is_future(res):
+                    handler_futures.append(res)
+            # a batched payload carries several messages: count its bytes once
+            if handler_futures:
+                self.read_throttle.track_many(handler_futures, len(payload))
 
         except ProtocolError as e:
             self.log.warn(
@@ -354,9 +433,11 @@ class WampRawSocketMixinGeneral:
         Implements :func:`autobahn.wamp.interfaces.ITransport.send`
         """
         if self.isOpen():
-            self.log.debug(
-                "{func}: TX WAMP message: {msg}", func=hltype(self.send), msg=msg
-            )
+            debug = log_enabled(self.log, "debug")
+            if debug:
+                self.log.debug(
+                    "{func}: TX WAMP message: {msg}", func=hltype(self.send), msg=msg
+                )
             try:
                 payload, _ = self._serializer.serialize(msg)
             except Exception as e:
@@ -366,13 +447,33 @@ class WampRawSocketMixinGeneral:
                 )
             else:
                 self.sendString(payload)
-                self.log.debug(
-                    "WampRawSocketProtocol: TX octets: {octets}",
-                    octets=_LazyHexFormatter(payload),
-                )
+                if debug:
+                    self.log.debug(
+                        "WampRawSocketProtocol: TX octets: {octets}",
+                        octets=_LazyHexFormatter(payload),
+                    )
         else:
             raise TransportLost()
 
+    def send_many(self, msgs):
+        """
+        Send several WAMP messages, serializing all of them first and writing them
+        to the transport at once.
+
+        :param msgs: The WAMP messages to send.
+        :type msgs: list
+        """
+        if not self.isOpen():
+            raise TransportLost()
+        serialize = self._serializer.serialize
+        try:
+            payloads = [serialize(msg)[0] for msg in msgs]
+        except Exception as e:
+            raise SerializationError(
+                f"WampRawSocketProtocol: unable to serialize WAMP application payload ({e})"
+            )
+        self.sendStrings(payloads)
+
     def isOpen(self):
         """
         Implements :func:`autobahn.wamp.interfaces.ITransport.isOpen`
@@ -386,7 +487,30 @@ class WampRawSocketMixinAsyncio:
     Base class for asyncio-based WAMP-over-RawSocket protocols.
     """
 
+    def _pause_reading(self):
+        if self.transport:
+            self.transport.pause_reading()
+
+    def _resume_reading(self):
+        if self.transport:
+            self.transport.resume_reading()
+
+    def pause_writing(self):
+        if self.write_flow is not None:
+            self.write_flow.pause()
+
+    def resume_writing(self):
+        if self.write_flow is not None:
+            self.write_flow.resume()
+
     def _on_connection_lost(self, exc):
+        if self.read_throttle is not None:
+            self.read_throttle.stop()
+        if self.write_flow is not None:
+            self.write_flow.stop(TransportLost())
+        metrics = getattr(self.factory, "_connection_metrics", None)
+        if self._handshake_done and metrics is not None:
+            metrics.closed(self)
         try:
             wasClean = exc is None
             self._session.onClose(wasClean)
@@ -477,10 +601,64 @@ class WampRawSocketFactory:
 
     log = txaio.make_logger()
 
+    # read-side backpressure (0 = unlimited)
+    _max_in_flight_messages = 0
+    _max_in_flight_bytes = 0
+
+    # write-side flow control (0 = disabled)
+    _write_high_water_mark = 0
+    _write_low_water_mark = 0
+
+    def resetProtocolOptions(self):
+        self._max_in_flight_messages = 0
+        self._max_in_flight_bytes = 0
+        self._write_high_water_mark = 0
+        self._write_low_water_mark = 0
+
+    def setProtocolOptions(
+        self,
+        maxInFlightMessages=None,
+        maxInFlightBytes=None,
+        writeHighWaterMark=None,
+        writeLowWaterMark=None,
+    ):
+        if maxInFlightMessages is not None:
+            assert type(maxInFlightMessages) == int and maxInFlightMessages >= 0
+            self._max_in_flight_messages = maxInFlightMessages
+
+        if maxInFlightBytes is not None:
+            assert type(maxInFlightBytes) == int and maxInFlightBytes >= 0
+            self._max_in_flight_bytes = maxInFlightBytes
+
+        if writeHighWaterMark is not None:
+            assert type(writeHighWaterMark) == int and writeHighWaterMark >= 0
+            self._write_high_water_mark = writeHighWaterMark
+
+        if writeLowWaterMark is not None:
+            assert type(writeLowWaterMark) == int and writeLowWaterMark >= 0
+            self._write_low_water_mark = writeLowWaterMark
+
+    def collect_metrics(self, metrics):
+        """
+        Report the metrics of all connections of this factory, aggregated. Metrics of
+        closed connections are retained in the counters.
+
+        Register the factory with a :class:`autobahn.metrics.MetricsRegistry` to
+        export them.
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        self._connection_metrics.collect_metrics(metrics)
+
     @public
     def __call__(self):
         proto = self.protocol()
         proto.factory = self
+        proto._max_in_flight_messages = self._max_in_flight_messages
+        proto._max_in_flight_bytes = self._max_in_flight_bytes
+        proto._write_high_water_mark = self._write_high_water_mark
+        proto._write_low_water_mark = self._write_low_water_mark
         return proto
 
 
@@ -519,6 +697,9 @@ class WampRawSocketServerFactory(WampRawSocketFactory):
 
         self._serializers = {ser.RAWSOCKET_SERIALIZER_ID: ser for ser in serializers}
 
+        # metrics of (open and closed) connections
+        self._connection_metrics = ConnectionMetrics("autobahn_rawsocket")
+
 
 @public
 class WampRawSocketClientFactory(WampRawSocketFactory):
@@ -556,3 +737,6 @@ class WampRawSocketClientFactory(WampRawSocketFactory):
             raise Exception("could not import any WAMP serializer")
 
         self._serializer = serializer
+
+        # metrics of (open and closed) connections
+        self._connection_metrics = ConnectionMetrics("autobahn_rawsocket")
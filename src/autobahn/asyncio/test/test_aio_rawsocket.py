@@ -72,6 +72,17 @@ def test_prefix():
     assert p._buffer == b"\x00"
 
 
+def test_prefix_send_strings():
+    p = PrefixProtocol()
+    transport = Mock()
+    p.connection_made(transport)
+
+    p.sendStrings([b"abcd", b"12345"])
+    transport.write.assert_called_once_with(
+        b"\x00\x00\x00\x04abcd\x00\x00\x00\x0512345"
+    )
+
+
 @pytest.mark.skipif(
     not os.environ.get("USE_ASYNCIO", False), reason="test runs on asyncio only"
 )
@@ -75,3 +75,32 @@ def test_async_on_connect_server():
 
     assert len(values) == 1
     assert values[0] == num * num
+
+
+@pytest.mark.skipif(
+    not os.environ.get("USE_ASYNCIO", False), reason="test runs on asyncio only"
+)
+def test_read_throttle_pauses_transport():
+    loop = asyncio.get_event_loop()
+    release = loop.create_future()
+
+    async def on_message(payload, isBinary):
+        await release
+
+    factory = WebSocketServerFactory()
+    factory.setProtocolOptions(maxInFlightMessages=1)
+    server = factory()
+    server.onMessage = on_message
+    transport = Mock()
+    server.connection_made(transport)
+
+    server._onMessage(b"hello", False)
+    assert transport.pause_reading.called
+    assert not transport.resume_reading.called
+    assert server.readThrottle.in_flight_bytes == 5
+
+    release.set_result(None)
+    loop.run_until_complete(asyncio.sleep(0.01))
+    assert transport.resume_reading.called
+    assert server.readThrottle.in_flight_messages == 0
+    assert server.readThrottle.pauses == 1
@@ -34,7 +34,7 @@ import txaio
 txaio.use_asyncio()  # noqa
 
 from autobahn.asyncio.util import create_transport_details, transport_channel_id
-from autobahn.util import hltype, public
+from autobahn.util import hltype, log_enabled, public
 from autobahn.wamp import websocket
 from autobahn.websocket import protocol
 
@@ -72,11 +72,12 @@ class WebSocketAdapterProtocol(asyncio.Protocol):
     def connection_made(self, transport):
         # asyncio networking framework entry point, called by asyncio
         # when the connection is established (either a client or a server)
-        self.log.debug(
-            "{func}(transport={transport})",
-            func=hltype(self.connection_made),
-            transport=transport,
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                "{func}(transport={transport})",
+                func=hltype(self.connection_made),
+                transport=transport,
+            )
 
         self.transport = transport
 
@@ -93,6 +94,20 @@ class WebSocketAdapterProtocol(asyncio.Protocol):
 
         self._connectionMade()
 
+        # write-side flow control: asyncio calls pause_writing/resume_writing
+        if self.writeFlow is not None:
+            self.transport.set_write_buffer_limits(
+                high=self.writeHighWaterMark, low=self.writeLowWaterMark
+            )
+
+    def pause_writing(self):
+        if self.writeFlow is not None:
+            self.writeFlow.pause()
+
+    def resume_writing(self):
+        if self.writeFlow is not None:
+            self.writeFlow.resume()
+
     def connection_lost(self, exc):
         self._connectionLost(exc)
         # according to asyncio docs, connection_lost(None) is called
@@ -172,7 +187,9 @@ class WebSocketAdapterProtocol(asyncio.Protocol):
     def _onMessage(self, payload, isBinary):
         res = self.onMessage(payload, isBinary)
         if yields(res):
-            asyncio.ensure_future(res)
+            f = asyncio.ensure_future(res)
+            if self.readThrottle is not None:
+                self.readThrottle.track(f, len(payload))
 
     def _onPing(self, payload):
         res = self.onPing(payload)
@@ -189,6 +206,15 @@ class WebSocketAdapterProtocol(asyncio.Protocol):
         if yields(res):
             asyncio.ensure_future(res)
 
+    def _pauseReading(self):
+        self.transport.pause_reading()
+
+    def _resumeReading(self):
+        self.transport.resume_reading()
+
+    def _runInThread(self, fun, *args):
+        return self.factory.loop.run_in_executor(None, fun, *args)
+
     def registerProducer(self, producer, streaming):
         raise Exception("not implemented")
 
@@ -280,6 +306,10 @@ class WebSocketServerFactory(WebSocketAdapterFactory, protocol.WebSocketServerFa
 
         protocol.WebSocketServerFactory.__init__(self, *args, **kwargs)
 
+        # run handshake admission control on the loop's clock
+        self._handshakeAdmission.clock = self.loop.time
+        self._handshakeAdmission.call_later = self.loop.call_later
+
 
 @public
 class WebSocketClientFactory(WebSocketAdapterFactory, protocol.WebSocketClientFactory):
@@ -0,0 +1,466 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Pull-based metrics.
+
+Nothing is recorded into the registry on the hot path: the objects which already
+keep statistics (traffic statistics of WebSocket connections, serializers, WAMP
+sessions and transport factories) are *metrics collectors*, that is they have a
+``collect_metrics(metrics)`` method which reports their current values into a
+:class:`MetricsSnapshot` when the registry is scraped.
+
+A snapshot sums up the values reported for the same metric name and labels, which
+is how metrics of all connections of a factory are aggregated. For example::
+
+    registry = MetricsRegistry()
+    registry.register(factory)
+
+    # Prometheus text exposition format
+    text = registry.to_prometheus()
+
+    # JSON
+    data = json.dumps(registry.__json__())
+"""
+
+from bisect import bisect_left
+
+from autobahn.util import public
+
+__all__ = (
+    "DEFAULT_BUCKETS",
+    "ConnectionMetrics",
+    "Histogram",
+    "MetricsRegistry",
+    "MetricsSnapshot",
+    "log_linear_buckets",
+)
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+"""
+Default histogram bucket upper bounds (in seconds, when used for latencies).
+"""
+
+
+@public
+def log_linear_buckets(lowest: float, highest: float, sub_buckets: int = 4):
+    """
+    Compute HDR-style (log-linear) histogram bucket bounds: every power-of-two range
+    between ``lowest`` and ``highest`` is split into ``sub_buckets`` linear buckets,
+    so the relative error of a recorded value is bounded by ``1 / sub_buckets``
+    over the whole range.
+
+    :param lowest: Upper bound of the first bucket (must be positive).
+    :param highest: Values above this bound are counted in the ``+Inf`` bucket.
+    :param sub_buckets: Number of buckets per power of two.
+
+    :returns: The bucket upper bounds in ascending order.
+    :rtype: tuple of float
+    """
+    if lowest <= 0 or highest <= lowest:
+        raise Exception(f"invalid bucket range [{lowest}, {highest}]")
+    if sub_buckets < 1:
+        raise Exception(f"invalid number of sub-buckets {sub_buckets}")
+    buckets = [lowest]
+    base = lowest
+    while base < highest:
+        for i in range(1, sub_buckets + 1):
+            bound = base * (1 + i / sub_buckets)
+            if bound > highest:
+                break
+            buckets.append(bound)
+        base *= 2
+    if buckets[-1] < highest:
+        buckets.append(highest)
+    return tuple(buckets)
+
+
+@public
+class Histogram:
+    """
+    Histogram with fixed buckets.
+
+    Observing a value is a binary search over the bucket bounds and an increment.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+
+        :param buckets: Upper bounds (inclusive) of the histogram buckets, sorted in
+            ascending order. Values larger than the last bound are counted in an
+            implicit ``+Inf`` bucket.
+        :type buckets: tuple of float
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        """
+        Record a value.
+
+        :param value: The value to record.
+        :type value: int or float
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Add the values recorded in another histogram with the same buckets.
+        """
+        if other.buckets != self.buckets:
+            raise Exception("cannot merge histograms with different buckets")
+        counts = self.counts
+        for i, n in enumerate(other.counts):
+            counts[i] += n
+        self.sum += other.sum
+        self.count += other.count
+
+    def copy(self) -> "Histogram":
+        histogram = Histogram(self.buckets)
+        histogram.merge(self)
+        return histogram
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def quantile(self, q: float):
+        """
+        Estimate a quantile from the buckets.
+
+        :param q: The quantile, e.g. ``0.99``.
+
+        :returns: The upper bound of the bucket the quantile falls into (``None``
+            when no values were recorded, and ``float("inf")`` when it falls into
+            the ``+Inf`` bucket).
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def __json__(self):
+        cumulative = 0
+        buckets = []
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            buckets.append([bound, cumulative])
+        buckets.append(["+Inf", self.count])
+        return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+
+class _Family:
+    __slots__ = ("type", "help", "samples")
+
+    def __init__(self, type, help):
+        self.type = type
+        self.help = help
+        self.samples = {}
+
+
+@public
+class MetricsSnapshot:
+    """
+    The metrics reported by collectors in one scrape. Values reported for the same
+    metric name and labels are summed up (histograms are merged).
+    """
+
+    def __init__(self, gauges: bool = True):
+        """
+
+        :param gauges: When ``False``, gauges reported into this snapshot are dropped.
+            This is used to retain the monotonic metrics of closed connections.
+        """
+        self._families = {}
+        self._gauges = gauges
+
+    def _family(self, name, type, help):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = _Family(type, help)
+        elif family.type != type:
+            raise Exception(
+                f'metric "{name}" reported as {type}, but is a {family.type}'
+            )
+        return family
+
+    def counter(self, name: str, value, help: str = "", labels=None) -> None:
+        """
+        Report a counter (a monotonically increasing value).
+
+        :param name: Metric name, e.g. ``autobahn_websocket_incoming_messages_total``.
+        :param value: Current value.
+        :param help: Description of the metric.
+        :param labels: Optional labels of the value.
+        :type labels: dict or None
+        """
+        samples = self._family(name, "counter", help).samples
+        key = tuple(sorted(labels.items())) if labels else ()
+        samples[key] = samples.get(key, 0) + value
+
+    def gauge(self, name: str, value, help: str = "", labels=None) -> None:
+        """
+        Report a gauge (a value which can go up and down).
+
+        Same parameters as :meth:`counter`.
+        """
+        if not self._gauges:
+            return
+        samples = self._family(name, "gauge", help).samples
+        key = tuple(sorted(labels.items())) if labels else ()
+        samples[key] = samples.get(key, 0) + value
+
+    def histogram(self, name: str, histogram: Histogram, help: str = "", labels=None):
+        """
+        Report a histogram.
+
+        Same parameters as :meth:`counter`, with the histogram instead of a value.
+        """
+        samples = self._family(name, "histogram", help).samples
+        key = tuple(sorted(labels.items())) if labels else ()
+        current = samples.get(key)
+        if current is None:
+            samples[key] = histogram.copy()
+        else:
+            current.merge(histogram)
+
+    def merge(self, other: "MetricsSnapshot") -> None:
+        """
+        Add all metrics of another snapshot.
+        """
+        for name, family in other._families.items():
+            if family.type == "gauge" and not self._gauges:
+                continue
+            mine = self._family(name, family.type, family.help)
+            for key, value in family.samples.items():
+                current = mine.samples.get(key)
+                if family.type == "histogram":
+                    if current is None:
+                        mine.samples[key] = value.copy()
+                    else:
+                        current.merge(value)
+                else:
+                    mine.samples[key] = (current or 0) + value
+
+    def get(self, name: str, **labels):
+        """
+        Get the value reported for a metric.
+
+        :param name: Metric name.
+        :param labels: Labels of the value.
+
+        :returns: The value (a :class:`Histogram` for histograms), or ``None``.
+        """
+        family = self._families.get(name)
+        if family is None:
+            return None
+        return family.samples.get(tuple(sorted(labels.items())))
+
+    def __json__(self):
+        data = {}
+        for name, family in sorted(self._families.items()):
+            samples = []
+            for key, value in family.samples.items():
+                if family.type == "histogram":
+                    value = value.__json__()
+                samples.append({"labels": dict(key), "value": value})
+            data[name] = {"type": family.type, "help": family.help, "samples": samples}
+        return data
+
+    def to_prometheus(self) -> str:
+        """
+        Render the snapshot in Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for name, family in sorted(self._families.items()):
+            if family.help:
+                lines.append(f"# HELP {name} {_escape_help(family.help)}")
+            lines.append(f"# TYPE {name} {family.type}")
+            for key, value in family.samples.items():
+                if family.type == "histogram":
+                    cumulative = 0
+                    for bound, n in zip(value.buckets, value.counts):
+                        cumulative += n
+                        labels = _format_labels(key + (("le", _format_value(bound)),))
+                        lines.append(f"{name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(key + (("le", "+Inf"),))
+                    lines.append(f"{name}_bucket{labels} {value.count}")
+                    labels = _format_labels(key)
+                    lines.append(f"{name}_sum{labels} {_format_value(value.sum)}")
+                    lines.append(f"{name}_count{labels} {value.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    labels = ",".join(
+        '{}="{}"'.format(
+            k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for k, v in key
+    )
+    return "{" + labels + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        if value == float("-inf"):
+            return "-Inf"
+        return repr(value)
+    return str(value)
+
+
+@public
+class MetricsRegistry:
+    """
+    Registry of metrics collectors, scraped on demand.
+
+    A collector is any object with a ``collect_metrics(metrics)`` method which reports
+    its current metrics into the given :class:`MetricsSnapshot`.
+    """
+
+    def __init__(self):
+        self._collectors = []
+
+    def register(self, collector) -> None:
+        """
+        Register a metrics collector.
+        """
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def unregister(self, collector) -> None:
+        """
+        Unregister a metrics collector.
+        """
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def collect(self) -> MetricsSnapshot:
+        """
+        Scrape all registered collectors.
+
+        :returns: A new snapshot of all metrics.
+        """
+        metrics = MetricsSnapshot()
+        for collector in self._collectors:
+            collector.collect_metrics(metrics)
+        return metrics
+
+    def to_prometheus(self) -> str:
+        """
+        Scrape all registered collectors, rendering the metrics in Prometheus text
+        exposition format.
+        """
+        return self.collect().to_prometheus()
+
+    def __json__(self):
+        return self.collect().__json__()
+
+
+class ConnectionMetrics:
+    """
+    Aggregates the metrics of the connections of a transport factory.
+
+    Connections (which must be metrics collectors) are added when opened and removed
+    when closed. The counters and histograms of closed connections are retained, so
+    aggregated counters never go backwards.
+
+    FOR INTERNAL USE ONLY!
+    """
+
+    __slots__ = ("_name", "_connections", "_closed", "_total")
+
+    def __init__(self, name: str):
+        """
+
+        :param name: Metric name prefix, e.g. ``autobahn_websocket``.
+        """
+        self._name = name
+        self._connections = set()
+        self._closed = MetricsSnapshot(gauges=False)
+        self._total = 0
+
+    def opened(self, connection) -> None:
+        self._connections.add(connection)
+        self._total += 1
+
+    def closed(self, connection) -> None:
+        if connection in self._connections:
+            self._connections.discard(connection)
+            connection.collect_metrics(self._closed)
+
+    def collect_metrics(self, metrics: MetricsSnapshot) -> None:
+        metrics.merge(self._closed)
+        for connection in self._connections:
+            connection.collect_metrics(metrics)
+        metrics.gauge(
+            f"{self._name}_connections",
+            len(self._connections),
+            "Currently open connections.",
+        )
+        metrics.counter(
+            f"{self._name}_connections_total",
+            self._total,
+            "Connections opened.",
+        )
@@ -52,6 +52,7 @@ import pytest
 CORE_MODULES = [
     "autobahn",
     "autobahn.util",
+    "autobahn.metrics",
     "autobahn.wamp",
     "autobahn.wamp.cryptosign",  # regressed in 26.6.1 -> see #1878
     "autobahn.wamp.auth",
@@ -61,6 +62,12 @@ CORE_MODULES = [
     "autobahn.wamp.role",
     "autobahn.wamp.serializer",
     "autobahn.wamp.component",
+    "autobahn.wamp.latency",
+    "autobahn.wamp.offload",
+    "autobahn.wamp.pipeline",
+    "autobahn.wamp.tracing",
+    "autobahn.wamp.typecheck",
+    "autobahn.websocket.admission",
     "autobahn.websocket.protocol",
     "autobahn.websocket.types",
     "autobahn.websocket.compress",
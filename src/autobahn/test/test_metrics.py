@@ -0,0 +1,205 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+import json
+import unittest
+
+from autobahn.metrics import (
+    ConnectionMetrics,
+    Histogram,
+    MetricsRegistry,
+    MetricsSnapshot,
+    log_linear_buckets,
+)
+
+
+class _Connection:
+    def __init__(self):
+        self.messages = 0
+        self.pending = 0
+
+    def collect_metrics(self, metrics):
+        metrics.counter("test_messages_total", self.messages, "Messages.")
+        metrics.gauge("test_pending", self.pending, "Pending.")
+
+
+class TestHistogram(unittest.TestCase):
+    def test_observe(self):
+        h = Histogram((1, 5, 10))
+        for value in (0.5, 1, 3, 7, 100):
+            h.observe(value)
+        self.assertEqual(h.counts, [2, 1, 1, 1])
+        self.assertEqual(h.count, 5)
+        self.assertEqual(h.sum, 111.5)
+        self.assertEqual(
+            h.__json__()["buckets"], [[1, 2], [5, 3], [10, 4], ["+Inf", 5]]
+        )
+
+    def test_quantile(self):
+        h = Histogram((1, 5, 10))
+        self.assertIsNone(h.quantile(0.5))
+        for value in (0.5, 0.5, 0.5, 3, 100):
+            h.observe(value)
+        self.assertEqual(h.quantile(0.5), 1)
+        self.assertEqual(h.quantile(0.8), 5)
+        self.assertEqual(h.quantile(0.99), float("inf"))
+
+    def test_merge(self):
+        h1 = Histogram((1, 5))
+        h2 = Histogram((1, 5))
+        h1.observe(1)
+        h2.observe(2)
+        h1.merge(h2)
+        self.assertEqual(h1.counts, [1, 1, 0])
+        self.assertRaises(Exception, h1.merge, Histogram((1, 2)))
+
+    def test_log_linear_buckets(self):
+        self.assertEqual(log_linear_buckets(1, 8, 2), (1, 1.5, 2, 3, 4, 6, 8))
+        self.assertEqual(log_linear_buckets(1, 5, 1), (1, 2, 4, 5))
+        buckets = log_linear_buckets(2**-14, 2**6, 4)
+        # relative width of every bucket is at most 1 / sub_buckets
+        for lower, upper in zip(buckets, buckets[1:]):
+            self.assertLessEqual((upper - lower) / lower, 0.25)
+        self.assertRaises(Exception, log_linear_buckets, 0, 1)
+        self.assertRaises(Exception, log_linear_buckets, 1, 8, 0)
+
+
+class TestMetricsSnapshot(unittest.TestCase):
+    def test_aggregation(self):
+        metrics = MetricsSnapshot()
+        metrics.counter("test_total", 1, labels={"a": "x"})
+        metrics.counter("test_total", 2, labels={"a": "x"})
+        metrics.counter("test_total", 5, labels={"a": "y"})
+        self.assertEqual(metrics.get("test_total", a="x"), 3)
+        self.assertEqual(metrics.get("test_total", a="y"), 5)
+        self.assertIsNone(metrics.get("test_total", a="z"))
+
+        h = Histogram((1,))
+        h.observe(0.5)
+        metrics.histogram("test_seconds", h)
+        metrics.histogram("test_seconds", h)
+        self.assertEqual(metrics.get("test_seconds").count, 2)
+        # the reported histogram itself is not modified
+        self.assertEqual(h.count, 1)
+
+    def test_type_conflict(self):
+        metrics = MetricsSnapshot()
+        metrics.counter("test", 1)
+        self.assertRaises(Exception, metrics.gauge, "test", 1)
+
+    def test_without_gauges(self):
+        metrics = MetricsSnapshot(gauges=False)
+        _Connection().collect_metrics(metrics)
+        self.assertEqual(metrics.get("test_messages_total"), 0)
+        self.assertIsNone(metrics.get("test_pending"))
+
+    def test_prometheus(self):
+        metrics = MetricsSnapshot()
+        metrics.counter("test_total", 3, "Test counter.", {"kind": 'a"b'})
+        metrics.gauge("test_ratio", 0.5)
+        h = Histogram((0.1, 1.0))
+        h.observe(0.05)
+        h.observe(2)
+        metrics.histogram("test_seconds", h, "Test histogram.")
+        self.assertEqual(
+            metrics.to_prometheus(),
+            "\n".join(
+                [
+                    "# TYPE test_ratio gauge",
+                    "test_ratio 0.5",
+                    "# HELP test_seconds Test histogram.",
+                    "# TYPE test_seconds histogram",
+                    'test_seconds_bucket{le="0.1"} 1',
+                    'test_seconds_bucket{le="1.0"} 1',
+                    'test_seconds_bucket{le="+Inf"} 2',
+                    "test_seconds_sum 2.05",
+                    "test_seconds_count 2",
+                    "# HELP test_total Test counter.",
+                    "# TYPE test_total counter",
+                    'test_total{kind="a\\"b"} 3',
+                    "",
+                ]
+            ),
+        )
+
+    def test_json(self):
+        metrics = MetricsSnapshot()
+        metrics.counter("test_total", 3, "Test counter.", {"kind": "a"})
+        data = json.loads(json.dumps(metrics.__json__()))
+        self.assertEqual(
+            data,
+            {
+                "test_total": {
+                    "type": "counter",
+                    "help": "Test counter.",
+                    "samples": [{"labels": {"kind": "a"}, "value": 3}],
+                }
+            },
+        )
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_collect(self):
+        registry = MetricsRegistry()
+        c1 = _Connection()
+        c2 = _Connection()
+        registry.register(c1)
+        registry.register(c2)
+        registry.register(c2)
+        c1.messages = 2
+        c2.messages = 3
+        self.assertEqual(registry.collect().get("test_messages_total"), 5)
+        self.assertIn("test_messages_total 5\n", registry.to_prometheus())
+
+        registry.unregister(c2)
+        self.assertEqual(registry.collect().get("test_messages_total"), 2)
+
+    def test_connection_metrics(self):
+        connections = ConnectionMetrics("test")
+        c1 = _Connection()
+        c2 = _Connection()
+        connections.opened(c1)
+        connections.opened(c2)
+        c1.messages = 2
+        c1.pending = 1
+        c2.messages = 3
+        c2.pending = 1
+
+        metrics = MetricsSnapshot()
+        connections.collect_metrics(metrics)
+        self.assertEqual(metrics.get("test_messages_total"), 5)
+        self.assertEqual(metrics.get("test_pending"), 2)
+        self.assertEqual(metrics.get("test_connections"), 2)
+
+        # counters of closed connections are retained, gauges are not
+        connections.closed(c1)
+        connections.closed(c1)
+        metrics = MetricsSnapshot()
+        connections.collect_metrics(metrics)
+        self.assertEqual(metrics.get("test_messages_total"), 5)
+        self.assertEqual(metrics.get("test_pending"), 1)
+        self.assertEqual(metrics.get("test_connections"), 1)
+        self.assertEqual(metrics.get("test_connections_total"), 2)
@@ -25,13 +25,20 @@
 ###############################################################################
 
 import os
+import threading
 import unittest
 from binascii import b2a_hex
+from unittest import mock
 
+import txaio
+
+from autobahn import util
 from autobahn.util import (
     IdGenerator,
+    RandomIdGenerator,
     generate_activation_code,
     generate_token,
+    log_enabled,
     parse_activation_code,
 )
 
@@ -44,13 +51,61 @@ class TestIdGenerator(unittest.TestCase):
         self.assertEqual(2, next(g))
 
     def test_generator_wrap(self):
-        g = IdGenerator()
-        g._next = 2**53 - 1  # cheat a little
+        g = IdGenerator(start=2**53 - 1)
 
+        v = next(g)
+        self.assertEqual(v, 2**53 - 1)
         v = next(g)
         self.assertEqual(v, 2**53)
         v = next(g)
         self.assertEqual(v, 1)
+        v = g.next()
+        self.assertEqual(v, 2)
+
+    def test_generator_subclass(self):
+        class EvenIdGenerator(IdGenerator):
+            def next(self):
+                return 2 * super().next()
+
+        g = EvenIdGenerator()
+        self.assertEqual(g.next(), 2)
+        self.assertEqual(next(g), 4)
+
+    def test_random_generator_threads(self):
+        g = RandomIdGenerator(batch=4)
+        ids = []
+
+        def take():
+            ids.extend(g.next() for _ in range(1000))
+
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(set(ids)), 8000)
+
+    def test_random_generator(self):
+        g = RandomIdGenerator(batch=16)
+        ids = [g.next() for _ in range(100)] + [next(g)]
+        for v in ids:
+            self.assertTrue(1 <= v <= 2**53)
+        self.assertEqual(len(set(ids)), len(ids))
+
+        for v in [util.id() for _ in range(100)] + [util.rid() for _ in range(100)]:
+            self.assertTrue(1 <= v <= 2**53)
+
+    def test_random_generator_fork(self):
+        g = RandomIdGenerator(batch=16)
+        g.next()
+        with mock.patch("autobahn.util.os.urandom", wraps=os.urandom) as urandom:
+            g.next()
+            self.assertEqual(urandom.call_count, 0)
+
+            # IDs buffered before a fork are discarded in the child
+            util._reset_random_id_generators()
+            g.next()
+            self.assertEqual(urandom.call_count, 1)
 
     def test_parse_valid_activation_codes(self):
         for i in range(20):
@@ -70,3 +125,46 @@ class TestIdGenerator(unittest.TestCase):
         self.assertEqual(len(token.split("-")), 5)
         for part in token.split("-"):
             self.assertEqual(len(part), 4)
+
+
+class TestLogEnabled(unittest.TestCase):
+    def setUp(self):
+        level = txaio.get_global_log_level()
+        self.addCleanup(txaio.set_global_log_level, level)
+
+    def test_follows_log_level(self):
+        log = txaio.make_logger()
+        txaio.set_global_log_level("info")
+        self.assertTrue(log_enabled(log, "info"))
+        self.assertTrue(log_enabled(log, "warn"))
+        self.assertFalse(log_enabled(log, "debug"))
+        self.assertFalse(log_enabled(log, "trace"))
+
+        txaio.set_global_log_level("trace")
+        self.assertTrue(log_enabled(log, "debug"))
+        self.assertTrue(log_enabled(log, "trace"))
+
+        txaio.set_global_log_level("none")
+        self.assertFalse(log_enabled(log, "critical"))
+
+    def test_logger_level(self):
+        # a log level exposed by the logger takes precedence over the global one
+        log = mock.Mock(spec=["log_level", "trace"], log_level="debug")
+        txaio.set_global_log_level("info")
+        self.assertTrue(log_enabled(log, "debug"))
+        self.assertFalse(log_enabled(log, "trace"))
+
+    def test_logger_set_log_level(self):
+        # the level set on a logger is used, though above the global one
+        log = txaio.make_logger()
+        txaio.set_global_log_level("info")
+        # Logger.set_log_level() with Twisted, _set_log_level() with asyncio
+        set_log_level = getattr(log, "set_log_level", None) or log._set_log_level
+        set_log_level("trace")
+        self.assertTrue(log_enabled(log, "debug"))
+        self.assertTrue(log_enabled(log, "trace"))
+        self.assertFalse(log_enabled(txaio.make_logger(), "debug"))
+
+    def test_unknown_logger(self):
+        # loggers without a (known) log level are always considered enabled
+        self.assertTrue(log_enabled(object(), "trace"))
@@ -28,6 +28,7 @@
 class FakeTransport:
     _written = b""
     _open = True
+    _paused = False
 
     def __init__(self):
         self._abort_calls = []
@@ -40,16 +41,27 @@ class FakeTransport:
             raise Exception("Can't write to a closed connection")
         self._written = self._written + msg
 
+    def writeSequence(self, msgs):
+        self.write(b"".join(msgs))
+
     def loseConnection(self):
         self._open = False
 
+    _producer = None
+
     def registerProducer(self, producer, streaming):
         # https://twistedmatrix.com/documents/current/api/twisted.internet.interfaces.IConsumer.html
-        raise NotImplementedError
+        # only remember the producer: tests drive pause/resume themselves
+        self._producer = producer
 
     def unregisterProducer(self):
-        # do nothing is correct! until we fake implement registerProducer ..;)
-        pass
+        self._producer = None
+
+    def pauseProducing(self):
+        self._paused = True
+
+    def resumeProducing(self):
+        self._paused = False
 
     def getPeer(self):
         # for Twisted, this would be an IAddress
@@ -26,13 +26,28 @@
 
 import copy
 import math
+import struct
 from typing import Optional
 
 import txaio
 
 from autobahn.exception import PayloadExceededError
-from autobahn.twisted.util import create_transport_details, transport_channel_id
-from autobahn.util import _LazyHexFormatter, public
+from autobahn.metrics import ConnectionMetrics
+from autobahn.twisted.util import (
+    _register_flow,
+    _register_producer,
+    _unregister_producer,
+    create_transport_details,
+    set_write_buffer_size,
+    transport_channel_id,
+)
+from autobahn.util import (
+    ReadThrottle,
+    WriteFlowControl,
+    _LazyHexFormatter,
+    log_enabled,
+    public,
+)
 from autobahn.wamp.exception import (
     InvalidUriError,
     ProtocolError,
@@ -68,6 +83,16 @@ class WampRawSocketProtocol(Int32StringReceiver):
         self._max_message_size = 2**24
         self._transport_details = None
 
+        # read-side backpressure limits (0 = unlimited)
+        self._max_in_flight_messages = 0
+        self._max_in_flight_bytes = 0
+        self.read_throttle = None
+
+        # write-side flow control (0 = disabled)
+        self._write_high_water_mark = 0
+        self._write_low_water_mark = 0
+        self.write_flow = None
+
     @property
     def transport_details(self) -> TransportDetails | None:
         """
@@ -75,6 +100,21 @@ class WampRawSocketProtocol(Int32StringReceiver):
         """
         return self._transport_details
 
+    def collect_metrics(self, metrics):
+        """
+        Report the metrics of this connection: the statistics of the WAMP serializer
+        and session. The factory reports the metrics of all its connections
+        aggregated (see :mod:`autobahn.metrics`).
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        if self._serializer is not None:
+            self._serializer.collect_metrics(metrics)
+        collect_session = getattr(self._session, "collect_metrics", None)
+        if collect_session is not None:
+            collect_session(metrics)
+
     def lengthLimitExceeded(self, length):
         # override hook in Int32StringReceiver base class that is fired when a message is (to be) received
         # that is larger than what we agreed to handle (by negotiation in the RawSocket opening handshake)
@@ -121,7 +161,28 @@ class WampRawSocketProtocol(Int32StringReceiver):
         #
         self._max_len_send = None
 
+        # pause reading while too many received messages are still being processed
+        #
+        if self._max_in_flight_messages or self._max_in_flight_bytes:
+            self.read_throttle = ReadThrottle(
+                self.pauseProducing,
+                self.resumeProducing,
+                self._max_in_flight_messages,
+                self._max_in_flight_bytes,
+            )
+
+        # let the transport pause/resume us when the outgoing buffer fills up
+        #
+        if self._write_high_water_mark:
+            self.write_flow = WriteFlowControl()
+            set_write_buffer_size(self.transport, self._write_high_water_mark)
+            _register_flow(self.transport, self.write_flow)
+
     def _on_handshake_complete(self):
+        metrics = getattr(self.factory, "_connection_metrics", None)
+        if metrics is not None:
+            metrics.opened(self)
+
         # RawSocket connection established. Now let the user WAMP session factory
         # create a new WAMP session and fire off session open callback.
         try:
@@ -166,6 +227,13 @@ class WampRawSocketProtocol(Int32StringReceiver):
             reason=reason,
         )
         txaio.resolve(self.is_closed, self)
+        if self.read_throttle is not None:
+            self.read_throttle.stop()
+        if self.write_flow is not None:
+            self.write_flow.stop(TransportLost())
+        metrics = getattr(self.factory, "_connection_metrics", None)
+        if self._handshake_complete and metrics is not None:
+            metrics.closed(self)
         try:
             wasClean = isinstance(reason.value, ConnectionDone)
             if self._session:
@@ -180,19 +248,28 @@ class WampRawSocketProtocol(Int32StringReceiver):
         self._session = None
 
     def stringReceived(self, payload):
-        self.log.trace(
-            "{klass}.stringReceived(): RX {octets} octets",
-            klass=self.__class__.__name__,
-            octets=_LazyHexFormatter(payload),
-        )
+        trace = log_enabled(self.log, "trace")
+        if trace:
+            self.log.trace(
+                "{klass}.stringReceived(): RX {octets} octets",
+                klass=self.__class__.__name__,
+                octets=_LazyHexFormatter(payload),
+            )
+        handler_futures = [] if self.read_throttle is not None else None
         try:
             for msg in self._serializer.unserialize(payload):
-                self.log.trace(
-                    "{klass}.stringReceived: RX WAMP message: {msg}",
-                    klass=self.__class__.__name__,
-                    msg=msg,
-                )
-                self._session.onMessage(msg)
+                if trace:
+                    self.log.trace(
+                        "{klass}.stringReceived: RX WAMP message: {msg}",
+                        klass=self.__class__.__name__,
+                        msg=msg,
+                    )
+                res = self._session.onMessage(msg)
+                if handler_futures is not None and txaio.is_future(res):
+                    handler_futures.append(res)
+            # a batched payload carries several messages: count its bytes once
+            if handler_futures:
+                self.read_throttle.track_many(handler_futures, len(payload))
 
         except CancelledError as e:
             self.log.debug(
@@ -247,12 +324,14 @@ class WampRawSocketProtocol(Int32StringReceiver):
         Implements :func:`autobahn.wamp.interfaces.ITransport.send`
         """
         if self.isOpen():
-            self.log.trace(
-                '{klass}.send() (serializer={serializer}): TX WAMP message: "{msg}"',
-                klass=self.__class__.__name__,
-                msg=msg,
-                serializer=self._serializer,
-            )
+            trace = log_enabled(self.log, "trace")
+            if trace:
+                self.log.trace(
+                    '{klass}.send() (serializer={serializer}): TX WAMP message: "{msg}"',
+                    klass=self.__class__.__name__,
+                    msg=msg,
+                    serializer=self._serializer,
+                )
             try:
                 payload, _ = self._serializer.serialize(msg)
             except SerializationError as e:
@@ -268,14 +347,63 @@ class WampRawSocketProtocol(Int32StringReceiver):
                     raise PayloadExceededError(emsg)
                 else:
                     self.sendString(payload)
-                    self.log.trace(
-                        "{klass}.send(): TX {octets} octets",
-                        klass=self.__class__.__name__,
-                        octets=_LazyHexFormatter(payload),
-                    )
+                    if trace:
+                        self.log.trace(
+                            "{klass}.send(): TX {octets} octets",
+                            klass=self.__class__.__name__,
+                            octets=_LazyHexFormatter(payload),
+                        )
         else:
             raise TransportLost()
 
+    def send_many(self, msgs):
+        """
+        Send several WAMP messages, serializing all of them first and writing them
+        to the transport at once.
+
+        :param msgs: The WAMP messages to send.
+        :type msgs: list
+        """
+        if not self.isOpen():
+            raise TransportLost()
+        chunks = []
+        for msg in msgs:
+            try:
+                payload, _ = self._serializer.serialize(msg)
+            except SerializationError as e:
+                raise SerializationError(
+                    f"WampRawSocketProtocol: unable to serialize WAMP application payload ({e})"
+                )
+            payload_len = len(payload)
+            if 0 < self._max_len_send < payload_len:
+                emsg = f"tried to send RawSocket message with size {payload_len} exceeding payload limit of {self._max_len_send} octets"
+                self.log.warn(emsg)
+                raise PayloadExceededError(emsg)
+            chunks.append(struct.pack(self.structFormat, payload_len))
+            chunks.append(payload)
+        self.transport.writeSequence(chunks)
+
+    def registerProducer(self, producer, streaming):
+        """
+        Register a Twisted producer with this protocol.
+
+        With write-side flow control enabled, a streaming producer is paused and
+        resumed together with the flow control, and a pull producer replaces the
+        flow control until it is unregistered.
+
+        :param producer: A Twisted push or pull producer.
+        :type producer: object
+        :param streaming: Producer type.
+        :type streaming: bool
+        """
+        _register_producer(self.transport, self.write_flow, producer, streaming)
+
+    def unregisterProducer(self):
+        """
+        Unregister Twisted producer with this protocol.
+        """
+        _unregister_producer(self.transport, self.write_flow)
+
     def isOpen(self):
         """
         Implements :func:`autobahn.wamp.interfaces.ITransport.isOpen`
@@ -527,14 +655,54 @@ class WampRawSocketFactory(Factory):
         # RawSocket max payload size is 16M (https://wamp-proto.org/_static/gen/wamp_latest_ietf.html#handshake)
         self._max_message_size = 2**24
 
+        # read-side backpressure (0 = unlimited)
+        self._max_in_flight_messages = 0
+        self._max_in_flight_bytes = 0
+
+        # write-side flow control (0 = disabled). the low water mark is accepted
+        # for symmetry with asyncio: Twisted resumes producers once the buffer is empty
+        self._write_high_water_mark = 0
+        self._write_low_water_mark = 0
+
+        # metrics of (open and closed) connections
+        self._connection_metrics = ConnectionMetrics("autobahn_rawsocket")
+
+    def collect_metrics(self, metrics):
+        """
+        Report the metrics of all connections of this factory, aggregated. Metrics of
+        closed connections are retained in the counters.
+
+        Register the factory with a :class:`autobahn.metrics.MetricsRegistry` to
+        export them.
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        self._connection_metrics.collect_metrics(metrics)
+
     def resetProtocolOptions(self):
         self._max_message_size = 2**24
-
-    def setProtocolOptions(self, maxMessagePayloadSize=None):
+        self._max_in_flight_messages = 0
+        self._max_in_flight_bytes = 0
+        self._write_high_water_mark = 0
+        self._write_low_water_mark = 0
+
+    def setProtocolOptions(
+        self,
+        maxMessagePayloadSize=None,
+        maxInFlightMessages=None,
+        maxInFlightBytes=None,
+        writeHighWaterMark=None,
+        writeLowWaterMark=None,
+    ):
         self.log.debug(
-            "{klass}.setProtocolOptions(maxMessagePayloadSize={maxMessagePayloadSize})",
+            "{klass}.setProtocolOptions(maxMessagePayloadSize={maxMessagePayloadSize}, maxInFlightMessages={maxInFlightMessages}, maxInFlightBytes={maxInFlightBytes}, writeHighWaterMark={writeHighWaterMark}, writeLowWaterMark={writeLowWaterMark})",
             klass=self.__class__.__name__,
             maxMessagePayloadSize=maxMessagePayloadSize,
+            maxInFlightMessages=maxInFlightMessages,
+            maxInFlightBytes=maxInFlightBytes,
+            writeHighWaterMark=writeHighWaterMark,
+            writeLowWaterMark=writeLowWaterMark,
         )
         assert maxMessagePayloadSize is None or (
             type(maxMessagePayloadSize) == int
@@ -547,6 +715,22 @@ class WampRawSocketFactory(Factory):
         ):
             self._max_message_size = maxMessagePayloadSize
 
+        if maxInFlightMessages is not None:
+            assert type(maxInFlightMessages) == int and maxInFlightMessages >= 0
+            self._max_in_flight_messages = maxInFlightMessages
+
+        if maxInFlightBytes is not None:
+            assert type(maxInFlightBytes) == int and maxInFlightBytes >= 0
+            self._max_in_flight_bytes = maxInFlightBytes
+
+        if writeHighWaterMark is not None:
+            assert type(writeHighWaterMark) == int and writeHighWaterMark >= 0
+            self._write_high_water_mark = writeHighWaterMark
+
+        if writeLowWaterMark is not None:
+            assert type(writeLowWaterMark) == int and writeLowWaterMark >= 0
+            self._write_low_water_mark = writeLowWaterMark
+
     def buildProtocol(self, addr):
         self.log.debug(
             "{klass}.buildProtocol(addr={addr})",
@@ -557,6 +741,10 @@ class WampRawSocketFactory(Factory):
         p.factory = self
         p.MAX_LENGTH = self._max_message_size
         p._max_message_size = self._max_message_size
+        p._max_in_flight_messages = self._max_in_flight_messages
+        p._max_in_flight_bytes = self._max_in_flight_bytes
+        p._write_high_water_mark = self._write_high_water_mark
+        p._write_low_water_mark = self._write_low_water_mark
         self.log.debug(
             "{klass}.buildProtocol() -> proto={proto}, max_message_size={max_message_size}, MAX_LENGTH={MAX_LENGTH}",
             klass=self.__class__.__name__,
@@ -108,6 +108,12 @@ class ExceptionHandlingTests(unittest.TestCase):
         self.assertTrue(" was lost " in messages)
         self.assertTrue("greetings" in messages)
 
+    def test_factory_without_metrics(self):
+        # e.g. a factory subclass that does not call the base class constructor
+        del self.factory._connectionMetrics
+        self.proto._connectionMade()
+        self.proto.connectionLost(Failure(ConnectionDone()))
+
 
 class Hixie76RejectionTests(unittest.TestCase):
     """
@@ -463,3 +469,37 @@ class OnConnectingTests(unittest.TestCase):
         req = ConnectingRequest(host="example.com", port="1234", resource="/ws")
         # we can str() this and it doesn't fail
         str(req)
+
+
+class WriteFlowProducerTests(unittest.TestCase):
+    def setUp(self):
+        self.factory = WebSocketServerFactory()
+        self.factory.protocol = WebSocketServerProtocol
+        self.factory.setProtocolOptions(writeHighWaterMark=1024)
+        self.proto = self.factory.buildProtocol(None)
+        self.transport = StringTransport()
+        self.proto.transport = self.transport
+        self.proto.connectionMade()
+
+    def tearDown(self):
+        self.proto.connectionLost(Failure(ConnectionDone()))
+
+    def test_application_producer(self):
+        flow = self.proto.writeFlow
+        self.assertIs(self.transport.producer, flow)
+
+        # the transport only takes one producer: a streaming producer of the
+        # application is chained behind the flow control
+        producer = Mock()
+        self.proto.registerProducer(producer, True)
+        self.assertIs(self.transport.producer, flow)
+        self.transport.producer.pauseProducing()
+        producer.pauseProducing.assert_called_once_with()
+        self.proto.unregisterProducer()
+        self.assertIs(self.transport.producer, flow)
+
+        # a pull producer replaces the flow control until unregistered
+        self.proto.registerProducer(producer, False)
+        self.assertIs(self.transport.producer, producer)
+        self.proto.unregisterProducer()
+        self.assertIs(self.transport.producer, flow)
@@ -27,6 +27,8 @@
 import unittest
 from unittest.mock import Mock
 
+from twisted.internet.defer import Deferred
+
 from autobahn.testutil import FakeTransport
 from autobahn.twisted.rawsocket import (
     WampRawSocketClientFactory,
@@ -113,3 +115,184 @@ class RawSocketHandshakeTests(unittest.TestCase):
         # the transport was aborted and no WAMP session was started
         self.assertTrue(t.abort_called())
         session_mock.onOpen.assert_not_called()
+
+
+class RawSocketReadThrottleTests(unittest.TestCase):
+    def _connect(self, **options):
+        session_mock = Mock()
+        t = FakeTransport()
+        f = WampRawSocketClientFactory(lambda: session_mock)
+        f.setProtocolOptions(**options)
+        p = f.buildProtocol(None)
+        p.transport = t
+
+        server_session_mock = Mock()
+        st = FakeTransport()
+        sf = WampRawSocketServerFactory(lambda: server_session_mock)
+        sp = sf.buildProtocol(None)
+        sp.transport = st
+
+        sp.connectionMade()
+        p.connectionMade()
+        sp.dataReceived(t._written[0:4])
+        p.dataReceived(st._written[0:4])
+
+        # the client serializer produces (and consumes) the server frames
+        self.serializer = p._serializer
+        return p, t, session_mock
+
+    def _frame(self):
+        from autobahn.wamp import message
+
+        payload, _ = self.serializer.serialize(message.Goodbye())
+        return len(payload).to_bytes(4, "big") + payload
+
+    def test_disabled_by_default(self):
+        p, t, session = self._connect()
+        self.assertIsNone(p.read_throttle)
+
+    def test_pause_and_resume(self):
+        p, t, session = self._connect(maxInFlightMessages=2)
+        pending = []
+
+        def on_message(msg):
+            d = Deferred()
+            pending.append(d)
+            return d
+
+        session.onMessage.side_effect = on_message
+
+        frame = self._frame()
+        p.dataReceived(frame * 3)
+
+        # reading paused after the second message, the third stays buffered
+        self.assertEqual(len(pending), 2)
+        self.assertTrue(t._paused)
+        self.assertEqual(p.read_throttle.pauses, 1)
+        self.assertEqual(p.read_throttle.in_flight_messages, 2)
+
+        # completing a handler resumes reading and processes the buffered message
+        pending[0].callback(None)
+        self.assertEqual(len(pending), 3)
+        self.assertTrue(t._paused)
+
+        for d in pending[1:]:
+            d.callback(None)
+        self.assertFalse(t._paused)
+        self.assertEqual(p.read_throttle.in_flight_messages, 0)
+        self.assertEqual(p.read_throttle.pauses, 2)
+        self.assertGreaterEqual(p.read_throttle.paused_time, 0)
+
+    def test_batched_payload_bytes(self):
+        from autobahn.wamp import message
+        from autobahn.wamp.serializer import JsonSerializer
+
+        p, t, session = self._connect(maxInFlightBytes=2**20)
+        pending = []
+
+        def on_message(msg):
+            d = Deferred()
+            pending.append(d)
+            return d
+
+        session.onMessage.side_effect = on_message
+
+        # one payload carrying three messages
+        p._serializer = JsonSerializer(batched=True)
+        payload = b"".join(
+            p._serializer.serialize(message.Goodbye())[0] for _ in range(3)
+        )
+        p.stringReceived(payload)
+
+        self.assertEqual(len(pending), 3)
+        self.assertEqual(p.read_throttle.in_flight_messages, 3)
+        self.assertEqual(p.read_throttle.in_flight_bytes, len(payload))
+
+        for d in pending:
+            d.callback(None)
+        self.assertEqual(p.read_throttle.in_flight_messages, 0)
+        self.assertEqual(p.read_throttle.in_flight_bytes, 0)
+
+    def test_write_flow_disabled_by_default(self):
+        p, t, session = self._connect()
+        self.assertIsNone(p.write_flow)
+        self.assertIsNone(t._producer)
+
+    def test_write_flow(self):
+        p, t, session = self._connect(writeHighWaterMark=1024)
+        flow = p.write_flow
+        self.assertIs(t._producer, flow)
+        self.assertTrue(flow.writable)
+
+        # the transport pauses the producer once its buffer exceeds the mark
+        t._producer.pauseProducing()
+        self.assertFalse(flow.writable)
+        d = flow.wait_writable()
+        self.assertFalse(d.called)
+
+        t._producer.resumeProducing()
+        self.assertTrue(d.called)
+        self.assertEqual(flow.pauses, 1)
+
+        # waiters still pending when the connection goes away are failed
+        t._producer.pauseProducing()
+        d = flow.wait_writable()
+        errors = []
+        d.addErrback(errors.append)
+        p.connectionLost(None)
+        self.assertEqual(len(errors), 1)
+
+    def test_write_flow_application_producer(self):
+        p, t, session = self._connect(writeHighWaterMark=1024)
+        flow = p.write_flow
+
+        # a streaming producer is chained behind the flow control
+        producer = Mock()
+        p.registerProducer(producer, True)
+        self.assertIs(t._producer, flow)
+        t._producer.pauseProducing()
+        producer.pauseProducing.assert_called_once_with()
+        t._producer.resumeProducing()
+        producer.resumeProducing.assert_called_once_with()
+        p.unregisterProducer()
+        self.assertIsNone(flow.producer)
+        self.assertIs(t._producer, flow)
+
+        # a pull producer replaces the flow control until unregistered
+        p.registerProducer(producer, False)
+        self.assertIs(t._producer, producer)
+        p.unregisterProducer()
+        self.assertIs(t._producer, flow)
+
+    def test_write_buffer_size_tls(self):
+        from autobahn.twisted.util import set_write_buffer_size
+
+        # e.g. TLSMemoryBIOProtocol, wrapping the TCP transport
+        tcp = Mock(spec=["bufferSize"])
+        tls = Mock(spec=["transport"], transport=tcp)
+        self.assertTrue(set_write_buffer_size(tls, 1024))
+        self.assertEqual(tcp.bufferSize, 1024)
+        self.assertFalse(set_write_buffer_size(Mock(spec=[]), 1024))
+
+
+class RawSocketSendManyTests(unittest.TestCase):
+    _connect = RawSocketReadThrottleTests._connect
+
+    def test_send_many(self):
+        from autobahn.wamp import message
+
+        p, t, session = self._connect()
+        writes = []
+        t.writeSequence = writes.append
+
+        msgs = [message.Publish(i + 1, "com.example.topic", args=[i]) for i in range(3)]
+        p.send_many(msgs)
+
+        # all messages are written at once, framed like single messages
+        self.assertEqual(len(writes), 1)
+        expected = []
+        for msg in msgs:
+            msg.uncache()
+            payload, _ = self.serializer.serialize(msg)
+            expected.append(len(payload).to_bytes(4, "big") + payload)
+        self.assertEqual(b"".join(writes[0]), b"".join(expected))
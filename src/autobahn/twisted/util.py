@@ -64,6 +64,7 @@ __all = (
     "transport_channel_id",
     "extract_peer_certificate",
     "create_transport_details",
+    "set_write_buffer_size",
 )
 
 
@@ -289,6 +290,59 @@ else:
             return result
 
 
+def set_write_buffer_size(transport: ITransport, size: int) -> bool:
+    """
+    Set the size of the outgoing buffer above which a Twisted transport pauses its
+    streaming producer. For a transport wrapping another one (e.g. TLS), the buffer
+    of the underlying transport is set.
+
+    :param transport: The Twisted transport.
+    :param size: The buffer size in bytes.
+    :returns: ``True`` if the buffer size was set.
+    """
+    while transport is not None:
+        if hasattr(transport, "bufferSize"):
+            transport.bufferSize = size
+            return True
+        transport = getattr(transport, "transport", None)
+    return False
+
+
+def _register_flow(transport, flow):
+    transport.registerProducer(flow, True)
+    flow.registered = True
+
+
+def _register_producer(transport, flow, producer, streaming):
+    # the transport takes only one producer: chain a streaming producer behind
+    # the write flow control, and swap the flow control out for a pull producer
+    if flow is not None and flow.registered:
+        if streaming:
+            flow.producer = producer
+            if not flow.writable:
+                producer.pauseProducing()
+            return
+        transport.unregisterProducer()
+        flow.registered = False
+        flow.resume()
+    transport.registerProducer(producer, streaming)
+
+
+def _unregister_producer(transport, flow):
+    if flow is None:
+        transport.unregisterProducer()
+    elif flow.producer is not None:
+        flow.producer = None
+    elif flow.registered:
+        # no producer of the application: unregister the flow control itself
+        transport.unregisterProducer()
+        flow.registered = False
+    else:
+        # a pull producer of the application was swapped in
+        transport.unregisterProducer()
+        _register_flow(transport, flow)
+
+
 def create_transport_details(
     transport: ITransport | IProcessTransport, is_server: bool
 ) -> TransportDetails:
@@ -35,8 +35,22 @@ from zope.interface import implementer
 txaio.use_twisted()
 
 import twisted.internet.protocol
-from autobahn.twisted.util import create_transport_details, transport_channel_id
-from autobahn.util import _is_tls_error, _maybe_tls_reason, hltype, hlval, public
+from autobahn.twisted.util import (
+    _register_flow,
+    _register_producer,
+    _unregister_producer,
+    create_transport_details,
+    set_write_buffer_size,
+    transport_channel_id,
+)
+from autobahn.util import (
+    _is_tls_error,
+    _maybe_tls_reason,
+    hltype,
+    hlval,
+    log_enabled,
+    public,
+)
 from autobahn.wamp import websocket
 from autobahn.wamp.types import TransportDetails
 from autobahn.websocket import protocol
@@ -57,6 +71,7 @@ from twisted.internet.defer import Deferred
 from twisted.internet.error import ConnectionAborted, ConnectionDone, ConnectionLost
 from twisted.internet.interfaces import ITransport
 from twisted.internet.protocol import connectionDone
+from twisted.internet.threads import deferToThreadPool
 from twisted.python.failure import Failure
 
 __all__ = (
@@ -289,12 +304,18 @@ class WebSocketAdapterProtocol(twisted.internet.protocol.Protocol):
         # ok, now forward to the networking framework independent code for websocket
         self._connectionMade()
 
+        # write-side flow control: let the transport pause/resume us as a producer
+        if self.writeFlow is not None:
+            set_write_buffer_size(self.transport, self.writeHighWaterMark)
+            _register_flow(self.transport, self.writeFlow)
+
         # ok, done!
-        self.log.debug(
-            '{func} connection established for peer="{peer}"',
-            func=hltype(self.connectionMade),
-            peer=hlval(self.peer),
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                '{func} connection established for peer="{peer}"',
+                func=hltype(self.connectionMade),
+                peer=hlval(self.peer),
+            )
 
     def connectionLost(self, reason: Failure = connectionDone) -> None:
         # Twisted networking framework entry point, called by Twisted
@@ -338,28 +359,30 @@ class WebSocketAdapterProtocol(twisted.internet.protocol.Protocol):
         self._connectionLost(reason)
 
         # ok, done!
-        if was_clean:
-            self.log.debug(
-                '{func} connection lost for peer="{peer}", closed cleanly',
-                func=hltype(self.connectionLost),
-                peer=hlval(self.peer),
-            )
-        else:
+        if log_enabled(self.log, "debug"):
+            if was_clean:
+                self.log.debug(
+                    '{func} connection lost for peer="{peer}", closed cleanly',
+                    func=hltype(self.connectionLost),
+                    peer=hlval(self.peer),
+                )
+            else:
+                self.log.debug(
+                    '{func} connection lost for peer="{peer}", closed with error {reason}',
+                    func=hltype(self.connectionLost),
+                    peer=hlval(self.peer),
+                    reason=reason,
+                )
+
+    def dataReceived(self, data: bytes) -> None:
+        if log_enabled(self.log, "debug"):
             self.log.debug(
-                '{func} connection lost for peer="{peer}", closed with error {reason}',
-                func=hltype(self.connectionLost),
+                '{func} received {data_len} bytes for peer="{peer}"',
+                func=hltype(self.dataReceived),
                 peer=hlval(self.peer),
-                reason=reason,
+                data_len=hlval(len(data)),
             )
 
-    def dataReceived(self, data: bytes) -> None:
-        self.log.debug(
-            '{func} received {data_len} bytes for peer="{peer}"',
-            func=hltype(self.dataReceived),
-            peer=hlval(self.peer),
-            data_len=hlval(len(data)),
-        )
-
         # bytes received from Twisted, forward to the networking framework independent code for websocket
         self._dataReceived(data)
 
@@ -402,7 +425,9 @@ class WebSocketAdapterProtocol(twisted.internet.protocol.Protocol):
         self.onMessageEnd()
 
     def _onMessage(self, payload, isBinary: bool) -> None:
-        self.onMessage(payload, isBinary)
+        res = self.onMessage(payload, isBinary)
+        if self.readThrottle is not None and txaio.is_future(res):
+            self.readThrottle.track(res, len(payload))
 
     def _onPing(self, payload) -> None:
         self.onPing(payload)
@@ -413,22 +438,38 @@ class WebSocketAdapterProtocol(twisted.internet.protocol.Protocol):
     def _onClose(self, wasClean: bool, code, reason) -> None:
         self.onClose(wasClean, code, reason)
 
+    def _pauseReading(self) -> None:
+        self.transport.pauseProducing()
+
+    def _resumeReading(self) -> None:
+        self.transport.resumeProducing()
+
+    def _runInThread(self, fun, *args):
+        reactor = self.factory.reactor
+        return deferToThreadPool(reactor, reactor.getThreadPool(), fun, *args)
+
     def registerProducer(self, producer, streaming) -> None:
         """
         Register a Twisted producer with this protocol.
 
+        With write-side flow control enabled, a streaming producer is paused and
+        resumed together with the flow control, and a pull producer replaces the
+        flow control until it is unregistered.
+
         :param producer: A Twisted push or pull producer.
         :type producer: object
         :param streaming: Producer type.
         :type streaming: bool
         """
-        self.transport.registerProducer(producer, streaming)
+        _register_producer(
+            self.transport, getattr(self, "writeFlow", None), producer, streaming
+        )
 
     def unregisterProducer(self) -> None:
         """
         Unregister Twisted producer with this protocol.
         """
-        self.transport.unregisterProducer()
+        _unregister_producer(self.transport, getattr(self, "writeFlow", None))
 
 
 @public
@@ -462,11 +503,12 @@ class WebSocketClientProtocol(
     is_server = False
 
     def _onConnect(self, response: ConnectionResponse):
-        self.log.debug(
-            "{meth}(response={response})",
-            meth=hltype(self._onConnect),
-            response=response,
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                "{meth}(response={response})",
+                meth=hltype(self._onConnect),
+                response=response,
+            )
         return self.onConnect(response)
 
     def startTLS(self):
@@ -511,6 +553,10 @@ class WebSocketServerFactory(
 
         protocol.WebSocketServerFactory.__init__(self, *args, **kwargs)
 
+        # run handshake admission control on the reactor's clock
+        self._handshakeAdmission.clock = reactor.seconds
+        self._handshakeAdmission.call_later = reactor.callLater
+
 
 @public
 class WebSocketClientFactory(
@@ -35,6 +35,7 @@ from autobahn.rawsocket.util import parse_url as parse_rs_url
 from autobahn.util import ObservableMixin
 from autobahn.wamp.auth import IAuthenticator, create_authenticator
 from autobahn.wamp.exception import ApplicationError, SessionNotReady
+from autobahn.wamp.latency import LatencyMetrics
 from autobahn.wamp.serializer import SERID_TO_SER
 from autobahn.wamp.types import ComponentConfig, RegisterOptions, SubscribeOptions
 from autobahn.websocket.util import parse_url as parse_ws_url
@@ -435,6 +436,7 @@ class Component(ObservableMixin):
         authentication=None,
         session_factory=None,
         is_fatal=None,
+        latency_metrics=False,
     ):
         """
         :param main: After a transport has been connected and a session
@@ -490,6 +492,13 @@ class Component(ObservableMixin):
             this error is "fatal", meaning we should not try connecting to
             the current transport again. The default behavior (on None) is
             to always return ``False``
+
+        :param latency_metrics: if ``True``, latency histograms of calls,
+            invocations, event handlers and acknowledged publishes are recorded
+            for all sessions of this component (see
+            :meth:`autobahn.wamp.protocol.ApplicationSession.enable_latency_metrics`),
+            and aggregated in :attr:`latency_metrics`.
+        :type latency_metrics: bool
         """
         self.set_valid_events(
             [
@@ -561,6 +570,30 @@ class Component(ObservableMixin):
         self._session = None
         self._stopping = False
 
+        self._latency = LatencyMetrics() if latency_metrics else None
+
+    @property
+    def latency_metrics(self):
+        """
+        The latency histograms aggregated over all sessions of this component, or
+        ``None`` when not enabled.
+
+        :rtype: :class:`autobahn.wamp.latency.LatencyMetrics` or None
+        """
+        return self._latency
+
+    def collect_metrics(self, metrics):
+        """
+        Report the latency histograms aggregated over all sessions of this component
+        (when enabled), so a component can be registered with a
+        :class:`autobahn.metrics.MetricsRegistry`.
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        if self._latency is not None:
+            self._latency.collect_metrics(metrics)
+
     def _can_reconnect(self):
         # check if any of our transport has any reconnect attempt left
         for transport in self._transports:
@@ -779,6 +812,8 @@ class Component(ObservableMixin):
             cfg = ComponentConfig(self._realm, self._extra)
             try:
                 self._session = session = self.session_factory(cfg)
+                if self._latency is not None:
+                    session.enable_latency_metrics(parent=self._latency)
                 for auth_name, auth_config in self._authentication.items():
                     if isinstance(auth_config, IAuthenticator):
                         session.add_authenticator(auth_config)
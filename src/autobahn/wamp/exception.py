@@ -38,6 +38,7 @@ __all__ = (
     "ProtocolError",
     "SerializationError",
     "SessionNotReady",
+    "TransportBusy",
     "TransportLost",
     "TypeCheckError",
 )
@@ -90,6 +91,14 @@ class TransportLost(Error):
     """
 
 
+@public
+class TransportBusy(Error):
+    """
+    Exception raised when a message could not be sent, because the outgoing
+    buffer of the transport underlying the WAMP session is full.
+    """
+
+
 @public
 class ApplicationError(Error):
     """
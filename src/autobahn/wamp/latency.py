@@ -0,0 +1,209 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Latency histograms of WAMP sessions.
+
+When enabled on a session (see
+:meth:`autobahn.wamp.protocol.ApplicationSession.enable_latency_metrics`), the
+following latencies are recorded per procedure or topic URI, using a monotonic clock:
+
+- ``call``: round-trip time of calls, from sending CALL until the final RESULT
+  (or ERROR) is received
+- ``invocation``: run time of registered procedures, until the value returned by
+  the procedure (or the Deferred/Future returned) resolves
+- ``event``: run time of event handlers (per subscription topic)
+- ``publish``: time from sending an acknowledged PUBLISH until PUBLISHED (or ERROR)
+  is received
+"""
+
+from time import perf_counter
+
+import txaio
+
+from autobahn.metrics import Histogram, log_linear_buckets
+from autobahn.util import public
+
+__all__ = (
+    "LATENCY_BUCKETS",
+    "LatencyMetrics",
+)
+
+LATENCY_BUCKETS = log_linear_buckets(2**-14, 2**6, 4)
+"""
+Default latency histogram buckets (in seconds): 4 buckets per power of two from
+about 61us to 64s, which bounds the relative error of the bucket a latency is
+counted in by 25%.
+"""
+
+_METRICS = {
+    "call": (
+        "autobahn_wamp_call_duration_seconds",
+        "procedure",
+        "Round-trip time of calls.",
+    ),
+    "invocation": (
+        "autobahn_wamp_invocation_duration_seconds",
+        "procedure",
+        "Run time of invocations of registered procedures.",
+    ),
+    "event": (
+        "autobahn_wamp_event_handler_duration_seconds",
+        "topic",
+        "Run time of event handlers.",
+    ),
+    "publish": (
+        "autobahn_wamp_publish_ack_duration_seconds",
+        "topic",
+        "Time from publishing until the publication is acknowledged.",
+    ),
+}
+
+
+@public
+class LatencyMetrics:
+    """
+    Latency histograms per kind (``call``, ``invocation``, ``event`` or ``publish``)
+    and procedure or topic URI.
+    """
+
+    CALL = "call"
+    INVOCATION = "invocation"
+    EVENT = "event"
+    PUBLISH = "publish"
+
+    __slots__ = ("buckets", "parent", "histograms", "_pending")
+
+    def __init__(self, buckets=LATENCY_BUCKETS, parent=None):
+        """
+
+        :param buckets: Histogram bucket upper bounds, in seconds.
+        :type buckets: tuple of float
+
+        :param parent: Optional other latency metrics, into which all latencies
+            recorded here are recorded too (e.g. to aggregate the latencies of all
+            sessions of a component).
+        :type parent: :class:`LatencyMetrics` or None
+        """
+        self.buckets = tuple(buckets)
+        self.parent = parent
+        self.histograms = {}
+        self._pending = {}
+
+    def observe(self, kind: str, uri: str, seconds: float) -> None:
+        """
+        Record a latency.
+
+        :param kind: One of ``call``, ``invocation``, ``event`` or ``publish``.
+        :param uri: The procedure or topic URI.
+        :param seconds: The latency in seconds.
+        """
+        histogram = self.histograms.get((kind, uri))
+        if histogram is None:
+            histogram = self.histograms[(kind, uri)] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        if self.parent is not None:
+            self.parent.observe(kind, uri, seconds)
+
+    def start(self, kind: str, request_id: int, uri: str) -> None:
+        """
+        Start timing an outgoing request, finished by :meth:`finish`.
+        """
+        self._pending[(kind, request_id)] = (uri, perf_counter())
+
+    def finish(self, kind: str, request_id: int) -> None:
+        """
+        Finish timing an outgoing request, recording its latency (if it was started).
+        """
+        pending = self._pending.pop((kind, request_id), None)
+        if pending is not None:
+            uri, started = pending
+            self.observe(kind, uri, perf_counter() - started)
+
+    def discard(self, kind: str, request_id: int) -> None:
+        """
+        Stop timing an outgoing request without recording a latency.
+        """
+        self._pending.pop((kind, request_id), None)
+
+    def clear_pending(self) -> None:
+        """
+        Stop timing all outgoing requests (e.g. when the transport was lost).
+        """
+        self._pending.clear()
+
+    def track(self, future, kind: str, uri: str, started: float) -> None:
+        """
+        Record the latency from ``started`` until a Deferred/Future resolves (either
+        successfully or with an error). The result of the Deferred/Future is
+        passed through unchanged.
+
+        :param future: The Deferred/Future to track.
+        :param kind: One of ``call``, ``invocation``, ``event`` or ``publish``.
+        :param uri: The procedure or topic URI.
+        :param started: Start time, from :func:`time.perf_counter`.
+        """
+        if txaio.is_called(future):
+            self.observe(kind, uri, perf_counter() - started)
+            return
+
+        def done(result):
+            self.observe(kind, uri, perf_counter() - started)
+            return result
+
+        txaio.add_callbacks(future, done, done)
+
+    def get(self, kind: str, uri: str):
+        """
+        Get the latency histogram of a procedure or topic.
+
+        :returns: The histogram, or ``None`` when no latency was recorded.
+        :rtype: :class:`autobahn.metrics.Histogram` or None
+        """
+        return self.histograms.get((kind, uri))
+
+    def reset(self) -> None:
+        """
+        Drop all recorded latencies.
+        """
+        self.histograms = {}
+
+    def collect_metrics(self, metrics) -> None:
+        """
+        Report the latency histograms (see :mod:`autobahn.metrics`).
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        for (kind, uri), histogram in self.histograms.items():
+            name, label, help = _METRICS[kind]
+            metrics.histogram(name, histogram, help, {label: uri})
+
+    def __json__(self):
+        data = {}
+        for (kind, uri), histogram in sorted(self.histograms.items()):
+            data.setdefault(kind, {})[uri] = histogram.__json__()
+        return data
@@ -0,0 +1,493 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Running procedures and event handlers off the event loop, and limiting how many
+invocations of a procedure (or event handler) run concurrently.
+
+Procedures registered with an ``executor`` in their
+:class:`autobahn.wamp.types.RegisterOptions` (and event handlers subscribed with
+one in their :class:`autobahn.wamp.types.SubscribeOptions`) are run in a thread or
+process pool, so CPU-bound work does not block the event loop (and with it all
+other sessions in the process). Results, errors and progressive results are
+delivered back on the event loop.
+"""
+
+import functools
+import inspect
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from time import perf_counter
+
+import txaio
+
+from autobahn.metrics import Histogram
+from autobahn.util import public
+from autobahn.wamp.exception import ApplicationError
+from autobahn.wamp.latency import LATENCY_BUCKETS
+
+__all__ = (
+    "THREAD",
+    "ConcurrencyLimiter",
+    "offload",
+    "run_in_executor",
+    "threadsafe",
+)
+
+THREAD = "thread"
+"""
+Executor to run in the default thread pool of the Twisted reactor or asyncio loop.
+"""
+
+
+def _reactor():
+    reactor = txaio.config.loop
+    if reactor is None:
+        from twisted.internet import reactor
+    return reactor
+
+
+def _loop():
+    import asyncio
+
+    return txaio.config.loop or asyncio.get_event_loop()
+
+
+def _call_from_thread():
+    # the function scheduling a call on the event loop from any thread
+    if txaio.using_twisted:
+        return _reactor().callFromThread
+    return _loop().call_soon_threadsafe
+
+
+def _resolve_from(d, future):
+    # called on the reactor thread, once the concurrent.futures future is done
+    if d.called:
+        # the Deferred was cancelled meanwhile
+        return
+    error = future.exception()
+    if error is None:
+        d.callback(future.result())
+    else:
+        d.errback(error)
+
+
+@public
+def run_in_executor(executor, fn, *args, **kwargs):
+    """
+    Run a function in an executor, delivering its result on the event loop.
+
+    Must be called from the event loop thread.
+
+    :param executor: The executor to run the function in, or :data:`THREAD` to use
+        the default thread pool of the Twisted reactor / asyncio event loop.
+    :type executor: :class:`concurrent.futures.Executor` or str
+
+    :param fn: The function to run.
+    :type fn: callable
+
+    :returns: A Deferred/Future for the result of ``fn``. Cancelling it cancels the
+        execution of ``fn`` if it has not started yet.
+    """
+    return _run_in_executor(executor, fn, args, kwargs)[0]
+
+
+def _run_in_executor(executor, fn, args, kwargs):
+    # returns the future for the result of fn, and a future resolved (never
+    # rejected) once fn has finished running, or will not run because it was
+    # cancelled before it started: cancelling the first does not stop a running fn
+    finished = txaio.create_future()
+    notify = functools.partial(
+        _call_from_thread(), functools.partial(txaio.resolve, finished, None)
+    )
+
+    if executor == THREAD:
+        # skip fn when the call was cancelled before it started
+        lock = threading.Lock()
+        started = [None]
+
+        def run():
+            with lock:
+                if started[0] is False:
+                    return None
+                started[0] = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                notify()
+
+        def done(result):
+            with lock:
+                if started[0] is None:
+                    started[0] = False
+                    txaio.resolve(finished, None)
+            return result
+
+        if txaio.using_twisted:
+            from twisted.internet.threads import deferToThreadPool
+
+            reactor = _reactor()
+            d = deferToThreadPool(reactor, reactor.getThreadPool(), run)
+        else:
+            d = _loop().run_in_executor(None, run)
+        txaio.add_callbacks(d, done, done)
+        return d, finished
+
+    future = executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(lambda _: notify())
+    if txaio.using_twisted:
+        from twisted.internet.defer import Deferred
+
+        reactor = _reactor()
+        d = Deferred(lambda _: future.cancel())
+        future.add_done_callback(
+            lambda future: reactor.callFromThread(_resolve_from, d, future)
+        )
+        return d, finished
+
+    import asyncio
+
+    return asyncio.wrap_future(future, loop=_loop()), finished
+
+
+@public
+def threadsafe(fn):
+    """
+    Wrap a function to be called on the event loop when called from any thread
+    (e.g. a progressive result callback, called by a procedure run in a thread).
+
+    Must be called from the event loop thread. The wrapper returns immediately: ``fn``
+    is called on the next iteration of the event loop. It returns a
+    :class:`concurrent.futures.Future` for the result of ``fn`` (resolved when a
+    Deferred/Future returned by ``fn`` resolves), which the calling thread can wait
+    on, e.g. for the backpressure of progressive results.
+
+    :param fn: The function to call on the event loop.
+    :type fn: callable
+
+    :returns: The wrapped function.
+    :rtype: callable
+    """
+    call = _call_from_thread()
+
+    @functools.wraps(fn)
+    def _threadsafe(*args, **kwargs):
+        future = Future()
+        call(_call_into, future, fn, args, kwargs)
+        return future
+
+    return _threadsafe
+
+
+def _call_into(future, fn, args, kwargs):
+    # called on the event loop: resolve the concurrent.futures future from fn
+    if not future.set_running_or_notify_cancel():
+        return
+    txaio.add_callbacks(
+        txaio.as_future(fn, *args, **kwargs),
+        future.set_result,
+        lambda fail: future.set_exception(fail.value),
+    )
+
+
+@public
+class ConcurrencyLimiter:
+    """
+    Limits the number of calls of a function running concurrently. Calls above the
+    limit are queued (up to a maximum queue length) and started in order as running
+    calls finish, and are rejected right away when the queue is full.
+
+    The number of calls admitted, queued and rejected, and the time calls spent
+    queued are counted.
+
+    A call holds its slot until it has finished: a call running in an executor keeps
+    it after its Deferred/Future was cancelled, until the function has returned.
+    """
+
+    __slots__ = (
+        "max_concurrency",
+        "max_queue",
+        "reject_error",
+        "running",
+        "admitted",
+        "enqueued",
+        "rejected",
+        "queue_time",
+        "_queue",
+        "_draining",
+    )
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int | None = None,
+        reject_error: str | None = None,
+        buckets=LATENCY_BUCKETS,
+    ):
+        """
+
+        :param max_concurrency: Maximum number of calls running concurrently.
+        :param max_queue: Maximum number of calls queued, or ``None`` for no limit.
+        :param reject_error: The error URI of the
+            :class:`autobahn.wamp.exception.ApplicationError` calls are rejected
+            with (default: ``wamp.error.canceled``).
+        :param buckets: Bucket upper bounds of the queue time histogram, in seconds.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.reject_error = reject_error or ApplicationError.CANCELED
+        self.running = 0
+        self.admitted = 0
+        self.enqueued = 0
+        self.rejected = 0
+        self.queue_time = Histogram(buckets)
+        self._queue = deque()
+        self._draining = False
+
+    @property
+    def queued(self) -> int:
+        """
+        Number of calls currently queued.
+        """
+        return len(self._queue)
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Call a function when less than ``max_concurrency`` calls are running.
+
+        :param fn: The function to call, returning a plain value or a
+            Deferred/Future (or coroutine).
+        :type fn: callable
+
+        :returns: A Deferred/Future for the result of ``fn``. When it is cancelled
+            while the call is queued, the call is not started.
+        """
+
+        def call(*args, **kwargs):
+            future = txaio.as_future(fn, *args, **kwargs)
+            return future, future
+
+        return self._run(call, args, kwargs)
+
+    def _run(self, call, args, kwargs):
+        # call returns the future for the result, and the future the slot of the
+        # call is held until (see _run_in_executor)
+        if self.running < self.max_concurrency:
+            self.admitted += 1
+            return self._start(call, args, kwargs)
+
+        if self.max_queue is not None and len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            return txaio.create_future(
+                error=ApplicationError(
+                    self.reject_error,
+                    f"too many concurrent calls ({self.running} running, "
+                    f"{len(self._queue)} queued)",
+                )
+            )
+
+        # cancelled calls are skipped when dequeued
+        self.enqueued += 1
+        future = txaio.create_future(canceller=lambda _: None)
+        self._queue.append((future, call, args, kwargs, perf_counter()))
+        return future
+
+    def _start(self, call, args, kwargs):
+        self.running += 1
+        try:
+            future, finished = call(*args, **kwargs)
+        except Exception as e:
+            self.running -= 1
+            return txaio.create_future(error=e)
+        txaio.add_callbacks(finished, self._done, self._done)
+        return future
+
+    def _done(self, result):
+        self.running -= 1
+        # calls finishing synchronously while the queue is drained return here,
+        # and the loop below starts the next queued calls
+        if not self._draining:
+            self._drain()
+        return result
+
+    def _drain(self):
+        self._draining = True
+        try:
+            queue = self._queue
+            while queue and self.running < self.max_concurrency:
+                future, call, args, kwargs, queued = queue.popleft()
+                if txaio.is_called(future):
+                    continue
+                self.admitted += 1
+                self.queue_time.observe(perf_counter() - queued)
+                txaio.add_callbacks(
+                    self._start(call, args, kwargs),
+                    functools.partial(self._forward_result, future),
+                    functools.partial(self._forward_error, future),
+                )
+        finally:
+            self._draining = False
+
+    @staticmethod
+    def _forward_result(future, result):
+        if not txaio.is_called(future):
+            txaio.resolve(future, result)
+
+    @staticmethod
+    def _forward_error(future, error):
+        if not txaio.is_called(future):
+            txaio.reject(future, error)
+
+    def collect_metrics(self, metrics, name: str, labels=None) -> None:
+        """
+        Report the counters, the queue time histogram, and the number of calls
+        currently running and queued (see :mod:`autobahn.metrics`).
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+
+        :param name: Metric name prefix, e.g. ``autobahn_wamp_invocations``.
+        :param labels: Labels of all values, e.g. the procedure URI.
+        :type labels: dict or None
+        """
+        metrics.counter(
+            f"{name}_admitted_total",
+            self.admitted,
+            "Calls started by the concurrency limit (right away or after queueing).",
+            labels,
+        )
+        metrics.counter(
+            f"{name}_queued_total",
+            self.enqueued,
+            "Calls queued by the concurrency limit.",
+            labels,
+        )
+        metrics.counter(
+            f"{name}_rejected_total",
+            self.rejected,
+            "Calls rejected by the concurrency limit because the queue was full.",
+            labels,
+        )
+        metrics.histogram(
+            f"{name}_queue_time_seconds",
+            self.queue_time,
+            "Time calls spent queued by the concurrency limit.",
+            labels,
+        )
+        metrics.gauge(
+            f"{name}_running",
+            self.running,
+            "Calls running under the concurrency limit.",
+            labels,
+        )
+        metrics.gauge(
+            f"{name}_queue_length",
+            len(self._queue),
+            "Calls currently queued by the concurrency limit.",
+            labels,
+        )
+
+
+@public
+def offload(
+    fn,
+    executor=None,
+    max_concurrency=None,
+    max_queue=None,
+    details_arg=None,
+    reject_error=None,
+):
+    """
+    Wrap a procedure or event handler to run in an executor and/or with a limit on
+    concurrent calls (see the ``executor``, ``max_concurrency``, ``max_queue`` and
+    ``reject_error`` options of :class:`autobahn.wamp.types.RegisterOptions`).
+
+    :param fn: The procedure or event handler.
+    :type fn: callable
+
+    :param executor: The executor to run ``fn`` in (see :func:`run_in_executor`),
+        or ``None`` to run it on the event loop.
+    :type executor: :class:`concurrent.futures.Executor` or str or None
+
+    :param max_concurrency: Maximum number of calls running concurrently, or
+        ``None`` for no limit.
+    :type max_concurrency: int or None
+
+    :param max_queue: Maximum number of calls waiting for ``max_concurrency``.
+    :type max_queue: int or None
+
+    :param details_arg: The keyword argument under which call or event details are
+        passed to ``fn`` (the progressive results callback in call details is
+        wrapped to be called from the executor).
+    :type details_arg: str or None
+
+    :param reject_error: The error URI calls are rejected with when the queue is
+        full (see :class:`ConcurrencyLimiter`).
+    :type reject_error: str or None
+
+    :returns: The wrapper, which returns a Deferred/Future. With ``max_concurrency``,
+        the :class:`ConcurrencyLimiter` of the wrapper is its ``limiter`` attribute.
+    :rtype: callable
+    """
+    if executor is not None:
+        if executor != THREAD and not isinstance(executor, Executor):
+            raise Exception(f"invalid type {type(executor)} for executor")
+        if inspect.iscoroutinefunction(fn):
+            raise Exception(
+                f"coroutine function {fn.__name__} cannot be run in an executor"
+            )
+        if details_arg is not None and isinstance(executor, ProcessPoolExecutor):
+            raise Exception(
+                f"details cannot be passed to {fn.__name__} run in a process pool"
+            )
+
+    def call(*args, **kwargs):
+        if executor is None:
+            future = txaio.as_future(fn, *args, **kwargs)
+            return future, future
+        if details_arg is not None:
+            details = kwargs.get(details_arg)
+            if getattr(details, "progress", None) is not None:
+                details.progress = threadsafe(details.progress)
+        return _run_in_executor(executor, fn, args, kwargs)
+
+    if max_concurrency is None:
+
+        @functools.wraps(fn)
+        def _offloaded(*args, **kwargs):
+            return call(*args, **kwargs)[0]
+
+        return _offloaded
+
+    limiter = ConcurrencyLimiter(max_concurrency, max_queue, reject_error)
+
+    @functools.wraps(fn)
+    def _limited(*args, **kwargs):
+        return limiter._run(call, args, kwargs)
+
+    _limited.limiter = limiter
+    return _limited
@@ -0,0 +1,352 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+
+"""
+Pipelined and streamed calls:
+
+- calling a procedure many times with a bounded number of calls in flight (see
+  :meth:`autobahn.wamp.protocol.ApplicationSession.call_many`)
+- iterating over the progressive results of a call, with a bounded buffer (see
+  :meth:`autobahn.wamp.protocol.ApplicationSession.call_stream`)
+"""
+
+from collections import deque
+from functools import partial
+from itertools import islice
+
+import txaio
+
+from autobahn.util import public
+from autobahn.wamp.exception import TransportLost
+from autobahn.wamp.types import CallResult
+
+__all__ = (
+    "CallPipeline",
+    "CallStream",
+)
+
+
+@public
+class CallPipeline:
+    """
+    Asynchronous iterator over the results of many calls of a procedure, producing
+    ``(index, result)`` tuples, where ``result`` is the exception for failed calls.
+
+    At most ``max_in_flight`` calls are issued whose result was not consumed yet.
+    Calls are issued when results are consumed: while results are ready, whenever
+    half of the window is free, and otherwise before waiting for a result. The
+    CALL messages issued together are written to the transport at once.
+    """
+
+    __slots__ = (
+        "_session",
+        "_procedure",
+        "_calls",
+        "_max_in_flight",
+        "_options",
+        "_attrs",
+        "_ordered",
+        "_exhausted",
+        "_error",
+        "_next_index",
+        "_next_result",
+        "_unconsumed",
+        "_replies",
+        "_ready",
+        "_waiter",
+    )
+
+    def __init__(self, session, procedure, calls, max_in_flight, options, ordered):
+        """
+
+        :param session: The session to call the procedure in.
+        :type session: :class:`autobahn.wamp.protocol.ApplicationSession`
+
+        See :meth:`autobahn.wamp.protocol.ApplicationSession.call_many` for the
+        other parameters.
+        """
+        self._session = session
+        self._procedure = procedure
+        self._calls = iter(calls)
+        self._max_in_flight = max_in_flight
+        self._options = options
+        self._attrs = options.message_attr() if options else {}
+        self._ordered = ordered
+        self._exhausted = False
+        self._error = None
+        # index of the next call issued, and of the next result produced (ordered)
+        self._next_index = 0
+        self._next_result = 0
+        # calls issued whose result was not consumed yet
+        self._unconsumed = 0
+        # index -> Deferred/Future of calls in flight
+        self._replies = {}
+        # results not consumed yet: index -> result when ordered, else a deque
+        self._ready = {} if ordered else deque()
+        self._waiter = None
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of calls waiting for their result.
+        """
+        return len(self._replies)
+
+    def cancel(self) -> None:
+        """
+        Stop issuing calls, and cancel the calls in flight (their results are
+        produced as errors).
+        """
+        self._exhausted = True
+        for reply in list(self._replies.values()):
+            txaio.cancel(reply)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            item = self._take()
+            if item is not None:
+                if 2 * (self._max_in_flight - self._unconsumed) >= self._max_in_flight:
+                    self._issue()
+                return item
+
+            self._issue()
+            if not self._replies and not self._has_ready():
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise error
+                raise StopAsyncIteration
+
+            if self._replies and not self._has_ready():
+                self._waiter = txaio.create_future()
+                await self._waiter
+
+    def _has_ready(self) -> bool:
+        if self._ordered:
+            return self._next_result in self._ready
+        return bool(self._ready)
+
+    def _take(self):
+        if self._ordered:
+            index = self._next_result
+            if index not in self._ready:
+                return None
+            self._next_result += 1
+            item = (index, self._ready.pop(index))
+        else:
+            if not self._ready:
+                return None
+            item = self._ready.popleft()
+        self._unconsumed -= 1
+        return item
+
+    def _issue(self) -> None:
+        """
+        Issue calls to fill the window.
+        """
+        if self._exhausted:
+            return
+        free = self._max_in_flight - self._unconsumed
+        if free <= 0:
+            return
+        session = self._session
+        if not session._transport:
+            self._exhausted = True
+            self._error = TransportLost()
+            return
+
+        procedure = self._procedure
+        options = self._options
+        attrs = self._attrs
+        msgs = []
+        issued = 0
+        for args in islice(self._calls, free):
+            issued += 1
+            index = self._next_index
+            self._next_index += 1
+            self._unconsumed += 1
+            try:
+                msg, reply = session._new_call(procedure, args, None, options, attrs)
+            except Exception as e:
+                self._done(index, e)
+                continue
+            self._replies[index] = reply
+            txaio.add_callbacks(
+                reply, partial(self._on_result, index), partial(self._on_error, index)
+            )
+            msgs.append(msg)
+        if issued < free:
+            self._exhausted = True
+
+        if msgs:
+            try:
+                session._send_many(msgs)
+            except Exception as e:
+                # the calls sent stay pending (unless the transport is gone), the
+                # call which failed and those after it were not sent
+                sent = 0
+                if not isinstance(e, TransportLost):
+                    sent = getattr(e, "messages_sent", 0)
+                for msg in msgs[sent:]:
+                    session._fail_call(msg.request, e)
+
+    def _on_result(self, index, result):
+        del self._replies[index]
+        self._done(index, result)
+
+    def _on_error(self, index, fail):
+        del self._replies[index]
+        self._done(index, fail.value)
+
+    def _done(self, index, result) -> None:
+        if self._ordered:
+            self._ready[index] = result
+        else:
+            self._ready.append((index, result))
+        waiter = self._waiter
+        if waiter is not None and self._has_ready():
+            self._waiter = None
+            txaio.resolve(waiter, None)
+
+
+@public
+class CallStream:
+    """
+    Asynchronous iterator over the progressive results of a call.
+
+    Once ``max_buffered`` progressive results are buffered, receiving a further
+    progressive result returns a Deferred/Future which resolves only when the
+    buffer has room again, which transports limiting the messages in flight use to
+    stop reading from the connection.
+    """
+
+    __slots__ = (
+        "_max_buffered",
+        "_chunks",
+        "_waiter",
+        "_drained",
+        "_reply",
+        "_done",
+        "_error",
+        "result",
+    )
+
+    def __init__(self, max_buffered: int):
+        """
+
+        :param max_buffered: Number of progressive results buffered before receiving
+            further results is held back.
+        """
+        self._max_buffered = max_buffered
+        self._chunks = deque()
+        self._waiter = None
+        self._drained = None
+        self._reply = None
+        self._done = False
+        self._error = None
+        # the final result of the call
+        self.result = None
+
+    @property
+    def buffered(self) -> int:
+        """
+        Number of progressive results received, but not consumed yet.
+        """
+        return len(self._chunks)
+
+    def cancel(self) -> None:
+        """
+        Cancel the call, and drop the buffered progressive results. Call this when
+        stopping the iteration before the call has finished, so reading from the
+        connection is not held back by the buffer.
+        """
+        self._chunks.clear()
+        self._release()
+        if self._reply is not None and not self._done:
+            txaio.cancel(self._reply)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            if self._chunks:
+                chunk = self._chunks.popleft()
+                if len(self._chunks) < self._max_buffered:
+                    self._release()
+                return chunk
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                raise StopAsyncIteration
+            self._waiter = txaio.create_future()
+            await self._waiter
+
+    def _track(self, reply) -> None:
+        self._reply = reply
+        txaio.add_callbacks(reply, self._on_result, self._on_error)
+
+    def _on_progress(self, *args, **kwargs):
+        if kwargs:
+            chunk = CallResult(*args, **kwargs)
+        elif len(args) == 1:
+            chunk = args[0]
+        elif args:
+            chunk = CallResult(*args)
+        else:
+            chunk = None
+        self._chunks.append(chunk)
+        self._wake()
+        if len(self._chunks) >= self._max_buffered:
+            if self._drained is None:
+                self._drained = txaio.create_future()
+            return self._drained
+        return None
+
+    def _on_result(self, result):
+        self.result = result
+        self._done = True
+        self._wake()
+
+    def _on_error(self, fail):
+        self._error = fail.value
+        self._done = True
+        self._wake()
+
+    def _release(self) -> None:
+        drained = self._drained
+        if drained is not None:
+            self._drained = None
+            txaio.resolve(drained, None)
+
+    def _wake(self) -> None:
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            txaio.resolve(waiter, None)
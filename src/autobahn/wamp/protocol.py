@@ -23,22 +23,24 @@
 # THE SOFTWARE.
 #
 ###############################################################################
+import copy
 import inspect
-from functools import reduce
-from typing import Any, ClassVar, Union
+from collections import deque
+from functools import partial, reduce
+from time import perf_counter
+from typing import Any, ClassVar
 from collections.abc import Callable
 
 import txaio
 
 from autobahn import wamp
 from autobahn.exception import PayloadExceededError
-from autobahn.util import IdGenerator, ObservableMixin, public
+from autobahn.util import IdGenerator, ObservableMixin, log_enabled, public
 from autobahn.wamp import exception, message, role, types, uri
 from autobahn.wamp.exception import (
     ApplicationError,
     ProtocolError,
     SerializationError,
-    TypeCheckError,
 )
 from autobahn.wamp.interfaces import (
     IAuthenticator,
@@ -47,6 +49,9 @@ from autobahn.wamp.interfaces import (
     ISession,
     ITransport,
 )  # noqa
+from autobahn.wamp.latency import LATENCY_BUCKETS, LatencyMetrics
+from autobahn.wamp.offload import offload
+from autobahn.wamp.pipeline import CallPipeline, CallStream
 from autobahn.wamp.request import (
     CallRequest,
     Endpoint,
@@ -56,12 +61,17 @@ from autobahn.wamp.request import (
     PublishRequest,
     RegisterRequest,
     Registration,
+    RequestTable,
+    RequestTimer,
     SubscribeRequest,
     Subscription,
     UnregisterRequest,
     UnsubscribeRequest,
 )
+from autobahn.wamp.tracing import Tracer
+from autobahn.wamp.typecheck import type_checked
 from autobahn.wamp.types import (
+    CallOptions,
     CallResult,
     Challenge,
     CloseDetails,
@@ -76,6 +86,43 @@ def is_method_or_function(f):
     return inspect.ismethod(f) or inspect.isfunction(f)
 
 
+# request types (as reported to tracers) of messages sent with a request ID
+_REQUEST_TYPES = {
+    message.Call: "call",
+    message.Publish: "publish",
+    message.Subscribe: "subscribe",
+    message.Unsubscribe: "unsubscribe",
+    message.Register: "register",
+    message.Unregister: "unregister",
+}
+
+
+def _gather_replies(replies):
+    """
+    Get a Deferred/Future for the list of results of several Deferreds/Futures,
+    failing with the first error.
+    """
+    gathered = txaio.create_future()
+    results = [None] * len(replies)
+    remaining = [len(replies)]
+
+    def resolve(result, index):
+        results[index] = result
+        remaining[0] -= 1
+        if not remaining[0] and not txaio.is_called(gathered):
+            txaio.resolve(gathered, results)
+
+    def reject(fail):
+        if not txaio.is_called(gathered):
+            txaio.reject(gathered, fail)
+
+    for index, reply in enumerate(replies):
+        txaio.add_callbacks(reply, partial(resolve, index=index), reject)
+    if not replies:
+        txaio.resolve(gathered, results)
+    return gathered
+
+
 class BaseSession(ObservableMixin):
     """
     WAMP session base class.
@@ -85,6 +132,13 @@ class BaseSession(ObservableMixin):
 
     log = None
 
+    request_id_generator = IdGenerator
+    """
+    Factory of the generator of the WAMP request IDs of a session: sequential IDs
+    (:class:`autobahn.util.IdGenerator`, the default) or random IDs
+    (:class:`autobahn.util.RandomIdGenerator`).
+    """
+
     def __init__(self):
         self.log = txaio.make_logger()
 
@@ -106,11 +160,12 @@ class BaseSession(ObservableMixin):
         # mapping of exception classes to list of WAMP error URI patterns
         self._ecls_to_uri_pat: dict[ClassVar, list[uri.Pattern]] = {}
 
-        # mapping of WAMP error URIs to exception classes
-        self._uri_to_ecls: dict[str, ClassVar] = {
-            ApplicationError.INVALID_PAYLOAD: SerializationError,
-            ApplicationError.PAYLOAD_SIZE_EXCEEDED: PayloadExceededError,
-        }
+        # mapping of WAMP error URIs (and URI patterns) to exception classes
+        self._uri_to_ecls = uri.UriTrie()
+        self._uri_to_ecls.add(ApplicationError.INVALID_PAYLOAD, SerializationError)
+        self._uri_to_ecls.add(
+            ApplicationError.PAYLOAD_SIZE_EXCEEDED, PayloadExceededError
+        )
 
         # WAMP ITransport (_not_ a Twisted protocol, which is self.transport - when using Twisted)
         self._transport: ITransport | None = None
@@ -134,7 +189,10 @@ class BaseSession(ObservableMixin):
         self._payload_codec: IPayloadCodec | None = None
 
         # generator for WAMP request IDs
-        self._request_id_gen = IdGenerator()
+        self._request_id_gen = self.request_id_generator()
+
+        # tracing hooks (see autobahn.wamp.tracing)
+        self._tracer: Tracer | None = None
 
     @property
     def transport(self) -> ITransport | None:
@@ -194,6 +252,21 @@ class BaseSession(ObservableMixin):
     def authextra(self) -> dict[str, Any] | None:
         return self._authextra
 
+    @property
+    def tracer(self) -> Tracer | None:
+        return self._tracer
+
+    @public
+    def set_tracer(self, tracer: Tracer | None) -> None:
+        """
+        Set the tracer called for every WAMP message sent and received by this
+        session, and when event handlers and registered procedures run (see
+        :mod:`autobahn.wamp.tracing`).
+
+        :param tracer: The tracer, or ``None`` to disable tracing.
+        """
+        self._tracer = tracer
+
     def define(self, exception: Exception, error: str | None = None):
         """
         Implements :func:`autobahn.wamp.interfaces.ISession.define`
@@ -201,7 +274,9 @@ class BaseSession(ObservableMixin):
         if error is None:
             if hasattr(exception, "_wampuris"):
                 self._ecls_to_uri_pat[exception] = exception._wampuris
-                self._uri_to_ecls[exception._wampuris[0].uri()] = exception
+                for pat in exception._wampuris:
+                    self._uri_to_ecls.remove(pat.uri())
+                    self._uri_to_ecls.add(pat.uri(), exception)
             else:
                 raise RuntimeError(
                     'cannot define WAMP exception from class with no decoration ("_wampuris" unset)'
@@ -211,7 +286,8 @@ class BaseSession(ObservableMixin):
                 self._ecls_to_uri_pat[exception] = [
                     uri.Pattern(error, uri.Pattern.URI_TARGET_HANDLER)
                 ]
-                self._uri_to_ecls[error] = exception
+                self._uri_to_ecls.remove(error)
+                self._uri_to_ecls.add(error, exception)
             else:
                 raise RuntimeError(
                     'cannot define WAMP exception: error URI is explicit, but class is decorated ("_wampuris" set'
@@ -252,8 +328,11 @@ class BaseSession(ObservableMixin):
         if isinstance(exc, exception.ApplicationError):
             error = exc.error if type(exc.error) == str else exc.error
         else:
-            if exc.__class__ in self._ecls_to_uri_pat:
-                error = self._ecls_to_uri_pat[exc.__class__][0]._uri
+            # the most derived exception class defined
+            for ecls in exc.__class__.__mro__:
+                if ecls in self._ecls_to_uri_pat:
+                    error = self._ecls_to_uri_pat[ecls][0]._uri
+                    break
             else:
                 error = "wamp.error.runtime_error"
 
@@ -284,10 +363,6 @@ class BaseSession(ObservableMixin):
         :type msg: instance of :class:`autobahn.wamp.message.Error`
         """
 
-        # FIXME:
-        # 1. map to ecls based on error URI wildcard/prefix
-        # 2. extract additional args/kwargs from error URI
-
         exc = None
         enc_err = None
 
@@ -333,17 +408,22 @@ class BaseSession(ObservableMixin):
         if enc_err:
             return enc_err
 
-        if msg.error in self._uri_to_ecls:
-            ecls = self._uri_to_ecls[msg.error]
+        # the exception class defined for the most specific matching error URI
+        # (pattern), and the named components of the error URI
+        match = self._uri_to_ecls.lookup(msg.error)
+        if match:
+            ecls, kwargs = match
+            if msg.kwargs:
+                kwargs.update(msg.kwargs)
             try:
                 # the following might fail, eg. TypeError when
                 # signature of exception constructor is incompatible
                 # with args/kwargs or when the exception constructor raises
-                if msg.kwargs:
+                if kwargs:
                     if msg.args:
-                        exc = ecls(*msg.args, **msg.kwargs)
+                        exc = ecls(*msg.args, **kwargs)
                     else:
-                        exc = ecls(**msg.kwargs)
+                        exc = ecls(**kwargs)
                 else:
                     if msg.args:
                         exc = ecls(*msg.args)
@@ -397,6 +477,32 @@ class ApplicationSession(BaseSession):
         * :class:`autobahn.wamp.interfaces.ISession`
     """
 
+    PUBLISH_FLOW_POLICY_QUEUE = "queue"
+    """
+    While the transport is not writable, hold back publications in a session-local
+    queue and send them (in order) once the transport has drained.
+    """
+
+    PUBLISH_FLOW_POLICY_RAISE = "raise"
+    """
+    While the transport is not writable, fail publications immediately with
+    :class:`autobahn.wamp.exception.TransportBusy`.
+    """
+
+    publish_flow_policy: str | None = None
+    """
+    Policy applied by :meth:`publish` when the transport has write-side flow control
+    enabled and its outgoing buffer is full: ``None`` (send anyway), or one of
+    ``PUBLISH_FLOW_POLICY_QUEUE`` and ``PUBLISH_FLOW_POLICY_RAISE``.
+    """
+
+    publish_queue_limit: int = 0
+    """
+    Maximum number of publications held back with ``PUBLISH_FLOW_POLICY_QUEUE``
+    (``0`` for no limit). When full, :meth:`publish` raises
+    :class:`autobahn.wamp.exception.TransportBusy`.
+    """
+
     def __init__(self, config: types.ComponentConfig | None = None):
         """
         Implements :func:`autobahn.wamp.interfaces.ISession`
@@ -413,13 +519,14 @@ class ApplicationSession(BaseSession):
         # WAMP application payload codec (e.g. for WAMP-cryptobox E2E)
         self._payload_codec: IPayloadCodec | None = None
 
-        # outstanding requests
-        self._publish_reqs = {}
-        self._subscribe_reqs = {}
-        self._unsubscribe_reqs = {}
-        self._call_reqs = {}
-        self._register_reqs = {}
-        self._unregister_reqs = {}
+        # outstanding requests (by request ID), expired by one shared timer
+        self._request_timer = RequestTimer(self._expire_requests)
+        self._publish_reqs = RequestTable("publish", self._request_timer)
+        self._subscribe_reqs = RequestTable("subscribe", self._request_timer)
+        self._unsubscribe_reqs = RequestTable("unsubscribe", self._request_timer)
+        self._call_reqs = RequestTable("call", self._request_timer)
+        self._register_reqs = RequestTable("register", self._request_timer)
+        self._unregister_reqs = RequestTable("unregister", self._request_timer)
 
         # subscriptions in place
         self._subscriptions = {}
@@ -430,6 +537,16 @@ class ApplicationSession(BaseSession):
         # incoming invocations
         self._invocations = {}
 
+        # publications held back while the transport is not writable
+        self._publish_queue = deque()
+
+        # latency histograms (disabled unless enable_latency_metrics() is called)
+        self._latency: LatencyMetrics | None = None
+
+        # return the futures of event handlers from onMessage(), for transports
+        # throttling reads while received messages are processed
+        self._track_handlers = False
+
     @property
     def config(self) -> types.ComponentConfig:
         return self._config
@@ -459,6 +576,10 @@ class ApplicationSession(BaseSession):
 
         # The WAMP transport (e.g. WebSocket connection)
         self._transport = transport
+        self._track_handlers = (
+            getattr(transport, "readThrottle", None) is not None
+            or getattr(transport, "read_throttle", None) is not None
+        )
 
         # FIXME: the observer API gets "transport" as argument, but _not_ the onConnect callback below?
         d = self.fire("connect", self, transport)
@@ -519,7 +640,147 @@ class ApplicationSession(BaseSession):
             resume_session=resume_session,
             resume_token=resume_token,
         )
-        self._transport.send(msg)
+        self._send(msg)
+
+    @public
+    def wait_writable(self):
+        """
+        Wait until the transport can take more outgoing messages without growing its
+        write buffer above the high water mark (see the ``writeHighWaterMark`` transport
+        option). Fast producers should wait on this before publishing or calling.
+
+        :returns: A Deferred/Future that resolves once the transport is writable
+            (immediately, if the transport has no write-side flow control enabled).
+        """
+        if not self._transport:
+            raise exception.TransportLost()
+        flow = getattr(self._transport, "write_flow", None)
+        if flow is None:
+            return txaio.create_future_success(None)
+        return flow.wait_writable()
+
+    @public
+    def collect_metrics(self, metrics) -> None:
+        """
+        Report the outstanding requests, subscriptions and registrations of this
+        session as gauges, and the metrics of local concurrency limits of
+        registrations and subscriptions (``max_concurrency``) per procedure and
+        topic. The transport factory reports the metrics of all its sessions
+        aggregated (see :mod:`autobahn.metrics`).
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        metrics.gauge(
+            "autobahn_wamp_sessions",
+            1 if self._session_id else 0,
+            "Sessions joined to a realm.",
+        )
+        for requests in self._request_timer.tables:
+            metrics.gauge(
+                "autobahn_wamp_outstanding_requests",
+                len(requests),
+                "Requests waiting for a reply from the router.",
+                {"type": requests.request_type},
+            )
+            metrics.counter(
+                "autobahn_wamp_request_timeouts_total",
+                requests.timeouts,
+                "Requests that got no reply from the router within the timeout.",
+                {"type": requests.request_type},
+            )
+        metrics.gauge(
+            "autobahn_wamp_invocations",
+            len(self._invocations),
+            "Invocations of registered procedures in progress.",
+        )
+        metrics.gauge(
+            "autobahn_wamp_subscriptions",
+            len(self._subscriptions),
+            "Active subscriptions.",
+        )
+        metrics.gauge(
+            "autobahn_wamp_registrations",
+            len(self._registrations),
+            "Active registrations.",
+        )
+        metrics.gauge(
+            "autobahn_wamp_queued_publishes",
+            len(self._publish_queue),
+            "Publishes queued by write-side flow control.",
+        )
+        for registration in self._registrations.values():
+            limiter = registration.endpoint.limiter
+            if limiter is not None:
+                limiter.collect_metrics(
+                    metrics,
+                    "autobahn_wamp_invocations",
+                    {"procedure": registration.procedure},
+                )
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                limiter = subscription.handler.limiter
+                if limiter is not None:
+                    limiter.collect_metrics(
+                        metrics, "autobahn_wamp_events", {"topic": subscription.topic}
+                    )
+        if self._latency is not None:
+            self._latency.collect_metrics(metrics)
+
+    @public
+    def enable_latency_metrics(
+        self, buckets=None, parent: LatencyMetrics | None = None
+    ) -> LatencyMetrics:
+        """
+        Enable recording of latency histograms per procedure and topic: round-trip
+        time of calls, run time of invocations and event handlers, and time until
+        acknowledged publications are acknowledged (see :mod:`autobahn.wamp.latency`).
+
+        The histograms are included in the metrics reported by
+        :meth:`collect_metrics`.
+
+        :param buckets: Histogram bucket upper bounds in seconds (default:
+            :data:`autobahn.wamp.latency.LATENCY_BUCKETS`).
+        :type buckets: tuple of float or None
+
+        :param parent: Optional latency metrics into which all latencies of this
+            session are recorded too (e.g. those of a :class:`Component`).
+
+        :returns: The latency metrics of this session.
+        """
+        if self._latency is None:
+            if buckets is None:
+                buckets = parent.buckets if parent is not None else LATENCY_BUCKETS
+            self._latency = LatencyMetrics(buckets, parent)
+        return self._latency
+
+    @property
+    def latency_metrics(self) -> LatencyMetrics | None:
+        """
+        The latency histograms of this session, or ``None`` when not enabled (see
+        :meth:`enable_latency_metrics`).
+        """
+        return self._latency
+
+    @public
+    def set_request_timeout(self, request_type: str, timeout: float | None) -> None:
+        """
+        Set a timeout for the replies of the router to requests of a type. Requests
+        that get no reply within the timeout fail with an
+        :class:`autobahn.wamp.exception.ApplicationError` ``wamp.error.timeout``
+        (and timed out calls are canceled). The timeout applies to requests issued
+        afterwards, and is checked at least once per second.
+
+        :param request_type: ``"call"``, ``"publish"`` (acknowledged publications),
+            ``"subscribe"``, ``"unsubscribe"``, ``"register"`` or ``"unregister"``.
+        :param timeout: The timeout in seconds, or ``None`` for no timeout (the
+            default).
+        """
+        for requests in self._request_timer.tables:
+            if requests.request_type == request_type:
+                requests.timeout = timeout
+                return
+        raise Exception(f"invalid request type '{request_type}'")
 
     @public
     def disconnect(self):
@@ -575,36 +836,18 @@ class ApplicationSession(BaseSession):
         """
         Does parameter type checking and validation against type hints
         and appropriately tells the user code and the caller (through router).
-        """
 
-        async def _type_check(*args, **kwargs):
-            # Converge both args and kwargs into a dictionary
-            arguments = inspect.getcallargs(func, *args, **kwargs)
-            response = []
-            for name, kind in func.__annotations__.items():
-                if name in arguments:
-                    # if a "type" has __origin__ attribute it is a
-                    # parameterized generic
-                    if getattr(kind, "__origin__", None) == Union:
-                        expected_types = [arg.__name__ for arg in kind.__args__]
-                        if not isinstance(arguments[name], kind.__args__):
-                            response.append(
-                                f"'{name}' expected types={expected_types} got={type(arguments[name]).__name__}"
-                            )
-                    elif not isinstance(arguments[name], kind):
-                        response.append(
-                            f"'{name}' expected type={kind.__name__} got={type(arguments[name]).__name__}"
-                        )
-            if response:
-                raise TypeCheckError(", ".join(response))
-            return await txaio.as_future(func, *args, **kwargs)
-
-        return _type_check
+        The type hints are analysed once, here (see
+        :func:`autobahn.wamp.typecheck.compile_type_check`).
+        """
+        return type_checked(func)
 
     def onMessage(self, msg: IMessage):
         """
         Implements :func:`autobahn.wamp.interfaces.ITransportHandler.onMessage`
         """
+        if self._tracer is not None:
+            self._tracer.on_receive(self, msg)
 
         if self._session_id is None:
             # the first message must be WELCOME, ABORT or CHALLENGE ..
@@ -623,7 +866,7 @@ class ApplicationSession(BaseSession):
                         reply = message.Abort(
                             "wamp.error.cannot_authenticate", f"{res}"
                         )
-                        self._transport.send(reply)
+                        self._send(reply)
                         return
 
                     if msg.realm:
@@ -689,7 +932,7 @@ class ApplicationSession(BaseSession):
                         "wamp.error.cannot_authenticate",
                         "Error calling onWelcome handler",
                     )
-                    self._transport.send(reply)
+                    self._send(reply)
                     return self._swallow_error(e, "While firing onWelcome")
 
                 txaio.add_callbacks(d, success, error)
@@ -733,14 +976,14 @@ class ApplicationSession(BaseSession):
                             f"signature must be unicode (was {type(signature)})"
                         )
                     reply = message.Authenticate(signature)
-                    self._transport.send(reply)
+                    self._send(reply)
 
                 def error(err):
                     self.onUserError(err, "Authentication failed")
                     reply = message.Abort(
                         "wamp.error.cannot_authenticate", f"{err.value}"
                     )
-                    self._transport.send(reply)
+                    self._send(reply)
                     # fire callback and close the transport
                     details = types.CloseDetails(reply.reason, reply.message)
                     d = txaio.as_future(self.onLeave, details)
@@ -771,7 +1014,7 @@ class ApplicationSession(BaseSession):
                 if not self._goodbye_sent:
                     # the peer wants to close: send GOODBYE reply
                     reply = message.Goodbye()
-                    self._transport.send(reply)
+                    self._send(reply)
 
                 self._session_id = None
 
@@ -792,6 +1035,8 @@ class ApplicationSession(BaseSession):
 
             elif isinstance(msg, message.Event):
                 if msg.subscription in self._subscriptions:
+                    handler_futures = [] if self._track_handlers else None
+
                     # fire all event handlers on subscription ..
                     for subscription in self._subscriptions[msg.subscription]:
                         handler = subscription.handler
@@ -837,6 +1082,17 @@ class ApplicationSession(BaseSession):
                             invoke_args = invoke_args + tuple(msg.args)
                         invoke_kwargs = msg.kwargs if msg.kwargs else dict()
 
+                        if handler.pattern is not None and msg.topic:
+                            # named components of the topic
+                            try:
+                                _, named = handler.pattern.match(topic)
+                            except ValueError:
+                                # e.g. a component that is not an int
+                                continue
+                            named = {k: v for k, v in named.items() if type(k) == str}
+                            if named:
+                                invoke_kwargs = {**named, **invoke_kwargs}
+
                         if handler.details_arg:
                             invoke_kwargs[handler.details_arg] = types.EventDetails(
                                 subscription,
@@ -863,7 +1119,7 @@ class ApplicationSession(BaseSession):
                             ):
                                 if self._transport:
                                     response = message.EventReceived(msg.publication)
-                                    self._transport.send(response)
+                                    self._send(response)
                                 else:
                                     self.log.warn(
                                         "successfully processed event with acknowledged delivery, but could not send ACK, since the transport was lost in the meantime"
@@ -873,10 +1129,37 @@ class ApplicationSession(BaseSession):
                             errmsg = f"While firing {handler.fn} subscribed under {msg.subscription}."
                             return self._swallow_error(e, errmsg)
 
-                        future = txaio.as_future(
-                            handler.fn, *invoke_args, **invoke_kwargs
-                        )
+                        if self._latency is not None:
+                            started = perf_counter()
+                        if self._tracer is None:
+                            future = txaio.as_future(
+                                handler.fn, *invoke_args, **invoke_kwargs
+                            )
+                        else:
+                            future = self._tracer.run_handler(
+                                self,
+                                msg,
+                                subscription.topic,
+                                handler.fn,
+                                invoke_args,
+                                invoke_kwargs,
+                            )
+                        if self._latency is not None:
+                            self._latency.track(
+                                future,
+                                LatencyMetrics.EVENT,
+                                subscription.topic,
+                                started,
+                            )
                         txaio.add_callbacks(future, _success, _error)
+                        if handler_futures is not None:
+                            handler_futures.append(future)
+
+                    # tell the transport when we're done processing the event
+                    if handler_futures:
+                        if len(handler_futures) == 1:
+                            return handler_futures[0]
+                        return txaio.gather(handler_futures, consume_exceptions=True)
 
                 else:
                     raise ProtocolError(
@@ -887,6 +1170,8 @@ class ApplicationSession(BaseSession):
                 if msg.request in self._publish_reqs:
                     # get and pop outstanding publish request
                     publish_request = self._publish_reqs.pop(msg.request)
+                    if self._latency is not None:
+                        self._latency.finish(LatencyMetrics.PUBLISH, msg.request)
 
                     if txaio.is_future(publish_request.on_reply) and txaio.is_called(
                         publish_request.on_reply
@@ -900,7 +1185,7 @@ class ApplicationSession(BaseSession):
 
                     # resolve deferred/future for publishing successfully
                     txaio.resolve(publish_request.on_reply, publication)
-                else:
+                elif not self._on_late_reply(self._publish_reqs, msg):
                     raise ProtocolError(
                         f"PUBLISHED received for non-pending request ID {msg.request}"
                     )
@@ -928,7 +1213,7 @@ class ApplicationSession(BaseSession):
 
                     # resolve deferred/future for subscribing successfully
                     txaio.resolve(request.on_reply, subscription)
-                else:
+                elif not self._on_late_reply(self._subscribe_reqs, msg):
                     raise ProtocolError(
                         f"SUBSCRIBED received for non-pending request ID {msg.request}"
                     )
@@ -953,7 +1238,7 @@ class ApplicationSession(BaseSession):
 
                     # resolve deferred/future for unsubscribing successfully
                     txaio.resolve(request.on_reply, 0)
-                else:
+                elif not self._on_late_reply(self._unsubscribe_reqs, msg):
                     raise ProtocolError(
                         f"UNSUBSCRIBED received for non-pending request ID {msg.request}"
                     )
@@ -1045,11 +1330,19 @@ class ApplicationSession(BaseSession):
 
                                 txaio.add_callbacks(prog_d, None, _error)
 
+                                # let the transport hold back reading while the
+                                # progressive result is still being processed
+                                # (e.g. when the buffer of a call stream is full)
+                                if not txaio.is_called(prog_d):
+                                    return prog_d
+
                     else:
                         # process final call result
 
                         # drop original request
                         del self._call_reqs[msg.request]
+                        if self._latency is not None:
+                            self._latency.finish(LatencyMetrics.CALL, msg.request)
 
                         # user callback that gets fired
                         on_reply = call_request.on_reply
@@ -1092,7 +1385,7 @@ class ApplicationSession(BaseSession):
                                         txaio.resolve(on_reply, msg.args[0])
                                 else:
                                     txaio.resolve(on_reply, None)
-                else:
+                elif not self._on_late_reply(self._call_reqs, msg):
                     raise ProtocolError(
                         f"RESULT received for non-pending request ID {msg.request}"
                     )
@@ -1163,7 +1456,7 @@ class ApplicationSession(BaseSession):
                             reply = self._message_from_exception(
                                 message.Invocation.MESSAGE_TYPE, msg.request, enc_err
                             )
-                            self._transport.send(reply)
+                            self._send(reply)
 
                         else:
                             if endpoint.obj is not None:
@@ -1215,7 +1508,16 @@ class ApplicationSession(BaseSession):
                                                 progress=True,
                                             )
 
-                                        self._transport.send(progress_msg)
+                                        self._send(progress_msg)
+
+                                        # let the endpoint wait for the transport
+                                        # to drain before producing more results
+                                        flow = getattr(
+                                            self._transport, "write_flow", None
+                                        )
+                                        if flow is None:
+                                            return txaio.create_future_success(None)
+                                        return flow.wait_writable()
 
                                 else:
                                     progress = None
@@ -1231,9 +1533,28 @@ class ApplicationSession(BaseSession):
                                     enc_algo=msg.enc_algo,
                                 )
 
-                            on_reply = txaio.as_future(
-                                endpoint.fn, *invoke_args, **invoke_kwargs
-                            )
+                            if self._latency is not None:
+                                started = perf_counter()
+                            if self._tracer is None:
+                                on_reply = txaio.as_future(
+                                    endpoint.fn, *invoke_args, **invoke_kwargs
+                                )
+                            else:
+                                on_reply = self._tracer.run_handler(
+                                    self,
+                                    msg,
+                                    registration.procedure,
+                                    endpoint.fn,
+                                    invoke_args,
+                                    invoke_kwargs,
+                                )
+                            if self._latency is not None:
+                                self._latency.track(
+                                    on_reply,
+                                    LatencyMetrics.INVOCATION,
+                                    registration.procedure,
+                                    started,
+                                )
 
                             def success(res):
                                 del self._invocations[msg.request]
@@ -1303,12 +1624,14 @@ class ApplicationSession(BaseSession):
 
                                 if self._transport is None:
                                     self.log.debug(
-                                        f'Skipping result of "{registration.procedure}", request {msg.request} because transport disconnected.'
+                                        'Skipping result of "{procedure}", request {request} because transport disconnected.',
+                                        procedure=registration.procedure,
+                                        request=msg.request,
                                     )
                                     return
 
                                 try:
-                                    self._transport.send(reply)
+                                    self._send(reply)
                                 except SerializationError as e:
                                     # the application-level payload returned from the invoked procedure can't be serialized
                                     error_reply = message.Error(
@@ -1319,7 +1642,7 @@ class ApplicationSession(BaseSession):
                                             f'success return value (args={reply.args}, kwargs={reply.kwargs}) from invoked procedure "{registration.procedure}" could not be serialized: {e}'
                                         ],
                                     )
-                                    self._transport.send(error_reply)
+                                    self._send(error_reply)
                                 except PayloadExceededError as e:
                                     # the application-level payload returned from the invoked procedure, when serialized and framed
                                     # for the transport, exceeds the transport message/frame size limit
@@ -1331,7 +1654,7 @@ class ApplicationSession(BaseSession):
                                             f'success return value (args={reply.args}, kwargs={reply.kwargs}) from invoked procedure "{registration.procedure}" exceeds transport size limit: {e}'
                                         ],
                                     )
-                                    self._transport.send(error_reply)
+                                    self._send(error_reply)
 
                             def error(err):
                                 del self._invocations[msg.request]
@@ -1356,7 +1679,7 @@ class ApplicationSession(BaseSession):
                                 )
 
                                 try:
-                                    self._transport.send(reply)
+                                    self._send(reply)
                                 except SerializationError as e:
                                     # the application-level payload returned from the invoked procedure can't be serialized
                                     reply = message.Error(
@@ -1367,7 +1690,7 @@ class ApplicationSession(BaseSession):
                                             f'error return value from invoked procedure "{registration.procedure}" could not be serialized: {e}'
                                         ],
                                     )
-                                    self._transport.send(reply)
+                                    self._send(reply)
                                 except PayloadExceededError as e:
                                     # the application-level payload returned from the invoked procedure, when serialized and framed
                                     # for the transport, exceeds the transport message/frame size limit
@@ -1379,7 +1702,7 @@ class ApplicationSession(BaseSession):
                                             f'success return value from invoked procedure "{registration.procedure}" exceeds transport size limit: {e}'
                                         ],
                                     )
-                                    self._transport.send(reply)
+                                    self._send(reply)
 
                                 # we have handled the error, so we eat it
                                 return None
@@ -1390,6 +1713,9 @@ class ApplicationSession(BaseSession):
 
                             txaio.add_callbacks(on_reply, success, error)
 
+                            # tell the transport when we're done processing the invocation
+                            return on_reply
+
             elif isinstance(msg, message.Interrupt):
                 if msg.request not in self._invocations:
                     # raise ProtocolError("INTERRUPT received for non-pending invocation {0}".format(msg.request))
@@ -1426,7 +1752,7 @@ class ApplicationSession(BaseSession):
                         )
 
                     txaio.resolve(request.on_reply, registration)
-                else:
+                elif not self._on_late_reply(self._register_reqs, msg):
                     raise ProtocolError(
                         f"REGISTERED received for non-pending request ID {msg.request}"
                     )
@@ -1464,7 +1790,7 @@ class ApplicationSession(BaseSession):
 
                     # resolve deferred/future for unregistering successfully
                     txaio.resolve(request.on_reply)
-                else:
+                elif not self._on_late_reply(self._unregister_reqs, msg):
                     raise ProtocolError(
                         f"UNREGISTERED received for non-pending request ID {msg.request}"
                     )
@@ -1479,6 +1805,8 @@ class ApplicationSession(BaseSession):
                     and msg.request in self._call_reqs
                 ):
                     on_reply = self._call_reqs.pop(msg.request).on_reply
+                    if self._latency is not None:
+                        self._latency.finish(LatencyMetrics.CALL, msg.request)
 
                 # ERROR reply to PUBLISH
                 elif (
@@ -1486,6 +1814,8 @@ class ApplicationSession(BaseSession):
                     and msg.request in self._publish_reqs
                 ):
                     on_reply = self._publish_reqs.pop(msg.request).on_reply
+                    if self._latency is not None:
+                        self._latency.finish(LatencyMetrics.PUBLISH, msg.request)
 
                 # ERROR reply to SUBSCRIBE
                 elif (
@@ -1518,7 +1848,10 @@ class ApplicationSession(BaseSession):
                 if on_reply:
                     if not txaio.is_called(on_reply):
                         txaio.reject(on_reply, self._exception_from_message(msg))
-                else:
+                elif not any(
+                    requests.is_expired(msg.request)
+                    for requests in self._request_timer.tables
+                ):
                     raise ProtocolError(
                         f"WampAppSession.onMessage(): ERROR received for non-pending request_type {msg.request_type} and request ID {msg.request}"
                     )
@@ -1589,37 +1922,126 @@ class ApplicationSession(BaseSession):
         Implements :meth:`autobahn.wamp.interfaces.ISession.onWelcome`
         """
 
+    def _expire_requests(self, requests, expired):
+        """
+        Fail requests that got no reply within the timeout of their type.
+        """
+        self.log.warn(
+            "{count} outstanding {request_type} requests got no reply within {timeout} seconds",
+            count=len(expired),
+            request_type=requests.request_type,
+            timeout=requests.timeout,
+        )
+        for request in expired:
+            error = ApplicationError(
+                ApplicationError.TIMEOUT,
+                f"no reply to {requests.request_type} request "
+                f"{request.request_id} within {requests.timeout} seconds",
+            )
+            if self._tracer is not None:
+                self._tracer.on_request_failed(
+                    self, requests.request_type, request.request_id, error
+                )
+            if requests is self._call_reqs:
+                if self._latency is not None:
+                    self._latency.discard(LatencyMetrics.CALL, request.request_id)
+                if self._transport:
+                    msg = message.Cancel(
+                        request.request_id, mode=message.Cancel.KILLNOWAIT
+                    )
+                    # the call fails with the timeout even if it cannot be canceled
+                    try:
+                        self._send(msg)
+                    except Exception as e:
+                        self.log.warn(
+                            "failed to cancel timed out call {request_id}: {err}",
+                            request_id=request.request_id,
+                            err=e,
+                        )
+            elif requests is self._publish_reqs and self._latency is not None:
+                self._latency.discard(LatencyMetrics.PUBLISH, request.request_id)
+            if not txaio.is_called(request.on_reply):
+                txaio.reject(request.on_reply, error)
+
+    def _on_late_reply(self, requests, msg) -> bool:
+        """
+        Handle a reply to a request that timed out before.
+
+        :returns: ``False`` if the request was never issued.
+        """
+        if not requests.is_expired(msg.request):
+            return False
+        self.log.debug(
+            "{msg_type} received for request ID {request_id} that timed out",
+            msg_type=msg.__class__.__name__.upper(),
+            request_id=msg.request,
+        )
+        if not self._transport:
+            return True
+
+        # undo subscriptions and registrations done by the router too late
+        if (
+            isinstance(msg, message.Subscribed)
+            and msg.subscription not in self._subscriptions
+        ):
+            request_id = self._request_id_gen.next()
+            requests = self._unsubscribe_reqs
+            request = UnsubscribeRequest(
+                request_id, txaio.create_future(), msg.subscription
+            )
+            reply = message.Unsubscribe(request_id, msg.subscription)
+        elif (
+            isinstance(msg, message.Registered)
+            and msg.registration not in self._registrations
+        ):
+            request_id = self._request_id_gen.next()
+            requests = self._unregister_reqs
+            request = UnregisterRequest(
+                request_id, txaio.create_future(), msg.registration
+            )
+            reply = message.Unregister(request_id, msg.registration)
+        else:
+            return True
+
+        # nobody is waiting for the outcome
+        txaio.add_callbacks(request.on_reply, None, lambda _: None)
+        requests.add(request)
+        self._send(reply)
+        return True
+
     def _errback_outstanding_requests(self, exc):
         """
         Errback any still outstanding requests with exc.
         """
         d = txaio.create_future_success(None)
-        all_requests = [
-            self._publish_reqs,
-            self._subscribe_reqs,
-            self._unsubscribe_reqs,
-            self._call_reqs,
-            self._register_reqs,
-            self._unregister_reqs,
-        ]
+        self._request_timer.stop()
         outstanding = []
-        for requests in all_requests:
+        for requests in self._request_timer.tables:
+            if self._tracer is not None:
+                for request_id in requests:
+                    self._tracer.on_request_failed(
+                        self, requests.request_type, request_id, exc
+                    )
             outstanding.extend(requests.values())
             requests.clear()
+        if self._latency is not None:
+            self._latency.clear_pending()
 
         if outstanding:
             self.log.info(
                 "Cancelling {count} outstanding requests",
                 count=len(outstanding),
             )
+        debug = log_enabled(self.log, "debug")
         for request in outstanding:
-            self.log.debug(
-                "cleaning up outstanding {request_type} request {request_id}, "
-                "firing errback on user handler {request_on_reply}",
-                request_on_reply=request.on_reply,
-                request_id=request.request_id,
-                request_type=request.__class__.__name__,
-            )
+            if debug:
+                self.log.debug(
+                    "cleaning up outstanding {request_type} request {request_id}, "
+                    "firing errback on user handler {request_on_reply}",
+                    request_on_reply=request.on_reply,
+                    request_id=request.request_id,
+                    request_type=request.__class__.__name__,
+                )
             if not txaio.is_called(request.on_reply):
                 txaio.reject(request.on_reply, exc)
 
@@ -1665,7 +2087,7 @@ class ApplicationSession(BaseSession):
             if not reason:
                 reason = "wamp.close.normal"
             msg = wamp.message.Goodbye(reason=reason, message=message)
-            self._transport.send(msg)
+            self._send(msg)
             self._goodbye_sent = True
         else:
             self.log.warn(
@@ -1765,9 +2187,13 @@ class ApplicationSession(BaseSession):
         if options and options.acknowledge:
             # only acknowledged publications expect a reply ..
             on_reply = txaio.create_future()
-            self._publish_reqs[request_id] = PublishRequest(
-                request_id, on_reply, was_encrypted=(encoded_payload is not None)
+            self._publish_reqs.add(
+                PublishRequest(
+                    request_id, on_reply, was_encrypted=(encoded_payload is not None)
+                )
             )
+            if self._latency is not None:
+                self._latency.start(LatencyMetrics.PUBLISH, request_id, topic)
         else:
             on_reply = None
 
@@ -1780,14 +2206,293 @@ class ApplicationSession(BaseSession):
             #   calling transpor.send(), because a mock- or side-by-side transport
             #   will immediately lead on an incoming WAMP message in onMessage()
             #
-            self._transport.send(msg)
+            if self.publish_flow_policy is None:
+                self._send(msg)
+            else:
+                self._send_publish(msg)
         except Exception as e:
             if request_id in self._publish_reqs:
                 del self._publish_reqs[request_id]
+                if self._latency is not None:
+                    self._latency.discard(LatencyMetrics.PUBLISH, request_id)
             raise e
 
         return on_reply
 
+    @public
+    def publish_many(self, topic: str, events, options=None):
+        """
+        Publish several events to a topic.
+
+        The topic is validated once, the PUBLISH messages of all events are built
+        and serialized in one pass, and written to the transport at once (when the
+        transport supports it). With a ``publish_flow_policy``, each publication is
+        subject to the policy.
+
+        :param topic: The URI of the topic to publish to.
+        :type topic: str
+
+        :param events: The positional arguments of the events, one list or tuple
+            per event.
+        :type events: iterable
+
+        :param options: Options for publishing, applied to all events.
+        :type options: :class:`autobahn.wamp.types.PublishOptions` or None
+
+        :returns: For acknowledged publications, a Deferred/Future for the list of
+            :class:`autobahn.wamp.request.Publication` (in order), failing with the
+            first error when any publication fails. ``None`` otherwise.
+        """
+        return self._publish_batch(
+            ((topic, args, None) for args in events), options, "publish_many"
+        )
+
+    @public
+    def publish_batch(self, publications, options=None):
+        """
+        Publish several events to different topics. Like :meth:`publish_many`, but
+        with the topic of every event given.
+
+        :param publications: The events, as tuples ``(topic, args)`` or
+            ``(topic, args, kwargs)``.
+        :type publications: iterable
+
+        :param options: Options for publishing, applied to all events.
+        :type options: :class:`autobahn.wamp.types.PublishOptions` or None
+
+        :returns: See :meth:`publish_many`.
+        """
+        return self._publish_batch(
+            (
+                (publication[0], publication[1], publication[2])
+                if len(publication) > 2
+                else (publication[0], publication[1], None)
+                for publication in publications
+            ),
+            options,
+            "publish_batch",
+        )
+
+    def _publish_batch(self, events, options, method: str):
+        if options and not isinstance(options, types.PublishOptions):
+            raise Exception("options must be of type a.w.t.PublishOptions")
+
+        if not self._transport:
+            raise exception.TransportLost()
+
+        attrs = options.message_attr() if options else {}
+        acknowledge = bool(options and options.acknowledge)
+        next_request_id = self._request_id_gen.next
+        payload_codec = self._payload_codec
+        valid_topics = set()
+        msgs = []
+        replies = []
+        sent = 0
+
+        try:
+            for topic, args, kwargs in events:
+                if topic not in valid_topics:
+                    assert type(topic) == str
+                    message.check_or_raise_uri(
+                        topic,
+                        message=f"{self.__class__.__name__}.{method}()",
+                        strict=False,
+                        allow_empty_components=False,
+                        allow_none=False,
+                    )
+                    valid_topics.add(topic)
+                assert args is None or type(args) in (list, tuple)
+                assert kwargs is None or type(kwargs) == dict
+
+                request_id = next_request_id()
+                encoded_payload = None
+                if payload_codec:
+                    encoded_payload = payload_codec.encode(True, topic, args, kwargs)
+                if encoded_payload:
+                    msg = message.Publish(
+                        request_id,
+                        topic,
+                        payload=encoded_payload.payload,
+                        enc_algo=encoded_payload.enc_algo,
+                        enc_key=encoded_payload.enc_key,
+                        enc_serializer=encoded_payload.enc_serializer,
+                        **attrs,
+                    )
+                else:
+                    msg = message.Publish(
+                        request_id, topic, args=args, kwargs=kwargs, **attrs
+                    )
+
+                if options:
+                    if options.correlation_id is not None:
+                        msg.correlation_id = options.correlation_id
+                    if options.correlation_uri is not None:
+                        msg.correlation_uri = options.correlation_uri
+                    if options.correlation_is_anchor is not None:
+                        msg.correlation_is_anchor = options.correlation_is_anchor
+                    if options.correlation_is_last is not None:
+                        msg.correlation_is_last = options.correlation_is_last
+
+                if acknowledge:
+                    on_reply = txaio.create_future()
+                    self._publish_reqs.add(
+                        PublishRequest(
+                            request_id,
+                            on_reply,
+                            was_encrypted=(encoded_payload is not None),
+                        )
+                    )
+                    replies.append(on_reply)
+                    if self._latency is not None:
+                        self._latency.start(LatencyMetrics.PUBLISH, request_id, topic)
+                msgs.append(msg)
+
+            if self.publish_flow_policy is None:
+                self._send_many(msgs)
+            else:
+                for msg in msgs:
+                    self._send_publish(msg)
+                    sent += 1
+        except Exception as e:
+            sent = getattr(e, "messages_sent", sent)
+            if acknowledge:
+                # the publications sent (or queued) stay pending: the router
+                # acknowledges them, though nobody waits for their replies
+                for reply in replies[:sent]:
+                    txaio.add_callbacks(reply, None, lambda _: None)
+                for msg in msgs[sent:]:
+                    if self._publish_reqs.pop(msg.request, None) is not None:
+                        if self._latency is not None:
+                            self._latency.discard(LatencyMetrics.PUBLISH, msg.request)
+            raise e
+
+        if acknowledge:
+            return _gather_replies(replies)
+        return None
+
+    def _send(self, msg):
+        """
+        Send a message, reporting it to the tracer (if any).
+        """
+        tracer = self._tracer
+        if tracer is None:
+            self._transport.send(msg)
+            return
+        tracer.on_send(self, msg)
+        try:
+            self._transport.send(msg)
+        except Exception as e:
+            self._trace_send_failed([msg], e)
+            raise
+
+    def _send_many(self, msgs):
+        """
+        Send several messages, written to the transport at once when the transport
+        supports it (all messages are sent, or none). Otherwise, the messages are
+        sent one by one, and when sending one fails, the number of messages sent
+        before is set as the ``messages_sent`` attribute of the exception raised.
+        """
+        if self._tracer is not None:
+            for msg in msgs:
+                self._tracer.on_send(self, msg)
+        send_many = getattr(self._transport, "send_many", None)
+        sent = 0
+        try:
+            if send_many is not None:
+                send_many(msgs)
+            else:
+                for msg in msgs:
+                    self._transport.send(msg)
+                    sent += 1
+        except Exception as e:
+            if send_many is None:
+                e.messages_sent = sent
+            if self._tracer is not None:
+                self._trace_send_failed(msgs[sent:], e)
+            raise
+
+    def _trace_send_failed(self, msgs, error):
+        """
+        Report requests whose messages could not be sent to the tracer.
+        """
+        for msg in msgs:
+            request_type = _REQUEST_TYPES.get(type(msg))
+            if request_type is not None:
+                self._tracer.on_request_failed(self, request_type, msg.request, error)
+
+    def _send_publish(self, msg: message.Publish):
+        """
+        Send a PUBLISH message applying the session's ``publish_flow_policy``.
+        """
+        flow = getattr(self._transport, "write_flow", None)
+        if flow is None or (flow.writable and not self._publish_queue):
+            self._send(msg)
+
+        elif self.publish_flow_policy == self.PUBLISH_FLOW_POLICY_RAISE:
+            raise exception.TransportBusy(
+                f"cannot publish to {msg.topic}: transport write buffer full"
+            )
+
+        elif self.publish_flow_policy == self.PUBLISH_FLOW_POLICY_QUEUE:
+            if 0 < self.publish_queue_limit <= len(self._publish_queue):
+                raise exception.TransportBusy(
+                    f"cannot publish to {msg.topic}: publish queue full ({len(self._publish_queue)} publications)"
+                )
+            self._publish_queue.append(msg)
+            if len(self._publish_queue) == 1:
+                txaio.add_callbacks(
+                    flow.wait_writable(),
+                    self._flush_publish_queue,
+                    self._fail_publish_queue,
+                )
+
+        else:
+            raise Exception(f"invalid publish_flow_policy {self.publish_flow_policy}")
+
+    def _flush_publish_queue(self, _=None):
+        """
+        Send publications held back while the transport was not writable.
+        """
+        while self._publish_queue:
+            flow = getattr(self._transport, "write_flow", None)
+            if flow is not None and not flow.writable:
+                txaio.add_callbacks(
+                    flow.wait_writable(),
+                    self._flush_publish_queue,
+                    self._fail_publish_queue,
+                )
+                return
+            msg = self._publish_queue.popleft()
+            try:
+                if not self._transport:
+                    raise exception.TransportLost()
+                self._send(msg)
+            except Exception as e:
+                self._fail_publish(msg, e)
+
+    def _fail_publish_queue(self, fail):
+        """
+        Fail all publications held back (e.g. because the transport was lost).
+        """
+        while self._publish_queue:
+            self._fail_publish(self._publish_queue.popleft(), fail.value)
+
+    def _fail_publish(self, msg: message.Publish, error: Exception):
+        request = self._publish_reqs.pop(msg.request, None)
+        if self._latency is not None:
+            self._latency.discard(LatencyMetrics.PUBLISH, msg.request)
+        if self._tracer is not None:
+            self._tracer.on_request_failed(self, "publish", msg.request, error)
+        if request is not None:
+            if not txaio.is_called(request.on_reply):
+                txaio.reject(request.on_reply, error)
+        else:
+            self.log.warn(
+                "held back publication to {topic} dropped: {error}",
+                topic=msg.topic,
+                error=error,
+            )
+
     @public
     def subscribe(
         self,
@@ -1808,7 +2513,7 @@ class ApplicationSession(BaseSession):
         if not self._transport:
             raise exception.TransportLost()
 
-        def _subscribe(obj, fn, topic, options, check_types):
+        def _subscribe(obj, fn, topic, options, check_types, pattern=None):
             message.check_or_raise_uri(
                 topic,
                 message=f"{self.__class__.__name__}.subscribe()",
@@ -1819,11 +2524,23 @@ class ApplicationSession(BaseSession):
 
             request_id = self._request_id_gen.next()
             on_reply = txaio.create_future()
+            limiter = None
+            if options and (options.executor or options.max_concurrency):
+                fn = offload(
+                    fn,
+                    options.executor,
+                    options.max_concurrency,
+                    options.max_queue,
+                    options.details_arg,
+                )
+                limiter = getattr(fn, "limiter", None)
             if check_types:
                 fn = self.type_check(fn)
-            handler_obj = Handler(fn, obj, options.details_arg if options else None)
-            self._subscribe_reqs[request_id] = SubscribeRequest(
-                request_id, topic, on_reply, handler_obj
+            handler_obj = Handler(
+                fn, obj, options.details_arg if options else None, limiter, pattern
+            )
+            self._subscribe_reqs.add(
+                SubscribeRequest(request_id, topic, on_reply, handler_obj)
             )
 
             if options:
@@ -1841,7 +2558,7 @@ class ApplicationSession(BaseSession):
                 if options.correlation_is_last is not None:
                     msg.correlation_is_last = options.correlation_is_last
 
-            self._transport.send(msg)
+            self._send(msg)
             return on_reply
 
         if callable(handler):
@@ -1856,16 +2573,24 @@ class ApplicationSession(BaseSession):
                 if "_wampuris" in proc.__dict__:
                     for pat in proc.__dict__["_wampuris"]:
                         if pat.is_handler():
-                            _uri = pat.uri()
+                            # named components are subscribed to as wildcards, and
+                            # passed to the handler as keyword arguments
+                            _uri = pat.wildcard_uri()
                             subopts = pat.options or options
+                            wildcard = pat.uri_type == uri.Pattern.URI_TYPE_WILDCARD
                             if subopts is None:
-                                if pat.uri_type == uri.Pattern.URI_TYPE_WILDCARD:
+                                if wildcard:
                                     subopts = types.SubscribeOptions(match="wildcard")
                                 else:
                                     subopts = types.SubscribeOptions(match="exact")
                             on_replies.append(
                                 _subscribe(
-                                    handler, proc, _uri, subopts, pat._check_types
+                                    handler,
+                                    proc,
+                                    _uri,
+                                    subopts,
+                                    pat._check_types,
+                                    pat if wildcard else None,
                                 )
                             )
 
@@ -1895,13 +2620,13 @@ class ApplicationSession(BaseSession):
             request_id = self._request_id_gen.next()
 
             on_reply = txaio.create_future()
-            self._unsubscribe_reqs[request_id] = UnsubscribeRequest(
-                request_id, on_reply, subscription.id
+            self._unsubscribe_reqs.add(
+                UnsubscribeRequest(request_id, on_reply, subscription.id)
             )
 
             msg = message.Unsubscribe(request_id, subscription.id)
 
-            self._transport.send(msg)
+            self._send(msg)
             return on_reply
         else:
             # there are still handlers active on the subscription!
@@ -1938,6 +2663,156 @@ class ApplicationSession(BaseSession):
         if not self._transport:
             raise exception.TransportLost()
 
+        msg, on_reply = self._new_call(
+            procedure, args, kwargs, options, options.message_attr() if options else {}
+        )
+        request_id = msg.request
+
+        try:
+            # Notes:
+            #
+            # * this might raise autobahn.wamp.exception.SerializationError
+            #   when the user payload cannot be serialized
+            # * we have to setup a CallRequest() in _call_reqs _before_
+            #   calling transpor.send(), because a mock- or side-by-side transport
+            #   will immediately lead on an incoming WAMP message in onMessage()
+            #
+            self._send(msg)
+        except:
+            if request_id in self._call_reqs:
+                del self._call_reqs[request_id]
+                if self._latency is not None:
+                    self._latency.discard(LatencyMetrics.CALL, request_id)
+            raise
+
+        return on_reply
+
+    @public
+    def call_many(
+        self,
+        procedure: str,
+        calls,
+        max_in_flight: int = 100,
+        options: CallOptions | None = None,
+        ordered: bool = False,
+    ) -> CallPipeline:
+        """
+        Call a procedure many times, with a bounded number of calls in flight.
+
+        Calls are issued as results are consumed, several at a time (with the CALL
+        messages written to the transport at once, when the transport supports
+        it). Errors of individual calls do not stop the iteration, but are
+        reported in place of the result::
+
+            async for index, result in session.call_many(
+                "com.example.add2", ([i, 1] for i in range(10000)), max_in_flight=50
+            ):
+                if isinstance(result, Exception):
+                    print(f"call {index} failed: {result}")
+
+        :param procedure: The URI of the procedure to call.
+        :type procedure: str
+
+        :param calls: The positional arguments of the calls, one list or tuple per
+            call. Consumed lazily.
+        :type calls: iterable
+
+        :param max_in_flight: Maximum number of calls issued whose result was not
+            consumed yet.
+        :type max_in_flight: int
+
+        :param options: Options for the calls.
+        :type options: :class:`autobahn.wamp.types.CallOptions` or None
+
+        :param ordered: When ``True``, results are produced in the order of
+            ``calls``, else in the order the calls complete.
+        :type ordered: bool
+
+        :returns: An asynchronous iterator of ``(index, result)`` tuples, with the
+            index of the call in ``calls``, and the result of the call (see
+            :meth:`call`) or the exception the call failed with.
+        :rtype: :class:`autobahn.wamp.pipeline.CallPipeline`
+        """
+        assert type(procedure) == str
+        assert type(max_in_flight) == int and max_in_flight > 0
+
+        message.check_or_raise_uri(
+            procedure,
+            message=f"{self.__class__.__name__}.call_many()",
+            strict=False,
+            allow_empty_components=False,
+            allow_none=False,
+        )
+
+        if options and not isinstance(options, types.CallOptions):
+            raise Exception("options must be of type a.w.t.CallOptions")
+
+        if not self._transport:
+            raise exception.TransportLost()
+
+        return CallPipeline(self, procedure, calls, max_in_flight, options, ordered)
+
+    @public
+    def call_stream(
+        self,
+        procedure: str,
+        *args,
+        options: CallOptions | None = None,
+        max_buffered: int = 100,
+        **kwargs,
+    ) -> CallStream:
+        """
+        Call a procedure producing progressive results, and iterate over the
+        progressive results::
+
+            stream = session.call_stream("com.example.scan", "users")
+            async for chunk in stream:
+                process(chunk)
+            print(stream.result)
+
+        Progressive results are buffered until consumed. Once ``max_buffered``
+        results are buffered, processing of further progressive results is held
+        back: when the transport limits the messages in flight (see the
+        ``maxInFlightMessages`` transport option), it stops reading from the
+        connection until the stream is consumed. Together with a callee waiting on
+        the Deferred/Future returned by ``details.progress()`` (which waits for the
+        transport of the callee to become writable), this bounds the memory used on
+        both sides to stream a large result.
+
+        :param procedure: The URI of the procedure to call.
+        :type procedure: str
+
+        :param options: Options for the call. ``on_progress`` must not be set.
+        :type options: :class:`autobahn.wamp.types.CallOptions` or None
+
+        :param max_buffered: Number of progressive results buffered before reading
+            is held back.
+        :type max_buffered: int
+
+        :returns: An asynchronous iterator over the progressive results (see
+            :meth:`call` for the types of results), which raises the error the call
+            failed with. The final result is available in its ``result`` attribute
+            once the iteration has finished.
+        :rtype: :class:`autobahn.wamp.pipeline.CallStream`
+        """
+        assert type(max_buffered) == int and max_buffered > 0
+        if options and not isinstance(options, types.CallOptions):
+            raise Exception("options must be of type a.w.t.CallOptions")
+        if options and options.on_progress:
+            raise Exception("on_progress cannot be used with call_stream()")
+
+        stream = CallStream(max_buffered)
+        options = copy.copy(options) if options else types.CallOptions()
+        options.on_progress = stream._on_progress
+        stream._track(self.call(procedure, *args, options=options, **kwargs))
+        return stream
+
+    def _new_call(self, procedure: str, args, kwargs, options, attrs: dict):
+        """
+        Create the CALL message and the outstanding request of a call.
+
+        :returns: The CALL message to send, and the Deferred/Future for the result.
+        """
         request_id = self._request_id_gen.next()
 
         encoded_payload = None
@@ -1951,36 +2826,17 @@ class ApplicationSession(BaseSession):
                 raise
 
         if encoded_payload:
-            if options:
-                msg = message.Call(
-                    request_id,
-                    procedure,
-                    payload=encoded_payload.payload,
-                    enc_algo=encoded_payload.enc_algo,
-                    enc_key=encoded_payload.enc_key,
-                    enc_serializer=encoded_payload.enc_serializer,
-                    **options.message_attr(),
-                )
-            else:
-                msg = message.Call(
-                    request_id,
-                    procedure,
-                    payload=encoded_payload.payload,
-                    enc_algo=encoded_payload.enc_algo,
-                    enc_key=encoded_payload.enc_key,
-                    enc_serializer=encoded_payload.enc_serializer,
-                )
+            msg = message.Call(
+                request_id,
+                procedure,
+                payload=encoded_payload.payload,
+                enc_algo=encoded_payload.enc_algo,
+                enc_key=encoded_payload.enc_key,
+                enc_serializer=encoded_payload.enc_serializer,
+                **attrs,
+            )
         else:
-            if options:
-                msg = message.Call(
-                    request_id,
-                    procedure,
-                    args=args,
-                    kwargs=kwargs,
-                    **options.message_attr(),
-                )
-            else:
-                msg = message.Call(request_id, procedure, args=args, kwargs=kwargs)
+            msg = message.Call(request_id, procedure, args=args, kwargs=kwargs, **attrs)
 
         if options:
             if options.correlation_id is not None:
@@ -1992,34 +2848,31 @@ class ApplicationSession(BaseSession):
             if options.correlation_is_last is not None:
                 msg.correlation_is_last = options.correlation_is_last
 
-        def canceller(d):
-            cancel_msg = message.Cancel(request_id)
-            self._transport.send(cancel_msg)
-            # since we announced support for cancelling, we should
-            # definitely get an Error back for our Cancel which will
-            # clean up this invocation
+        on_reply = txaio.create_future(canceller=partial(self._cancel_call, request_id))
+        self._call_reqs.add(CallRequest(request_id, procedure, on_reply, options))
+        if self._latency is not None:
+            self._latency.start(LatencyMetrics.CALL, request_id, procedure)
 
-        on_reply = txaio.create_future(canceller=canceller)
-        self._call_reqs[request_id] = CallRequest(
-            request_id, procedure, on_reply, options
-        )
+        return msg, on_reply
 
-        try:
-            # Notes:
-            #
-            # * this might raise autobahn.wamp.exception.SerializationError
-            #   when the user payload cannot be serialized
-            # * we have to setup a CallRequest() in _call_reqs _before_
-            #   calling transpor.send(), because a mock- or side-by-side transport
-            #   will immediately lead on an incoming WAMP message in onMessage()
-            #
-            self._transport.send(msg)
-        except:
-            if request_id in self._call_reqs:
-                del self._call_reqs[request_id]
-            raise
+    def _cancel_call(self, request_id: int, d):
+        cancel_msg = message.Cancel(request_id)
+        self._send(cancel_msg)
+        # since we announced support for cancelling, we should
+        # definitely get an Error back for our Cancel which will
+        # clean up this invocation
 
-        return on_reply
+    def _fail_call(self, request_id: int, error: Exception):
+        """
+        Fail an outstanding call which could not be sent.
+        """
+        request = self._call_reqs.pop(request_id, None)
+        if request is not None:
+            if self._latency is not None:
+                self._latency.discard(LatencyMetrics.CALL, request_id)
+            if self._tracer is not None:
+                self._tracer.on_request_failed(self, "call", request_id, error)
+            txaio.reject(request.on_reply, error)
 
     @public
     def register(
@@ -2051,13 +2904,26 @@ class ApplicationSession(BaseSession):
 
             request_id = self._request_id_gen.next()
             on_reply = txaio.create_future()
+            limiter = None
+            if options and (options.executor or options.max_concurrency):
+                fn = offload(
+                    fn,
+                    options.executor,
+                    options.max_concurrency,
+                    options.max_queue,
+                    options.details_arg,
+                    options.reject_error,
+                )
+                limiter = getattr(fn, "limiter", None)
             if check_types:
                 fn = self.type_check(fn)
-            endpoint_obj = Endpoint(fn, obj, options.details_arg if options else None)
+            endpoint_obj = Endpoint(
+                fn, obj, options.details_arg if options else None, limiter
+            )
             if prefix is not None:
                 procedure = f"{prefix}{procedure}"
-            self._register_reqs[request_id] = RegisterRequest(
-                request_id, on_reply, procedure, endpoint_obj
+            self._register_reqs.add(
+                RegisterRequest(request_id, on_reply, procedure, endpoint_obj)
             )
 
             if options:
@@ -2075,7 +2941,7 @@ class ApplicationSession(BaseSession):
                 if options.correlation_is_last is not None:
                     msg.correlation_is_last = options.correlation_is_last
 
-            self._transport.send(msg)
+            self._send(msg)
             return on_reply
 
         if callable(endpoint):
@@ -2114,13 +2980,13 @@ class ApplicationSession(BaseSession):
         request_id = self._request_id_gen.next()
 
         on_reply = txaio.create_future()
-        self._unregister_reqs[request_id] = UnregisterRequest(
-            request_id, on_reply, registration.id
+        self._unregister_reqs.add(
+            UnregisterRequest(request_id, on_reply, registration.id)
         )
 
         msg = message.Unregister(request_id, registration.id)
 
-        self._transport.send(msg)
+        self._send(msg)
         return on_reply
 
 
@@ -23,7 +23,10 @@
 # THE SOFTWARE.
 #
 ###############################################################################
+import heapq
+import time
 
+import txaio
 
 __all__ = (
     "CallRequest",
@@ -34,6 +37,8 @@ __all__ = (
     "PublishRequest",
     "RegisterRequest",
     "Registration",
+    "RequestTable",
+    "RequestTimer",
     "SubscribeRequest",
     "Subscription",
     "UnregisterRequest",
@@ -111,9 +116,9 @@ class Handler:
     Object representing an event handler attached to a subscription.
     """
 
-    __slots__ = ("fn", "obj", "details_arg")
+    __slots__ = ("fn", "obj", "details_arg", "limiter", "pattern")
 
-    def __init__(self, fn, obj=None, details_arg=None):
+    def __init__(self, fn, obj=None, details_arg=None, limiter=None, pattern=None):
         """
 
         :param fn: The event handler function to be called.
@@ -124,10 +129,19 @@ class Handler:
 
         :param details_arg: The keyword argument under which event details should be provided.
         :type details_arg: str or None
+
+        :param limiter: The (optional) local concurrency limit events run under.
+        :type limiter: :class:`autobahn.wamp.offload.ConcurrencyLimiter` or None
+
+        :param pattern: The (optional) wildcard pattern with named components, which
+            are passed to the function as keyword arguments.
+        :type pattern: :class:`autobahn.wamp.uri.Pattern` or None
         """
         self.fn = fn
         self.obj = obj
         self.details_arg = details_arg
+        self.limiter = limiter
+        self.pattern = pattern
 
 
 class Registration:
@@ -174,9 +188,9 @@ class Endpoint:
     Object representing an procedure endpoint attached to a registration.
     """
 
-    __slots__ = ("fn", "obj", "details_arg")
+    __slots__ = ("fn", "obj", "details_arg", "limiter")
 
-    def __init__(self, fn, obj=None, details_arg=None):
+    def __init__(self, fn, obj=None, details_arg=None, limiter=None):
         """
 
         :param fn: The endpoint procedure to be called.
@@ -187,10 +201,14 @@ class Endpoint:
 
         :param details_arg: The keyword argument under which call details should be provided.
         :type details_arg: str or None
+
+        :param limiter: The (optional) local concurrency limit invocations run under.
+        :type limiter: :class:`autobahn.wamp.offload.ConcurrencyLimiter` or None
         """
         self.fn = fn
         self.obj = obj
         self.details_arg = details_arg
+        self.limiter = limiter
 
 
 class Request:
@@ -199,6 +217,8 @@ class Request:
     register/unregister or call/publish.
     """
 
+    # CallRequest and PublishRequest set these slots themselves (without calling
+    # Request.__init__()): slots added here must be set there too
     __slots__ = ("request_id", "on_reply")
 
     def __init__(self, request_id, on_reply):
@@ -219,7 +239,7 @@ class PublishRequest(Request):
     Object representing an outstanding request to publish (acknowledged) an event.
     """
 
-    __slots__ = "was_encrypted"
+    __slots__ = ("was_encrypted",)
 
     def __init__(self, request_id, on_reply, was_encrypted):
         """
@@ -233,7 +253,10 @@ class PublishRequest(Request):
         :param was_encrypted: Flag indicating whether the app payload was encrypted.
         :type was_encrypted: bool
         """
-        Request.__init__(self, request_id, on_reply)
+        # allocated per acknowledged publish: set all slots here rather than
+        # calling Request.__init__() (keep in sync with Request.__slots__)
+        self.request_id = request_id
+        self.on_reply = on_reply
         self.was_encrypted = was_encrypted
 
 
@@ -299,7 +322,10 @@ class CallRequest(Request):
         :param options: WAMP call options that are in use for this call.
         :type options: dict
         """
-        Request.__init__(self, request_id, on_reply)
+        # allocated per call: set all slots here rather than calling
+        # Request.__init__() (keep in sync with Request.__slots__)
+        self.request_id = request_id
+        self.on_reply = on_reply
         self.procedure = procedure
         self.options = options
 
@@ -309,6 +335,8 @@ class InvocationRequest(Request):
     Object representing an outstanding request to invoke an endpoint.
     """
 
+    __slots__ = ()
+
 
 class RegisterRequest(Request):
     """
@@ -338,3 +366,179 @@ class UnregisterRequest(Request):
         """ """
         Request.__init__(self, request_id, on_reply)
         self.registration_id = registration_id
+
+
+class RequestTable(dict):
+    """
+    Outstanding requests of one type (e.g. calls) by request ID.
+
+    With a timeout set, requests that got no reply within the timeout are removed by
+    :meth:`expire`. Their request IDs are remembered (the most recent
+    ``MAX_EXPIRED``), so that a late reply can be told apart from a reply to a
+    request that was never issued.
+    """
+
+    MAX_EXPIRED = 1024
+
+    __slots__ = (
+        "request_type",
+        "timeout",
+        "timeouts",
+        "timer",
+        "_deadlines",
+        "_expired",
+    )
+
+    def __init__(self, request_type, timer=None):
+        """
+
+        :param request_type: The request type, e.g. ``"call"``.
+        :type request_type: str
+
+        :param timer: The (optional) timer expiring requests of this table.
+        :type timer: :class:`RequestTimer` or None
+        """
+        dict.__init__(self)
+        self.request_type = request_type
+        self.timeout = None
+        self.timeouts = 0
+        self.timer = timer
+        self._deadlines = []
+        self._expired = {}
+        if timer is not None:
+            timer.tables.append(self)
+
+    def add(self, request):
+        """
+        Add an outstanding request, which expires after the timeout of the table (if
+        set).
+
+        :param request: The request.
+        :type request: :class:`Request`
+        """
+        self[request.request_id] = request
+        if self.timeout is not None:
+            # the timeout may change between requests: keep the deadlines in a heap
+            deadline = time.monotonic() + self.timeout
+            heapq.heappush(self._deadlines, (deadline, request.request_id))
+            if self.timer is not None:
+                self.timer.start(self.timeout)
+
+    def expire(self, now):
+        """
+        Remove the requests that got no reply before their deadline.
+
+        :param now: The current time (:func:`time.monotonic`).
+        :type now: float
+
+        :returns: The requests removed.
+        :rtype: list
+        """
+        expired = []
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] <= now:
+            _, request_id = heapq.heappop(deadlines)
+            request = self.pop(request_id, None)
+            if request is not None:
+                expired.append(request)
+                self._expired[request_id] = None
+                if len(self._expired) > self.MAX_EXPIRED:
+                    del self._expired[next(iter(self._expired))]
+        if not self:
+            # all requests left got a reply: their deadlines need no timer
+            deadlines.clear()
+        self.timeouts += len(expired)
+        return expired
+
+    def is_expired(self, request_id):
+        """
+        Check if a request was removed because it got no reply within the timeout.
+
+        :param request_id: The WAMP request ID.
+        :type request_id: int
+
+        :rtype: bool
+        """
+        return request_id in self._expired
+
+    @property
+    def pending_deadlines(self):
+        """
+        Number of deadlines of requests added with a timeout not yet passed (including
+        those of requests that got a reply meanwhile, until the table is empty at an
+        expiry check).
+        """
+        return len(self._deadlines)
+
+    def clear(self):
+        dict.clear(self)
+        self._deadlines.clear()
+        self._expired.clear()
+
+
+class RequestTimer:
+    """
+    One timer shared by the request tables of a session, expiring requests that got
+    no reply within the timeout of their table. The timer only runs while requests
+    with a timeout are outstanding.
+    """
+
+    __slots__ = ("tables", "on_expired", "interval", "_call")
+
+    def __init__(self, on_expired, interval=1.0):
+        """
+
+        :param on_expired: Called with the table and a list of requests expired.
+        :type on_expired: callable
+
+        :param interval: The maximum interval between checks for expired requests,
+            in seconds (checks run at least as often as the shortest timeout).
+        :type interval: float
+        """
+        self.tables = []
+        self.on_expired = on_expired
+        self.interval = interval
+        self._call = None
+
+    def start(self, timeout):
+        """
+        Start the timer, if not running.
+
+        :param timeout: The timeout of the requests to be expired.
+        :type timeout: float
+        """
+        if self._call is None:
+            self._call = txaio.call_later(min(self.interval, timeout), self._tick)
+
+    def stop(self):
+        """
+        Stop the timer, if running.
+        """
+        if self._call is not None:
+            self._call.cancel()
+            self._call = None
+
+    def expire(self, now=None):
+        """
+        Expire the requests of all tables that got no reply before their deadline.
+
+        :param now: The current time (default: :func:`time.monotonic`).
+        :type now: float or None
+        """
+        if now is None:
+            now = time.monotonic()
+        for table in self.tables:
+            expired = table.expire(now)
+            if expired:
+                self.on_expired(table, expired)
+
+    def _tick(self):
+        self._call = None
+        self.expire()
+        timeouts = [
+            table.timeout or self.interval
+            for table in self.tables
+            if table.pending_deadlines
+        ]
+        if timeouts:
+            self.start(min(timeouts))
@@ -25,7 +25,6 @@
 ###############################################################################
 
 import decimal
-import math
 import os
 import platform
 import re
@@ -115,6 +114,12 @@ class Serializer:
         self._autoreset_duration = None
         self._autoreset_callback = None
 
+        # statistics up to the last reset (for metrics, which never reset)
+        self._reset_serialized_bytes = 0
+        self._reset_serialized_messages = 0
+        self._reset_unserialized_bytes = 0
+        self._reset_unserialized_messages = 0
+
     def stats_reset(self):
         """
         Get serializer statistics: timestamp when statistics were last reset.
@@ -241,6 +246,10 @@ class Serializer:
                 + self._unserialized_rated_messages,
             }
         if reset:
+            self._reset_serialized_bytes += self._serialized_bytes
+            self._reset_serialized_messages += self._serialized_messages
+            self._reset_unserialized_bytes += self._unserialized_bytes
+            self._reset_unserialized_messages += self._unserialized_messages
             self._serialized_bytes = 0
             self._serialized_messages = 0
             self._serialized_rated_messages = 0
@@ -250,6 +259,40 @@ class Serializer:
             self._stats_reset = time_ns()
         return data
 
+    def collect_metrics(self, metrics) -> None:
+        """
+        Report the serializer statistics as counters. Unlike :meth:`stats`, the
+        counters are not affected by statistics resets.
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        labels = {"serializer": self.SERIALIZER_ID}
+        metrics.counter(
+            "autobahn_wamp_serialized_messages_total",
+            self._reset_serialized_messages + self._serialized_messages,
+            "WAMP messages serialized.",
+            labels,
+        )
+        metrics.counter(
+            "autobahn_wamp_serialized_octets_total",
+            self._reset_serialized_bytes + self._serialized_bytes,
+            "Octets of serialized WAMP messages.",
+            labels,
+        )
+        metrics.counter(
+            "autobahn_wamp_unserialized_messages_total",
+            self._reset_unserialized_messages + self._unserialized_messages,
+            "WAMP messages unserialized.",
+            labels,
+        )
+        metrics.counter(
+            "autobahn_wamp_unserialized_octets_total",
+            self._reset_unserialized_bytes + self._unserialized_bytes,
+            "Octets of unserialized WAMP messages.",
+            labels,
+        )
+
     def serialize(self, msg: IMessage) -> tuple[bytes, bool]:
         """
         Implements :func:`autobahn.wamp.interfaces.ISerializer.serialize`
@@ -259,9 +302,7 @@ class Serializer:
         # maintain statistics for serialized WAMP message data
         self._serialized_bytes += len(data)
         self._serialized_messages += 1
-        self._serialized_rated_messages += int(
-            math.ceil(float(len(data)) / self.RATED_MESSAGE_SIZE)
-        )
+        self._serialized_rated_messages += -(-len(data) // self.RATED_MESSAGE_SIZE)
 
         # maybe auto-reset and trigger user callback ..
         if self._autoreset_callback and (
@@ -349,8 +390,8 @@ class Serializer:
         # maintain statistics for unserialized WAMP message data
         self._unserialized_bytes += len(payload)
         self._unserialized_messages += len(msgs)
-        self._unserialized_rated_messages += int(
-            math.ceil(float(len(payload)) / self.RATED_MESSAGE_SIZE)
+        self._unserialized_rated_messages += -(
+            -len(payload) // self.RATED_MESSAGE_SIZE
         )
 
         # maybe auto-reset and trigger user callback ..
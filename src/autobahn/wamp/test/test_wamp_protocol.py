@@ -25,11 +25,15 @@
 ###############################################################################
 
 import os
+import threading
+import time
 import unittest.mock as mock
+from concurrent.futures import ThreadPoolExecutor
 
 if os.environ.get("USE_TWISTED", False):
     import twisted
     from autobahn import util
+    from autobahn.metrics import MetricsSnapshot
     from autobahn.twisted.wamp import ApplicationSession, Session
     from autobahn.wamp import CloseDetails, message, role, serializer, types, uri
     from autobahn.wamp.auth import create_authenticator
@@ -38,13 +42,21 @@ if os.environ.get("USE_TWISTED", False):
         InvalidUri,
         NotAuthorized,
         ProtocolError,
+        SerializationError,
+        TransportBusy,
+        TransportLost,
     )
     from autobahn.wamp.interfaces import IAuthenticator
-    from autobahn.wamp.request import CallRequest
+    from autobahn.wamp.latency import LatencyMetrics
+    from autobahn.wamp.offload import offload, threadsafe
+    from autobahn.wamp.request import CallRequest, PublishRequest, Request
+    from autobahn.wamp.tracing import InMemorySpanExporter, SpanTracer, Tracer
     from autobahn.wamp.types import TransportDetails
+    from twisted.internet import reactor, task
     from twisted.internet.defer import (
         Deferred,
         DeferredList,
+        ensureDeferred,
         fail,
         inlineCallbacks,
         succeed,
@@ -213,6 +225,18 @@ if os.environ.get("USE_TWISTED", False):
             handler._call_reqs[1] = CallRequest(1, "foo", deferred, {})
             handler.onLeave(CloseDetails())
 
+        def test_request_slots(self):
+            # CallRequest and PublishRequest do not call Request.__init__(), but
+            # must set all slots of Request
+            for request in [
+                CallRequest(1, "com.myapp.procedure1", Deferred(), {}),
+                PublishRequest(2, Deferred(), False),
+            ]:
+                slots = Request.__slots__ + type(request).__slots__
+                for slot in slots:
+                    self.assertTrue(hasattr(request, slot), slot)
+                self.assertFalse(hasattr(request, "__dict__"))
+
     class TestRegisterDecorator(unittest.TestCase):
         def test_prefix(self):
             class Prefix(ApplicationSession):
@@ -412,6 +436,63 @@ if os.environ.get("USE_TWISTED", False):
             )
             self.assertTrue(type(publication.id) == int)
 
+        @inlineCallbacks
+        def test_publish_many(self):
+            handler = ApplicationSession()
+            transport = MockTransport(handler)
+            sent = []
+            transport.send_many = lambda msgs: sent.append(msgs) or [
+                transport.send(msg) for msg in msgs
+            ]
+
+            res = handler.publish_many("com.myapp.topic1", [[1], [2, 3], ()])
+            self.assertIsNone(res)
+            self.assertEqual(len(sent), 1)
+            self.assertEqual([msg.args for msg in sent[0]], [[1], [2, 3], ()])
+
+            publications = yield handler.publish_many(
+                "com.myapp.topic1",
+                ([i] for i in range(3)),
+                options=types.PublishOptions(acknowledge=True),
+            )
+            self.assertEqual(len(publications), 3)
+            self.assertEqual(len({publication.id for publication in publications}), 3)
+            self.assertEqual(handler._publish_reqs, {})
+
+            publications = yield handler.publish_many(
+                "com.myapp.topic1", [], options=types.PublishOptions(acknowledge=True)
+            )
+            self.assertEqual(publications, [])
+
+            with self.assertRaises(Exception):
+                handler.publish_many("com.myapp..topic", [[1]])
+
+        @inlineCallbacks
+        def test_publish_batch(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            options = types.PublishOptions(acknowledge=True)
+            publications = yield handler.publish_batch(
+                [
+                    ("com.myapp.topic1", [1]),
+                    ("com.myapp.topic2", [2], {"foo": 23}),
+                    ("com.myapp.topic1", [3]),
+                ],
+                options=options,
+            )
+            self.assertEqual(len(publications), 3)
+
+            # fails with the first error
+            yield self.assertFailure(
+                handler.publish_batch(
+                    [("com.myapp.topic1", [1]), ("de.myapp.topic1", [2])],
+                    options=options,
+                ),
+                ApplicationError,
+            )
+            self.assertEqual(handler._publish_reqs, {})
+
         @inlineCallbacks
         def test_publish_undefined_exception(self):
             handler = ApplicationSession()
@@ -443,6 +524,47 @@ if os.environ.get("USE_TWISTED", False):
                 handler.publish("foobar", options=options), NotAuthorized
             )
 
+        def test_define_exception_pattern(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            @uri.error("com.myapp.product.<product:int>.inactive")
+            class ProductInactiveError(Exception):
+                def __init__(self, msg, product=None):
+                    Exception.__init__(self, msg)
+                    self.product = product
+
+            class DiscontinuedError(ProductInactiveError):
+                pass
+
+            handler.define(ProductInactiveError)
+
+            exc = handler._exception_from_message(
+                message.Error(
+                    message.Call.MESSAGE_TYPE,
+                    1,
+                    "com.myapp.product.123.inactive",
+                    args=["sold out"],
+                )
+            )
+            self.assertIsInstance(exc, ProductInactiveError)
+            self.assertEqual(exc.args, ("sold out",))
+            self.assertEqual(exc.product, 123)
+
+            # the component is not an int: not mapped
+            exc = handler._exception_from_message(
+                message.Error(
+                    message.Call.MESSAGE_TYPE, 1, "com.myapp.product.x.inactive"
+                )
+            )
+            self.assertIsInstance(exc, ApplicationError)
+
+            # subclasses of defined exceptions map to the error URI defined
+            msg = handler._message_from_exception(
+                message.Invocation.MESSAGE_TYPE, 1, DiscontinuedError("gone")
+            )
+            self.assertEqual(msg.error, "com.myapp.product.<product:int>.inactive")
+
         @inlineCallbacks
         def test_call(self):
             handler = ApplicationSession()
@@ -475,6 +597,22 @@ if os.environ.get("USE_TWISTED", False):
             )
             self.assertEqual(res, 100)
 
+        @inlineCallbacks
+        def test_call_random_request_ids(self):
+            class RandomIdSession(ApplicationSession):
+                request_id_generator = util.RandomIdGenerator
+
+            handler = RandomIdSession()
+            transport = MockTransport(handler)
+            sent = []
+            send = transport.send
+            transport.send = lambda msg: sent.append(msg) or send(msg)
+
+            res = yield handler.call("com.myapp.procedure1")
+            self.assertEqual(res, 100)
+            self.assertIsInstance(handler._request_id_gen, util.RandomIdGenerator)
+            self.assertTrue(1 <= sent[0].request <= 2**53)
+
         @inlineCallbacks
         def test_call_with_complex_result(self):
             handler = ApplicationSession()
@@ -515,6 +653,41 @@ if os.environ.get("USE_TWISTED", False):
             )
             self.assertTrue(type(subscription.id) == int)
 
+        @inlineCallbacks
+        def test_subscribe_pattern(self):
+            handler = ApplicationSession()
+            transport = MockTransport(handler)
+            events = []
+
+            class Handlers:
+                @uri.subscribe("com.myapp.product.<product:int>.on_update")
+                def on_update(self, label, product=None):
+                    events.append((product, label))
+
+            yield handler.subscribe(Handlers())
+            subscription_id = transport._subscription_topics[
+                "com.myapp.product..on_update"
+            ]
+
+            handler.onMessage(
+                message.Event(
+                    subscription_id,
+                    1,
+                    args=["foo"],
+                    topic="com.myapp.product.123.on_update",
+                )
+            )
+            # the component is not an int: the handler is not called
+            handler.onMessage(
+                message.Event(
+                    subscription_id,
+                    2,
+                    args=["bar"],
+                    topic="com.myapp.product.x.on_update",
+                )
+            )
+            self.assertEqual(events, [(123, "foo")])
+
         @inlineCallbacks
         def test_double_subscribe(self):
             handler = ApplicationSession()
@@ -590,6 +763,161 @@ if os.environ.get("USE_TWISTED", False):
             self.assertTrue(event0.called, "Missing callback")
             self.assertTrue(not event1.called, "Second callback fired.")
 
+        @inlineCallbacks
+        def test_event_returns_handler_future(self):
+            """
+            Processing an EVENT returns a future that fires once the event
+            handler has finished (used by transports for read-side backpressure).
+            """
+
+            class ThrottledTransport(MockTransport):
+                read_throttle = mock.Mock()
+
+            handler = ApplicationSession()
+            ThrottledTransport(handler)
+
+            handler_done = Deferred()
+            subscription = yield handler.subscribe(
+                lambda: handler_done, "com.myapp.topic1"
+            )
+            publish = yield handler.publish(
+                "com.myapp.topic1",
+                options=types.PublishOptions(acknowledge=True, exclude_me=False),
+            )
+            d = handler.onMessage(message.Event(subscription.id, publish.id))
+
+            self.assertIsInstance(d, Deferred)
+            self.assertFalse(d.called)
+            handler_done.callback(None)
+            self.assertTrue(d.called)
+
+            # without a read throttle, handler futures are not collected
+            handler = ApplicationSession()
+            MockTransport(handler)
+            subscription = yield handler.subscribe(lambda: None, "com.myapp.topic1")
+            self.assertIsNone(
+                handler.onMessage(message.Event(subscription.id, publish.id))
+            )
+
+        def test_wait_writable_without_flow_control(self):
+            """
+            Without write-side flow control, wait_writable() resolves immediately.
+            """
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            d = handler.wait_writable()
+            self.assertTrue(d.called)
+
+        @inlineCallbacks
+        def test_publish_flow_policy_queue(self):
+            """
+            With the "queue" policy, publications are held back while the
+            transport is paused and sent in order once it is writable again.
+            """
+            handler = ApplicationSession()
+            handler.publish_flow_policy = ApplicationSession.PUBLISH_FLOW_POLICY_QUEUE
+            handler.publish_queue_limit = 2
+            transport = MockTransport(handler)
+            transport.write_flow = util.WriteFlowControl()
+
+            sent = []
+            send = transport.send
+
+            def record(msg):
+                if isinstance(msg, message.Publish):
+                    sent.append(msg.args[0])
+                send(msg)
+
+            transport.send = record
+            transport.write_flow.pauseProducing()
+
+            writable = handler.wait_writable()
+            d0 = handler.publish(
+                "com.myapp.topic1",
+                0,
+                options=types.PublishOptions(acknowledge=True),
+            )
+            handler.publish("com.myapp.topic1", 1)
+            self.assertRaises(TransportBusy, handler.publish, "com.myapp.topic1", 2)
+            self.assertEqual(sent, [])
+            self.assertFalse(writable.called)
+            self.assertFalse(d0.called)
+
+            transport.write_flow.resumeProducing()
+            self.assertTrue(writable.called)
+            self.assertEqual(sent, [0, 1])
+            pub = yield d0
+            self.assertTrue(pub.id is not None)
+
+        def test_publish_flow_policy_raise(self):
+            """
+            With the "raise" policy, publishing while the transport is paused fails.
+            """
+            handler = ApplicationSession()
+            handler.publish_flow_policy = ApplicationSession.PUBLISH_FLOW_POLICY_RAISE
+            transport = MockTransport(handler)
+            transport.write_flow = util.WriteFlowControl()
+
+            transport.write_flow.pauseProducing()
+            self.assertRaises(TransportBusy, handler.publish, "com.myapp.topic1")
+            transport.write_flow.resumeProducing()
+            handler.publish("com.myapp.topic1")
+            self.assertEqual(transport.write_flow.pauses, 1)
+
+        def test_publish_many_transport_busy(self):
+            """
+            When the transport gets busy during a batch, only the publications not
+            sent are dropped.
+            """
+            handler = ApplicationSession()
+            handler.publish_flow_policy = ApplicationSession.PUBLISH_FLOW_POLICY_RAISE
+            transport = MockTransport(handler)
+            transport.write_flow = util.WriteFlowControl()
+            sent = []
+
+            def send(msg):
+                sent.append(msg)
+                if len(sent) == 2:
+                    transport.write_flow.pauseProducing()
+
+            transport.send = send
+
+            with self.assertRaises(TransportBusy):
+                handler.publish_many(
+                    "com.myapp.topic1",
+                    [[1], [2], [3]],
+                    options=types.PublishOptions(acknowledge=True),
+                )
+            self.assertEqual([msg.args for msg in sent], [[1], [2]])
+            self.assertEqual(
+                sorted(handler._publish_reqs), [msg.request for msg in sent]
+            )
+
+            # the router acknowledges the publications sent
+            for msg in sent:
+                handler.onMessage(message.Published(msg.request, 1))
+            self.assertEqual(handler._publish_reqs, {})
+
+        def test_publish_flow_queue_failed_on_close(self):
+            """
+            Publications held back are failed when the transport is lost.
+            """
+            handler = ApplicationSession()
+            handler.publish_flow_policy = ApplicationSession.PUBLISH_FLOW_POLICY_QUEUE
+            transport = MockTransport(handler)
+            transport.write_flow = util.WriteFlowControl()
+
+            transport.write_flow.pauseProducing()
+            d = handler.publish(
+                "com.myapp.topic1", options=types.PublishOptions(acknowledge=True)
+            )
+            errors = []
+            d.addErrback(errors.append)
+            transport.write_flow.stop(RuntimeError("gone"))
+            self.assertEqual(len(errors), 1)
+            self.assertIsInstance(errors[0].value, RuntimeError)
+
         @inlineCallbacks
         def test_double_subscribe_double_unsubscribe(self):
             """
@@ -823,6 +1151,590 @@ if os.environ.get("USE_TWISTED", False):
             self.assertTrue(isinstance(errors[0][0], TypeError))
 
     class TestInvoker(unittest.TestCase):
+        @inlineCallbacks
+        def test_collect_metrics(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            def myproc1():
+                return 23
+
+            yield handler.register(myproc1, "com.myapp.myproc1")
+            yield handler.subscribe(lambda: None, "com.myapp.topic1")
+
+            metrics = MetricsSnapshot()
+            handler.collect_metrics(metrics)
+            self.assertEqual(metrics.get("autobahn_wamp_sessions"), 1)
+            self.assertEqual(metrics.get("autobahn_wamp_registrations"), 1)
+            self.assertEqual(metrics.get("autobahn_wamp_subscriptions"), 1)
+            self.assertEqual(
+                metrics.get("autobahn_wamp_outstanding_requests", type="call"), 0
+            )
+
+        @inlineCallbacks
+        def test_check_types(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            def add(a: int, b: int | None = None):
+                return a + (b or 0)
+
+            async def add_async(a: int, b: int):
+                return a + b
+
+            events = []
+
+            def on_event(x: str):
+                events.append(x)
+
+            yield handler.register(add, "com.myapp.myproc_add", check_types=True)
+            yield handler.register(
+                add_async, "com.myapp.myproc_add_async", check_types=True
+            )
+            sub = yield handler.subscribe(
+                on_event, "com.myapp.topic1", check_types=True
+            )
+
+            res = yield handler.call("com.myapp.myproc_add", 1, 2)
+            self.assertEqual(res, 3)
+            res = yield handler.call("com.myapp.myproc_add_async", 1, b=2)
+            self.assertEqual(res, 3)
+
+            for procedure in ["com.myapp.myproc_add", "com.myapp.myproc_add_async"]:
+                with self.assertRaises(ApplicationError) as ctx:
+                    yield handler.call(procedure, 1, "2")
+                self.assertEqual(ctx.exception.error, ApplicationError.TYPE_CHECK_ERROR)
+                self.assertIn("'b' expected type", ctx.exception.args[0])
+
+            handler.onMessage(message.Event(sub.id, 1, args=["hello"]))
+            handler.onMessage(message.Event(sub.id, 2, args=[23]))
+            self.assertEqual(events, ["hello"])
+
+        @inlineCallbacks
+        def test_executor(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+            executor = ThreadPoolExecutor(max_workers=1)
+            self.addCleanup(executor.shutdown)
+
+            def work(n, details=None):
+                for i in range(n):
+                    # progress() runs on the reactor, and can be waited for
+                    details.progress(i).result(5)
+                return threading.get_ident()
+
+            yield handler.register(
+                work,
+                "com.myapp.myproc_work",
+                options=types.RegisterOptions(details=True, executor=executor),
+            )
+
+            progress = []
+            thread = yield handler.call(
+                "com.myapp.myproc_work",
+                3,
+                options=types.CallOptions(on_progress=progress.append),
+            )
+            self.assertNotEqual(thread, threading.get_ident())
+            self.assertEqual(progress, [0, 1, 2])
+
+            def fail_in_thread():
+                raise ApplicationError("com.myapp.error", threading.get_ident())
+
+            yield handler.register(
+                fail_in_thread,
+                "com.myapp.myproc_fail",
+                options=types.RegisterOptions(executor="thread"),
+            )
+            with self.assertRaises(ApplicationError) as ctx:
+                yield handler.call("com.myapp.myproc_fail")
+            self.assertEqual(ctx.exception.error, "com.myapp.error")
+            self.assertNotEqual(ctx.exception.args[0], threading.get_ident())
+
+            async def coro():
+                pass
+
+            with self.assertRaises(Exception):
+                handler.register(
+                    coro,
+                    "com.myapp.myproc_coro",
+                    options=types.RegisterOptions(executor=executor),
+                )
+
+        @inlineCallbacks
+        def test_max_concurrency(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            running = []
+
+            def work(n):
+                d = Deferred()
+                running.append((n, d))
+                return d
+
+            yield handler.register(
+                work,
+                "com.myapp.myproc_work",
+                options=types.RegisterOptions(max_concurrency=2, max_queue=1),
+            )
+
+            calls = [handler.call("com.myapp.myproc_work", n) for n in range(4)]
+            self.assertEqual([n for n, _ in running], [0, 1])
+            # the queue is full
+            with self.assertRaises(ApplicationError) as ctx:
+                yield calls[3]
+            self.assertEqual(ctx.exception.error, ApplicationError.CANCELED)
+
+            # the queued invocation starts as soon as a running one finishes
+            running[1][1].callback("one")
+            res = yield calls[1]
+            self.assertEqual(res, "one")
+            self.assertEqual([n for n, _ in running], [0, 1, 2])
+            running[2][1].errback(ApplicationError("com.myapp.error"))
+            with self.assertRaises(ApplicationError) as ctx:
+                yield calls[2]
+            self.assertEqual(ctx.exception.error, "com.myapp.error")
+            running[0][1].callback("zero")
+            res = yield calls[0]
+            self.assertEqual(res, "zero")
+
+        @inlineCallbacks
+        def test_max_concurrency_cancel_running(self):
+            executor = ThreadPoolExecutor(max_workers=2)
+            self.addCleanup(executor.shutdown)
+            release = threading.Event()
+            started = []
+
+            def work(n):
+                started.append(n)
+                release.wait(5)
+                return n
+
+            fn = offload(work, executor, max_concurrency=1)
+            first = fn(0)
+            second = fn(1)
+            self.assertEqual(fn.limiter.queued, 1)
+            while not started:
+                yield task.deferLater(reactor, 0.01, lambda: None)
+
+            # the cancelled call keeps running in the executor, and holds its slot
+            first.cancel()
+            self.failureResultOf(first)
+            yield task.deferLater(reactor, 0.05, lambda: None)
+            self.assertEqual(fn.limiter.running, 1)
+            self.assertEqual(fn.limiter.queued, 1)
+            self.assertEqual(started, [0])
+
+            release.set()
+            res = yield second
+            self.assertEqual(res, 1)
+            self.assertEqual(started, [0, 1])
+
+        @inlineCallbacks
+        def test_threadsafe(self):
+            written = Deferred()
+            fn = threadsafe(lambda n: written if n else 1 / n)
+            results = []
+
+            def work():
+                results.append(fn(1).result(5))
+                try:
+                    fn(0).result(5)
+                except ZeroDivisionError as e:
+                    results.append(e)
+
+            thread = threading.Thread(target=work)
+            thread.start()
+            # the future of a call returning a Deferred resolves with it
+            yield task.deferLater(reactor, 0.05, lambda: None)
+            self.assertEqual(results, [])
+            written.callback("written")
+            while thread.is_alive():
+                yield task.deferLater(reactor, 0.01, lambda: None)
+            self.assertEqual(results[0], "written")
+            self.assertIsInstance(results[1], ZeroDivisionError)
+
+        def test_max_concurrency_synchronous_completions(self):
+            first = Deferred()
+            calls = []
+
+            def work(n):
+                calls.append(n)
+                return first if n == 0 else n
+
+            fn = offload(work, max_concurrency=1)
+            results = [fn(n) for n in range(5000)]
+            self.assertEqual(fn.limiter.queued, 4999)
+
+            # the queued calls finish synchronously: the queue is drained
+            # without recursing once per call
+            first.callback(0)
+            self.assertEqual(calls, list(range(5000)))
+            self.assertEqual(fn.limiter.running, 0)
+            self.assertEqual(fn.limiter.queued, 0)
+            self.assertEqual(fn.limiter.enqueued, 4999)
+            self.assertEqual(self.successResultOf(results[-1]), 4999)
+
+        @inlineCallbacks
+        def test_call_stream(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            def paged(n, details=None):
+                for i in range(n):
+                    details.progress(i)
+                details.progress(n, page="last")
+                return "done"
+
+            yield handler.register(
+                paged,
+                "com.myapp.myproc_paged",
+                types.RegisterOptions(details_arg="details"),
+            )
+
+            async def consume(stream):
+                return [chunk async for chunk in stream]
+
+            stream = handler.call_stream("com.myapp.myproc_paged", 4, max_buffered=2)
+            chunks = yield ensureDeferred(consume(stream))
+            self.assertEqual(chunks[:4], [0, 1, 2, 3])
+            self.assertEqual(chunks[4].results, (4,))
+            self.assertEqual(chunks[4].kwresults, {"page": "last"})
+            self.assertEqual(stream.result, "done")
+
+            stream = handler.call_stream("com.example.nonexisting")
+            with self.assertRaises(ApplicationError):
+                yield ensureDeferred(consume(stream))
+
+            with self.assertRaises(Exception):
+                handler.call_stream(
+                    "com.myapp.myproc_paged",
+                    options=types.CallOptions(on_progress=lambda *args: None),
+                )
+
+        @inlineCallbacks
+        def test_call_stream_flow_control(self):
+            handler = ApplicationSession()
+            transport = MockTransport(handler)
+            transport.write_flow = util.WriteFlowControl()
+
+            # what processing received progressive results returns
+            held_back = []
+            on_message = handler.onMessage
+
+            def record(msg):
+                res = on_message(msg)
+                if isinstance(msg, message.Result) and msg.progress:
+                    held_back.append(res)
+                return res
+
+            handler.onMessage = record
+
+            callee = []
+            finish = Deferred()
+
+            def paged(details=None):
+                callee.append(details)
+                details.progress(0)
+                return finish
+
+            yield handler.register(
+                paged,
+                "com.myapp.myproc_paged",
+                types.RegisterOptions(details_arg="details"),
+            )
+            stream = handler.call_stream("com.myapp.myproc_paged", max_buffered=2)
+            details = callee[0]
+
+            # the callee waits on progress() for its transport to become writable
+            self.assertTrue(details.progress(1).called)
+            transport.write_flow.pause()
+            writable = details.progress(2)
+            self.assertFalse(writable.called)
+            transport.write_flow.resume()
+            self.assertTrue(writable.called)
+
+            # once the buffer is full, processing progressive results is held back
+            self.assertEqual(stream.buffered, 3)
+            self.assertIsNone(held_back[0])
+            self.assertFalse(held_back[1].called)
+            self.assertIs(held_back[2], held_back[1])
+
+            chunk = yield ensureDeferred(stream.__anext__())
+            self.assertEqual(chunk, 0)
+            self.assertFalse(held_back[1].called)
+            chunk = yield ensureDeferred(stream.__anext__())
+            self.assertEqual(chunk, 1)
+            self.assertTrue(held_back[1].called)
+
+            finish.callback("done")
+            chunk = yield ensureDeferred(stream.__anext__())
+            self.assertEqual(chunk, 2)
+            with self.assertRaises(StopAsyncIteration):
+                yield ensureDeferred(stream.__anext__())
+            self.assertEqual(stream.result, "done")
+
+        @inlineCallbacks
+        def test_call_many(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            def double(n):
+                if n == 3:
+                    raise ApplicationError("com.myapp.error", n)
+                return 2 * n
+
+            yield handler.register(double, "com.myapp.myproc_double")
+
+            async def consume(pipeline):
+                return [item async for item in pipeline]
+
+            results = yield ensureDeferred(
+                consume(
+                    handler.call_many(
+                        "com.myapp.myproc_double",
+                        ([n] for n in range(7)),
+                        max_in_flight=2,
+                    )
+                )
+            )
+            self.assertEqual(len(results), 7)
+            results = dict(results)
+            self.assertIsInstance(results.pop(3), ApplicationError)
+            self.assertEqual(results, {n: 2 * n for n in range(7) if n != 3})
+            self.assertEqual(handler._call_reqs, {})
+
+            with self.assertRaises(Exception):
+                handler.call_many("com.myapp..myproc", [[1]])
+
+        @inlineCallbacks
+        def test_call_many_window(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            pending = {}
+
+            def work(n):
+                d = pending[n] = Deferred()
+                return d
+
+            yield handler.register(work, "com.myapp.myproc_work")
+
+            pipeline = handler.call_many(
+                "com.myapp.myproc_work",
+                ([n] for n in range(6)),
+                max_in_flight=4,
+                ordered=True,
+            )
+            results = []
+
+            async def consume():
+                async for item in pipeline:
+                    results.append(item)
+
+            done = ensureDeferred(consume())
+            self.assertEqual(sorted(pending), [0, 1, 2, 3])
+
+            # results are produced in order
+            pending[1].callback("one")
+            self.assertEqual(results, [])
+            pending[0].callback("zero")
+            self.assertEqual(results, [(0, "zero"), (1, "one")])
+            # the calls completed are replaced (consumed results free the window)
+            self.assertEqual(sorted(pending), [0, 1, 2, 3, 4, 5])
+            self.assertEqual(pipeline.in_flight, 4)
+
+            for n in [5, 4, 3, 2]:
+                pending[n].callback(n)
+            yield done
+            self.assertEqual(
+                results, [(0, "zero"), (1, "one"), (2, 2), (3, 3), (4, 4), (5, 5)]
+            )
+
+        @inlineCallbacks
+        def test_call_many_send_error(self):
+            handler = ApplicationSession()
+            transport = MockTransport(handler)
+
+            pending = {}
+
+            def work(n):
+                d = pending[n] = Deferred()
+                return d
+
+            yield handler.register(work, "com.myapp.myproc_work")
+
+            send = transport.send
+            sent = []
+
+            def fail_third(msg):
+                sent.append(msg)
+                if len(sent) == 3:
+                    raise SerializationError("cannot serialize")
+                return send(msg)
+
+            transport.send = fail_third
+
+            async def consume(pipeline):
+                return [item async for item in pipeline]
+
+            done = ensureDeferred(
+                consume(
+                    handler.call_many(
+                        "com.myapp.myproc_work",
+                        ([n] for n in range(4)),
+                        max_in_flight=4,
+                    )
+                )
+            )
+            # the calls sent before the error are not sent again, and get their
+            # results later
+            self.assertEqual(sorted(pending), [0, 1])
+            for n, d in pending.items():
+                d.callback(2 * n)
+            results = dict((yield done))
+            calls = [msg for msg in sent if isinstance(msg, message.Call)]
+            self.assertEqual(len(calls), 3)
+            self.assertEqual(results[0], 0)
+            self.assertEqual(results[1], 2)
+            for n in [2, 3]:
+                self.assertIsInstance(results[n], SerializationError)
+            self.assertEqual(handler._call_reqs, {})
+
+            # when the transport is gone, all calls of the batch fail
+            transport.send = lambda msg: (_ for _ in ()).throw(TransportLost())
+            results = yield ensureDeferred(
+                consume(handler.call_many("com.myapp.myproc_work", [[0], [1]]))
+            )
+            for _, result in results:
+                self.assertIsInstance(result, TransportLost)
+            self.assertEqual(handler._call_reqs, {})
+
+        @inlineCallbacks
+        def test_max_concurrency_reject_error_and_metrics(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+
+            running = []
+
+            def work():
+                d = Deferred()
+                running.append(d)
+                return d
+
+            yield handler.register(
+                work,
+                "com.myapp.myproc_work",
+                options=types.RegisterOptions(
+                    max_concurrency=1, max_queue=1, reject_error="com.myapp.busy"
+                ),
+            )
+
+            calls = [handler.call("com.myapp.myproc_work") for _ in range(3)]
+            with self.assertRaises(ApplicationError) as ctx:
+                yield calls[2]
+            self.assertEqual(ctx.exception.error, "com.myapp.busy")
+
+            metrics = MetricsSnapshot()
+            handler.collect_metrics(metrics)
+            labels = {"procedure": "com.myapp.myproc_work"}
+            for name, value in [
+                ("autobahn_wamp_invocations_admitted_total", 1),
+                ("autobahn_wamp_invocations_queued_total", 1),
+                ("autobahn_wamp_invocations_rejected_total", 1),
+                ("autobahn_wamp_invocations_running", 1),
+                ("autobahn_wamp_invocations_queue_length", 1),
+            ]:
+                self.assertEqual(metrics.get(name, **labels), value, name)
+
+            running[0].callback(None)
+            yield calls[0]
+            running[1].callback(None)
+            yield calls[1]
+
+            metrics = MetricsSnapshot()
+            handler.collect_metrics(metrics)
+            self.assertEqual(
+                metrics.get("autobahn_wamp_invocations_admitted_total", **labels), 2
+            )
+            self.assertEqual(
+                metrics.get("autobahn_wamp_invocations_running", **labels), 0
+            )
+            queue_time = metrics.get(
+                "autobahn_wamp_invocations_queue_time_seconds", **labels
+            )
+            self.assertEqual(queue_time.count, 1)
+
+        @inlineCallbacks
+        def test_latency_metrics(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+            self.assertIsNone(handler.latency_metrics)
+            parent = LatencyMetrics()
+            latency = handler.enable_latency_metrics(parent=parent)
+            self.assertIs(handler.latency_metrics, latency)
+
+            def myproc1():
+                return 23
+
+            events = []
+            yield handler.register(myproc1, "com.myapp.myproc1")
+            sub = yield handler.subscribe(events.append, "com.myapp.topic1")
+
+            yield handler.call("com.myapp.myproc1")
+            yield handler.call("com.myapp.myproc1")
+            with self.assertRaises(ApplicationError):
+                yield handler.call("com.myapp.unknown")
+            yield handler.publish(
+                "com.myapp.topic1", options=types.PublishOptions(acknowledge=True)
+            )
+            handler.onMessage(message.Event(sub.id, 1, args=[42]))
+            self.assertEqual(events, [42])
+
+            self.assertEqual(latency.get("call", "com.myapp.myproc1").count, 2)
+            self.assertEqual(latency.get("call", "com.myapp.unknown").count, 1)
+            self.assertEqual(latency.get("invocation", "com.myapp.myproc1").count, 2)
+            self.assertEqual(latency.get("event", "com.myapp.topic1").count, 1)
+            self.assertEqual(latency.get("publish", "com.myapp.topic1").count, 1)
+            self.assertEqual(latency._pending, {})
+
+            # the parent (e.g. of a component) aggregates the latencies
+            self.assertEqual(parent.get("call", "com.myapp.myproc1").count, 2)
+
+            metrics = MetricsSnapshot()
+            handler.collect_metrics(metrics)
+            hist = metrics.get(
+                "autobahn_wamp_call_duration_seconds", procedure="com.myapp.myproc1"
+            )
+            self.assertEqual(hist.count, 2)
+            hist = metrics.get(
+                "autobahn_wamp_event_handler_duration_seconds", topic="com.myapp.topic1"
+            )
+            self.assertEqual(hist.count, 1)
+
+        @inlineCallbacks
+        def test_latency_metrics_async_invocation(self):
+            handler = ApplicationSession()
+            MockTransport(handler)
+            latency = handler.enable_latency_metrics()
+
+            d = Deferred()
+
+            def myproc1():
+                return d
+
+            yield handler.register(myproc1, "com.myapp.myproc1")
+            res = handler.call("com.myapp.myproc1")
+            self.assertIsNone(latency.get("invocation", "com.myapp.myproc1"))
+            self.assertEqual([kind for kind, _ in latency._pending], ["call"])
+
+            d.callback(23)
+            res = yield res
+            self.assertEqual(res, 23)
+            self.assertEqual(latency.get("invocation", "com.myapp.myproc1").count, 1)
+            self.assertEqual(latency.get("call", "com.myapp.myproc1").count, 1)
+
         @inlineCallbacks
         def test_invoke(self):
             handler = ApplicationSession()
@@ -1127,6 +2039,276 @@ if os.environ.get("USE_TWISTED", False):
         #    with self.assertRaises(ApplicationError):
         #       yield self.handler.publish('de.myapp.topic1')
 
+        @inlineCallbacks
+        def test_request_timeout(self):
+            handler = ApplicationSession()
+            transport = MockTransport(handler)
+            sent = []
+            transport.send = sent.append
+
+            with self.assertRaises(Exception):
+                handler.set_request_timeout("event", 1)
+            handler.set_request_timeout("publish", 0.01)
+            handler.set_request_timeout("call", 10)
+            handler.set_request_timeout("register", 10)
+
+            d_publish = handler.publish(
+                "com.myapp.topic1", options=types.PublishOptions(acknowledge=True)
+            )
+            d_call = handler.call("com.myapp.procedure1")
+            d_register = handler.register(lambda: None, "com.myapp.myproc1")
+            publish_id, call_id, register_id = [msg.request for msg in sent]
+
+            # expired by the timer
+            yield task.deferLater(reactor, 0.05, lambda: None)
+            error = yield self.assertFailure(d_publish, ApplicationError)
+            self.assertEqual(error.error, ApplicationError.TIMEOUT)
+            self.assertEqual(len(handler._publish_reqs), 0)
+            self.assertEqual(len(handler._call_reqs), 1)
+
+            handler._request_timer.expire(time.monotonic() + 20)
+            yield self.assertFailure(d_call, ApplicationError)
+            yield self.assertFailure(d_register, ApplicationError)
+            self.assertEqual(handler._call_reqs, {})
+            self.assertEqual(handler._register_reqs, {})
+
+            # the timed out call is canceled
+            self.assertIsInstance(sent[3], message.Cancel)
+            self.assertEqual(sent[3].request, call_id)
+            self.assertEqual(sent[3].mode, message.Cancel.KILLNOWAIT)
+
+            # late replies are dropped, registrations made too late are undone
+            handler.onMessage(message.Published(publish_id, 1))
+            handler.onMessage(
+                message.Error(message.Call.MESSAGE_TYPE, call_id, "wamp.error.canceled")
+            )
+            handler.onMessage(message.Registered(register_id, 42))
+            self.assertIsInstance(sent[4], message.Unregister)
+            self.assertEqual(sent[4].registration, 42)
+            handler.onMessage(message.Unregistered(sent[4].request))
+            self.assertEqual(handler._registrations, {})
+            with self.assertRaises(ProtocolError):
+                handler.onMessage(message.Published(register_id + 100, 1))
+
+            metrics = MetricsSnapshot()
+            handler.collect_metrics(metrics)
+            for request_type, timeouts in [
+                ("publish", 1),
+                ("call", 1),
+                ("register", 1),
+                ("subscribe", 0),
+            ]:
+                self.assertEqual(
+                    metrics.get(
+                        "autobahn_wamp_request_timeouts_total", type=request_type
+                    ),
+                    timeouts,
+                )
+
+            handler.onClose(False)
+            self.assertIsNone(handler._request_timer._call)
+
+        def test_request_timeout_changed(self):
+            handler = ApplicationSession()
+            transport = MockTransport(handler)
+            sent = []
+
+            def send(msg):
+                sent.append(msg)
+                if isinstance(msg, message.Cancel):
+                    raise TransportLost()
+
+            transport.send = send
+            self.addCleanup(handler._request_timer.stop)
+
+            # a shorter timeout set after requests with a longer one
+            handler.set_request_timeout("call", 10)
+            d_long = handler.call("com.myapp.procedure1")
+            handler.set_request_timeout("call", 1)
+            d_short = [handler.call("com.myapp.procedure1") for _ in range(2)]
+            long_id = sent[0].request
+
+            handler._request_timer.expire(time.monotonic() + 5)
+            # both calls fail though sending CANCEL fails
+            for d in d_short:
+                self.assertEqual(
+                    self.failureResultOf(d, ApplicationError).value.error,
+                    ApplicationError.TIMEOUT,
+                )
+            self.assertEqual(len([m for m in sent if isinstance(m, message.Cancel)]), 2)
+            self.assertNoResult(d_long)
+            self.assertEqual(list(handler._call_reqs), [long_id])
+
+            # the deadlines of requests that got a reply are dropped
+            handler.onMessage(message.Result(long_id))
+            self.assertEqual(handler._call_reqs.pending_deadlines, 1)
+            handler._request_timer.expire(time.monotonic())
+            self.assertEqual(handler._call_reqs.pending_deadlines, 0)
+
+    class TestTracing(unittest.TestCase):
+        def setUp(self):
+            self.handler = ApplicationSession()
+            MockTransport(self.handler)
+            self.exporter = InMemorySpanExporter()
+            self.handler.set_tracer(SpanTracer(self.exporter))
+
+        @inlineCallbacks
+        def test_call_chain(self):
+            handler = self.handler
+
+            def myproc1():
+                return 23
+
+            @inlineCallbacks
+            def myproc2():
+                res = yield handler.call("com.myapp.myproc1")
+                return res + 1
+
+            yield handler.register(myproc1, "com.myapp.myproc1")
+            yield handler.register(myproc2, "com.myapp.myproc2")
+            self.exporter.clear()
+
+            res = yield handler.call("com.myapp.myproc2")
+            self.assertEqual(res, 24)
+
+            spans = {span.name: span for span in self.exporter.spans}
+            self.assertEqual(
+                sorted(spans),
+                [
+                    "call com.myapp.myproc1",
+                    "call com.myapp.myproc2",
+                    "invocation com.myapp.myproc1",
+                    "invocation com.myapp.myproc2",
+                ],
+            )
+            outer = spans["call com.myapp.myproc2"]
+            inner = spans["call com.myapp.myproc1"]
+            self.assertEqual(outer.kind, "client")
+            self.assertIsNone(outer.parent_id)
+            self.assertEqual(
+                inner.parent_id, spans["invocation com.myapp.myproc2"].span_id
+            )
+            # trace context is not propagated over the wire
+            self.assertNotEqual(inner.trace_id, outer.trace_id)
+            self.assertEqual(
+                inner.trace_id, spans["invocation com.myapp.myproc2"].trace_id
+            )
+            self.assertIsNone(spans["invocation com.myapp.myproc1"].parent_id)
+            for span in spans.values():
+                self.assertIsNotNone(span.duration)
+                self.assertIsNone(span.error)
+
+        @inlineCallbacks
+        def test_correlation_id(self):
+            self.handler.subscribe(lambda: None, "com.myapp.topic1")
+            yield self.handler.publish(
+                "com.myapp.topic1",
+                options=types.PublishOptions(
+                    acknowledge=True, correlation_id="trace-1", correlation_uri="a.b"
+                ),
+            )
+            (span,) = self.exporter.spans[-1:]
+            self.assertEqual(span.name, "publish com.myapp.topic1")
+            self.assertEqual(span.kind, "producer")
+            self.assertEqual(span.trace_id, "trace-1")
+            self.assertEqual(span.attributes["wamp.correlation_uri"], "a.b")
+
+        @inlineCallbacks
+        def test_errors(self):
+            def myproc1():
+                raise ApplicationError("com.myapp.error1")
+
+            yield self.handler.register(myproc1, "com.myapp.myproc1")
+            self.exporter.clear()
+            with self.assertRaises(ApplicationError):
+                yield self.handler.call("com.myapp.myproc1")
+            spans = {span.name: span for span in self.exporter.spans}
+            self.assertIsInstance(
+                spans["invocation com.myapp.myproc1"].error, ApplicationError
+            )
+            self.assertEqual(spans["call com.myapp.myproc1"].error, "com.myapp.error1")
+
+        @inlineCallbacks
+        def test_event_handler(self):
+            events = []
+            sub = yield self.handler.subscribe(events.append, "com.myapp.topic1")
+            self.handler.onMessage(message.Event(sub.id, 1, args=[42]))
+            self.assertEqual(events, [42])
+            (span,) = self.exporter.spans
+            self.assertEqual(span.name, "event com.myapp.topic1")
+            self.assertEqual(span.kind, "consumer")
+
+        @inlineCallbacks
+        def test_sampling(self):
+            self.handler.set_tracer(SpanTracer(self.exporter, sample_rate=0.0))
+            yield self.handler.call("com.myapp.procedure1")
+            self.assertEqual(self.exporter.spans, [])
+            self.assertRaises(Exception, SpanTracer, self.exporter, 1.5)
+
+        def test_failed_requests(self):
+            handler = self.handler
+            tracer = handler.tracer
+            transport = handler._transport
+            transport.send = lambda msg: None
+
+            # timed out
+            handler.set_request_timeout("call", 1)
+            d_timeout = handler.call("com.myapp.procedure1")
+            handler._request_timer.expire(time.monotonic() + 5)
+            self.failureResultOf(d_timeout, ApplicationError)
+
+            # not sent
+            def fail(msg):
+                raise TransportLost()
+
+            transport.send = fail
+            self.assertRaises(TransportLost, handler.call, "com.myapp.procedure2")
+            self.assertRaises(
+                TransportLost,
+                handler.publish,
+                "com.myapp.topic1",
+                options=types.PublishOptions(acknowledge=True),
+            )
+
+            # session closed
+            transport.send = lambda msg: None
+            d_closed = handler.publish(
+                "com.myapp.topic1", options=types.PublishOptions(acknowledge=True)
+            )
+            errors = []
+            d_closed.addErrback(errors.append)
+            handler.onLeave(CloseDetails())
+            self.assertIsInstance(errors[0].value, ApplicationError)
+
+            spans = self.exporter.spans
+            self.assertEqual(
+                [span.name for span in spans],
+                [
+                    "call com.myapp.procedure1",
+                    "call com.myapp.procedure2",
+                    "publish com.myapp.topic1",
+                    "publish com.myapp.topic1",
+                ],
+            )
+            self.assertIsInstance(spans[0].error, ApplicationError)
+            self.assertIsInstance(spans[1].error, TransportLost)
+            self.assertIsInstance(spans[2].error, TransportLost)
+            self.assertIsInstance(spans[3].error, ApplicationError)
+            for span in spans:
+                self.assertIsNotNone(span.duration)
+            self.assertEqual(tracer._pending[handler], {})
+
+        @inlineCallbacks
+        def test_hooks(self):
+            tracer = mock.Mock(wraps=Tracer())
+            self.handler.set_tracer(tracer)
+            self.assertIs(self.handler.tracer, tracer)
+            yield self.handler.call("com.myapp.procedure1")
+            sent = [c.args[1] for c in tracer.on_send.call_args_list]
+            received = [c.args[1] for c in tracer.on_receive.call_args_list]
+            self.assertIsInstance(sent[0], message.Call)
+            self.assertIsInstance(received[0], message.Result)
+
     class TestAuthenticator(unittest.TestCase):
         def test_inconsistent_authids(self):
             session = Session(mock.Mock())
@@ -30,6 +30,7 @@ import random
 import unittest
 from decimal import Decimal
 
+from autobahn.metrics import MetricsSnapshot
 from autobahn.wamp import message, role, serializer
 
 
@@ -608,6 +609,36 @@ class TestSerializer(unittest.TestCase):
             self.assertEqual(stats["unserialized"]["messages"], 0)
             self.assertEqual(stats["unserialized"]["rated_messages"], 0)
 
+    def test_metrics_survive_stats_reset(self):
+        """
+        Test serializer metrics are cumulative, regardless of stats resets.
+        """
+        for ser in self._test_serializers:
+            for contains_binary, msg in self._test_messages:
+                payload, binary = ser.serialize(msg)
+                ser.unserialize(payload, binary)
+            stats = ser.stats(reset=True, details=True)
+
+            metrics = MetricsSnapshot()
+            ser.collect_metrics(metrics)
+            labels = {"serializer": ser.SERIALIZER_ID}
+            self.assertEqual(
+                metrics.get("autobahn_wamp_serialized_messages_total", **labels),
+                stats["serialized"]["messages"],
+            )
+            self.assertEqual(
+                metrics.get("autobahn_wamp_unserialized_octets_total", **labels),
+                stats["unserialized"]["bytes"],
+            )
+
+            payload, binary = ser.serialize(self._test_messages[0][1])
+            metrics = MetricsSnapshot()
+            ser.collect_metrics(metrics)
+            self.assertEqual(
+                metrics.get("autobahn_wamp_serialized_octets_total", **labels),
+                stats["serialized"]["bytes"] + len(payload),
+            )
+
     def test_auto_stats(self):
         """
         Test serializer stats are non-empty after serializing/unserializing messages.
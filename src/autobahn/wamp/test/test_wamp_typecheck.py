@@ -0,0 +1,140 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+from typing import Any, Optional, Union
+from unittest import TestCase
+
+from autobahn.wamp.exception import ApplicationError, TypeCheckError
+from autobahn.wamp.typecheck import compile_type_check, type_checked
+
+
+class CompileTypeCheckTestCase(TestCase):
+    def test_nothing_to_check(self):
+        def untyped(a, b=1):
+            pass
+
+        def unchecked(a: Any, b: object, *args, **kwargs) -> int:
+            pass
+
+        self.assertIsNone(compile_type_check(untyped))
+        self.assertIsNone(compile_type_check(unchecked))
+        self.assertIs(type_checked(untyped), untyped)
+
+    def test_positional_and_keyword(self):
+        def fn(a: int, b: str, *, c: float = 1.0):
+            pass
+
+        check = compile_type_check(fn)
+        check((1, "x"), {})
+        check((1,), {"b": "x", "c": 2.0})
+        check((), {"a": 1, "b": "x"})
+
+        with self.assertRaises(TypeCheckError) as ctx:
+            check(("1", 2), {"c": 3})
+        self.assertEqual(ctx.exception.error, ApplicationError.TYPE_CHECK_ERROR)
+        self.assertEqual(
+            ctx.exception.args,
+            (
+                "'a' expected type=int got=str, "
+                "'b' expected type=str got=int, "
+                "'c' expected type=float got=int",
+            ),
+        )
+
+    def test_union(self):
+        def fn(a: Union[int, str], b: Optional[int], c: int | None = None):
+            pass
+
+        check = compile_type_check(fn)
+        check((1, None), {})
+        check(("x", 1, 2), {})
+        with self.assertRaises(TypeCheckError) as ctx:
+            check((1.0, "x", "y"), {})
+        self.assertEqual(
+            ctx.exception.args,
+            (
+                "'a' expected types=['int', 'str'] got=float, "
+                "'b' expected types=['int', 'NoneType'] got=str, "
+                "'c' expected types=['int', 'NoneType'] got=str",
+            ),
+        )
+
+    def test_generics_and_defaults(self):
+        def fn(a: list[int], b: dict[str, Any], c: int = None):
+            pass
+
+        check = compile_type_check(fn)
+        check(([1], {}, 1), {})
+        with self.assertRaises(TypeCheckError) as ctx:
+            check(((1,), {}), {})
+        # defaults of omitted arguments are checked too
+        self.assertEqual(
+            ctx.exception.args,
+            ("'a' expected type=list got=tuple, 'c' expected type=int got=NoneType",),
+        )
+
+    def test_string_annotations(self):
+        def fn(a: "int", b: "UnknownType"):  # noqa: F821
+            pass
+
+        # unresolvable annotations are ignored
+        self.assertIsNone(compile_type_check(fn))
+
+        def fn2(a: "int", b: "Optional[str]" = None):
+            pass
+
+        check = compile_type_check(fn2)
+        check((1,), {})
+        with self.assertRaises(TypeCheckError):
+            check(("1",), {})
+
+    def test_method(self):
+        class Foo:
+            def bar(self, a: int):
+                return a
+
+        check = compile_type_check(Foo.bar)
+        check((Foo(), 1), {})
+        with self.assertRaises(TypeCheckError):
+            check((Foo(), "1"), {})
+
+        bar = type_checked(Foo().bar)
+        self.assertEqual(bar(1), 1)
+        self.assertEqual(bar.__name__, "bar")
+        with self.assertRaises(TypeCheckError):
+            bar("1")
+
+    def test_type_checked_coroutine(self):
+        async def fn(a: int):
+            return a
+
+        checked = type_checked(fn)
+        with self.assertRaises(TypeCheckError):
+            checked("1")
+        coro = checked(1)
+        with self.assertRaises(StopIteration) as ctx:
+            coro.send(None)
+        self.assertEqual(ctx.exception.value, 1)
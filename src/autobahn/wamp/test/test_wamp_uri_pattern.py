@@ -27,7 +27,7 @@
 import unittest
 
 from autobahn import wamp
-from autobahn.wamp.uri import Pattern, RegisterOptions, SubscribeOptions
+from autobahn.wamp.uri import Pattern, RegisterOptions, SubscribeOptions, UriTrie
 
 
 class TestUris(unittest.TestCase):
@@ -640,3 +640,62 @@ class TestDecoratorsAdvanced(unittest.TestCase):
 
             self.assertIsInstance(exc, ecls)
             self.assertEqual(list(exc.args), args)
+
+
+class TestUriTrie(unittest.TestCase):
+    def test_wildcard_uri(self):
+        for u, wildcard_uri in [
+            ("com.myapp.proc1", "com.myapp.proc1"),
+            ("com.myapp.<product:int>.update", "com.myapp..update"),
+            ("com.myapp.<category>..<id:suffix>", "com.myapp..."),
+        ]:
+            p = Pattern(u, Pattern.URI_TARGET_HANDLER)
+            self.assertEqual(p.wildcard_uri(), wildcard_uri)
+
+    def test_match(self):
+        trie = UriTrie()
+        trie.add("com.myapp.product.update", "exact")
+        trie.add("com.myapp", "prefix", match="prefix")
+        trie.add("com.myapp.product.", "longer_prefix", match="prefix")
+        trie.add("com.myapp.<category>.<product:int>.update", "named")
+        trie.add("com.myapp.product.<product:int>.update", "literal_first")
+        trie.add("com.myapp...update", "wildcard")
+        self.assertEqual(len(trie), 6)
+
+        self.assertEqual(
+            trie.match("com.myapp.product.123.update"),
+            [
+                ("longer_prefix", {}),
+                ("prefix", {}),
+                ("literal_first", {"product": 123}),
+                ("named", {"category": "product", "product": 123}),
+                ("wildcard", {}),
+            ],
+        )
+        self.assertEqual(
+            trie.match("com.myapp.product.x.update"),
+            [("longer_prefix", {}), ("prefix", {}), ("wildcard", {})],
+        )
+        self.assertEqual(trie.lookup("com.myapp.product.update"), ("exact", {}))
+        self.assertEqual(trie.lookup("com.myapp"), ("prefix", {}))
+        self.assertIsNone(trie.lookup("com.myapp2"))
+        # wildcards do not match empty components
+        self.assertEqual(trie.match("com.myapp..1.update"), [("prefix", {})])
+
+    def test_remove(self):
+        trie = UriTrie()
+        trie.add("com.myapp.<product:int>", 1)
+        trie.add("com.myapp.<product:int>", 2)
+        trie.add("com.myapp", 3, match="prefix")
+
+        self.assertEqual(trie.remove("com.myapp.<product:int>", 1), 1)
+        self.assertEqual(trie.lookup("com.myapp.5"), (3, {}))
+        self.assertEqual(trie.remove("com.myapp", match="prefix"), 1)
+        self.assertEqual(trie.match("com.myapp.5"), [(2, {"product": 5})])
+        self.assertEqual(trie.remove("com.other"), 0)
+        self.assertEqual(len(trie), 1)
+
+    def test_invalid(self):
+        trie = UriTrie()
+        self.assertRaises(TypeError, trie.add, "com.myapp..update", 1, "exact")
+        self.assertRaises(TypeError, trie.add, "com.myapp", 1, "suffix")
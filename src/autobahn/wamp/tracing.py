@@ -0,0 +1,479 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Tracing hooks for WAMP sessions.
+
+A tracer set on a session (see :meth:`autobahn.wamp.protocol.BaseSession.set_tracer`)
+is called for every WAMP message sent and received by the session, when a request
+fails without a reply, and when an event handler or a registered procedure starts
+and finishes running. Without a
+tracer, the cost is a single attribute check per hook.
+
+:class:`SpanTracer` records spans for calls (from CALL until RESULT or ERROR),
+publications (until PUBLISHED when acknowledged), invocations and event handlers.
+Spans started while a handler runs (e.g. a handler calling another procedure) are
+children of the handler span, so a span tree shows the slow hop in a chain of calls
+within the process. The message correlation attributes
+(:attr:`autobahn.wamp.message.Message.correlation_id` etc.) are used as trace
+context: an outgoing message with a ``correlation_id`` is traced under that ID,
+and messages without one get the ID of the trace they are part of. Spans are
+handed to an exporter, e.g. :class:`InMemorySpanExporter`.
+
+:class:`OpenTelemetryTracer` records the same spans with an OpenTelemetry tracer
+(only available when ``opentelemetry-api`` is installed).
+"""
+
+import os
+import random
+import time
+from contextvars import ContextVar, copy_context
+from weakref import WeakKeyDictionary
+
+import txaio
+
+from autobahn.util import public
+from autobahn.wamp import message
+
+# note: __all__ must be a list here, since we dynamically
+# extend it depending on availability of OpenTelemetry
+__all__ = ["InMemorySpanExporter", "Span", "SpanTracer", "Tracer"]
+
+_current_span = ContextVar("autobahn_wamp_current_span", default=None)
+
+
+@public
+class Tracer:
+    """
+    Base class of tracers. All hooks do nothing by default.
+    """
+
+    def on_send(self, session, msg) -> None:
+        """
+        Called before a WAMP message is sent by a session.
+
+        :param session: The session sending the message.
+        :param msg: The message.
+        :type msg: :class:`autobahn.wamp.message.Message`
+        """
+
+    def on_receive(self, session, msg) -> None:
+        """
+        Called when a WAMP message was received by a session, before it is
+        processed.
+        """
+
+    def on_request_failed(
+        self, session, request_type: str, request_id: int, error
+    ) -> None:
+        """
+        Called when a request of a session failed without a reply from the router:
+        when its message could not be sent, it timed out, or the session was
+        closed or lost.
+
+        :param request_type: The request type, e.g. ``"call"`` or ``"publish"``.
+        :param request_id: The WAMP request ID.
+        :param error: The exception the request failed with.
+        """
+
+    def on_handler_start(self, session, msg, uri: str):
+        """
+        Called right before an event handler or registered procedure is run.
+
+        This is called in a copy of the current :mod:`contextvars` context which
+        the handler runs in, so context variables set here are visible to the
+        handler (and to hooks called from within the handler), but not beyond.
+
+        :param session: The session running the handler.
+        :param msg: The EVENT or INVOCATION message.
+        :param uri: The topic or procedure URI the handler was subscribed or
+            registered under.
+
+        :returns: Any value, passed to :meth:`on_handler_end`.
+        """
+
+    def on_handler_end(self, session, msg, context, error=None) -> None:
+        """
+        Called when an event handler or registered procedure has finished (that is,
+        when the value returned, or the Deferred/Future returned, has resolved).
+
+        :param context: The value returned from :meth:`on_handler_start`.
+        :param error: The exception raised by the handler, if any.
+        """
+
+    def run_handler(self, session, msg, uri: str, fn, args, kwargs):
+        """
+        Run an event handler or registered procedure, calling
+        :meth:`on_handler_start` and :meth:`on_handler_end`.
+
+        :returns: A Deferred/Future with the result of the handler.
+        """
+        ctx = copy_context()
+        context = ctx.run(self.on_handler_start, session, msg, uri)
+        future = ctx.run(txaio.as_future, fn, *args, **kwargs)
+
+        def success(result):
+            self.on_handler_end(session, msg, context)
+            return result
+
+        def error(fail):
+            self.on_handler_end(session, msg, context, fail.value)
+            return fail
+
+        txaio.add_callbacks(future, success, error)
+        return future
+
+
+@public
+class Span:
+    """
+    A traced operation. Span and trace IDs follow the W3C Trace Context format
+    (as used by OpenTelemetry).
+    """
+
+    CLIENT = "client"
+    PRODUCER = "producer"
+    SERVER = "server"
+    CONSUMER = "consumer"
+
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "attributes",
+        "sampled",
+        "start_time",
+        "end_time",
+        "error",
+        "_started",
+    )
+
+    def __init__(
+        self, trace_id, name, kind, parent=None, attributes=None, sampled=True
+    ):
+        """
+
+        :param trace_id: Trace ID (32 hex digits).
+        :type trace_id: str
+
+        :param name: Span name, e.g. ``call com.example.add2``.
+        :type name: str
+
+        :param kind: One of ``client``, ``producer``, ``server`` or ``consumer``.
+        :type kind: str
+
+        :param parent: The parent span, if any.
+        :type parent: :class:`Span` or None
+
+        :param attributes: Span attributes.
+        :type attributes: dict or None
+
+        :param sampled: Whether the span is exported when ended.
+        :type sampled: bool
+        """
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.sampled = sampled
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.error = None
+        self._started = time.perf_counter_ns()
+
+    @property
+    def duration(self):
+        """
+        Duration of the span in seconds (measured with a monotonic clock), or
+        ``None`` while the span has not ended.
+        """
+        if self.end_time is None:
+            return None
+        return (self.end_time - self.start_time) / 1e9
+
+    def end(self, error=None) -> None:
+        """
+        End the span.
+
+        :param error: The error which ended the operation, if any (an exception or
+            a WAMP error URI).
+        """
+        # the end time is derived from a monotonic clock, so durations are
+        # not affected by wall clock adjustments
+        self.end_time = self.start_time + (time.perf_counter_ns() - self._started)
+        self.error = error
+
+    def __json__(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "attributes": self.attributes,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "error": None if self.error is None else str(self.error),
+        }
+
+    def __repr__(self):
+        return (
+            f"Span(name={self.name!r}, kind={self.kind!r}, trace_id={self.trace_id}, "
+            f"span_id={self.span_id}, parent_id={self.parent_id}, "
+            f"duration={self.duration}, error={self.error!r})"
+        )
+
+
+@public
+class InMemorySpanExporter:
+    """
+    Exporter keeping all ended spans in a list (e.g. for tests).
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def clear(self) -> None:
+        self.spans = []
+
+
+class _RequestTracer(Tracer):
+    """
+    Base class of tracers recording a span per CALL, PUBLISH, INVOCATION and EVENT.
+    """
+
+    def __init__(self):
+        # session -> request ID -> span of CALLs and acknowledged PUBLISHes
+        # waiting for a reply
+        self._pending = WeakKeyDictionary()
+
+    def _start_span(self, session, msg, name, kind, uri):
+        raise NotImplementedError()
+
+    def _end_span(self, span, error=None):
+        raise NotImplementedError()
+
+    def _activate_span(self, span):
+        raise NotImplementedError()
+
+    def on_send(self, session, msg) -> None:
+        if isinstance(msg, message.Call):
+            span = self._start_span(
+                session, msg, f"call {msg.procedure}", Span.CLIENT, msg.procedure
+            )
+        elif isinstance(msg, message.Publish):
+            span = self._start_span(
+                session, msg, f"publish {msg.topic}", Span.PRODUCER, msg.topic
+            )
+            if not msg.acknowledge:
+                self._end_span(span)
+                return
+        else:
+            return
+        pending = self._pending.get(session)
+        if pending is None:
+            pending = self._pending[session] = {}
+        pending[msg.request] = span
+
+    def on_receive(self, session, msg) -> None:
+        if isinstance(msg, message.Result):
+            if msg.progress:
+                return
+            error = None
+        elif isinstance(msg, message.Published):
+            error = None
+        elif isinstance(msg, message.Error):
+            if msg.request_type not in (
+                message.Call.MESSAGE_TYPE,
+                message.Publish.MESSAGE_TYPE,
+            ):
+                return
+            error = msg.error
+        else:
+            return
+        pending = self._pending.get(session)
+        if pending:
+            span = pending.pop(msg.request, None)
+            if span is not None:
+                self._end_span(span, error)
+
+    def on_request_failed(
+        self, session, request_type: str, request_id: int, error
+    ) -> None:
+        pending = self._pending.get(session)
+        if pending:
+            span = pending.pop(request_id, None)
+            if span is not None:
+                self._end_span(span, error)
+
+    def on_handler_start(self, session, msg, uri: str):
+        if isinstance(msg, message.Invocation):
+            span = self._start_span(
+                session, msg, f"invocation {uri}", Span.SERVER, uri
+            )
+        else:
+            span = self._start_span(session, msg, f"event {uri}", Span.CONSUMER, uri)
+        self._activate_span(span)
+        return span
+
+    def on_handler_end(self, session, msg, context, error=None) -> None:
+        self._end_span(context, error)
+
+
+@public
+class SpanTracer(_RequestTracer):
+    """
+    Tracer recording :class:`Span` objects, handing ended (and sampled) spans to an
+    exporter.
+    """
+
+    def __init__(self, exporter, sample_rate: float = 1.0):
+        """
+
+        :param exporter: The exporter, an object with an ``export(span)`` method,
+            e.g. :class:`InMemorySpanExporter`.
+
+        :param sample_rate: Fraction of traces recorded. The sampling decision is
+            made for the first span of a trace and inherited by all its children.
+        """
+        _RequestTracer.__init__(self)
+        if not 0.0 <= sample_rate <= 1.0:
+            raise Exception(f"invalid sample rate {sample_rate}")
+        self._exporter = exporter
+        self._sample_rate = sample_rate
+
+    def _start_span(self, session, msg, name, kind, uri):
+        if kind in (Span.SERVER, Span.CONSUMER) or msg.correlation_is_anchor:
+            # received messages (and anchor messages) start a new trace, since
+            # the trace context is not transmitted over the wire
+            parent = None
+        else:
+            parent = _current_span.get()
+        if msg.correlation_id is not None:
+            trace_id = msg.correlation_id
+        elif parent is not None:
+            trace_id = parent.trace_id
+        else:
+            trace_id = os.urandom(16).hex()
+        if parent is not None:
+            sampled = parent.sampled
+        else:
+            sampled = self._sample_rate >= 1.0 or random.random() < self._sample_rate
+
+        attributes = {
+            "wamp.uri": uri,
+            "wamp.realm": session._realm,
+            "wamp.session": session._session_id,
+        }
+        if msg.correlation_uri is not None:
+            attributes["wamp.correlation_uri"] = msg.correlation_uri
+        if msg.correlation_is_last is not None:
+            attributes["wamp.correlation_is_last"] = msg.correlation_is_last
+
+        if kind in (Span.CLIENT, Span.PRODUCER) and msg.correlation_id is None:
+            msg.correlation_id = trace_id
+
+        return Span(trace_id, name, kind, parent, attributes, sampled)
+
+    def _end_span(self, span, error=None):
+        span.end(error)
+        if span.sampled:
+            self._exporter.export(span)
+
+    def _activate_span(self, span):
+        _current_span.set(span)
+
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    pass
+else:
+    _OTEL_SPAN_KINDS = {
+        Span.CLIENT: otel_trace.SpanKind.CLIENT,
+        Span.PRODUCER: otel_trace.SpanKind.PRODUCER,
+        Span.SERVER: otel_trace.SpanKind.SERVER,
+        Span.CONSUMER: otel_trace.SpanKind.CONSUMER,
+    }
+
+    @public
+    class OpenTelemetryTracer(_RequestTracer):
+        """
+        Tracer recording spans with an OpenTelemetry tracer. Sampling and export
+        are configured in the OpenTelemetry SDK.
+        """
+
+        def __init__(self, tracer=None):
+            """
+
+            :param tracer: The OpenTelemetry tracer to use (default: the tracer
+                ``autobahn`` of the global tracer provider).
+            """
+            _RequestTracer.__init__(self)
+            self._tracer = tracer or otel_trace.get_tracer("autobahn")
+
+        def _start_span(self, session, msg, name, kind, uri):
+            attributes = {"wamp.uri": uri}
+            if session._realm is not None:
+                attributes["wamp.realm"] = session._realm
+            if session._session_id is not None:
+                attributes["wamp.session"] = session._session_id
+            if msg.correlation_id is not None:
+                attributes["wamp.correlation_id"] = msg.correlation_id
+            if msg.correlation_uri is not None:
+                attributes["wamp.correlation_uri"] = msg.correlation_uri
+            if kind in (Span.SERVER, Span.CONSUMER) or msg.correlation_is_anchor:
+                span_context = otel_context.Context()
+            else:
+                span_context = None
+            return self._tracer.start_span(
+                name,
+                context=span_context,
+                kind=_OTEL_SPAN_KINDS[kind],
+                attributes=attributes,
+            )
+
+        def _end_span(self, span, error=None):
+            if error is not None:
+                if isinstance(error, BaseException):
+                    span.record_exception(error)
+                span.set_status(
+                    otel_trace.Status(otel_trace.StatusCode.ERROR, str(error))
+                )
+            span.end()
+
+        def _activate_span(self, span):
+            otel_context.attach(otel_trace.set_span_in_context(span))
+
+    __all__.append("OpenTelemetryTracer")
@@ -0,0 +1,221 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Type checking of the arguments of procedures and event handlers registered or
+subscribed with ``check_types=True``.
+
+The type hints of a function are analysed once (when it is registered or
+subscribed), into a list of checks of positional argument index / keyword name
+against a tuple of types for :func:`isinstance`. Checking the arguments of an
+invocation or event then only runs these checks.
+"""
+
+import inspect
+import types
+import typing
+from functools import wraps
+
+from autobahn.util import public
+from autobahn.wamp.exception import TypeCheckError
+
+__all__ = (
+    "compile_type_check",
+    "type_checked",
+)
+
+_EMPTY = inspect.Parameter.empty
+
+
+def _isinstance_types(kind):
+    """
+    Get the tuple of types to check values against with :func:`isinstance`, or
+    ``None`` when values of any type (or types that cannot be checked) are allowed.
+    """
+    if kind is None:
+        return (type(None),)
+    if kind is typing.Any or kind is object:
+        return None
+    origin = typing.get_origin(kind)
+    if origin is typing.Union or origin is types.UnionType:
+        result = ()
+        for arg in typing.get_args(kind):
+            arg_types = _isinstance_types(arg)
+            if arg_types is None:
+                return None
+            result += arg_types
+        return result
+    if origin is typing.Annotated:
+        return _isinstance_types(typing.get_args(kind)[0])
+    if origin is not None:
+        # parameterized generic, e.g. list[int]: only the container type is checked
+        kind = origin
+    if isinstance(kind, type):
+        return (kind,)
+    return None
+
+
+def _name(kind) -> str:
+    return getattr(kind, "__name__", None) or repr(kind)
+
+
+def _error_prefix(name: str, kind) -> str:
+    origin = typing.get_origin(kind)
+    if origin is typing.Union or origin is types.UnionType:
+        expected_types = [_name(arg) for arg in typing.get_args(kind)]
+        return f"'{name}' expected types={expected_types} got="
+    return f"'{name}' expected type={_name(kind)} got="
+
+
+@public
+def compile_type_check(func):
+    """
+    Compile a check of the arguments of calls of ``func`` against its type hints.
+
+    Hints that are unions (including ``Optional``) check against any of their
+    members, parameterized generics (e.g. ``list[int]``) check against the
+    container type only. ``Any``, type variables and other hints which cannot be
+    checked using :func:`isinstance` are ignored. Default values of omitted
+    arguments are checked too.
+
+    :param func: The function (or bound method) to check calls of.
+    :type func: callable
+
+    :returns: A function ``check(args, kwargs)``, checking the positional
+        arguments (a tuple) and keyword arguments (a dict) of a call of ``func``,
+        and raising :class:`autobahn.wamp.exception.TypeCheckError` describing all
+        arguments of the wrong type. ``None`` is returned when there is nothing
+        to check.
+    :rtype: callable or None
+    """
+    annotations = getattr(func, "__annotations__", None)
+    if not annotations:
+        return None
+    if any(isinstance(kind, str) for kind in annotations.values()):
+        # postponed evaluation of annotations ("from __future__ import annotations")
+        try:
+            annotations = typing.get_type_hints(func, include_extras=True)
+        except Exception:
+            pass
+    try:
+        parameters = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return None
+
+    # (name, positional index or None, types, error prefix, error for default value)
+    checks = []
+    # (name, positional index or None, types, error prefix) for *args and **kwargs
+    var_checks = []
+    keywords = set()
+
+    for index, param in enumerate(parameters):
+        if param.kind is not param.VAR_POSITIONAL:
+            keywords.add(param.name)
+        if param.name not in annotations:
+            continue
+        kind = annotations[param.name]
+        check_types = _isinstance_types(kind)
+        if check_types is None:
+            continue
+        prefix = _error_prefix(param.name, kind)
+
+        if param.kind is param.VAR_POSITIONAL:
+            var_checks.append((param.name, index, check_types, prefix))
+        elif param.kind is param.VAR_KEYWORD:
+            keywords.discard(param.name)
+            var_checks.append((param.name, None, check_types, prefix))
+        else:
+            default_error = None
+            if param.default is not _EMPTY and not isinstance(
+                param.default, check_types
+            ):
+                default_error = prefix + type(param.default).__name__
+            position = index if param.kind is not param.KEYWORD_ONLY else None
+            checks.append((param.name, position, check_types, prefix, default_error))
+
+    if not checks and not var_checks:
+        return None
+
+    def check(args, kwargs):
+        errors = None
+        nargs = len(args)
+        for name, position, check_types, prefix, default_error in checks:
+            if position is not None and position < nargs:
+                value = args[position]
+            elif name in kwargs:
+                value = kwargs[name]
+            else:
+                if default_error is not None:
+                    if errors is None:
+                        errors = []
+                    errors.append(default_error)
+                continue
+            if not isinstance(value, check_types):
+                if errors is None:
+                    errors = []
+                errors.append(prefix + type(value).__name__)
+
+        for name, position, check_types, prefix in var_checks:
+            if position is not None:
+                value = tuple(args[position:])
+            else:
+                value = {k: v for k, v in kwargs.items() if k not in keywords}
+            if not isinstance(value, check_types):
+                if errors is None:
+                    errors = []
+                errors.append(prefix + type(value).__name__)
+
+        if errors:
+            raise TypeCheckError(", ".join(errors))
+
+    return check
+
+
+@public
+def type_checked(func):
+    """
+    Wrap a function to check the types of the arguments of every call against the
+    type hints of the function (see :func:`compile_type_check`) before calling it.
+
+    The wrapper is synchronous and returns what ``func`` returns (e.g. a coroutine
+    when ``func`` is a coroutine function).
+
+    :param func: The function (or bound method) to wrap.
+    :type func: callable
+
+    :returns: The wrapped function, or ``func`` itself when there is nothing to check.
+    :rtype: callable
+    """
+    check = compile_type_check(func)
+    if check is None:
+        return func
+
+    @wraps(func)
+    def _type_check(*args, **kwargs):
+        check(args, kwargs)
+        return func(*args, **kwargs)
+
+    return _type_check
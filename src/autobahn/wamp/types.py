@@ -507,6 +507,9 @@ class SubscribeOptions:
         "correlation_uri",
         "correlation_is_anchor",
         "correlation_is_last",
+        "executor",
+        "max_concurrency",
+        "max_queue",
     )
 
     def __init__(
@@ -520,6 +523,9 @@ class SubscribeOptions:
         correlation_uri=None,
         correlation_is_anchor=None,
         correlation_is_last=None,
+        executor=None,
+        max_concurrency=None,
+        max_queue=None,
     ):
         """
 
@@ -536,6 +542,23 @@ class SubscribeOptions:
 
         :param get_retained: Whether the client wants the retained message we may have along with the subscription.
         :type get_retained: bool or None
+
+        :param executor: Run the event handler in this executor (a thread or process
+            pool) instead of on the event loop, or ``"thread"`` to use the default
+            thread pool of the Twisted reactor / asyncio loop (see
+            :mod:`autobahn.wamp.offload`). The handler must not be a coroutine
+            function. This option is not sent to the router.
+        :type executor: :class:`concurrent.futures.Executor` or str or None
+
+        :param max_concurrency: Maximum number of events processed by the handler
+            concurrently. Further events are queued (see ``max_queue``). This option
+            is not sent to the router.
+        :type max_concurrency: int or None
+
+        :param max_queue: Maximum number of events queued when ``max_concurrency``
+            events are being processed (default: no limit). Further events are
+            dropped (logging an error).
+        :type max_queue: int or None
         """
         assert match is None or (
             type(match) == str and match in ["exact", "prefix", "wildcard"]
@@ -545,6 +568,10 @@ class SubscribeOptions:
             details_arg is None or type(details_arg) == str
         )  # yes, "str" is correct here, since this is about Python identifiers!
         assert get_retained is None or type(get_retained) is bool
+        assert max_concurrency is None or (
+            type(max_concurrency) == int and max_concurrency > 0
+        )
+        assert max_queue is None or (type(max_queue) == int and max_queue >= 0)
 
         assert forward_for is None or type(forward_for) == list
         if forward_for:
@@ -573,6 +600,10 @@ class SubscribeOptions:
         self.correlation_is_anchor = correlation_is_anchor
         self.correlation_is_last = correlation_is_last
 
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+
     def message_attr(self):
         """
         Returns options dict as sent within WAMP messages.
@@ -957,6 +988,10 @@ class RegisterOptions:
         "correlation_uri",
         "correlation_is_anchor",
         "correlation_is_last",
+        "executor",
+        "max_concurrency",
+        "max_queue",
+        "reject_error",
     )
 
     def __init__(
@@ -972,6 +1007,10 @@ class RegisterOptions:
         correlation_uri=None,
         correlation_is_anchor=None,
         correlation_is_last=None,
+        executor=None,
+        max_concurrency=None,
+        max_queue=None,
+        reject_error=None,
     ):
         """
         :param match: Type of matching to use on the URI (`exact`, `prefix` or `wildcard`)
@@ -1004,6 +1043,32 @@ class RegisterOptions:
         :param forward_for: When this Register is forwarded over a router-to-router link,
             or via an intermediary router.
         :type forward_for: list[dict]
+
+        :param executor: Run the endpoint in this executor (a thread or process pool)
+            instead of on the event loop, or ``"thread"`` to use the default thread
+            pool of the Twisted reactor / asyncio loop (see
+            :mod:`autobahn.wamp.offload`). The endpoint must not be a coroutine
+            function, and with a process pool, must be picklable and cannot receive
+            call details. In a thread, the progressive results callback of the call
+            details returns a :class:`concurrent.futures.Future` to wait on (see
+            :func:`autobahn.wamp.offload.threadsafe`). This option is not sent to the
+            router.
+        :type executor: :class:`concurrent.futures.Executor` or str or None
+
+        :param max_concurrency: Maximum number of invocations of the endpoint running
+            concurrently in this session. Further invocations are queued (see
+            ``max_queue``). Unlike ``concurrency``, this is enforced locally and not
+            sent to the router.
+        :type max_concurrency: int or None
+
+        :param max_queue: Maximum number of invocations queued when
+            ``max_concurrency`` invocations are running (default: no limit). Further
+            invocations fail right away with ``reject_error``.
+        :type max_queue: int or None
+
+        :param reject_error: The error URI invocations rejected because the queue is
+            full fail with (default: ``wamp.error.canceled``).
+        :type reject_error: str or None
         """
         assert match is None or (
             type(match) == str and match in ["exact", "prefix", "wildcard"]
@@ -1013,6 +1078,11 @@ class RegisterOptions:
             and invoke in ["single", "first", "last", "roundrobin", "random"]
         )
         assert concurrency is None or (type(concurrency) == int and concurrency > 0)
+        assert max_concurrency is None or (
+            type(max_concurrency) == int and max_concurrency > 0
+        )
+        assert max_queue is None or (type(max_queue) == int and max_queue >= 0)
+        assert reject_error is None or type(reject_error) == str
         assert details is None or (type(details) == bool and details_arg is None)
         assert (
             details_arg is None or type(details_arg) == str
@@ -1047,6 +1117,11 @@ class RegisterOptions:
         self.correlation_is_anchor = correlation_is_anchor
         self.correlation_is_last = correlation_is_last
 
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.reject_error = reject_error
+
     def message_attr(self):
         """
         Returns options dict as sent within WAMP messages.
@@ -1110,7 +1185,10 @@ class CallDetails:
         :param registration: The (client side) registration object this invocation is delivered on.
         :type registration: instance of :class:`autobahn.wamp.request.Registration`
 
-        :param progress: A callable that will receive progressive call results.
+        :param progress: A callable that will receive progressive call results. It
+            returns a Deferred/Future which resolves once the transport is writable
+            (see :meth:`autobahn.wamp.protocol.ApplicationSession.wait_writable`), so
+            endpoints streaming large results can wait on it.
         :type progress: callable or None
 
         :param caller: The WAMP session ID of the caller, if the latter is disclosed.
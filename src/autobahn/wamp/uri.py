@@ -31,7 +31,14 @@ from typing import Optional, Union
 from autobahn.util import public
 from autobahn.wamp.types import RegisterOptions, SubscribeOptions
 
-__all__ = ("Pattern", "convert_starred_uri", "error", "register", "subscribe")
+__all__ = (
+    "Pattern",
+    "UriTrie",
+    "convert_starred_uri",
+    "error",
+    "register",
+    "subscribe",
+)
 
 
 def convert_starred_uri(uri: str):
@@ -174,6 +181,7 @@ class Pattern:
         # _URI_COMP_CHARS = r'[a-z0-9][a-z0-9_\-]*'
 
         pl = []
+        wl = []
         nc = {}
         group_count = 0
         for i in range(len(components)):
@@ -200,6 +208,7 @@ class Pattern:
                     raise TypeError("logic error")
 
                 pl.append(f"(?P<{name}>{_URI_COMP_CHARS})")
+                wl.append("")
                 group_count += 1
                 continue
 
@@ -211,17 +220,20 @@ class Pattern:
 
                 nc[name] = str
                 pl.append(f"(?P<{name}>{_URI_COMP_CHARS})")
+                wl.append("")
                 group_count += 1
                 continue
 
             match = Pattern._URI_COMPONENT.match(component)
             if match:
                 pl.append(component)
+                wl.append(component)
                 continue
 
             if component == "":
                 group_count += 1
                 pl.append(rf"({_URI_COMP_CHARS})")
+                wl.append("")
                 nc[group_count] = str
                 continue
 
@@ -239,6 +251,7 @@ class Pattern:
             self._pattern = None
             self._names = None
         self._uri = uri
+        self._wildcard_uri = ".".join(wl)
         self._target = target
         self._options = options
         self._check_types = check_types
@@ -275,6 +288,17 @@ class Pattern:
         """
         return self._uri
 
+    @public
+    def wildcard_uri(self):
+        """
+        Returns the URI of this pattern as matched by a WAMP router, with named
+        components left empty (the same as :meth:`uri` for exact URIs).
+
+        :returns: The URI, e.g. ``"com.myapp.product..update"``.
+        :rtype: str
+        """
+        return self._wildcard_uri
+
     def match(self, uri):
         """
         Match the given (fully qualified) URI according to this pattern
@@ -332,6 +356,211 @@ class Pattern:
         return self._target == Pattern.URI_TARGET_EXCEPTION
 
 
+class _TrieNode:
+    __slots__ = ("children", "wildcard", "exact", "prefix", "patterns")
+
+    def __init__(self):
+        # literal components to child nodes
+        self.children = {}
+        # child node for a wildcard (empty or named) component
+        self.wildcard = None
+        # targets of exact URIs and of prefixes ending in this node
+        self.exact = []
+        self.prefix = []
+        # (target, named components) of wildcard patterns ending in this node
+        self.patterns = []
+
+
+@public
+class UriTrie:
+    """
+    An index of WAMP URI patterns (exact URIs, prefixes and wildcard patterns) to
+    targets like exception classes or event handlers. A URI is matched against all
+    patterns in one walk over its components, independent of the number of patterns.
+
+    Wildcard patterns have empty or named components, as in :class:`Pattern`: e.g.
+    ``"com.myapp.product.<product:int>.update"`` matches
+    ``"com.myapp.product.123.update"``, returning ``{"product": 123}`` (a component
+    that cannot be converted does not match). Prefixes match whole URI components:
+    ``"com.myapp"`` matches ``"com.myapp"`` and ``"com.myapp.update"``, but not
+    ``"com.myapp2"``.
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _parse(uri: str, match: str | None):
+        """
+        Split a URI pattern into its components (``None`` for wildcard components),
+        and the named components as tuples ``(index, name, converter)``.
+        """
+        if match == "prefix":
+            return uri.rstrip(".").split("."), (), match
+        components = uri.split(".")
+        names = []
+        for i, component in enumerate(components):
+            if component == "":
+                components[i] = None
+                continue
+            m = Pattern._URI_NAMED_CONVERTED_COMPONENT.match(component)
+            if m:
+                name, comp_type = m.groups()
+            else:
+                m = Pattern._URI_NAMED_COMPONENT.match(component)
+                if not m:
+                    continue
+                name, comp_type = m.group(1), "str"
+            names.append((i, name, int if comp_type == "int" else str))
+            components[i] = None
+        if match is None:
+            match = "wildcard" if None in components else "exact"
+        elif match == "exact" and None in components:
+            raise TypeError(f"invalid exact URI '{uri}'")
+        elif match != "wildcard" and match != "exact":
+            raise TypeError(f"invalid match policy '{match}'")
+        return components, tuple(names), match
+
+    def _node(self, components, create):
+        node = self._root
+        for component in components:
+            if component is None:
+                if node.wildcard is None and create:
+                    node.wildcard = _TrieNode()
+                node = node.wildcard
+            else:
+                child = node.children.get(component)
+                if child is None and create:
+                    child = node.children[component] = _TrieNode()
+                node = child
+            if node is None:
+                break
+        return node
+
+    def add(self, uri: str, target, match: str | None = None):
+        """
+        Add a URI pattern.
+
+        :param uri: The URI, prefix or wildcard pattern, e.g.
+            ``"com.myapp.<category>.<product:int>.inactive"``.
+        :param target: The object returned when a URI matches the pattern.
+        :param match: The matching policy (``"exact"``, ``"prefix"`` or
+            ``"wildcard"``), or ``None`` to detect exact and wildcard patterns from
+            the URI.
+        """
+        components, names, match = self._parse(uri, match)
+        node = self._node(components, True)
+        if match == "exact":
+            node.exact.append(target)
+        elif match == "prefix":
+            node.prefix.append(target)
+        else:
+            node.patterns.append((target, names))
+        self._size += 1
+
+    def remove(self, uri: str, target=None, match: str | None = None) -> int:
+        """
+        Remove a URI pattern.
+
+        :param uri: The URI, prefix or wildcard pattern as added.
+        :param target: The target to remove, or ``None`` to remove all targets of
+            the pattern.
+        :param match: The matching policy as added.
+
+        :returns: The number of targets removed.
+        """
+        components, names, match = self._parse(uri, match)
+        node = self._node(components, False)
+        if node is None:
+            return 0
+        if match == "exact":
+            entries = node.exact
+        elif match == "prefix":
+            entries = node.prefix
+        else:
+            entries = node.patterns
+        kept = [
+            entry
+            for entry in entries
+            if target is not None
+            and (entry[0] if match == "wildcard" else entry) is not target
+        ]
+        removed = len(entries) - len(kept)
+        entries[:] = kept
+        self._size -= removed
+        return removed
+
+    def match(self, uri: str) -> list:
+        """
+        Match a URI against all patterns.
+
+        :param uri: The URI to match, e.g. ``"com.myapp.product.123.inactive"``.
+
+        :returns: List of pairs ``(target, kwargs)``, most specific pattern first:
+            exact URIs, then prefixes (longest first), then wildcard patterns
+            (literal components before wildcards, left to right). ``kwargs`` are
+            the named components of wildcard patterns.
+        :rtype: list
+        """
+        components = uri.split(".")
+        depth = len(components)
+        hits = []
+
+        # exact URIs and prefixes: follow the literal components only
+        prefixes = []
+        node = self._root
+        for component in components:
+            node = node.children.get(component)
+            if node is None:
+                break
+            if node.prefix:
+                prefixes.append(node.prefix)
+        else:
+            hits.extend((target, {}) for target in node.exact)
+        for targets in reversed(prefixes):
+            hits.extend((target, {}) for target in targets)
+
+        # wildcard patterns: depth-first, literal components before wildcards
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if i == depth:
+                for target, names in node.patterns:
+                    kwargs = {}
+                    try:
+                        for index, name, convert in names:
+                            kwargs[name] = convert(components[index])
+                    except ValueError:
+                        continue
+                    hits.append((target, kwargs))
+                continue
+            component = components[i]
+            if node.wildcard is not None and component:
+                stack.append((node.wildcard, i + 1))
+            child = node.children.get(component)
+            if child is not None:
+                stack.append((child, i + 1))
+        return hits
+
+    def lookup(self, uri: str):
+        """
+        Match a URI against all patterns, returning the most specific match only.
+
+        :param uri: The URI to match.
+
+        :returns: A pair ``(target, kwargs)``, or ``None`` when no pattern matches.
+        :rtype: tuple or None
+        """
+        hits = self.match(uri)
+        return hits[0] if hits else None
+
+
 @public
 def register(
     uri: str | None,
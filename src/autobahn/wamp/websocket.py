@@ -27,7 +27,9 @@
 import copy
 import traceback
 
-from autobahn.util import hlval
+import txaio
+
+from autobahn.util import hlval, log_enabled
 from autobahn.wamp.exception import ProtocolError, SerializationError, TransportLost
 from autobahn.wamp.interfaces import ISession, ITransport
 from autobahn.wamp.types import TransportDetails
@@ -107,26 +109,32 @@ class WampWebSocketProtocol:
         """
         Callback from :func:`autobahn.websocket.interfaces.IWebSocketChannel.onMessage`
         """
+        # with read-side backpressure enabled, collect the futures of the session
+        # processing the messages (see ITransportHandler.onMessage)
+        handler_futures = [] if self.readThrottle is not None else None
         try:
             for msg in self._serializer.unserialize(payload, isBinary):
-                self.log.trace(
-                    "\n{action1}{session}, {authid}{action2}\n  {message}\n{action3}",
-                    action1=hlval("WAMP-Receive(", color="green", bold=True),
-                    authid=(
-                        hlval(self._session._authid, color="green", bold=False)
-                        if self._session._authid
-                        else "-"
-                    ),
-                    session=(
-                        hlval(self._session._session_id, color="green", bold=False)
-                        if self._session._session_id
-                        else "-"
-                    ),
-                    action2=hlval(") <<", color="green", bold=True),
-                    action3=hlval("<<", color="green", bold=True),
-                    message=msg,
-                )
-                self._session.onMessage(msg)
+                if log_enabled(self.log, "trace"):
+                    self.log.trace(
+                        "\n{action1}{session}, {authid}{action2}\n  {message}\n{action3}",
+                        action1=hlval("WAMP-Receive(", color="green", bold=True),
+                        authid=(
+                            hlval(self._session._authid, color="green", bold=False)
+                            if self._session._authid
+                            else "-"
+                        ),
+                        session=(
+                            hlval(self._session._session_id, color="green", bold=False)
+                            if self._session._session_id
+                            else "-"
+                        ),
+                        action2=hlval(") <<", color="green", bold=True),
+                        action3=hlval("<<", color="green", bold=True),
+                        message=msg,
+                    )
+                res = self._session.onMessage(msg)
+                if handler_futures is not None and txaio.is_future(res):
+                    handler_futures.append(res)
 
         except ProtocolError as e:
             self.log.critical("{tb}", tb=traceback.format_exc())
@@ -144,29 +152,35 @@ class WampWebSocketProtocol:
                 reason=reason,
             )
 
+        if handler_futures:
+            if len(handler_futures) == 1:
+                return handler_futures[0]
+            return txaio.gather(handler_futures, consume_exceptions=True)
+
     def send(self, msg):
         """
         Implements :func:`autobahn.wamp.interfaces.ITransport.send`
         """
         if self.isOpen():
             try:
-                self.log.trace(
-                    "\n{action1}{session}, {authid}{action2}\n  {message}\n{action3}",
-                    action1=hlval("WAMP-Transmit(", color="red", bold=True),
-                    authid=(
-                        hlval(self._session._authid, color="red", bold=False)
-                        if self._session._authid
-                        else "-"
-                    ),
-                    session=(
-                        hlval(self._session._session_id, color="red", bold=False)
-                        if self._session._session_id
-                        else "-"
-                    ),
-                    action2=hlval(") >>", color="red", bold=True),
-                    action3=hlval(">>", color="red", bold=True),
-                    message=msg,
-                )
+                if log_enabled(self.log, "trace"):
+                    self.log.trace(
+                        "\n{action1}{session}, {authid}{action2}\n  {message}\n{action3}",
+                        action1=hlval("WAMP-Transmit(", color="red", bold=True),
+                        authid=(
+                            hlval(self._session._authid, color="red", bold=False)
+                            if self._session._authid
+                            else "-"
+                        ),
+                        session=(
+                            hlval(self._session._session_id, color="red", bold=False)
+                            if self._session._session_id
+                            else "-"
+                        ),
+                        action2=hlval(") >>", color="red", bold=True),
+                        action3=hlval(">>", color="red", bold=True),
+                        message=msg,
+                    )
                 payload, isBinary = self._serializer.serialize(msg)
             except Exception as e:
                 self.log.error(f"WAMP message serialization error: {e}")
@@ -179,6 +193,32 @@ class WampWebSocketProtocol:
         else:
             raise TransportLost()
 
+    def send_many(self, msgs):
+        """
+        Send several WAMP messages, serializing all of them first and writing the
+        WebSocket frames of all messages to the transport at once.
+
+        :param msgs: The WAMP messages to send.
+        :type msgs: list
+        """
+        if not self.isOpen():
+            raise TransportLost()
+        serialize = self._serializer.serialize
+        try:
+            payloads = [serialize(msg) for msg in msgs]
+        except Exception as e:
+            self.log.error(f"WAMP message serialization error: {e}")
+            raise SerializationError(f"WAMP message serialization error: {e}")
+        if log_enabled(self.log, "trace"):
+            for msg in msgs:
+                self.log.trace("WAMP-Transmit >> {message}", message=msg)
+        self._cork()
+        try:
+            for payload, isBinary in payloads:
+                self.sendMessage(payload, isBinary)
+        finally:
+            self._uncork()
+
     def isOpen(self):
         """
         Implements :func:`autobahn.wamp.interfaces.ITransport.isOpen`
@@ -192,6 +232,30 @@ class WampWebSocketProtocol:
         """
         return self._transport_details
 
+    @property
+    def write_flow(self):
+        """
+        Write-side flow control of this transport (or ``None``, when not enabled
+        via the ``writeHighWaterMark`` protocol option).
+        """
+        return self.writeFlow
+
+    def collect_metrics(self, metrics):
+        """
+        Report the metrics of this connection: the WebSocket traffic statistics, and
+        the statistics of the WAMP serializer and session.
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        super().collect_metrics(metrics)
+        serializer = getattr(self, "_serializer", None)
+        if serializer is not None:
+            serializer.collect_metrics(metrics)
+        collect_session = getattr(self._session, "collect_metrics", None)
+        if collect_session is not None:
+            collect_session(metrics)
+
     def close(self):
         """
         Implements :func:`autobahn.wamp.interfaces.ITransport.close`
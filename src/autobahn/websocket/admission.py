@@ -0,0 +1,303 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Admission control of WebSocket opening handshakes.
+
+Limits the rate at which a server accepts new WebSocket connections, globally and
+per peer, using token buckets. This keeps a storm of (re)connecting clients from
+starving the already established connections of CPU time. See the
+``handshakeRate`` family of options of
+:meth:`autobahn.websocket.interfaces.IWebSocketServerChannelFactory.setProtocolOptions`.
+"""
+
+import math
+import time
+from collections import deque
+
+import txaio
+
+from autobahn.util import public
+from autobahn.websocket.types import ConnectionDeny
+
+__all__ = (
+    "HandshakeAdmission",
+    "TokenBucket",
+)
+
+
+@public
+class TokenBucket:
+    """
+    A token bucket: tokens are added at a constant ``rate`` up to ``burst`` tokens,
+    and every admitted unit of work takes one token.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        """
+
+        :param rate: Tokens added per second.
+        :param burst: Maximum number of tokens (the bucket starts full).
+        :param now: Current time, in seconds.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            tokens = self.tokens + (now - self.updated) * self.rate
+            self.tokens = tokens if tokens < self.burst else self.burst
+            self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Take a token if one is available.
+
+        :param now: Current time, in seconds.
+
+        :returns: ``0`` when a token was taken, or else the number of seconds until
+            the next token becomes available.
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        """
+        Check if the bucket is full (so it can be forgotten without effect).
+        """
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+def _retry_after(seconds: float) -> list:
+    return [("Retry-After", str(max(1, math.ceil(seconds))))]
+
+
+class HandshakeAdmission:
+    """
+    Token bucket admission control of the opening handshakes of a server factory.
+
+    Handshakes exceeding the per-peer rate are rejected right away. Handshakes
+    exceeding the global rate are queued (up to ``queue_size``, in order of arrival)
+    until a token becomes available, or else rejected. Rejected handshakes are
+    answered with a HTTP 503 with a ``Retry-After`` header.
+
+    FOR INTERNAL USE ONLY!
+    """
+
+    __slots__ = (
+        "_name",
+        "clock",
+        "call_later",
+        "rate",
+        "burst",
+        "peer_rate",
+        "peer_burst",
+        "queue_size",
+        "max_peers",
+        "_bucket",
+        "_peers",
+        "_queue",
+        "_drain_call",
+        "admitted",
+        "queued",
+        "rejected",
+    )
+
+    def __init__(self, name: str, clock=time.monotonic, call_later=None):
+        """
+
+        :param name: Metric name prefix, e.g. ``autobahn_websocket``.
+        :param clock: Monotonic clock returning seconds.
+        :param call_later: Function to schedule timers, with the signature of
+            :func:`txaio.call_later` (the default).
+        """
+        self._name = name
+        self.clock = clock
+        self.call_later = call_later
+        self.max_peers = 10000
+        self._queue = deque()
+        self._drain_call = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = {"rate": 0, "peer_rate": 0, "queue_full": 0}
+        self.configure()
+
+    def configure(self, rate=0, burst=0, peer_rate=0, peer_burst=0, queue_size=0):
+        """
+        (Re-)configure the limits. The token buckets start full.
+
+        :param rate: Handshakes admitted per second, or ``0`` for no limit.
+        :param burst: Handshakes admitted at once (default: ``rate``, at least 1).
+        :param peer_rate: Handshakes admitted per second and peer, or ``0`` for no
+            limit.
+        :param peer_burst: Handshakes admitted at once per peer (default:
+            ``peer_rate``, at least 1).
+        :param queue_size: Handshakes queued when exceeding ``rate``.
+        """
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.peer_rate = peer_rate
+        self.peer_burst = peer_burst or max(1, peer_rate)
+        self.queue_size = queue_size
+        now = self.clock()
+        self._bucket = TokenBucket(rate, self.burst, now) if rate else None
+        self._peers = {}
+
+        # handshakes queued under the previous configuration are admitted now
+        queue = self._queue
+        self._queue = deque()
+        for proto in queue:
+            if proto.state == proto.STATE_CONNECTING:
+                self.admitted += 1
+                proto._admitHandshake()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rate or self.peer_rate)
+
+    def _peer_bucket(self, peer: str, now: float) -> TokenBucket:
+        bucket = self._peers.get(peer)
+        if bucket is None:
+            if len(self._peers) >= self.max_peers:
+                self._prune(now)
+            bucket = self._peers[peer] = TokenBucket(
+                self.peer_rate, self.peer_burst, now
+            )
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        # full buckets are equivalent to new ones
+        peers = self._peers
+        for peer in [peer for peer, bucket in peers.items() if bucket.is_full(now)]:
+            del peers[peer]
+        # then forget the peers seen first
+        while len(peers) >= self.max_peers:
+            del peers[next(iter(peers))]
+
+    def admit(self, proto) -> None:
+        """
+        Admit the opening handshake of a server protocol, now or later (calling
+        ``proto._admitHandshake()``), or reject it (failing the handshake).
+
+        :param proto: The server protocol, with its ``peer`` determined.
+        :type proto: :class:`autobahn.websocket.protocol.WebSocketServerProtocol`
+        """
+        now = self.clock()
+
+        if self.peer_rate:
+            wait = self._peer_bucket(proto.peer, now).take(now)
+            if wait:
+                self.rejected["peer_rate"] += 1
+                proto.failHandshake(
+                    "handshake rate limit of peer exceeded",
+                    ConnectionDeny.SERVICE_UNAVAILABLE,
+                    _retry_after(wait),
+                )
+                return
+
+        bucket = self._bucket
+        if bucket is not None:
+            # handshakes already queued go first
+            wait = bucket.take(now) if not self._queue else 1 / self.rate
+            if wait:
+                if len(self._queue) < self.queue_size:
+                    self.queued += 1
+                    self._queue.append(proto)
+                    if self._drain_call is None:
+                        self._schedule_drain(wait)
+                else:
+                    self.rejected["queue_full" if self.queue_size else "rate"] += 1
+                    proto.failHandshake(
+                        "handshake rate limit exceeded",
+                        ConnectionDeny.SERVICE_UNAVAILABLE,
+                        _retry_after(wait + len(self._queue) / self.rate),
+                    )
+                return
+
+        self.admitted += 1
+        proto._admitHandshake()
+
+    def _schedule_drain(self, delay: float) -> None:
+        call_later = self.call_later or txaio.call_later
+        self._drain_call = call_later(delay, self._drain)
+
+    def _drain(self) -> None:
+        self._drain_call = None
+        queue = self._queue
+        while queue:
+            proto = queue[0]
+            if proto.state != proto.STATE_CONNECTING:
+                # connection was lost (or timed out) while queued
+                queue.popleft()
+                continue
+            if self._bucket is None:
+                return
+            wait = self._bucket.take(self.clock())
+            if wait:
+                self._schedule_drain(wait)
+                return
+            queue.popleft()
+            self.admitted += 1
+            proto._admitHandshake()
+
+    def collect_metrics(self, metrics) -> None:
+        """
+        Report the admission control metrics (see :mod:`autobahn.metrics`).
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        name = self._name
+        metrics.counter(
+            f"{name}_handshakes_admitted_total",
+            self.admitted,
+            "Opening handshakes admitted by admission control.",
+        )
+        metrics.counter(
+            f"{name}_handshakes_queued_total",
+            self.queued,
+            "Opening handshakes queued by admission control.",
+        )
+        for reason, count in self.rejected.items():
+            metrics.counter(
+                f"{name}_handshakes_rejected_total",
+                count,
+                "Opening handshakes rejected by admission control.",
+                {"reason": reason},
+            )
+        metrics.gauge(
+            f"{name}_handshake_queue_length",
+            len(self._queue),
+            "Opening handshakes currently queued by admission control.",
+        )
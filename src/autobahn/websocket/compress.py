@@ -32,7 +32,9 @@ from autobahn.websocket.compress_base import (
     PerMessageCompressResponseAccept,
 )
 from autobahn.websocket.compress_deflate import (
+    DEFLATE_MEMORY_BUDGET,
     PerMessageDeflate,
+    PerMessageDeflateMemoryBudget,
     PerMessageDeflateMixin,
     PerMessageDeflateOffer,
     PerMessageDeflateOfferAccept,
@@ -43,6 +45,7 @@ from autobahn.websocket.compress_deflate import (
 # this must be a list (not tuple), since we dynamically
 # extend it ..
 __all__ = [
+    "DEFLATE_MEMORY_BUDGET",
     "PERMESSAGE_COMPRESSION_EXTENSION",
     "PerMessageCompress",
     "PerMessageCompressOffer",
@@ -50,6 +53,7 @@ __all__ = [
     "PerMessageCompressResponse",
     "PerMessageCompressResponseAccept",
     "PerMessageDeflate",
+    "PerMessageDeflateMemoryBudget",
     "PerMessageDeflateOffer",
     "PerMessageDeflateOfferAccept",
     "PerMessageDeflateResponse",
@@ -181,3 +185,39 @@ else:
             "PerMessageBrotliResponseAccept",
         ]
     )
+
+
+# include 'permessage-zstd' classes if Zstandard is available
+try:
+    # noinspection PyPackageRequirements
+    import zstandard
+except ImportError:
+    zstandard = None
+else:
+    from autobahn.websocket.compress_zstd import (
+        PerMessageZstd,
+        PerMessageZstdMixin,
+        PerMessageZstdOffer,
+        PerMessageZstdOfferAccept,
+        PerMessageZstdResponse,
+        PerMessageZstdResponseAccept,
+    )
+
+    PMCE = {
+        "Offer": PerMessageZstdOffer,
+        "OfferAccept": PerMessageZstdOfferAccept,
+        "Response": PerMessageZstdResponse,
+        "ResponseAccept": PerMessageZstdResponseAccept,
+        "PMCE": PerMessageZstd,
+    }
+    PERMESSAGE_COMPRESSION_EXTENSION[PerMessageZstdMixin.EXTENSION_NAME] = PMCE
+
+    __all__.extend(
+        [
+            "PerMessageZstd",
+            "PerMessageZstdOffer",
+            "PerMessageZstdOfferAccept",
+            "PerMessageZstdResponse",
+            "PerMessageZstdResponseAccept",
+        ]
+    )
@@ -61,3 +61,15 @@ class PerMessageCompress:
     """
     Base class for WebSocket compression negotiated parameters.
     """
+
+    def open(self):
+        """
+        Acquire resources for the compression processor. Called when it is installed
+        on a WebSocket connection, after the extension has been negotiated.
+        """
+
+    def close(self):
+        """
+        Release resources held by the compression processor. Called when the
+        WebSocket connection is lost.
+        """
@@ -36,7 +36,9 @@ from autobahn.websocket.compress_base import (
 )
 
 __all__ = (
+    "DEFLATE_MEMORY_BUDGET",
     "PerMessageDeflate",
+    "PerMessageDeflateMemoryBudget",
     "PerMessageDeflateMixin",
     "PerMessageDeflateOffer",
     "PerMessageDeflateOfferAccept",
@@ -67,6 +69,180 @@ class PerMessageDeflateMixin:
     Higher values use more memory, but are faster and produce smaller output. The default is 8.
     """
 
+    LEVEL_PERMISSIBLE_VALUES = [-1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+    """
+    Permissible value for compression level parameter.
+    Higher values use more CPU time, but produce smaller output. The default is -1 (zlib default, which is 6).
+    """
+
+    STRATEGY_PERMISSIBLE_VALUES = [
+        zlib.Z_DEFAULT_STRATEGY,
+        zlib.Z_FILTERED,
+        zlib.Z_HUFFMAN_ONLY,
+        zlib.Z_RLE,
+        zlib.Z_FIXED,
+    ]
+    """
+    Permissible value for compression strategy parameter (the ``zlib.Z_*`` strategy constants).
+    The default is ``zlib.Z_DEFAULT_STRATEGY``.
+    """
+
+
+@public
+class PerMessageDeflateMemoryBudget:
+    """
+    Process wide budget for the memory of zlib compression and decompression contexts
+    that `permessage-deflate` connections keep alive between messages (context takeover).
+
+    A new connection that would exceed the budget has the compressor for its sending
+    direction downgraded: first to a smaller window, and if that is still too much, to
+    no context takeover (the compressor then only exists while sending a message).
+    The receiving direction is fixed by the peer during the opening handshake.
+
+    The budget is disabled by default. Enable it by setting :attr:`limit` on
+    :data:`DEFLATE_MEMORY_BUDGET`.
+    """
+
+    __slots__ = ("limit", "downgrade_window_bits", "active", "connections", "downgrades")
+
+    def __init__(self, limit=0, downgrade_window_bits=9):
+        """
+
+        :param limit: Memory budget in octets or ``0`` for no limit.
+        :type limit: int
+        :param downgrade_window_bits: Compressor window size used for connections downgraded
+            because of the budget.
+        :type downgrade_window_bits: int
+        """
+        self.limit = limit
+        self.downgrade_window_bits = downgrade_window_bits
+
+        # estimated memory in octets held by currently open connections
+        self.active = 0
+
+        # number of currently open connections holding memory
+        self.connections = 0
+
+        # number of connections downgraded because of the budget
+        self.downgrades = 0
+
+    @staticmethod
+    def compressor_memory(window_bits, mem_level):
+        """
+        Estimate the memory used by a zlib compressor (see ``zconf.h``).
+
+        :returns: Memory in octets.
+        :rtype: int
+        """
+        return (1 << (window_bits + 2)) + (1 << (mem_level + 9))
+
+    @staticmethod
+    def decompressor_memory(window_bits):
+        """
+        Estimate the memory used by a zlib decompressor (see ``zconf.h``).
+
+        :returns: Memory in octets.
+        :rtype: int
+        """
+        return (1 << window_bits) + 7168
+
+    def reserve(self, window_bits, mem_level, no_context_takeover, decompress_memory):
+        """
+        Reserve memory for a new connection, downgrading its compressor if needed.
+
+        :param window_bits: Window size of the compressor as negotiated.
+        :type window_bits: int
+        :param mem_level: Memory level of the compressor.
+        :type mem_level: int
+        :param no_context_takeover: Whether the compressor uses no context takeover as negotiated.
+        :type no_context_takeover: bool
+        :param decompress_memory: Memory of the decompressor kept between messages.
+        :type decompress_memory: int
+
+        :returns: Tuple of the compressor window size, no context takeover flag and the
+            memory reserved (which must be passed to :meth:`release` later).
+        :rtype: tuple
+        """
+        if no_context_takeover:
+            memory = decompress_memory
+        else:
+            memory = decompress_memory + self.compressor_memory(window_bits, mem_level)
+
+        if self.limit and self.active + memory > self.limit:
+            requested = (window_bits, no_context_takeover)
+            if not no_context_takeover and window_bits > self.downgrade_window_bits:
+                window_bits = self.downgrade_window_bits
+                memory = decompress_memory + self.compressor_memory(
+                    window_bits, mem_level
+                )
+            if not no_context_takeover and self.active + memory > self.limit:
+                no_context_takeover = True
+                memory = decompress_memory
+            if (window_bits, no_context_takeover) != requested:
+                self.downgrades += 1
+
+        self.active += memory
+        self.connections += 1
+        return window_bits, no_context_takeover, memory
+
+    def release(self, memory):
+        """
+        Release memory reserved with :meth:`reserve`.
+
+        :param memory: The memory returned from :meth:`reserve`.
+        :type memory: int
+        """
+        self.active -= memory
+        self.connections -= 1
+
+    def __json__(self):
+        """
+        Returns a JSON serializable object representation.
+
+        :returns: JSON serializable representation.
+        :rtype: dict
+        """
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "connections": self.connections,
+            "downgrades": self.downgrades,
+        }
+
+    def collect_metrics(self, metrics):
+        """
+        Report the budget as metrics (see :mod:`autobahn.metrics`).
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        metrics.gauge(
+            "autobahn_websocket_deflate_memory_limit_octets",
+            self.limit,
+            "Memory budget of permessage-deflate contexts (0 = no limit).",
+        )
+        metrics.gauge(
+            "autobahn_websocket_deflate_memory_octets",
+            self.active,
+            "Estimated memory of permessage-deflate contexts of open connections.",
+        )
+        metrics.gauge(
+            "autobahn_websocket_deflate_connections",
+            self.connections,
+            "Open connections holding permessage-deflate memory.",
+        )
+        metrics.counter(
+            "autobahn_websocket_deflate_downgrades_total",
+            self.downgrades,
+            "Connections downgraded because of the memory budget.",
+        )
+
+
+DEFLATE_MEMORY_BUDGET = PerMessageDeflateMemoryBudget()
+"""
+Process wide memory budget for `permessage-deflate` connections.
+"""
+
 
 @public
 class PerMessageDeflateOffer(PerMessageCompressOffer, PerMessageDeflateMixin):
@@ -293,6 +469,8 @@ class PerMessageDeflateOfferAccept(
         window_bits=None,
         mem_level=None,
         max_message_size=None,
+        level=None,
+        strategy=None,
     ):
         """
 
@@ -311,6 +489,10 @@ class PerMessageDeflateOfferAccept(
         :type window_bits: int
         :param mem_level: Set server ("server-to-client direction") memory level.
         :type mem_level: int
+        :param level: Set server ("server-to-client direction") compression level.
+        :type level: int
+        :param strategy: Set server ("server-to-client direction") compression strategy.
+        :type strategy: int
         """
         if not isinstance(offer, PerMessageDeflateOffer):
             raise Exception(f"invalid type {type(offer)} for offer")
@@ -382,6 +564,22 @@ class PerMessageDeflateOfferAccept(
         self.mem_level = mem_level
         self.max_message_size = max_message_size  # clamp/check values..?
 
+        if level is not None:
+            if level not in self.LEVEL_PERMISSIBLE_VALUES:
+                raise Exception(
+                    f"invalid value {level} for level - permissible values {self.LEVEL_PERMISSIBLE_VALUES}"
+                )
+
+        self.level = level
+
+        if strategy is not None:
+            if strategy not in self.STRATEGY_PERMISSIBLE_VALUES:
+                raise Exception(
+                    f"invalid value {strategy} for strategy - permissible values {self.STRATEGY_PERMISSIBLE_VALUES}"
+                )
+
+        self.strategy = strategy
+
     def get_extension_string(self):
         """
         Returns the WebSocket extension configuration string as sent to the server.
@@ -418,6 +616,8 @@ class PerMessageDeflateOfferAccept(
             "window_bits": self.window_bits,
             "mem_level": self.mem_level,
             "max_message_size": self.max_message_size,
+            "level": self.level,
+            "strategy": self.strategy,
         }
 
     def __repr__(self):
@@ -428,7 +628,7 @@ class PerMessageDeflateOfferAccept(
         :rtype: str
         """
         return (
-            f"PerMessageDeflateOfferAccept(offer = {self.offer.__repr__()}, request_no_context_takeover = {self.request_no_context_takeover}, request_max_window_bits = {self.request_max_window_bits}, no_context_takeover = {self.no_context_takeover}, window_bits = {self.window_bits}, mem_level = {self.mem_level}, max_message_size = {self.max_message_size})"
+            f"PerMessageDeflateOfferAccept(offer = {self.offer.__repr__()}, request_no_context_takeover = {self.request_no_context_takeover}, request_max_window_bits = {self.request_max_window_bits}, no_context_takeover = {self.no_context_takeover}, window_bits = {self.window_bits}, mem_level = {self.mem_level}, max_message_size = {self.max_message_size}, level = {self.level}, strategy = {self.strategy})"
         )
 
 
@@ -589,6 +789,8 @@ class PerMessageDeflateResponseAccept(
         window_bits=None,
         mem_level=None,
         max_message_size=None,
+        level=None,
+        strategy=None,
     ):
         """
 
@@ -600,6 +802,10 @@ class PerMessageDeflateResponseAccept(
         :type window_bits: int
         :param mem_level: Set client ("client-to-server direction") memory level.
         :type mem_level: int
+        :param level: Set client ("client-to-server direction") compression level.
+        :type level: int
+        :param strategy: Set client ("client-to-server direction") compression strategy.
+        :type strategy: int
         """
         if not isinstance(response, PerMessageDeflateResponse):
             raise Exception(f"invalid type {type(response)} for response")
@@ -644,6 +850,22 @@ class PerMessageDeflateResponseAccept(
         self.mem_level = mem_level
         self.max_message_size = max_message_size
 
+        if level is not None:
+            if level not in self.LEVEL_PERMISSIBLE_VALUES:
+                raise Exception(
+                    f"invalid value {level} for level - permissible values {self.LEVEL_PERMISSIBLE_VALUES}"
+                )
+
+        self.level = level
+
+        if strategy is not None:
+            if strategy not in self.STRATEGY_PERMISSIBLE_VALUES:
+                raise Exception(
+                    f"invalid value {strategy} for strategy - permissible values {self.STRATEGY_PERMISSIBLE_VALUES}"
+                )
+
+        self.strategy = strategy
+
     def __json__(self):
         """
         Returns a JSON serializable object representation.
@@ -657,6 +879,8 @@ class PerMessageDeflateResponseAccept(
             "no_context_takeover": self.no_context_takeover,
             "window_bits": self.window_bits,
             "mem_level": self.mem_level,
+            "level": self.level,
+            "strategy": self.strategy,
         }
 
     def __repr__(self):
@@ -667,7 +891,7 @@ class PerMessageDeflateResponseAccept(
         :rtype: str
         """
         return (
-            f"PerMessageDeflateResponseAccept(response = {self.response.__repr__()}, no_context_takeover = {self.no_context_takeover}, window_bits = {self.window_bits}, mem_level = {self.mem_level})"
+            f"PerMessageDeflateResponseAccept(response = {self.response.__repr__()}, no_context_takeover = {self.no_context_takeover}, window_bits = {self.window_bits}, mem_level = {self.mem_level}, level = {self.level}, strategy = {self.strategy})"
         )
 
 
@@ -699,6 +923,8 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
             ),
             accept.mem_level,
             accept.max_message_size,
+            accept.level,
+            accept.strategy,
         )
         return pmce
 
@@ -721,6 +947,8 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
             accept.request_max_window_bits,
             accept.mem_level,
             accept.max_message_size,
+            accept.level,
+            accept.strategy,
         )
         return pmce
 
@@ -733,6 +961,8 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
         client_max_window_bits,
         mem_level,
         max_message_size=None,
+        level=None,
+        strategy=None,
     ):
         self._is_server = is_server
 
@@ -753,9 +983,22 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
         self.mem_level = mem_level if mem_level else self.DEFAULT_MEM_LEVEL
         self.max_message_size = max_message_size  # None means "no limit"
 
+        self.level = level if level is not None else zlib.Z_DEFAULT_COMPRESSION
+        self.strategy = strategy if strategy is not None else zlib.Z_DEFAULT_STRATEGY
+
         self._compressor = None
         self._decompressor = None
 
+        # parameters of the compressor for our sending direction: as negotiated,
+        # unless downgraded by the memory budget (see open())
+        if is_server:
+            self._compress_window_bits = self.server_max_window_bits
+            self._compress_no_context_takeover = self.server_no_context_takeover
+        else:
+            self._compress_window_bits = self.client_max_window_bits
+            self._compress_no_context_takeover = self.client_no_context_takeover
+        self._memory = None
+
     def __json__(self):
         return {
             "extension": self.EXTENSION_NAME,
@@ -765,39 +1008,67 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
             "server_max_window_bits": self.server_max_window_bits,
             "client_max_window_bits": self.client_max_window_bits,
             "mem_level": self.mem_level,
+            "level": self.level,
+            "strategy": self.strategy,
         }
 
     def __repr__(self):
         return (
-            f"PerMessageDeflate(is_server = {self._is_server}, server_no_context_takeover = {self.server_no_context_takeover}, client_no_context_takeover = {self.client_no_context_takeover}, server_max_window_bits = {self.server_max_window_bits}, client_max_window_bits = {self.client_max_window_bits}, mem_level = {self.mem_level})"
+            f"PerMessageDeflate(is_server = {self._is_server}, server_no_context_takeover = {self.server_no_context_takeover}, client_no_context_takeover = {self.client_no_context_takeover}, server_max_window_bits = {self.server_max_window_bits}, client_max_window_bits = {self.client_max_window_bits}, mem_level = {self.mem_level}, level = {self.level}, strategy = {self.strategy})"
+        )
+
+    def open(self):
+        # account for the zlib contexts kept alive between messages, and downgrade
+        # the compressor for our sending direction when over the memory budget. the
+        # negotiated parameters stay as agreed with the peer: a sender may always
+        # use a smaller window than negotiated, or drop its context between messages
+        if self._memory is not None:
+            return
+        if self._is_server:
+            no_context_takeover = self.client_no_context_takeover
+            window_bits = self.client_max_window_bits
+        else:
+            no_context_takeover = self.server_no_context_takeover
+            window_bits = self.server_max_window_bits
+        decompress_memory = (
+            0
+            if no_context_takeover
+            else DEFLATE_MEMORY_BUDGET.decompressor_memory(window_bits)
+        )
+        (
+            self._compress_window_bits,
+            self._compress_no_context_takeover,
+            self._memory,
+        ) = DEFLATE_MEMORY_BUDGET.reserve(
+            self._compress_window_bits,
+            self.mem_level,
+            self._compress_no_context_takeover,
+            decompress_memory,
         )
 
     def start_compress_message(self):
         # compressobj([level[, method[, wbits[, mem_level[, strategy]]]]])
         # http://bugs.python.org/issue19278
         # http://hg.python.org/cpython/rev/c54c8e71b79a
-        if self._is_server:
-            if self._compressor is None or self.server_no_context_takeover:
-                self._compressor = zlib.compressobj(
-                    zlib.Z_DEFAULT_COMPRESSION,
-                    zlib.DEFLATED,
-                    -self.server_max_window_bits,
-                    self.mem_level,
-                )
-        else:
-            if self._compressor is None or self.client_no_context_takeover:
-                self._compressor = zlib.compressobj(
-                    zlib.Z_DEFAULT_COMPRESSION,
-                    zlib.DEFLATED,
-                    -self.client_max_window_bits,
-                    self.mem_level,
-                )
+        if self._compressor is None or self._compress_no_context_takeover:
+            self._compressor = zlib.compressobj(
+                self.level,
+                zlib.DEFLATED,
+                -self._compress_window_bits,
+                self.mem_level,
+                self.strategy,
+            )
 
     def compress_message_data(self, data):
         return self._compressor.compress(data)
 
     def end_compress_message(self):
         data = self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        # without context takeover, don't keep the compressor between messages
+        if self._compress_no_context_takeover:
+            self._compressor = None
+
         return data[:-4]
 
     def start_decompress_message(self):
@@ -817,3 +1088,18 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
         # Eat stripped LEN and NLEN field of a non-compressed block added
         # for Z_SYNC_FLUSH.
         self._decompressor.decompress(b"\x00\x00\xff\xff")
+
+        # without context takeover, don't keep the decompressor between messages
+        if self._is_server:
+            if self.client_no_context_takeover:
+                self._decompressor = None
+        else:
+            if self.server_no_context_takeover:
+                self._decompressor = None
+
+    def close(self):
+        self._compressor = None
+        self._decompressor = None
+        if self._memory is not None:
+            DEFLATE_MEMORY_BUDGET.release(self._memory)
+            self._memory = None
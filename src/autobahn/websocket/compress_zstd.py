@@ -0,0 +1,697 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) typedef int GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+# noinspection PyPackageRequirements
+import zstandard
+
+from autobahn.util import public
+from autobahn.websocket.compress_base import (
+    PerMessageCompress,
+    PerMessageCompressOffer,
+    PerMessageCompressOfferAccept,
+    PerMessageCompressResponse,
+    PerMessageCompressResponseAccept,
+)
+
+__all__ = (
+    "PerMessageZstd",
+    "PerMessageZstdMixin",
+    "PerMessageZstdOffer",
+    "PerMessageZstdOfferAccept",
+    "PerMessageZstdResponse",
+    "PerMessageZstdResponseAccept",
+    "get_dictionary",
+    "register_dictionary",
+)
+
+
+_DICTIONARIES = {}
+
+
+@public
+def register_dictionary(dict_data):
+    """
+    Register a (pre-trained) zstd dictionary for use with `permessage-zstd`.
+
+    Dictionaries are negotiated by ID during the WebSocket opening handshake, and
+    hence must be registered on both peers before connecting. A dictionary can be
+    trained from sample messages using ``zstandard.train_dictionary()``.
+
+    :param dict_data: The dictionary, either the raw dictionary content as produced
+        by ``zstd --train``, or a ``zstandard.ZstdCompressionDict``.
+    :type dict_data: bytes or obj
+
+    :returns: The dictionary ID to use in ``PerMessageZstdOffer(dictionary_id=..)``.
+    :rtype: int
+    """
+    if isinstance(dict_data, bytes):
+        dict_data = zstandard.ZstdCompressionDict(dict_data)
+    elif not isinstance(dict_data, zstandard.ZstdCompressionDict):
+        raise Exception(f"invalid type {type(dict_data)} for dict_data")
+
+    dict_id = dict_data.dict_id()
+    if dict_id == 0:
+        raise Exception(
+            "zstd dictionary has no dictionary ID (raw content dictionaries are not supported)"
+        )
+
+    _DICTIONARIES[dict_id] = dict_data
+    return dict_id
+
+
+@public
+def get_dictionary(dict_id):
+    """
+    Get a zstd dictionary previously registered with :func:`register_dictionary`.
+
+    :param dict_id: The dictionary ID.
+    :type dict_id: int
+
+    :returns: The dictionary or ``None`` when no dictionary with the ID is registered.
+    :rtype: obj or None
+    """
+    return _DICTIONARIES.get(dict_id, None)
+
+
+class PerMessageZstdMixin:
+    """
+    Mixin class for this extension.
+    """
+
+    EXTENSION_NAME = "permessage-zstd"
+    """
+    Name of this WebSocket extension.
+    """
+
+    LEVEL_PERMISSIBLE_VALUES = list(range(1, zstandard.MAX_COMPRESSION_LEVEL + 1))
+    """
+    Permissible value for compression level parameter.
+    Higher values use more CPU time, but produce smaller output. The default is 3.
+    """
+
+    @classmethod
+    def _parse_dictionary_id(cls, p, val):
+        try:
+            dictionary_id = int(val)
+        except (TypeError, ValueError):
+            raise Exception(
+                f"illegal extension parameter value '{val}' for parameter '{p}' of extension '{cls.EXTENSION_NAME}'"
+            )
+        if dictionary_id < 1 or dictionary_id >= 2**32:
+            raise Exception(
+                f"illegal extension parameter value '{val}' for parameter '{p}' of extension '{cls.EXTENSION_NAME}'"
+            )
+        return dictionary_id
+
+
+@public
+class PerMessageZstdOffer(PerMessageCompressOffer, PerMessageZstdMixin):
+    """
+    Set of extension parameters for `permessage-zstd` WebSocket extension
+    offered by a client to a server.
+    """
+
+    @classmethod
+    def parse(cls, params):
+        """
+        Parses a WebSocket extension offer for `permessage-zstd` provided by a client to a server.
+
+        :param params: Output from :func:`autobahn.websocket.WebSocketProtocol._parseExtensionsHeader`.
+        :type params: list
+
+        :returns: A new instance of :class:`autobahn.compress.PerMessageZstdOffer`.
+        :rtype: obj
+        """
+        # extension parameter defaults
+        accept_no_context_takeover = False
+        request_no_context_takeover = False
+        dictionary_id = 0
+
+        # verify/parse client ("client-to-server direction") parameters of permessage-zstd offer
+        for p in params:
+            if len(params[p]) > 1:
+                raise Exception(
+                    f"multiple occurrence of extension parameter '{p}' for extension '{cls.EXTENSION_NAME}'"
+                )
+
+            val = params[p][0]
+
+            if p == "client_no_context_takeover":
+                # noinspection PySimplifyBooleanCheck
+                if val is not True:
+                    raise Exception(
+                        f"illegal extension parameter value '{val}' for parameter '{p}' of extension '{cls.EXTENSION_NAME}'"
+                    )
+                else:
+                    accept_no_context_takeover = True
+
+            elif p == "server_no_context_takeover":
+                # noinspection PySimplifyBooleanCheck
+                if val is not True:
+                    raise Exception(
+                        f"illegal extension parameter value '{val}' for parameter '{p}' of extension '{cls.EXTENSION_NAME}'"
+                    )
+                else:
+                    request_no_context_takeover = True
+
+            elif p == "dictionary_id":
+                dictionary_id = cls._parse_dictionary_id(p, val)
+
+            else:
+                raise Exception(
+                    f"illegal extension parameter '{p}' for extension '{cls.EXTENSION_NAME}'"
+                )
+
+        offer = cls(
+            accept_no_context_takeover, request_no_context_takeover, dictionary_id
+        )
+        return offer
+
+    def __init__(
+        self,
+        accept_no_context_takeover=True,
+        request_no_context_takeover=False,
+        dictionary_id=0,
+    ):
+        """
+
+        :param accept_no_context_takeover: Iff true, client accepts "no context takeover" feature.
+        :type accept_no_context_takeover: bool
+        :param request_no_context_takeover: Iff true, client request "no context takeover" feature.
+        :type request_no_context_takeover: bool
+        :param dictionary_id: ID of a pre-trained dictionary (see :func:`register_dictionary`)
+            the client proposes to use in both directions, or ``0`` for no dictionary.
+        :type dictionary_id: int
+        """
+        if type(accept_no_context_takeover) != bool:
+            raise Exception(
+                f"invalid type {type(accept_no_context_takeover)} for accept_no_context_takeover"
+            )
+
+        self.accept_no_context_takeover = accept_no_context_takeover
+
+        if type(request_no_context_takeover) != bool:
+            raise Exception(
+                f"invalid type {type(request_no_context_takeover)} for request_no_context_takeover"
+            )
+
+        self.request_no_context_takeover = request_no_context_takeover
+
+        if type(dictionary_id) != int:
+            raise Exception(f"invalid type {type(dictionary_id)} for dictionary_id")
+
+        if dictionary_id < 0 or dictionary_id >= 2**32:
+            raise Exception(f"invalid value {dictionary_id} for dictionary_id")
+
+        self.dictionary_id = dictionary_id
+
+    def get_extension_string(self):
+        """
+        Returns the WebSocket extension configuration string as sent to the server.
+
+        :returns: PMCE configuration string.
+        :rtype: str
+        """
+        pmce_string = self.EXTENSION_NAME
+        if self.accept_no_context_takeover:
+            pmce_string += "; client_no_context_takeover"
+        if self.request_no_context_takeover:
+            pmce_string += "; server_no_context_takeover"
+        if self.dictionary_id:
+            pmce_string += f"; dictionary_id={self.dictionary_id}"
+        return pmce_string
+
+    def __json__(self):
+        """
+        Returns a JSON serializable object representation.
+
+        :returns: JSON serializable representation.
+        :rtype: dict
+        """
+        return {
+            "extension": self.EXTENSION_NAME,
+            "accept_no_context_takeover": self.accept_no_context_takeover,
+            "request_no_context_takeover": self.request_no_context_takeover,
+            "dictionary_id": self.dictionary_id,
+        }
+
+    def __repr__(self):
+        """
+        Returns Python object representation that can be eval'ed to reconstruct the object.
+
+        :returns: Python string representation.
+        :rtype: str
+        """
+        return (
+            f"PerMessageZstdOffer(accept_no_context_takeover = {self.accept_no_context_takeover}, request_no_context_takeover = {self.request_no_context_takeover}, dictionary_id = {self.dictionary_id})"
+        )
+
+
+@public
+class PerMessageZstdOfferAccept(PerMessageCompressOfferAccept, PerMessageZstdMixin):
+    """
+    Set of parameters with which to accept an `permessage-zstd` offer
+    from a client by a server.
+    """
+
+    def __init__(
+        self,
+        offer,
+        request_no_context_takeover=False,
+        no_context_takeover=None,
+        dictionary_id=None,
+        level=None,
+    ):
+        """
+
+        :param offer: The offer being accepted.
+        :type offer: Instance of :class:`autobahn.compress.PerMessageZstdOffer`.
+        :param request_no_context_takeover: Iff true, server request "no context takeover" feature.
+        :type request_no_context_takeover: bool
+        :param no_context_takeover: Override server ("server-to-client direction") context takeover (this must be compatible with offer).
+        :type no_context_takeover: bool
+        :param dictionary_id: The dictionary to use: ``None`` to use the dictionary proposed by
+            the client if it is registered on the server, ``0`` to decline any dictionary, or the
+            ID proposed by the client (which then must be registered).
+        :type dictionary_id: int or None
+        :param level: Set server ("server-to-client direction") compression level.
+        :type level: int
+        """
+        if not isinstance(offer, PerMessageZstdOffer):
+            raise Exception(f"invalid type {type(offer)} for offer")
+
+        self.offer = offer
+
+        if type(request_no_context_takeover) != bool:
+            raise Exception(
+                f"invalid type {type(request_no_context_takeover)} for request_no_context_takeover"
+            )
+
+        if request_no_context_takeover and not offer.accept_no_context_takeover:
+            raise Exception(
+                f"invalid value {request_no_context_takeover} for request_no_context_takeover - feature unsupported by client"
+            )
+
+        self.request_no_context_takeover = request_no_context_takeover
+
+        if no_context_takeover is not None:
+            if type(no_context_takeover) != bool:
+                raise Exception(
+                    f"invalid type {type(no_context_takeover)} for no_context_takeover"
+                )
+
+            if offer.request_no_context_takeover and not no_context_takeover:
+                raise Exception(
+                    f"invalid value {no_context_takeover} for no_context_takeover - client requested feature"
+                )
+
+        self.no_context_takeover = no_context_takeover
+
+        if dictionary_id is None:
+            dictionary_id = offer.dictionary_id
+            if dictionary_id and get_dictionary(dictionary_id) is None:
+                dictionary_id = 0
+        elif dictionary_id != 0:
+            if dictionary_id != offer.dictionary_id:
+                raise Exception(
+                    f"invalid value {dictionary_id} for dictionary_id - client proposed dictionary {offer.dictionary_id}"
+                )
+            if get_dictionary(dictionary_id) is None:
+                raise Exception(
+                    f"invalid value {dictionary_id} for dictionary_id - no such dictionary registered"
+                )
+
+        self.dictionary_id = dictionary_id
+
+        if level is not None:
+            if level not in self.LEVEL_PERMISSIBLE_VALUES:
+                raise Exception(
+                    f"invalid value {level} for level - permissible values {self.LEVEL_PERMISSIBLE_VALUES}"
+                )
+
+        self.level = level
+
+    def get_extension_string(self):
+        """
+        Returns the WebSocket extension configuration string as sent to the server.
+
+        :returns: PMCE configuration string.
+        :rtype: str
+        """
+        pmce_string = self.EXTENSION_NAME
+        if self.offer.request_no_context_takeover:
+            pmce_string += "; server_no_context_takeover"
+        if self.request_no_context_takeover:
+            pmce_string += "; client_no_context_takeover"
+        if self.dictionary_id:
+            pmce_string += f"; dictionary_id={self.dictionary_id}"
+        return pmce_string
+
+    def __json__(self):
+        """
+        Returns a JSON serializable object representation.
+
+        :returns: JSON serializable representation.
+        :rtype: dict
+        """
+        return {
+            "extension": self.EXTENSION_NAME,
+            "offer": self.offer.__json__(),
+            "request_no_context_takeover": self.request_no_context_takeover,
+            "no_context_takeover": self.no_context_takeover,
+            "dictionary_id": self.dictionary_id,
+            "level": self.level,
+        }
+
+    def __repr__(self):
+        """
+        Returns Python object representation that can be eval'ed to reconstruct the object.
+
+        :returns: Python string representation.
+        :rtype: str
+        """
+        return (
+            f"PerMessageZstdOfferAccept(offer = {self.offer.__repr__()}, request_no_context_takeover = {self.request_no_context_takeover}, no_context_takeover = {self.no_context_takeover}, dictionary_id = {self.dictionary_id}, level = {self.level})"
+        )
+
+
+@public
+class PerMessageZstdResponse(PerMessageCompressResponse, PerMessageZstdMixin):
+    """
+    Set of parameters for `permessage-zstd` responded by server.
+    """
+
+    @classmethod
+    def parse(cls, params):
+        """
+        Parses a WebSocket extension response for `permessage-zstd` provided by a server to a client.
+
+        :param params: Output from :func:`autobahn.websocket.WebSocketProtocol._parseExtensionsHeader`.
+        :type params: list
+
+        :returns: A new instance of :class:`autobahn.compress.PerMessageZstdResponse`.
+        :rtype: obj
+        """
+        client_no_context_takeover = False
+        server_no_context_takeover = False
+        dictionary_id = 0
+
+        for p in params:
+            if len(params[p]) > 1:
+                raise Exception(
+                    f"multiple occurrence of extension parameter '{p}' for extension '{cls.EXTENSION_NAME}'"
+                )
+
+            val = params[p][0]
+
+            if p == "client_no_context_takeover":
+                # noinspection PySimplifyBooleanCheck
+                if val is not True:
+                    raise Exception(
+                        f"illegal extension parameter value '{val}' for parameter '{p}' of extension '{cls.EXTENSION_NAME}'"
+                    )
+                else:
+                    client_no_context_takeover = True
+
+            elif p == "server_no_context_takeover":
+                # noinspection PySimplifyBooleanCheck
+                if val is not True:
+                    raise Exception(
+                        f"illegal extension parameter value '{val}' for parameter '{p}' of extension '{cls.EXTENSION_NAME}'"
+                    )
+                else:
+                    server_no_context_takeover = True
+
+            elif p == "dictionary_id":
+                dictionary_id = cls._parse_dictionary_id(p, val)
+
+            else:
+                raise Exception(
+                    f"illegal extension parameter '{p}' for extension '{cls.EXTENSION_NAME}'"
+                )
+
+        response = cls(
+            client_no_context_takeover, server_no_context_takeover, dictionary_id
+        )
+        return response
+
+    def __init__(
+        self, client_no_context_takeover, server_no_context_takeover, dictionary_id=0
+    ):
+        self.client_no_context_takeover = client_no_context_takeover
+        self.server_no_context_takeover = server_no_context_takeover
+        self.dictionary_id = dictionary_id
+
+    def __json__(self):
+        """
+        Returns a JSON serializable object representation.
+
+        :returns: JSON serializable representation.
+        :rtype: dict
+        """
+        return {
+            "extension": self.EXTENSION_NAME,
+            "client_no_context_takeover": self.client_no_context_takeover,
+            "server_no_context_takeover": self.server_no_context_takeover,
+            "dictionary_id": self.dictionary_id,
+        }
+
+    def __repr__(self):
+        """
+        Returns Python object representation that can be eval'ed to reconstruct the object.
+
+        :returns: Python string representation.
+        :rtype: str
+        """
+        return (
+            f"PerMessageZstdResponse(client_no_context_takeover = {self.client_no_context_takeover}, server_no_context_takeover = {self.server_no_context_takeover}, dictionary_id = {self.dictionary_id})"
+        )
+
+
+@public
+class PerMessageZstdResponseAccept(
+    PerMessageCompressResponseAccept, PerMessageZstdMixin
+):
+    """
+    Set of parameters with which to accept an `permessage-zstd` response
+    from a server by a client.
+    """
+
+    def __init__(self, response, no_context_takeover=None, level=None):
+        """
+
+        :param response: The response being accepted.
+        :type response: Instance of :class:`autobahn.compress.PerMessageZstdResponse`.
+        :param no_context_takeover: Override client ("client-to-server direction") context takeover (this must be compatible with response).
+        :type no_context_takeover: bool
+        :param level: Set client ("client-to-server direction") compression level.
+        :type level: int
+        """
+        if not isinstance(response, PerMessageZstdResponse):
+            raise Exception(f"invalid type {type(response)} for response")
+
+        self.response = response
+
+        if no_context_takeover is not None:
+            if type(no_context_takeover) != bool:
+                raise Exception(
+                    f"invalid type {type(no_context_takeover)} for no_context_takeover"
+                )
+
+            if response.client_no_context_takeover and not no_context_takeover:
+                raise Exception(
+                    f"invalid value {no_context_takeover} for no_context_takeover - server requested feature"
+                )
+
+        self.no_context_takeover = no_context_takeover
+
+        if response.dictionary_id and get_dictionary(response.dictionary_id) is None:
+            raise Exception(
+                f"invalid value {response.dictionary_id} for dictionary_id - no such dictionary registered"
+            )
+
+        if level is not None:
+            if level not in self.LEVEL_PERMISSIBLE_VALUES:
+                raise Exception(
+                    f"invalid value {level} for level - permissible values {self.LEVEL_PERMISSIBLE_VALUES}"
+                )
+
+        self.level = level
+
+    def __json__(self):
+        """
+        Returns a JSON serializable object representation.
+
+        :returns: JSON serializable representation.
+        :rtype: dict
+        """
+        return {
+            "extension": self.EXTENSION_NAME,
+            "response": self.response.__json__(),
+            "no_context_takeover": self.no_context_takeover,
+            "level": self.level,
+        }
+
+    def __repr__(self):
+        """
+        Returns Python object representation that can be eval'ed to reconstruct the object.
+
+        :returns: Python string representation.
+        :rtype: str
+        """
+        return (
+            f"PerMessageZstdResponseAccept(response = {self.response.__repr__()}, no_context_takeover = {self.no_context_takeover}, level = {self.level})"
+        )
+
+
+@public
+class PerMessageZstd(PerMessageCompress, PerMessageZstdMixin):
+    """
+    `permessage-zstd` WebSocket extension processor.
+
+    With context takeover, all messages sent in one direction form a single zstd
+    frame, and every message is terminated by a block flush. Without context takeover,
+    every message is a complete zstd frame of its own.
+    """
+
+    DEFAULT_LEVEL = 3
+
+    @classmethod
+    def create_from_response_accept(cls, is_server, accept):
+        # accept: instance of PerMessageZstdResponseAccept
+        pmce = cls(
+            is_server,
+            accept.response.server_no_context_takeover,
+            (
+                accept.no_context_takeover
+                if accept.no_context_takeover is not None
+                else accept.response.client_no_context_takeover
+            ),
+            accept.response.dictionary_id,
+            accept.level,
+        )
+        return pmce
+
+    @classmethod
+    def create_from_offer_accept(cls, is_server, accept):
+        # accept: instance of PerMessageZstdOfferAccept
+        pmce = cls(
+            is_server,
+            (
+                accept.no_context_takeover
+                if accept.no_context_takeover is not None
+                else accept.offer.request_no_context_takeover
+            ),
+            accept.request_no_context_takeover,
+            accept.dictionary_id,
+            accept.level,
+        )
+        return pmce
+
+    def __init__(
+        self,
+        is_server,
+        server_no_context_takeover,
+        client_no_context_takeover,
+        dictionary_id=0,
+        level=None,
+    ):
+        self._is_server = is_server
+
+        self.server_no_context_takeover = server_no_context_takeover
+        self.client_no_context_takeover = client_no_context_takeover
+
+        self.dictionary_id = dictionary_id
+        self.level = level if level else self.DEFAULT_LEVEL
+
+        if dictionary_id:
+            dict_data = get_dictionary(dictionary_id)
+            if dict_data is None:
+                raise Exception(
+                    f"no zstd dictionary with ID {dictionary_id} registered"
+                )
+        else:
+            dict_data = None
+
+        if is_server:
+            self._compress_no_context_takeover = server_no_context_takeover
+            self._decompress_no_context_takeover = client_no_context_takeover
+        else:
+            self._compress_no_context_takeover = client_no_context_takeover
+            self._decompress_no_context_takeover = server_no_context_takeover
+
+        # the dictionary ID is negotiated, so there is no need to repeat it
+        # in the frame header of every message
+        self._cctx = zstandard.ZstdCompressor(
+            level=self.level,
+            dict_data=dict_data,
+            write_checksum=False,
+            write_dict_id=False,
+        )
+        self._dctx = zstandard.ZstdDecompressor(dict_data=dict_data)
+
+        if self._compress_no_context_takeover:
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_FINISH
+        else:
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+        self._compressor = None
+        self._decompressor = None
+
+    def __json__(self):
+        return {
+            "extension": self.EXTENSION_NAME,
+            "is_server": self._is_server,
+            "server_no_context_takeover": self.server_no_context_takeover,
+            "client_no_context_takeover": self.client_no_context_takeover,
+            "dictionary_id": self.dictionary_id,
+            "level": self.level,
+        }
+
+    def __repr__(self):
+        return (
+            f"PerMessageZstd(is_server = {self._is_server}, server_no_context_takeover = {self.server_no_context_takeover}, client_no_context_takeover = {self.client_no_context_takeover}, dictionary_id = {self.dictionary_id}, level = {self.level})"
+        )
+
+    def start_compress_message(self):
+        if self._compressor is None or self._compress_no_context_takeover:
+            self._compressor = self._cctx.compressobj()
+
+    def compress_message_data(self, data):
+        return self._compressor.compress(data)
+
+    def end_compress_message(self):
+        return self._compressor.flush(self._flush_mode)
+
+    def start_decompress_message(self):
+        if self._decompressor is None or self._decompress_no_context_takeover:
+            self._decompressor = self._dctx.decompressobj()
+
+    def decompress_message_data(self, data):
+        return self._decompressor.decompress(data)
+
+    def end_decompress_message(self):
+        pass
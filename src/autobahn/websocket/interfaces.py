@@ -153,6 +153,20 @@ class IWebSocketServerChannelFactory(abc.ABC):
         allowNullOrigin=False,
         maxConnections=None,
         trustXForwardedFor=0,
+        handshakeRate=None,
+        handshakeBurst=None,
+        handshakeRatePerPeer=None,
+        handshakeBurstPerPeer=None,
+        handshakeQueueSize=None,
+        compactConnection=None,
+        maxInFlightMessages=None,
+        maxInFlightBytes=None,
+        writeHighWaterMark=None,
+        writeLowWaterMark=None,
+        compressMinSize=None,
+        compressMaxEntropy=None,
+        compressMaxRatio=None,
+        compressOffloadSize=None,
     ):
         """
         Set WebSocket protocol options used as defaults for new protocol instances.
@@ -244,6 +258,84 @@ class IWebSocketServerChannelFactory(abc.ABC):
         :param trustXForwardedFor: Number of trusted web servers in front of this server that add their
             own X-Forwarded-For header (default: `0`)
         :type trustXForwardedFor: int
+
+        :param handshakeRate: Maximum rate of opening handshakes admitted (per second),
+            to protect established connections during a storm of new connections. Set
+            to `0` to disable (default: `0`). Handshakes exceeding the rate are queued
+            (see ``handshakeQueueSize``) or rejected with HTTP 503 and a ``Retry-After``
+            header. The limit applies after the HTTP request was received, before the
+            user's ``onConnect()`` is called.
+        :type handshakeRate: float
+
+        :param handshakeBurst: Number of opening handshakes admitted at once when
+            limited by ``handshakeRate`` (default: ``handshakeRate``, at least `1`).
+        :type handshakeBurst: int
+
+        :param handshakeRatePerPeer: Maximum rate of opening handshakes admitted per peer
+            (per second, see ``trustXForwardedFor`` for how peers are identified). Set
+            to `0` to disable (default: `0`). Handshakes exceeding the rate are rejected
+            with HTTP 503 and a ``Retry-After`` header.
+        :type handshakeRatePerPeer: float
+
+        :param handshakeBurstPerPeer: Number of opening handshakes admitted at once per
+            peer when limited by ``handshakeRatePerPeer`` (default:
+            ``handshakeRatePerPeer``, at least `1`).
+        :type handshakeBurstPerPeer: int
+
+        :param handshakeQueueSize: Number of opening handshakes exceeding
+            ``handshakeRate`` that are queued until admitted, rather than rejected
+            (default: `0`). Queued handshakes are still subject to
+            ``openHandshakeTimeout``.
+        :type handshakeQueueSize: int
+
+        :param compactConnection: Trim per-connection state of open connections: drop opening
+            handshake data after ``onOpen`` and allocate traffic statistics and the UTF-8
+            validator only on first use (default: `False`).
+        :type compactConnection: bool
+
+        :param maxInFlightMessages: Pause reading from the transport while this many received
+            messages are still being processed by ``onMessage`` handlers (that returned a
+            Deferred/Future) or `0` for no limit (default: `0`).
+        :type maxInFlightMessages: int
+
+        :param maxInFlightBytes: Pause reading from the transport while received messages with
+            this many payload bytes in total are still being processed or `0` for no limit
+            (default: `0`).
+        :type maxInFlightBytes: int
+
+        :param writeHighWaterMark: Enable write-side flow control: the connection is considered
+            not writable while the outgoing transport buffer holds more than this many bytes,
+            or `0` to disable (default: `0`). With Twisted, this sets the transport buffer size.
+        :type writeHighWaterMark: int
+
+        :param writeLowWaterMark: The connection becomes writable again once the outgoing
+            transport buffer drained below this many bytes (default: `0`). Only honored
+            with asyncio; Twisted resumes producers when the buffer is empty.
+        :type writeLowWaterMark: int
+
+        :param compressMinSize: With a permessage-compress extension in use, send messages
+            with less than this many payload octets uncompressed (default: `0`).
+        :type compressMinSize: int
+
+        :param compressMaxEntropy: Send messages uncompressed that look incompressible:
+            when the Shannon entropy of the octet values in a sample of the payload is above
+            this many bits per octet, or `0` to disable (default: `0`). A value of `7` catches
+            random or already compressed data (text, including non-ASCII UTF-8, has about
+            4 to 6 bits per octet).
+        :type compressMaxEntropy: float
+
+        :param compressMaxRatio: Track the compression ratio (compressed size / uncompressed
+            size) of each connection, and send messages uncompressed for a while when it
+            exceeds this value, or `0` to disable (default: `0`).
+        :type compressMaxRatio: float
+
+        :param compressOffloadSize: Compress messages with at least this many payload octets
+            (and decompress frames of at least this size) in a worker thread, or `0` to
+            disable (default: `0`). ``sendMessage`` then returns a Deferred/Future for these
+            messages and any messages sent while one is being compressed, which are queued
+            to keep their order (as are prepared messages, while ``beginMessage`` raises).
+            Processing of incoming data is suspended while a frame is being decompressed.
+        :type compressOffloadSize: int
         """
 
     @public
@@ -357,6 +449,15 @@ class IWebSocketClientChannelFactory(abc.ABC):
         autoPingInterval=None,
         autoPingTimeout=None,
         autoPingSize=None,
+        compactConnection=None,
+        maxInFlightMessages=None,
+        maxInFlightBytes=None,
+        writeHighWaterMark=None,
+        writeLowWaterMark=None,
+        compressMinSize=None,
+        compressMaxEntropy=None,
+        compressMaxRatio=None,
+        compressOffloadSize=None,
     ):
         """
         Set WebSocket protocol options used as defaults for _new_ protocol instances.
@@ -431,6 +532,55 @@ class IWebSocketClientChannelFactory(abc.ABC):
         :param autoPingSize: Payload size for automatic pings/pongs. Must be an integer
             from `[12, 125]`. (default: `12`).
         :type autoPingSize: int
+
+        :param compactConnection: Trim per-connection state of open connections: drop opening
+            handshake data after ``onOpen`` and allocate traffic statistics and the UTF-8
+            validator only on first use (default: `False`).
+        :type compactConnection: bool
+
+        :param maxInFlightMessages: Pause reading from the transport while this many received
+            messages are still being processed by ``onMessage`` handlers (that returned a
+            Deferred/Future) or `0` for no limit (default: `0`).
+        :type maxInFlightMessages: int
+
+        :param maxInFlightBytes: Pause reading from the transport while received messages with
+            this many payload bytes in total are still being processed or `0` for no limit
+            (default: `0`).
+        :type maxInFlightBytes: int
+
+        :param writeHighWaterMark: Enable write-side flow control: the connection is considered
+            not writable while the outgoing transport buffer holds more than this many bytes,
+            or `0` to disable (default: `0`). With Twisted, this sets the transport buffer size.
+        :type writeHighWaterMark: int
+
+        :param writeLowWaterMark: The connection becomes writable again once the outgoing
+            transport buffer drained below this many bytes (default: `0`). Only honored
+            with asyncio; Twisted resumes producers when the buffer is empty.
+        :type writeLowWaterMark: int
+
+        :param compressMinSize: With a permessage-compress extension in use, send messages
+            with less than this many payload octets uncompressed (default: `0`).
+        :type compressMinSize: int
+
+        :param compressMaxEntropy: Send messages uncompressed that look incompressible:
+            when the Shannon entropy of the octet values in a sample of the payload is above
+            this many bits per octet, or `0` to disable (default: `0`). A value of `7` catches
+            random or already compressed data (text, including non-ASCII UTF-8, has about
+            4 to 6 bits per octet).
+        :type compressMaxEntropy: float
+
+        :param compressMaxRatio: Track the compression ratio (compressed size / uncompressed
+            size) of each connection, and send messages uncompressed for a while when it
+            exceeds this value, or `0` to disable (default: `0`).
+        :type compressMaxRatio: float
+
+        :param compressOffloadSize: Compress messages with at least this many payload octets
+            (and decompress frames of at least this size) in a worker thread, or `0` to
+            disable (default: `0`). ``sendMessage`` then returns a Deferred/Future for these
+            messages and any messages sent while one is being compressed, which are queued
+            to keep their order (as are prepared messages, while ``beginMessage`` raises).
+            Processing of incoming data is suspended while a frame is being decompressed.
+        :type compressOffloadSize: int
         """
 
     @public
@@ -537,6 +687,10 @@ class IWebSocketChannel(abc.ABC):
         :param payload: The WebSocket message to be sent.
 
         :param isBinary: Flag indicating whether payload is binary or UTF-8 encoded text.
+
+        :returns: ``None`` when the message was sent right away, or a Deferred/Future that
+            fires once the message was sent, when it is compressed in a worker thread
+            (see the ``compressOffloadSize`` option) or queued behind such a message.
         """
 
     @public
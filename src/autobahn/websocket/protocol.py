@@ -31,12 +31,15 @@ import binascii
 import copy
 import hashlib
 import json
+import math
 import os
 import pickle
 import random
+import re
 import struct
 import time
-from collections import deque
+from collections import Counter, deque
+from functools import lru_cache
 from pprint import pformat
 from typing import Literal, overload
 from collections.abc import Iterator
@@ -47,17 +50,22 @@ import txaio
 
 from autobahn import __version__
 from autobahn.exception import Disconnected, PayloadExceededError
+from autobahn.metrics import ConnectionMetrics
 from autobahn.util import (
     ObservableMixin,
+    ReadThrottle,
     Stopwatch,
+    WriteFlowControl,
     _LazyHexFormatter,
     _maybe_tls_reason,
     encode_truncate,
     hltype,
     hlval,
+    log_enabled,
     wildcards2patterns,
 )
 from autobahn.wamp.types import TransportDetails
+from autobahn.websocket.admission import HandshakeAdmission
 from autobahn.websocket.compress import PERMESSAGE_COMPRESSION_EXTENSION
 from autobahn.websocket.interfaces import (
     IWebSocketChannel,
@@ -167,6 +175,25 @@ def _is_same_origin(websocket_origin, host_scheme, host_port, host_policy):
 
 
 class TrafficStats:
+    __slots__ = (
+        "outgoingOctetsWireLevel",
+        "outgoingOctetsWebSocketLevel",
+        "outgoingOctetsAppLevel",
+        "outgoingWebSocketFrames",
+        "outgoingWebSocketMessages",
+        "incomingOctetsWireLevel",
+        "incomingOctetsWebSocketLevel",
+        "incomingOctetsAppLevel",
+        "incomingWebSocketFrames",
+        "incomingWebSocketMessages",
+        "preopenOutgoingOctetsWireLevel",
+        "preopenIncomingOctetsWireLevel",
+        "outgoingCompressedMessages",
+        "outgoingCompressSkippedSize",
+        "outgoingCompressSkippedEntropy",
+        "outgoingCompressSkippedRatio",
+    )
+
     def __init__(self):
         self.reset()
 
@@ -191,6 +218,14 @@ class TrafficStats:
         self.preopenOutgoingOctetsWireLevel = 0
         self.preopenIncomingOctetsWireLevel = 0
 
+        # decisions of the adaptive per-message compression policy: messages sent
+        # compressed, and messages sent uncompressed since they were too small, looked
+        # incompressible or the connection's compression ratio didn't pay off
+        self.outgoingCompressedMessages = 0
+        self.outgoingCompressSkippedSize = 0
+        self.outgoingCompressSkippedEntropy = 0
+        self.outgoingCompressSkippedRatio = 0
+
     def __json__(self):
         # compression ratio = compressed size / uncompressed size
         #
@@ -231,6 +266,10 @@ class TrafficStats:
             "outgoingWebSocketFrames": self.outgoingWebSocketFrames,
             "outgoingWebSocketMessages": self.outgoingWebSocketMessages,
             "preopenOutgoingOctetsWireLevel": self.preopenOutgoingOctetsWireLevel,
+            "outgoingCompressedMessages": self.outgoingCompressedMessages,
+            "outgoingCompressSkippedSize": self.outgoingCompressSkippedSize,
+            "outgoingCompressSkippedEntropy": self.outgoingCompressSkippedEntropy,
+            "outgoingCompressSkippedRatio": self.outgoingCompressSkippedRatio,
             "incomingOctetsWireLevel": self.incomingOctetsWireLevel,
             "incomingOctetsWebSocketLevel": self.incomingOctetsWebSocketLevel,
             "incomingOctetsAppLevel": self.incomingOctetsAppLevel,
@@ -244,6 +283,69 @@ class TrafficStats:
     def __str__(self):
         return json.dumps(self.__json__())
 
+    _METRICS = (
+        ("outgoingOctetsWireLevel", "outgoing_wire_octets", "Octets sent on the wire."),
+        (
+            "outgoingOctetsWebSocketLevel",
+            "outgoing_payload_octets",
+            "Message payload octets sent (after compression).",
+        ),
+        (
+            "outgoingOctetsAppLevel",
+            "outgoing_app_octets",
+            "Message payload octets sent (before compression).",
+        ),
+        ("outgoingWebSocketFrames", "outgoing_frames", "Data frames sent."),
+        ("outgoingWebSocketMessages", "outgoing_messages", "Messages sent."),
+        (
+            "outgoingCompressedMessages",
+            "outgoing_compressed_messages",
+            "Messages sent compressed.",
+        ),
+        ("incomingOctetsWireLevel", "incoming_wire_octets", "Octets received."),
+        (
+            "incomingOctetsWebSocketLevel",
+            "incoming_payload_octets",
+            "Message payload octets received (before decompression).",
+        ),
+        (
+            "incomingOctetsAppLevel",
+            "incoming_app_octets",
+            "Message payload octets received (after decompression).",
+        ),
+        ("incomingWebSocketFrames", "incoming_frames", "Data frames received."),
+        ("incomingWebSocketMessages", "incoming_messages", "Messages received."),
+        (
+            "preopenOutgoingOctetsWireLevel",
+            "preopen_outgoing_wire_octets",
+            "Octets sent before the connection was open.",
+        ),
+        (
+            "preopenIncomingOctetsWireLevel",
+            "preopen_incoming_wire_octets",
+            "Octets received before the connection was open.",
+        ),
+    )
+
+    def collect_metrics(self, metrics) -> None:
+        """
+        Report the traffic statistics as counters.
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        for attr, name, help in self._METRICS:
+            metrics.counter(
+                f"autobahn_websocket_{name}_total", getattr(self, attr), help
+            )
+        for reason in ("Size", "Entropy", "Ratio"):
+            metrics.counter(
+                "autobahn_websocket_outgoing_compress_skipped_total",
+                getattr(self, "outgoingCompressSkipped" + reason),
+                "Messages sent uncompressed by the adaptive compression policy.",
+                {"reason": reason.lower()},
+            )
+
 
 class FrameHeader:
     """
@@ -252,6 +354,8 @@ class FrameHeader:
     FOR INTERNAL USE ONLY!
     """
 
+    __slots__ = ("opcode", "fin", "rsv", "length", "mask")
+
     def __init__(self, opcode: int, fin: bool, rsv: int, length: int, mask: str):
         """
         Constructor.
@@ -289,16 +393,17 @@ def parseHttpHeader(data: bytes) -> tuple[str, dict[str, str], dict[str, int]]:
     #   - http://tools.ietf.org/html/rfc5987
     #   - https://github.com/crossbario/autobahn-python/issues/533
     #
-    raw = data.decode("iso-8859-1").splitlines()
-    http_status_line = raw[0].strip()
+    # single pass over the raw header lines, decoding header keys and values only
+    lines = data.splitlines()
+    http_status_line = lines[0].strip().decode("iso-8859-1")
     http_headers: dict[str, str] = {}
     http_headers_cnt: dict[str, int] = {}
-    for h in raw[1:]:
-        i = h.find(":")
+    for line in lines[1:]:
+        i = line.find(b":")
         if i > 0:
             # HTTP header keys are case-insensitive
-            key = h[:i].strip().lower()
-            value = h[i + 1 :].strip()
+            key = line[:i].strip().lower().decode("iso-8859-1")
+            value = line[i + 1 :].strip().decode("iso-8859-1")
 
             # handle HTTP headers split across multiple lines
             if key in http_headers:
@@ -313,12 +418,99 @@ def parseHttpHeader(data: bytes) -> tuple[str, dict[str, str], dict[str, int]]:
     return http_status_line, http_headers, http_headers_cnt
 
 
+def _format_http_headers(headers) -> str:
+    """
+    Format HTTP headers (a dict mapping header names to a value, or to an iterable
+    of values for headers to be sent multiple times) into header lines.
+
+    FOR INTERNAL USE ONLY!
+    """
+    lines = []
+    for name, value in headers.items():
+        if isinstance(value, str):
+            values = [value]
+        else:
+            try:
+                values = iter(value)
+            except TypeError:
+                values = [value]
+        for v in values:
+            lines.append(f"{name}: {v}\x0d\x0a")
+    return "".join(lines)
+
+
+# clients of a server usually send the very same Sec-WebSocket-Protocol and
+# Sec-WebSocket-Extensions headers, so the results of parsing these are cached
+# (as immutable values)
+
+
+@lru_cache(maxsize=256)
+def _parse_protocols_header(header: str) -> tuple[tuple[str, ...], str | None]:
+    """
+    Parse the Sec-WebSocket-Protocol header.
+
+    FOR INTERNAL USE ONLY!
+
+    :returns: Tuple of the protocols in the order given and the first protocol
+        listed more than once (or ``None``).
+    """
+    protocols = tuple(x.strip() for x in header.split(","))
+    seen = set()
+    for p in protocols:
+        if p in seen:
+            return protocols, p
+        seen.add(p)
+    return protocols, None
+
+
+@lru_cache(maxsize=256)
+def _parse_extensions_header(header: str, removeQuotes: bool) -> tuple:
+    """
+    Parse the Sec-WebSocket-Extensions header.
+
+    FOR INTERNAL USE ONLY!
+
+    :returns: Tuple of ``(extension, params)`` pairs, where ``params`` is a tuple
+        of ``(key, values)`` pairs.
+    """
+    extensions = []
+    exts = [x.strip() for x in header.split(",")]
+    for e in exts:
+        if e != "":
+            ext = [x.strip() for x in e.split(";")]
+            extension = ext[0].lower()
+            params = {}
+            for p in ext[1:]:
+                p = [x.strip() for x in p.split("=")]
+                key = p[0].lower()
+                if len(p) > 1:
+                    value = "=".join(p[1:])
+                    if removeQuotes:
+                        if len(value) > 0 and value[0] == '"':
+                            value = value[1:]
+                        if len(value) > 0 and value[-1] == '"':
+                            value = value[:-1]
+                else:
+                    value = True
+                params.setdefault(key, []).append(value)
+            extensions.append(
+                (extension, tuple((k, tuple(v)) for k, v in params.items()))
+            )
+    return tuple(extensions)
+
+
+# Sec-WebSocket-Key: base64 encoding of 16 random bytes
+_WS_KEY_PAT = re.compile(r"[a-zA-Z0-9+/]{22}==")
+
+
 class Timings:
     """
     Helper class to track timings by key. This class also supports item access,
     iteration and conversion to string.
     """
 
+    __slots__ = ("_stopwatch", "_timings")
+
     def __init__(self):
         self._stopwatch = Stopwatch()
         self._timings: dict[str, float] = {}
@@ -443,6 +635,30 @@ class WebSocketProtocol(ObservableMixin):
     For synched/chopped writes, this is the reactor reentry delay in seconds.
     """
 
+    _corked = None
+    """
+    While not ``None``, the data of (unsynched, unchopped) writes is collected here
+    and written at once by :meth:`_uncork`.
+    """
+
+    COMPRESS_ENTROPY_SAMPLE_SIZE = 512
+    """
+    Number of leading payload octets sampled to estimate the entropy of an outgoing
+    message (see ``compressMaxEntropy``).
+    """
+
+    COMPRESS_RATIO_WINDOW = 16
+    """
+    Number of compressed messages over which the compression ratio of a connection
+    is evaluated (see ``compressMaxRatio``).
+    """
+
+    COMPRESS_RATIO_BACKOFF = 256
+    """
+    Number of messages sent uncompressed after compression did not pay off, before
+    compression is tried again (see ``compressMaxRatio``).
+    """
+
     MESSAGE_TYPE_TEXT = 1
     """
     WebSocket text message type (UTF-8 payload).
@@ -552,6 +768,15 @@ class WebSocketProtocol(ObservableMixin):
         "autoPingTimeout",
         "autoPingSize",
         "autoPingRestartOnAnyTraffic",
+        "compactConnection",
+        "maxInFlightMessages",
+        "maxInFlightBytes",
+        "writeHighWaterMark",
+        "writeLowWaterMark",
+        "compressMinSize",
+        "compressMaxEntropy",
+        "compressMaxRatio",
+        "compressOffloadSize",
     ]
     """
     Configuration attributes common to servers and clients.
@@ -570,6 +795,11 @@ class WebSocketProtocol(ObservableMixin):
         "allowNullOrigin",
         "maxConnections",
         "trustXForwardedFor",
+        "handshakeRate",
+        "handshakeBurst",
+        "handshakeRatePerPeer",
+        "handshakeBurstPerPeer",
+        "handshakeQueueSize",
     ]
     """
     Configuration attributes specific to servers.
@@ -1100,6 +1330,47 @@ class WebSocketProtocol(ObservableMixin):
             else:
                 self.trackedTimings = None
 
+    _trafficStats: TrafficStats | None = None
+
+    @property
+    def trafficStats(self) -> TrafficStats:
+        """
+        Traffic statistics for this connection.
+
+        With ``compactConnection`` enabled, the statistics object is only allocated
+        (and traffic counted from then on) when this attribute is first accessed.
+        """
+        if self._trafficStats is None:
+            self._trafficStats = TrafficStats()
+        return self._trafficStats
+
+    @trafficStats.setter
+    def trafficStats(self, stats: TrafficStats | None) -> None:
+        self._trafficStats = stats
+
+    def collect_metrics(self, metrics) -> None:
+        """
+        Report the metrics of this connection. The factory reports the metrics of
+        all its connections aggregated (see :mod:`autobahn.metrics`).
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        stats = self._trafficStats
+        if stats is not None:
+            stats.collect_metrics(metrics)
+
+    def _dropHandshakeState(self) -> None:
+        """
+        Release opening handshake artefacts no longer needed once the connection
+        is open. Only called when ``compactConnection`` is enabled.
+        """
+        self.http_request_data = None
+        self.http_response_data = None
+        self.http_status_line = None
+        self.http_headers = None
+        self.websocket_extensions = None
+
     def _connectionMade(self) -> None:
         """
         This is called by network framework when a new TCP connection has been established
@@ -1109,6 +1380,7 @@ class WebSocketProtocol(ObservableMixin):
         # those), but only copy if not already set on protocol instance (allow
         # to set configuration individually)
         #
+        debug = log_enabled(self.log, "debug")
         configAttrLog = []
         for configAttr in self.CONFIG_ATTRS:
             if not hasattr(self, configAttr):
@@ -1116,21 +1388,53 @@ class WebSocketProtocol(ObservableMixin):
                 configAttrSource = self.factory.__class__.__name__
             else:
                 configAttrSource = self.__class__.__name__
-            configAttrLog.append(
-                (configAttr, getattr(self, configAttr), configAttrSource)
-            )
+            if debug:
+                configAttrLog.append(
+                    (configAttr, getattr(self, configAttr), configAttrSource)
+                )
+
+        if debug:
+            self.log.debug("\n{attrs}", attrs=pformat(configAttrLog))
 
-        self.log.debug("\n{attrs}", attrs=pformat(configAttrLog))
+        # factories not initialized through the WebSocket factory base classes
+        # have no connection metrics
+        metrics = getattr(self.factory, "_connectionMetrics", None)
+        if metrics is not None:
+            metrics.opened(self)
 
         # permessage-compress extension
         self._perMessageCompress = None
 
+        # adaptive per-message compression policy
+        self._adaptiveCompress = bool(
+            self.compressMinSize or self.compressMaxEntropy or self.compressMaxRatio
+        )
+        self._compressRatioIn = 0
+        self._compressRatioOut = 0
+        self._compressRatioCount = 0
+        self._compressBackoff = 0
+
+        # set while a message is being compressed in a worker thread, and messages
+        # queued behind it
+        self._offloadBusy = False
+        self._offloadQueue = deque()
+
+        # set while a frame is being decompressed in a worker thread
+        self._decompressPending = False
+
+        # set when the connection was lost while a worker thread (de)compresses:
+        # the compression context is closed when the thread is done
+        self._compressClosePending = False
+
         # Time tracking
         self.trackedTimings = None
         self.setTrackTimings(self.trackTimings)
 
-        # Traffic stats
-        self.trafficStats = TrafficStats()
+        # Traffic stats (in compact mode, allocated on first access only)
+        if self.compactConnection:
+            self._trafficStats = None
+        else:
+            self._trafficStats = TrafficStats()
 
         # initial state
         if not self.factory.isServer and self.factory.proxy is not None:
@@ -1146,8 +1450,30 @@ class WebSocketProtocol(ObservableMixin):
         self.send_queue = deque()
         self.triggered = False
 
-        # incremental UTF8 validator
-        self.utf8validator = Utf8Validator()
+        # incremental UTF8 validator (in compact mode, allocated on first text message)
+        if self.compactConnection:
+            self.utf8validator = None
+        else:
+            self.utf8validator = Utf8Validator()
+
+        # read-side backpressure: pause reading while too many messages are still
+        # being processed by (asynchronous) onMessage handlers
+        if self.maxInFlightMessages or self.maxInFlightBytes:
+            self.readThrottle = ReadThrottle(
+                self._pauseReading,
+                self._resumeReading,
+                self.maxInFlightMessages,
+                self.maxInFlightBytes,
+            )
+        else:
+            self.readThrottle = None
+
+        # write-side flow control: track the outgoing transport buffer (the
+        # networking framework specific classes hook this up to the transport)
+        if self.writeHighWaterMark:
+            self.writeFlow = WriteFlowControl()
+        else:
+            self.writeFlow = None
 
         # track when frame/message payload sizes (incoming) were exceeded
         self.wasMaxFramePayloadSizeExceeded = False
@@ -1220,6 +1546,29 @@ class WebSocketProtocol(ObservableMixin):
                 self.onOpenHandshakeTimeout,
             )
 
+    def _pauseReading(self) -> None:
+        """
+        Stop reading from the underlying transport. Must be implemented by the
+        networking framework specific derived class.
+        """
+        raise Exception("must implement pausing of reads in derived class")
+
+    def _resumeReading(self) -> None:
+        """
+        Resume reading from the underlying transport. Must be implemented by the
+        networking framework specific derived class.
+        """
+        raise Exception("must implement resuming of reads in derived class")
+
+    def _runInThread(self, fun, *args):
+        """
+        Run a function in a worker thread. Must be implemented by the networking
+        framework specific derived class.
+
+        :returns: A Deferred/Future that fires with the result of the function.
+        """
+        raise Exception("must implement running in worker threads in derived class")
+
     def _connectionLost(self, reason: str) -> None:
         """
         This is called by network framework when a transport connection was
@@ -1258,6 +1607,22 @@ class WebSocketProtocol(ObservableMixin):
             self.openHandshakeTimeoutCall.cancel()
             self.openHandshakeTimeoutCall = None
 
+        if self.readThrottle is not None:
+            self.readThrottle.stop()
+
+        if self.writeFlow is not None:
+            self.writeFlow.stop(Disconnected("WebSocket connection lost"))
+
+        if self._perMessageCompress is not None:
+            if self._offloadBusy or self._decompressPending:
+                self._compressClosePending = True
+            else:
+                self._perMessageCompress.close()
+
+        metrics = getattr(self.factory, "_connectionMetrics", None)
+        if metrics is not None:
+            metrics.closed(self)
+
         # check required here because in some scenarios dropConnection
         # will already have resolved the Future/Deferred.
         if self.state != WebSocketProtocol.STATE_CLOSED:
@@ -1358,17 +1723,22 @@ class WebSocketProtocol(ObservableMixin):
         connection.
         """
         if self.state == WebSocketProtocol.STATE_OPEN:
-            self.trafficStats.incomingOctetsWireLevel += len(data)
+            stats = self._trafficStats
+            if stats is not None:
+                stats.incomingOctetsWireLevel += len(data)
         elif (
             self.state == WebSocketProtocol.STATE_CONNECTING
             or self.state == WebSocketProtocol.STATE_PROXY_CONNECTING
         ):
-            self.trafficStats.preopenIncomingOctetsWireLevel += len(data)
+            stats = self._trafficStats
+            if stats is not None:
+                stats.preopenIncomingOctetsWireLevel += len(data)
 
         if self.logOctets:
             self.logRxOctets(data)
         self.data += data
-        self.consumeData()
+        if not self._decompressPending:
+            self.consumeData()
 
     def consumeData(self) -> None:
         """
@@ -1446,12 +1816,16 @@ class WebSocketProtocol(ObservableMixin):
                 self.transport.write(e[0])
 
                 if self.state == WebSocketProtocol.STATE_OPEN:
-                    self.trafficStats.outgoingOctetsWireLevel += len(e[0])
+                    stats = self._trafficStats
+                    if stats is not None:
+                        stats.outgoingOctetsWireLevel += len(e[0])
                 elif (
                     self.state == WebSocketProtocol.STATE_CONNECTING
                     or self.state == WebSocketProtocol.STATE_PROXY_CONNECTING
                 ):
-                    self.trafficStats.preopenOutgoingOctetsWireLevel += len(e[0])
+                    stats = self._trafficStats
+                    if stats is not None:
+                        stats.preopenOutgoingOctetsWireLevel += len(e[0])
 
                 if self.logOctets:
                     self.logTxOctets(e[0], e[1])
@@ -1477,6 +1851,15 @@ class WebSocketProtocol(ObservableMixin):
         is also different from the TcpNoDelay option which can be set on the
         socket.
         """
+        corked = self._corked
+        if corked is not None:
+            if not sync and not chopsize:
+                corked.append(data)
+                return
+            # keep the order of writes
+            self._uncork()
+            self._corked = []
+
         if chopsize and chopsize > 0:
             i = 0
             n = len(data)
@@ -1495,32 +1878,61 @@ class WebSocketProtocol(ObservableMixin):
                 self._trigger()
             else:
                 self.transport.write(data)
-                self.log.debug(
-                    "{func} sent {data_len} bytes for peer {peer}",
-                    func=hltype(self.sendData),
-                    peer=hlval(self.peer),
-                    data_len=hlval(len(data)),
-                )
+                if log_enabled(self.log, "debug"):
+                    self.log.debug(
+                        "{func} sent {data_len} bytes for peer {peer}",
+                        func=hltype(self.sendData),
+                        peer=hlval(self.peer),
+                        data_len=hlval(len(data)),
+                    )
 
                 if self.state == WebSocketProtocol.STATE_OPEN:
-                    self.trafficStats.outgoingOctetsWireLevel += len(data)
+                    stats = self._trafficStats
+                    if stats is not None:
+                        stats.outgoingOctetsWireLevel += len(data)
                 elif (
                     self.state == WebSocketProtocol.STATE_CONNECTING
                     or self.state == WebSocketProtocol.STATE_PROXY_CONNECTING
                 ):
-                    self.trafficStats.preopenOutgoingOctetsWireLevel += len(data)
+                    stats = self._trafficStats
+                    if stats is not None:
+                        stats.preopenOutgoingOctetsWireLevel += len(data)
 
                 if self.logOctets:
                     self.logTxOctets(data, False)
 
-    def sendPreparedMessage(self, preparedMsg: PreparedMessage) -> None:
+    def _cork(self) -> None:
+        """
+        Collect the data of all following writes until :meth:`_uncork` is called,
+        to write the frames of several messages to the transport at once.
+        """
+        if self._corked is None:
+            self._corked = []
+
+    def _uncork(self) -> None:
+        """
+        Write the data collected since :meth:`_cork` was called.
+        """
+        corked = self._corked
+        self._corked = None
+        if corked:
+            self.sendData(corked[0] if len(corked) == 1 else b"".join(corked))
+
+    def sendPreparedMessage(self, preparedMsg: PreparedMessage):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketChannel.sendPreparedMessage`
         """
+        # keep messages in order behind a message being compressed in a worker thread
+        #
+        if self._offloadBusy:
+            d = txaio.create_future()
+            self._offloadQueue.append((self.sendPreparedMessage, (preparedMsg,), d))
+            return d
+
         if self._perMessageCompress is None or preparedMsg.doNotCompress:
             self.sendData(preparedMsg.payloadHybi)
         else:
-            self.sendMessage(preparedMsg.payload, preparedMsg.binary)
+            return self.sendMessage(preparedMsg.payload, preparedMsg.binary)
 
     def processData(self) -> bool:
         """
@@ -1821,7 +2233,10 @@ class WebSocketProtocol(ObservableMixin):
                     self.current_frame.opcode == WebSocketProtocol.MESSAGE_TYPE_TEXT
                     and self.utf8validateIncoming
                 ):
-                    self.utf8validator.reset()
+                    if self.utf8validator is None:
+                        self.utf8validator = Utf8Validator()
+                    else:
+                        self.utf8validator.reset()
                     self.utf8validateIncomingCurrentMessage = True
                     self.utf8validateLast = (True, True, 0, 0)
                 else:
@@ -1851,35 +2266,82 @@ class WebSocketProtocol(ObservableMixin):
             #
             if self._isMessageCompressed:
                 compressedLen = len(payload)
-                self.log.debug(
-                    "RX compressed [length]: octets",
-                    legnth=compressedLen,
-                    octets=_LazyHexFormatter(payload),
-                )
+                if log_enabled(self.log, "debug"):
+                    self.log.debug(
+                        "RX compressed [{length}]: {octets}",
+                        length=compressedLen,
+                        octets=_LazyHexFormatter(payload),
+                    )
+
+                # decompress large frames in a worker thread, and stop processing
+                # incoming data until done
+                if 0 < self.compressOffloadSize <= self.current_frame.length:
+                    self._decompressPending = True
+                    txaio.add_callbacks(
+                        self._runInThread(
+                            self._perMessageCompress.decompress_message_data, payload
+                        ),
+                        lambda payload: self._onFrameDataDecompressed(
+                            payload, compressedLen
+                        ),
+                        self._onDecompressError,
+                    )
+                    return False
 
                 # XXX oberstet
                 payload = self._perMessageCompress.decompress_message_data(payload)
-                uncompressedLen = len(payload)
+
             else:
-                l = len(payload)
-                compressedLen = l
-                uncompressedLen = l
+                compressedLen = len(payload)
 
-            if self.state == WebSocketProtocol.STATE_OPEN:
-                self.trafficStats.incomingOctetsWebSocketLevel += compressedLen
-                self.trafficStats.incomingOctetsAppLevel += uncompressedLen
+            return self._processFrameData(payload, compressedLen)
 
-            # incrementally validate UTF-8 payload
-            #
-            if self.utf8validateIncomingCurrentMessage:
-                self.utf8validateLast = self.utf8validator.validate(payload)
-                if not self.utf8validateLast[0]:
-                    if self._invalid_payload(
-                        f"encountered invalid UTF-8 while processing text message at payload octet index {self.utf8validateLast[3]}"
-                    ):
-                        return False
+    def _onFrameDataDecompressed(self, payload: bytes, compressedLen: int) -> None:
+        """
+        Continue processing a frame after its data was decompressed in a worker thread.
+        """
+        self._decompressPending = False
+        if self.state == WebSocketProtocol.STATE_CLOSED:
+            self._closeOffloadedCompress()
+            return
+
+        # the remaining steps of processData()
+        if self._processFrameData(payload, compressedLen) is False:
+            return
+        if self.current_frame_masker.pointer() == self.current_frame.length:
+            if self.onFrameEnd() is False:
+                return
 
-            self._onMessageFrameData(payload)
+        # continue with data buffered in the meantime
+        self.consumeData()
+
+    def _onDecompressError(self, fail) -> None:
+        self._decompressPending = False
+        self._closeOffloadedCompress()
+        if self.state != WebSocketProtocol.STATE_CLOSED:
+            self._invalid_payload(f"decompression of frame data failed: {fail.value}")
+
+    def _processFrameData(self, payload: bytes, compressedLen: int) -> bool | None:
+        """
+        Process (decompressed) data of a data frame.
+        """
+        if self.state == WebSocketProtocol.STATE_OPEN:
+            stats = self._trafficStats
+            if stats is not None:
+                stats.incomingOctetsWebSocketLevel += compressedLen
+                stats.incomingOctetsAppLevel += len(payload)
+
+        # incrementally validate UTF-8 payload
+        #
+        if self.utf8validateIncomingCurrentMessage:
+            self.utf8validateLast = self.utf8validator.validate(payload)
+            if not self.utf8validateLast[0]:
+                if self._invalid_payload(
+                    f"encountered invalid UTF-8 while processing text message at payload octet index {self.utf8validateLast[3]}"
+                ):
+                    return False
+
+        self._onMessageFrameData(payload)
 
     def onFrameEnd(self) -> bool | None:
         """
@@ -1891,7 +2353,9 @@ class WebSocketProtocol(ObservableMixin):
             self.processControlFrame()
         else:
             if self.state == WebSocketProtocol.STATE_OPEN:
-                self.trafficStats.incomingWebSocketFrames += 1
+                stats = self._trafficStats
+                if stats is not None:
+                    stats.incomingWebSocketFrames += 1
             if self.logFrames:
                 self.logRxFrame(self.current_frame, self.frame_data)
 
@@ -1919,7 +2383,9 @@ class WebSocketProtocol(ObservableMixin):
                             return False
 
                 if self.state == WebSocketProtocol.STATE_OPEN:
-                    self.trafficStats.incomingWebSocketMessages += 1
+                    stats = self._trafficStats
+                    if stats is not None:
+                        stats.incomingWebSocketMessages += 1
 
                 self._onMessageEnd()
                 self.inside_message = False
@@ -2099,7 +2565,9 @@ class WebSocketProtocol(ObservableMixin):
 
         raw = b"".join([b0.to_bytes(1, "big"), b1.to_bytes(1, "big"), el, mv, plm])
         if opcode in [0, 1, 2]:
-            self.trafficStats.outgoingWebSocketFrames += 1
+            stats = self._trafficStats
+            if stats is not None:
+                stats.outgoingWebSocketFrames += 1
 
         if self.logFrames:
             frameHeader = FrameHeader(opcode, fin, rsv, l, mask)
@@ -2287,6 +2755,13 @@ class WebSocketProtocol(ObservableMixin):
                 "WebSocketProtocol.beginMessage invalid in current sending state"
             )
 
+        # the compressor is in use by a worker thread (see compressOffloadSize)
+        #
+        if self._offloadBusy:
+            raise Exception(
+                "WebSocketProtocol.beginMessage invalid while a message is compressed in a worker thread"
+            )
+
         self.send_message_opcode = (
             WebSocketProtocol.MESSAGE_TYPE_BINARY
             if isBinary
@@ -2302,7 +2777,9 @@ class WebSocketProtocol(ObservableMixin):
         else:
             self.send_compressed = False
 
-        self.trafficStats.outgoingWebSocketMessages += 1
+        stats = self._trafficStats
+        if stats is not None:
+            stats.outgoingWebSocketMessages += 1
 
     def beginMessageFrame(self, length: int) -> None:
         """
@@ -2326,7 +2803,9 @@ class WebSocketProtocol(ObservableMixin):
 
         self.send_message_frame_length = length
 
-        self.trafficStats.outgoingWebSocketFrames += 1
+        stats = self._trafficStats
+        if stats is not None:
+            stats.outgoingWebSocketFrames += 1
 
         if (not self.factory.isServer and self.maskClientFrames) or (
             self.factory.isServer and self.maskServerFrames
@@ -2404,15 +2883,22 @@ class WebSocketProtocol(ObservableMixin):
         if self.state != WebSocketProtocol.STATE_OPEN:
             return
 
-        if not self.send_compressed:
-            self.trafficStats.outgoingOctetsAppLevel += len(payload)
-        self.trafficStats.outgoingOctetsWebSocketLevel += len(payload)
+        stats = self._trafficStats
+        if stats is not None:
+            if not self.send_compressed:
+                stats.outgoingOctetsAppLevel += len(payload)
+            stats.outgoingOctetsWebSocketLevel += len(payload)
 
         if self.send_state != WebSocketProtocol.SEND_STATE_INSIDE_MESSAGE_FRAME:
             raise Exception(
                 "WebSocketProtocol.sendMessageFrameData invalid in current sending state"
             )
 
+        if self._offloadBusy:
+            raise Exception(
+                "WebSocketProtocol.sendMessageFrameData invalid while a message is compressed in a worker thread"
+            )
+
         rl = len(payload)
         if (
             self.send_message_frame_masker.pointer() + rl
@@ -2466,7 +2952,9 @@ class WebSocketProtocol(ObservableMixin):
 
         if self.send_compressed:
             payload = self._perMessageCompress.end_compress_message()
-            self.trafficStats.outgoingOctetsWebSocketLevel += len(payload)
+            stats = self._trafficStats
+            if stats is not None:
+                stats.outgoingOctetsWebSocketLevel += len(payload)
         else:
             # send continuation frame with empty payload and FIN set to end message
             payload = b""
@@ -2482,7 +2970,9 @@ class WebSocketProtocol(ObservableMixin):
             return
 
         if self.send_compressed:
-            self.trafficStats.outgoingOctetsAppLevel += len(payload)
+            stats = self._trafficStats
+            if stats is not None:
+                stats.outgoingOctetsAppLevel += len(payload)
             payload = self._perMessageCompress.compress_message_data(payload)
 
         self.beginMessageFrame(len(payload))
@@ -2519,37 +3009,171 @@ class WebSocketProtocol(ObservableMixin):
         if self.trackedTimings:
             self.trackedTimings.track("sendMessage")
 
-        # (initial) frame opcode
+        # keep messages in order behind a message being compressed in a worker thread
         #
-        if isBinary:
-            opcode = 2
-        else:
-            opcode = 1
+        if self._offloadBusy:
+            d = txaio.create_future()
+            self._offloadQueue.append(
+                (
+                    self.sendMessage,
+                    (payload, isBinary, fragmentSize, sync, doNotCompress),
+                    d,
+                )
+            )
+            return d
 
-        self.trafficStats.outgoingWebSocketMessages += 1
+        stats = self._trafficStats
+        if stats is not None:
+            stats.outgoingWebSocketMessages += 1
 
         # setup compressor
         #
-        if self._perMessageCompress is not None and not doNotCompress:
-            sendCompressed = True
+        sendCompressed = self._perMessageCompress is not None and not doNotCompress
+        if sendCompressed and self._adaptiveCompress:
+            sendCompressed = self._shouldCompressMessage(payload)
 
-            self._perMessageCompress.start_compress_message()
+        if sendCompressed:
+            # compress large messages in a worker thread (but not in the middle of
+            # a message sent frame by frame, which uses the compressor meanwhile)
+            if (
+                0 < self.compressOffloadSize <= len(payload)
+                and self.send_state == WebSocketProtocol.SEND_STATE_GROUND
+            ):
+                d = txaio.create_future()
+                self._offloadCompress(payload, isBinary, fragmentSize, sync, d)
+                return d
+
+            payload = self._compressMessage(payload)
+
+        else:
+            if stats is not None:
+                payload_len = len(payload)
+                stats.outgoingOctetsAppLevel += payload_len
+                stats.outgoingOctetsWebSocketLevel += payload_len
 
-            self.trafficStats.outgoingOctetsAppLevel += len(payload)
+        self._sendMessagePayload(payload, isBinary, fragmentSize, sync, sendCompressed)
 
+    def _compressMessage(self, payload: bytes) -> bytes:
+        """
+        Compress a complete message payload, updating statistics.
+        """
+        self._perMessageCompress.start_compress_message()
+        payload1 = self._perMessageCompress.compress_message_data(payload)
+        payload2 = self._perMessageCompress.end_compress_message()
+        compressed = b"".join([payload1, payload2])
+        self._trackCompressedMessage(len(payload), len(compressed))
+        return compressed
+
+    def _trackCompressedMessage(self, app_len: int, payload_len: int) -> None:
+        stats = self._trafficStats
+        if stats is not None:
+            stats.outgoingOctetsAppLevel += app_len
+            stats.outgoingOctetsWebSocketLevel += payload_len
+            stats.outgoingCompressedMessages += 1
+
+        if self.compressMaxRatio:
+            self._trackCompressRatio(app_len, payload_len)
+
+    def _offloadCompress(self, payload, isBinary, fragmentSize, sync, d) -> None:
+        """
+        Compress a message in a worker thread, and send it when done.
+        """
+
+        def compress(payload):
+            self._perMessageCompress.start_compress_message()
             payload1 = self._perMessageCompress.compress_message_data(payload)
             payload2 = self._perMessageCompress.end_compress_message()
-            payload = b"".join([payload1, payload2])
+            return b"".join([payload1, payload2])
+
+        def compressed(compressed):
+            self._offloadBusy = False
+            if self.state != WebSocketProtocol.STATE_OPEN:
+                self._closeOffloadedCompress()
+                self._failOffloadQueue(d)
+                return
+
+            self._trackCompressedMessage(len(payload), len(compressed))
+            try:
+                self._sendMessagePayload(compressed, isBinary, fragmentSize, sync, True)
+            except Exception as e:
+                txaio.reject(d, e)
+            else:
+                txaio.resolve(d, None)
 
-            payload_len = len(payload)
+            self._flushOffloadQueue()
 
-            self.trafficStats.outgoingOctetsWebSocketLevel += payload_len
+        def error(fail):
+            self._offloadBusy = False
+            self._closeOffloadedCompress()
+            self._failOffloadQueue(d, fail.value)
+            if self.state == WebSocketProtocol.STATE_OPEN:
+                self._fail_connection(
+                    WebSocketProtocol.CLOSE_STATUS_CODE_INTERNAL_ERROR,
+                    f"compression of message failed: {fail.value}",
+                )
 
-        else:
-            sendCompressed = False
-            payload_len = len(payload)
-            self.trafficStats.outgoingOctetsAppLevel += payload_len
-            self.trafficStats.outgoingOctetsWebSocketLevel += payload_len
+        self._offloadBusy = True
+        txaio.add_callbacks(self._runInThread(compress, payload), compressed, error)
+
+    def _closeOffloadedCompress(self) -> None:
+        """
+        Close the compression context when the connection was lost while it was used
+        in a worker thread, and no worker thread uses it anymore.
+        """
+        if (
+            self._compressClosePending
+            and not self._offloadBusy
+            and not self._decompressPending
+        ):
+            self._compressClosePending = False
+            self._perMessageCompress.close()
+
+    def _flushOffloadQueue(self) -> None:
+        """
+        Send messages queued behind a message compressed in a worker thread, until
+        the next message goes to a worker thread again.
+        """
+        while self._offloadQueue and not self._offloadBusy:
+            send, args, d = self._offloadQueue.popleft()
+            if self.state != WebSocketProtocol.STATE_OPEN:
+                self._failOffloadQueue(d)
+                return
+            try:
+                res = send(*args)
+            except Exception as e:
+                txaio.reject(d, e)
+            else:
+                if res is None:
+                    txaio.resolve(d, None)
+                else:
+                    txaio.add_callbacks(
+                        res,
+                        lambda _, d=d: txaio.resolve(d, None),
+                        lambda fail, d=d: txaio.reject(d, fail),
+                    )
+
+    def _failOffloadQueue(self, d, error=None) -> None:
+        """
+        Fail a message compressed in a worker thread and all messages queued behind it.
+        """
+        if error is None:
+            error = Disconnected("Attempt to send on a closed protocol")
+        txaio.reject(d, error)
+        while self._offloadQueue:
+            txaio.reject(self._offloadQueue.popleft()[-1], error)
+
+    def _sendMessagePayload(
+        self,
+        payload: bytes,
+        isBinary: bool,
+        fragmentSize: int | None,
+        sync: bool,
+        sendCompressed: bool,
+    ) -> None:
+        """
+        Send a complete (possibly compressed) message payload in one or more frames.
+        """
+        payload_len = len(payload)
 
         if 0 < self.maxMessagePayloadSize < payload_len:
             self.wasMaxMessagePayloadSizeExceeded = True
@@ -2557,6 +3181,13 @@ class WebSocketProtocol(ObservableMixin):
             self.log.warn(emsg)
             raise PayloadExceededError(emsg)
 
+        # (initial) frame opcode
+        #
+        if isBinary:
+            opcode = 2
+        else:
+            opcode = 1
+
         # explicit fragmentSize arguments overrides autoFragmentSize setting
         #
         if fragmentSize is not None:
@@ -2569,7 +3200,7 @@ class WebSocketProtocol(ObservableMixin):
 
         # send unfragmented
         #
-        if pfs is None or len(payload) <= pfs:
+        if pfs is None or payload_len <= pfs:
             self.sendFrame(
                 opcode=opcode,
                 payload=payload,
@@ -2584,7 +3215,7 @@ class WebSocketProtocol(ObservableMixin):
                 raise Exception(
                     f"payload fragment size must be at least 1 (was {pfs})"
                 )
-            n = len(payload)
+            n = payload_len
             i = 0
             done = False
             first = True
@@ -2606,37 +3237,77 @@ class WebSocketProtocol(ObservableMixin):
                     self.sendFrame(opcode=0, payload=payload[i:j], fin=done, sync=sync)
                 i += pfs
 
+    def _shouldCompressMessage(self, payload: bytes) -> bool:
+        """
+        Adaptive per-message compression policy: decide whether an outgoing message
+        is worth compressing.
+
+        :param payload: The (uncompressed) message payload.
+
+        :returns: ``True`` if the message should be sent compressed.
+        """
+        stats = self._trafficStats
+
+        if len(payload) < self.compressMinSize:
+            if stats is not None:
+                stats.outgoingCompressSkippedSize += 1
+            return False
+
+        if self._compressBackoff:
+            self._compressBackoff -= 1
+            if stats is not None:
+                stats.outgoingCompressSkippedRatio += 1
+            return False
+
+        if self.compressMaxEntropy:
+            # Shannon entropy (bits per octet) of the octet values in a sample
+            sample = payload[: self.COMPRESS_ENTROPY_SAMPLE_SIZE]
+            n = len(sample)
+            entropy = math.log2(n) - sum(
+                c * math.log2(c) for c in Counter(sample).values()
+            ) / n
+            if entropy > self.compressMaxEntropy:
+                if stats is not None:
+                    stats.outgoingCompressSkippedEntropy += 1
+                return False
+
+        return True
+
+    def _trackCompressRatio(self, app_len: int, payload_len: int) -> None:
+        """
+        Track the compression ratio of the connection, and stop compressing for a
+        while when it exceeds ``compressMaxRatio``.
+
+        :param app_len: Size of the message before compression.
+        :param payload_len: Size of the message after compression.
+        """
+        self._compressRatioIn += app_len
+        self._compressRatioOut += payload_len
+        self._compressRatioCount += 1
+
+        if self._compressRatioCount >= self.COMPRESS_RATIO_WINDOW:
+            if self._compressRatioOut > self._compressRatioIn * self.compressMaxRatio:
+                self._compressBackoff = self.COMPRESS_RATIO_BACKOFF
+                self.log.debug(
+                    "compression ratio {ratio:.2f} over last {count} messages exceeds "
+                    "{max_ratio} - sending the next {backoff} messages uncompressed",
+                    ratio=self._compressRatioOut / self._compressRatioIn,
+                    count=self._compressRatioCount,
+                    max_ratio=self.compressMaxRatio,
+                    backoff=self._compressBackoff,
+                )
+            self._compressRatioIn = 0
+            self._compressRatioOut = 0
+            self._compressRatioCount = 0
+
     def _parseExtensionsHeader(self, header, removeQuotes=True):
         """
         Parse the Sec-WebSocket-Extensions header.
         """
-        extensions = []
-        exts = [str(x.strip()) for x in header.split(",")]
-        for e in exts:
-            if e != "":
-                ext = [x.strip() for x in e.split(";")]
-                if len(ext) > 0:
-                    extension = ext[0].lower()
-                    params = {}
-                    for p in ext[1:]:
-                        p = [x.strip() for x in p.split("=")]
-                        key = p[0].lower()
-                        if len(p) > 1:
-                            value = "=".join(p[1:])
-                            if removeQuotes:
-                                if len(value) > 0 and value[0] == '"':
-                                    value = value[1:]
-                                if len(value) > 0 and value[-1] == '"':
-                                    value = value[:-1]
-                        else:
-                            value = True
-                        if key not in params:
-                            params[key] = []
-                        params[key].append(value)
-                    extensions.append((extension, params))
-                else:
-                    pass  # should not arrive here
-        return extensions
+        return [
+            (extension, {key: list(values) for key, values in params})
+            for extension, params in _parse_extensions_header(header, removeQuotes)
+        ]
 
 
 IWebSocketChannel.register(WebSocketProtocol)
@@ -2743,6 +3414,19 @@ class WebSocketFactory:
         applyMask = not self.isServer
         return PreparedMessage(payload, isBinary, applyMask, doNotCompress)
 
+    def collect_metrics(self, metrics) -> None:
+        """
+        Report the metrics of all connections of this factory, aggregated. Metrics of
+        closed connections are retained in the counters.
+
+        Register the factory with a :class:`autobahn.metrics.MetricsRegistry` to
+        export them.
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        self._connectionMetrics.collect_metrics(metrics)
+
 
 _SERVER_STATUS_TEMPLATE = """<!DOCTYPE html>
 <html>
@@ -2825,14 +3509,23 @@ class WebSocketServerProtocol(WebSocketProtocol):
         handshake. When overriding in derived class, make sure to call this base class
         implementation *before* your code.
         """
-        self.log.debug(
-            "{func}: connection accepted from peer {peer}",
-            func=hltype(self._connectionMade),
-            peer=self.peer,
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                "{func}: connection accepted from peer {peer}",
+                func=hltype(self._connectionMade),
+                peer=self.peer,
+            )
         WebSocketProtocol._connectionMade(self)
         self.factory.countConnections += 1
 
+    def _dropHandshakeState(self) -> None:
+        WebSocketProtocol._dropHandshakeState(self)
+        self.http_request_uri = None
+        self.http_request_path = None
+        self.http_request_params = None
+        self.websocket_protocols = None
+        self.websocket_origin = None
+
     def _connectionLost(self, reason: str) -> None:
         """
         Called by network framework when established transport connection from client
@@ -2840,12 +3533,13 @@ class WebSocketServerProtocol(WebSocketProtocol):
         When overriding in derived class, make sure to call this base class
         implementation *after* your code.
         """
-        self.log.debug(
-            "{func}: connection lost to peer {peer}: reason={reason}",
-            func=hltype(self._connectionLost),
-            peer=self.peer,
-            reason=hlval(reason),
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                "{func}: connection lost to peer {peer}: reason={reason}",
+                func=hltype(self._connectionLost),
+                peer=self.peer,
+                reason=hlval(reason),
+            )
         WebSocketProtocol._connectionLost(self, reason)
         self.factory.countConnections -= 1
 
@@ -2860,11 +3554,12 @@ class WebSocketServerProtocol(WebSocketProtocol):
         #
         end_of_header = self.data.find(b"\x0d\x0a\x0d\x0a")
         if end_of_header >= 0:
-            self.log.debug(
-                "{func} found end of HTTP request header at byte {end_of_header}",
-                func=hltype(self.processHandshake),
-                end_of_header=hlval(end_of_header),
-            )
+            if log_enabled(self.log, "debug"):
+                self.log.debug(
+                    "{func} found end of HTTP request header at byte {end_of_header}",
+                    func=hltype(self.processHandshake),
+                    end_of_header=hlval(end_of_header),
+                )
 
             self.http_request_data = self.data[: end_of_header + 4]
             self.log.debug(
@@ -3113,21 +3808,16 @@ class WebSocketServerProtocol(WebSocketProtocol):
             # Sec-WebSocket-Protocol
             #
             if "sec-websocket-protocol" in self.http_headers:
-                protocols = [
-                    str(x.strip())
-                    for x in self.http_headers["sec-websocket-protocol"].split(",")
-                ]
+                protocols, duplicate = _parse_protocols_header(
+                    self.http_headers["sec-websocket-protocol"]
+                )
                 # check for duplicates in protocol header
-                pp = {}
-                for p in protocols:
-                    if p in pp:
-                        return self.failHandshake(
-                            f'duplicate protocol "{p}" specified in HTTP Sec-WebSocket-Protocol header'
-                        )
-                    else:
-                        pp[p] = 1
+                if duplicate is not None:
+                    return self.failHandshake(
+                        f'duplicate protocol "{duplicate}" specified in HTTP Sec-WebSocket-Protocol header'
+                    )
                 # ok, no duplicates, save list in order the client sent it
-                self.websocket_protocols = protocols
+                self.websocket_protocols = list(protocols)
             else:
                 self.websocket_protocols = []
 
@@ -3193,14 +3883,15 @@ class WebSocketServerProtocol(WebSocketProtocol):
                 return self.failHandshake(
                     f'bad Sec-WebSocket-Key (invalid base64 encoding) "{key}"'
                 )
-            for c in key[:-2]:
-                if (
-                    c
-                    not in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+/"
-                ):
-                    return self.failHandshake(
-                        f'bad character "{c}" in Sec-WebSocket-Key (invalid base64 encoding) "{key}"'
-                    )
+            if not _WS_KEY_PAT.fullmatch(key):
+                for c in key[:-2]:
+                    if (
+                        c
+                        not in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+/"
+                    ):
+                        return self.failHandshake(
+                            f'bad character "{c}" in Sec-WebSocket-Key (invalid base64 encoding) "{key}"'
+                        )
 
             # Sec-WebSocket-Extensions
             #
@@ -3239,44 +3930,13 @@ class WebSocketServerProtocol(WebSocketProtocol):
                 )  # Service Unavailable
 
             else:
-                # WebSocket handshake validated => produce opening handshake response
+                # rate limiting of new connections
                 #
-                request = ConnectionRequest(
-                    self.peer,
-                    self.http_headers,
-                    self.http_request_host,
-                    self.http_request_path,
-                    self.http_request_params,
-                    self.websocket_version,
-                    self.websocket_origin,
-                    self.websocket_protocols,
-                    self.websocket_extensions,
-                )
-
-                # The user's onConnect() handler must do one of the following:
-                #   - return the subprotocol to be spoken
-                #   - return None to continue with no subprotocol
-                #   - return a pair (subprotocol, headers)
-                #   - raise a ConnectionDeny to dismiss the client
-
-                f = txaio.as_future(self.onConnect, request)
-
-                def forward_error(err):
-                    if isinstance(err.value, ConnectionDeny):
-                        # the user handler explicitly denies the connection
-                        self.failHandshake(err.value.reason, err.value.code)
-                    else:
-                        # the user handler ran into an unexpected error (and hence, user code needs fixing!)
-                        self.log.warn(
-                            "Unexpected exception in onConnect ['{err.value}']", err=err
-                        )
-                        self.log.warn("{tb}", tb=txaio.failure_format_traceback(err))
-                        return self.failHandshake(
-                            f"Internal server error: {err.value}",
-                            ConnectionDeny.INTERNAL_SERVER_ERROR,
-                        )
-
-                txaio.add_callbacks(f, self.succeedHandshake, forward_error)
+                admission = self.factory._handshakeAdmission
+                if admission.enabled:
+                    admission.admit(self)
+                else:
+                    self._admitHandshake()
 
         elif self.serveFlashSocketPolicy:
             flash_policy_file_request = self.data.find(b"<policy-file-request/>\x00")
@@ -3303,6 +3963,50 @@ class WebSocketServerProtocol(WebSocketProtocol):
                         "WebSocketServerFactory.flashSocketPolicy"
                     )
 
+    def _admitHandshake(self) -> None:
+        """
+        Continue the validated opening handshake (once admitted by the admission
+        control of the factory), calling the user's ``onConnect()`` handler.
+        """
+        # WebSocket handshake validated => produce opening handshake response
+        #
+        request = ConnectionRequest(
+            self.peer,
+            self.http_headers,
+            self.http_request_host,
+            self.http_request_path,
+            self.http_request_params,
+            self.websocket_version,
+            self.websocket_origin,
+            self.websocket_protocols,
+            self.websocket_extensions,
+        )
+
+        # The user's onConnect() handler must do one of the following:
+        #   - return the subprotocol to be spoken
+        #   - return None to continue with no subprotocol
+        #   - return a pair (subprotocol, headers)
+        #   - raise a ConnectionDeny to dismiss the client
+
+        f = txaio.as_future(self.onConnect, request)
+
+        def forward_error(err):
+            if isinstance(err.value, ConnectionDeny):
+                # the user handler explicitly denies the connection
+                self.failHandshake(err.value.reason, err.value.code)
+            else:
+                # the user handler ran into an unexpected error (and hence, user code needs fixing!)
+                self.log.warn(
+                    "Unexpected exception in onConnect ['{err.value}']", err=err
+                )
+                self.log.warn("{tb}", tb=txaio.failure_format_traceback(err))
+                return self.failHandshake(
+                    f"Internal server error: {err.value}",
+                    ConnectionDeny.INTERNAL_SERVER_ERROR,
+                )
+
+        txaio.add_callbacks(f, self.succeedHandshake, forward_error)
+
     def succeedHandshake(self, res) -> None:
         """
         Callback after onConnect() returns successfully. Generates the response for the handshake.
@@ -3371,6 +4075,7 @@ class WebSocketServerProtocol(WebSocketProtocol):
                 self._perMessageCompress = PMCE["PMCE"].create_from_offer_accept(
                     self.factory.isServer, accept
                 )
+                self._perMessageCompress.open()
                 self.websocket_extensions_in_use.append(self._perMessageCompress)
                 extensionResponse.append(accept.get_extension_string())
             else:
@@ -3380,31 +4085,16 @@ class WebSocketServerProtocol(WebSocketProtocol):
                     offers=pmceOffers,
                 )
 
-        # build response to complete WebSocket handshake
+        # build response to complete WebSocket handshake: status line, server
+        # and upgrade headers, and optional headers from factory (all precomputed
+        # per factory)
         #
-        response = "HTTP/1.1 101 Switching Protocols\x0d\x0a"
-
-        if self.factory.server:
-            response += f"Server: {self.factory.server}\x0d\x0a"
-
-        response += "Upgrade: WebSocket\x0d\x0a"
-        response += "Connection: Upgrade\x0d\x0a"
+        response = self.factory._getHandshakeResponseHead()
 
-        # optional, user supplied additional HTTP headers
+        # optional, user supplied additional HTTP headers from onConnect
         #
-        # headers from factory, headers from onConnect
-        for headers_source in (self.factory.headers.items(), headers.items()):
-            for uh in headers_source:
-                if isinstance(uh[1], str):
-                    header_values = [uh[1]]
-                else:
-                    try:
-                        header_values = iter(uh[1])
-                    except TypeError:
-                        header_values = [uh[1]]
-
-                for header_value in header_values:
-                    response += f"{uh[0]}: {header_value}\x0d\x0a"
+        if headers:
+            response += _format_http_headers(headers)
 
         if self.websocket_protocol_in_use is not None:
             response += f"Sec-WebSocket-Protocol: {self.websocket_protocol_in_use}\x0d\x0a"
@@ -3477,6 +4167,9 @@ class WebSocketServerProtocol(WebSocketProtocol):
 
         txaio.resolve(self.is_open, None)
 
+        if self.compactConnection:
+            self._dropHandshakeState()
+
         # process rest, if any
         #
         if len(self.data) > 0:
@@ -3585,6 +4278,10 @@ class WebSocketServerFactory(WebSocketFactory):
         #
         self.setSessionParameters(url, protocols, server, headers, externalPort)
 
+        # rate limiting of opening handshakes (configured by protocol options)
+        #
+        self._handshakeAdmission = HandshakeAdmission("autobahn_websocket")
+
         # default WebSocket protocol options
         #
         self.resetProtocolOptions()
@@ -3593,12 +4290,61 @@ class WebSocketServerFactory(WebSocketFactory):
         #
         self.countConnections = 0
 
+        # metrics of (open and closed) connections
+        self._connectionMetrics = ConnectionMetrics("autobahn_websocket")
+
+    def collect_metrics(self, metrics) -> None:
+        """
+        Report the metrics of all connections of this factory, aggregated, and of
+        the admission control of opening handshakes (when enabled).
+
+        :param metrics: The snapshot to report into.
+        :type metrics: :class:`autobahn.metrics.MetricsSnapshot`
+        """
+        WebSocketFactory.collect_metrics(self, metrics)
+        if self._handshakeAdmission.enabled:
+            self._handshakeAdmission.collect_metrics(metrics)
+
+    def _configureHandshakeAdmission(self) -> None:
+        self._handshakeAdmission.configure(
+            rate=self.handshakeRate,
+            burst=self.handshakeBurst,
+            peer_rate=self.handshakeRatePerPeer,
+            peer_burst=self.handshakeBurstPerPeer,
+            queue_size=self.handshakeQueueSize,
+        )
+
+    def _getHandshakeResponseHead(self) -> str:
+        """
+        Get the static part of the HTTP response completing the opening handshake:
+        status line, ``Server`` and upgrade headers, and the headers configured on
+        this factory. The result is computed once and reused until ``server`` or
+        ``headers`` change.
+        """
+        cached = self._handshakeResponseHead
+        if cached is not None:
+            server, headers, head = cached
+            if server == self.server and headers == self.headers:
+                return head
+
+        head = "HTTP/1.1 101 Switching Protocols\x0d\x0a"
+        if self.server:
+            head += f"Server: {self.server}\x0d\x0a"
+        head += "Upgrade: WebSocket\x0d\x0a"
+        head += "Connection: Upgrade\x0d\x0a"
+        head += _format_http_headers(self.headers)
+
+        # remember a copy of the headers, so changes in place are detected too
+        self._handshakeResponseHead = (self.server, dict(self.headers), head)
+        return head
+
     def setSessionParameters(
         self, url=None, protocols=None, server=None, headers=None, externalPort=None
     ):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketServerChannelFactory.setSessionParameters`
         """
+        self._handshakeResponseHead = None
 
         # parse WebSocket URI into components
         (isSecure, host, port, resource, path, params) = parse_url(
@@ -3667,6 +4413,33 @@ class WebSocketServerFactory(WebSocketFactory):
         # number of trusted web servers in front of this server
         self.trustXForwardedFor = 0
 
+        # rate limiting of opening handshakes, globally and per peer (0 = unlimited)
+        self.handshakeRate = 0
+        self.handshakeBurst = 0
+        self.handshakeRatePerPeer = 0
+        self.handshakeBurstPerPeer = 0
+        self.handshakeQueueSize = 0
+        self._configureHandshakeAdmission()
+
+        # trim per-connection state of idle connections
+        self.compactConnection = False
+
+        # read-side backpressure (0 = unlimited)
+        self.maxInFlightMessages = 0
+        self.maxInFlightBytes = 0
+
+        # write-side flow control (0 = disabled)
+        self.writeHighWaterMark = 0
+        self.writeLowWaterMark = 0
+
+        # adaptive per-message compression (0 = disabled)
+        self.compressMinSize = 0
+        self.compressMaxEntropy = 0
+        self.compressMaxRatio = 0
+
+        # compress/decompress large messages in worker threads (0 = disabled)
+        self.compressOffloadSize = 0
+
     def setProtocolOptions(
         self,
         versions=None,
@@ -3694,6 +4467,20 @@ class WebSocketServerFactory(WebSocketFactory):
         allowNullOrigin=False,
         maxConnections=None,
         trustXForwardedFor=None,
+        handshakeRate=None,
+        handshakeBurst=None,
+        handshakeRatePerPeer=None,
+        handshakeBurstPerPeer=None,
+        handshakeQueueSize=None,
+        compactConnection=None,
+        maxInFlightMessages=None,
+        maxInFlightBytes=None,
+        writeHighWaterMark=None,
+        writeLowWaterMark=None,
+        compressMinSize=None,
+        compressMaxEntropy=None,
+        compressMaxRatio=None,
+        compressOffloadSize=None,
     ):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketServerChannelFactory.setProtocolOptions`
@@ -3824,6 +4611,97 @@ class WebSocketServerFactory(WebSocketFactory):
             assert trustXForwardedFor >= 0
             self.trustXForwardedFor = trustXForwardedFor
 
+        admission = (
+            self.handshakeRate,
+            self.handshakeBurst,
+            self.handshakeRatePerPeer,
+            self.handshakeBurstPerPeer,
+            self.handshakeQueueSize,
+        )
+
+        if handshakeRate is not None and handshakeRate != self.handshakeRate:
+            assert handshakeRate >= 0
+            self.handshakeRate = handshakeRate
+
+        if handshakeBurst is not None and handshakeBurst != self.handshakeBurst:
+            assert type(handshakeBurst) == int
+            assert handshakeBurst >= 0
+            self.handshakeBurst = handshakeBurst
+
+        if (
+            handshakeRatePerPeer is not None
+            and handshakeRatePerPeer != self.handshakeRatePerPeer
+        ):
+            assert handshakeRatePerPeer >= 0
+            self.handshakeRatePerPeer = handshakeRatePerPeer
+
+        if (
+            handshakeBurstPerPeer is not None
+            and handshakeBurstPerPeer != self.handshakeBurstPerPeer
+        ):
+            assert type(handshakeBurstPerPeer) == int
+            assert handshakeBurstPerPeer >= 0
+            self.handshakeBurstPerPeer = handshakeBurstPerPeer
+
+        if (
+            handshakeQueueSize is not None
+            and handshakeQueueSize != self.handshakeQueueSize
+        ):
+            assert type(handshakeQueueSize) == int
+            assert handshakeQueueSize >= 0
+            self.handshakeQueueSize = handshakeQueueSize
+
+        if admission != (
+            self.handshakeRate,
+            self.handshakeBurst,
+            self.handshakeRatePerPeer,
+            self.handshakeBurstPerPeer,
+            self.handshakeQueueSize,
+        ):
+            self._configureHandshakeAdmission()
+
+        if (
+            compactConnection is not None
+            and compactConnection != self.compactConnection
+        ):
+            self.compactConnection = compactConnection
+
+        if (
+            maxInFlightMessages is not None
+            and maxInFlightMessages != self.maxInFlightMessages
+        ):
+            self.maxInFlightMessages = maxInFlightMessages
+
+        if maxInFlightBytes is not None and maxInFlightBytes != self.maxInFlightBytes:
+            self.maxInFlightBytes = maxInFlightBytes
+
+        if (
+            writeHighWaterMark is not None
+            and writeHighWaterMark != self.writeHighWaterMark
+        ):
+            self.writeHighWaterMark = writeHighWaterMark
+
+        if writeLowWaterMark is not None and writeLowWaterMark != self.writeLowWaterMark:
+            self.writeLowWaterMark = writeLowWaterMark
+
+        if compressMinSize is not None and compressMinSize != self.compressMinSize:
+            self.compressMinSize = compressMinSize
+
+        if (
+            compressMaxEntropy is not None
+            and compressMaxEntropy != self.compressMaxEntropy
+        ):
+            self.compressMaxEntropy = compressMaxEntropy
+
+        if compressMaxRatio is not None and compressMaxRatio != self.compressMaxRatio:
+            self.compressMaxRatio = compressMaxRatio
+
+        if (
+            compressOffloadSize is not None
+            and compressOffloadSize != self.compressOffloadSize
+        ):
+            self.compressOffloadSize = compressOffloadSize
+
     def getConnectionCount(self):
         """
         Get number of currently connected clients.
@@ -3875,11 +4753,12 @@ class WebSocketClientProtocol(WebSocketProtocol):
         When overriding in derived class, make sure to call this base class
         implementation _before_ your code.
         """
-        self.log.debug(
-            "{func}: connection accepted from peer {peer}",
-            func=hltype(self._connectionMade),
-            peer=self.peer,
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                "{func}: connection accepted from peer {peer}",
+                func=hltype(self._connectionMade),
+                peer=self.peer,
+            )
         WebSocketProtocol._connectionMade(self)
 
         if not self.factory.isServer and self.factory.proxy is not None:
@@ -3889,6 +4768,10 @@ class WebSocketClientProtocol(WebSocketProtocol):
             # immediately start with the WebSocket opening handshake
             self.startHandshake()
 
+    def _dropHandshakeState(self):
+        WebSocketProtocol._dropHandshakeState(self)
+        self.websocket_key = None
+
     def _connectionLost(self, reason):
         """
         Called by network framework when established transport connection to server was lost. Default
@@ -3896,12 +4779,13 @@ class WebSocketClientProtocol(WebSocketProtocol):
         When overriding in derived class, make sure to call this base class
         implementation _after_ your code.
         """
-        self.log.debug(
-            "{func}: connection lost to peer {peer}: reason={reason}",
-            func=hltype(self._connectionLost),
-            peer=self.peer,
-            reason=hlval(reason),
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                "{func}: connection lost to peer {peer}: reason={reason}",
+                func=hltype(self._connectionLost),
+                peer=self.peer,
+                reason=hlval(reason),
+            )
         WebSocketProtocol._connectionLost(self, reason)
 
     def startProxyConnect(self):
@@ -4017,11 +4901,12 @@ class WebSocketClientProtocol(WebSocketProtocol):
         """
         Start WebSocket opening handshake.
         """
-        self.log.debug(
-            "{meth}: starting handshake with transport_details=\n{transport_details}",
-            meth=hltype(self.startHandshake),
-            transport_details=pformat(self._transport_details.marshal()),
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                "{meth}: starting handshake with transport_details=\n{transport_details}",
+                meth=hltype(self.startHandshake),
+                transport_details=pformat(self._transport_details.marshal()),
+            )
 
         # ask our specialized framework-specific (or user-code) for a
         # ConnectingRequest instance
@@ -4137,11 +5022,12 @@ class WebSocketClientProtocol(WebSocketProtocol):
         self.http_request_data = request.encode("utf8")
         self.sendData(self.http_request_data)
 
-        self.log.debug(
-            "{meth}: sent HTTP request:\n{request}",
-            meth=hltype(self._actuallyStartHandshake),
-            request=request,
-        )
+        if log_enabled(self.log, "debug"):
+            self.log.debug(
+                "{meth}: sent HTTP request:\n{request}",
+                meth=hltype(self._actuallyStartHandshake),
+                request=request,
+            )
 
     def processHandshake(self):
         """
@@ -4152,11 +5038,12 @@ class WebSocketClientProtocol(WebSocketProtocol):
         end_of_header = self.data.find(b"\x0d\x0a\x0d\x0a")
         if end_of_header >= 0:
             self.http_response_data: bytes = self.data[: end_of_header + 4]
-            self.log.debug(
-                "{meth}: received HTTP response:\n{response}",
-                meth=hltype(self.processHandshake),
-                response=self.http_response_data.decode("utf8"),
-            )
+            if log_enabled(self.log, "debug"):
+                self.log.debug(
+                    "{meth}: received HTTP response:\n{response}",
+                    meth=hltype(self.processHandshake),
+                    response=self.http_response_data.decode("utf8"),
+                )
 
             # extract HTTP status line and headers
             #
@@ -4317,6 +5204,7 @@ class WebSocketClientProtocol(WebSocketProtocol):
                         self._perMessageCompress = PMCE[
                             "PMCE"
                         ].create_from_response_accept(self.factory.isServer, accept)
+                        self._perMessageCompress.open()
 
                         self.websocket_extensions_in_use.append(
                             self._perMessageCompress
@@ -4397,6 +5285,8 @@ class WebSocketClientProtocol(WebSocketProtocol):
                     self.trackedTimings.track("onOpen")
                 self._onOpen()
                 txaio.resolve(self.is_open, None)
+                if self.compactConnection:
+                    self._dropHandshakeState()
                 if len(self.data) > 0:
                     self.consumeData()
 
@@ -4473,6 +5363,9 @@ class WebSocketClientFactory(WebSocketFactory):
         #
         self.resetProtocolOptions()
 
+        # metrics of (open and closed) connections
+        self._connectionMetrics = ConnectionMetrics("autobahn_websocket")
+
     def setSessionParameters(
         self,
         url=None,
@@ -4537,6 +5430,25 @@ class WebSocketClientFactory(WebSocketFactory):
         # see: https://github.com/crossbario/autobahn-python/issues/1327 and _cancelAutoPingTimeoutCall
         self.autoPingRestartOnAnyTraffic = True
 
+        # trim per-connection state of idle connections
+        self.compactConnection = False
+
+        # read-side backpressure (0 = unlimited)
+        self.maxInFlightMessages = 0
+        self.maxInFlightBytes = 0
+
+        # write-side flow control (0 = disabled)
+        self.writeHighWaterMark = 0
+        self.writeLowWaterMark = 0
+
+        # adaptive per-message compression (0 = disabled)
+        self.compressMinSize = 0
+        self.compressMaxEntropy = 0
+        self.compressMaxRatio = 0
+
+        # compress/decompress large messages in worker threads (0 = disabled)
+        self.compressOffloadSize = 0
+
     def setProtocolOptions(
         self,
         version=None,
@@ -4559,6 +5471,15 @@ class WebSocketClientFactory(WebSocketFactory):
         autoPingTimeout=None,
         autoPingSize=None,
         autoPingRestartOnAnyTraffic=None,
+        compactConnection=None,
+        maxInFlightMessages=None,
+        maxInFlightBytes=None,
+        writeHighWaterMark=None,
+        writeLowWaterMark=None,
+        compressMinSize=None,
+        compressMaxEntropy=None,
+        compressMaxRatio=None,
+        compressOffloadSize=None,
     ):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketClientChannelFactory.setProtocolOptions`
@@ -4672,3 +5593,45 @@ class WebSocketClientFactory(WebSocketFactory):
         ):
             assert type(autoPingRestartOnAnyTraffic) == bool
             self.autoPingRestartOnAnyTraffic = autoPingRestartOnAnyTraffic
+
+        if (
+            compactConnection is not None
+            and compactConnection != self.compactConnection
+        ):
+            self.compactConnection = compactConnection
+
+        if (
+            maxInFlightMessages is not None
+            and maxInFlightMessages != self.maxInFlightMessages
+        ):
+            self.maxInFlightMessages = maxInFlightMessages
+
+        if maxInFlightBytes is not None and maxInFlightBytes != self.maxInFlightBytes:
+            self.maxInFlightBytes = maxInFlightBytes
+
+        if (
+            writeHighWaterMark is not None
+            and writeHighWaterMark != self.writeHighWaterMark
+        ):
+            self.writeHighWaterMark = writeHighWaterMark
+
+        if writeLowWaterMark is not None and writeLowWaterMark != self.writeLowWaterMark:
+            self.writeLowWaterMark = writeLowWaterMark
+
+        if compressMinSize is not None and compressMinSize != self.compressMinSize:
+            self.compressMinSize = compressMinSize
+
+        if (
+            compressMaxEntropy is not None
+            and compressMaxEntropy != self.compressMaxEntropy
+        ):
+            self.compressMaxEntropy = compressMaxEntropy
+
+        if compressMaxRatio is not None and compressMaxRatio != self.compressMaxRatio:
+            self.compressMaxRatio = compressMaxRatio
+
+        if (
+            compressOffloadSize is not None
+            and compressOffloadSize != self.compressOffloadSize
+        ):
+            self.compressOffloadSize = compressOffloadSize
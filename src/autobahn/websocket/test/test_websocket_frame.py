@@ -26,6 +26,7 @@
 
 import os
 import struct
+import zlib
 
 if os.environ.get("USE_TWISTED", False):
     from base64 import b64decode
@@ -40,7 +41,12 @@ if os.environ.get("USE_TWISTED", False):
         WebSocketServerFactory,
         WebSocketServerProtocol,
     )
-    from autobahn.websocket.compress_deflate import PerMessageDeflate
+    from autobahn.websocket import compress
+    from autobahn.websocket.compress_deflate import (
+        DEFLATE_MEMORY_BUDGET,
+        PerMessageDeflate,
+        PerMessageDeflateMemoryBudget,
+    )
     from twisted.internet.address import IPv4Address
     from twisted.internet.task import Clock
     from twisted.trial import unittest
@@ -127,6 +133,227 @@ if os.environ.get("USE_TWISTED", False):
 
             self.assertEqual(data, b"x" * 2000)
 
+    class TestDeflateLevelAndBudget(unittest.TestCase):
+        def setUp(self):
+            self.addCleanup(setattr, DEFLATE_MEMORY_BUDGET, "limit", 0)
+
+        def _pmce(self, is_server=True, no_context_takeover=False, **kwargs):
+            pmce = PerMessageDeflate(
+                is_server=is_server,
+                server_no_context_takeover=no_context_takeover,
+                client_no_context_takeover=no_context_takeover,
+                server_max_window_bits=15,
+                client_max_window_bits=15,
+                mem_level=8,
+                **kwargs,
+            )
+            self.addCleanup(pmce.close)
+            return pmce
+
+        def _compress(self, pmce, payload):
+            pmce.start_compress_message()
+            data = pmce.compress_message_data(payload)
+            return data + pmce.end_compress_message()
+
+        def test_level_and_strategy(self):
+            payload = b"0123456789abcdef" * 500
+            fast = self._pmce(level=1)
+            huffman = self._pmce(strategy=zlib.Z_HUFFMAN_ONLY)
+
+            decoder = self._pmce(is_server=False)
+            for pmce in [fast, huffman]:
+                decoder.start_decompress_message()
+                data = decoder.decompress_message_data(self._compress(pmce, payload))
+                decoder.end_decompress_message()
+                self.assertEqual(data, payload)
+
+            # without matching strings, huffman-only coding can't shrink the repeats
+            self.assertTrue(
+                len(self._compress(huffman, payload))
+                > 10 * len(self._compress(fast, payload))
+            )
+
+        def test_memory_accounting(self):
+            active = DEFLATE_MEMORY_BUDGET.active
+            pmce = self._pmce()
+
+            # memory is only reserved once installed on a connection
+            self.assertEqual(DEFLATE_MEMORY_BUDGET.active, active)
+            pmce.open()
+            pmce.open()
+            self.assertEqual(
+                DEFLATE_MEMORY_BUDGET.active - active,
+                DEFLATE_MEMORY_BUDGET.compressor_memory(15, 8)
+                + DEFLATE_MEMORY_BUDGET.decompressor_memory(15),
+            )
+            pmce.close()
+            pmce.close()
+            self.assertEqual(DEFLATE_MEMORY_BUDGET.active, active)
+
+            # without context takeover, nothing is kept between messages
+            pmce = self._pmce(no_context_takeover=True)
+            pmce.open()
+            self.assertEqual(DEFLATE_MEMORY_BUDGET.active, active)
+            self._compress(pmce, b"hello")
+            self.assertIsNone(pmce._compressor)
+
+        def test_budget_downgrades(self):
+            budget = DEFLATE_MEMORY_BUDGET
+            full = budget.compressor_memory(15, 8) + budget.decompressor_memory(15)
+            small = budget.compressor_memory(9, 8) + budget.decompressor_memory(15)
+            downgrades = budget.downgrades
+
+            budget.limit = budget.active + full + small + 100
+            first = self._pmce()
+            second = self._pmce()
+            third = self._pmce()
+            for pmce in [first, second, third]:
+                pmce.open()
+
+            self.assertEqual(first._compress_window_bits, 15)
+            self.assertFalse(first._compress_no_context_takeover)
+            self.assertEqual(second._compress_window_bits, 9)
+            self.assertFalse(second._compress_no_context_takeover)
+            self.assertTrue(third._compress_no_context_takeover)
+            self.assertEqual(budget.downgrades - downgrades, 2)
+
+            # the negotiated parameters stay as agreed with the peer
+            self.assertEqual(third.server_max_window_bits, 15)
+            self.assertFalse(third.server_no_context_takeover)
+            self.assertEqual(third.client_max_window_bits, 15)
+            self.assertFalse(third.client_no_context_takeover)
+
+            # the downgraded compressor is still understood by the peer
+            decoder = self._pmce(is_server=False)
+            for pmce in [second, third]:
+                for _ in range(2):
+                    decoder.start_decompress_message()
+                    data = decoder.decompress_message_data(
+                        self._compress(pmce, b"hello" * 100)
+                    )
+                    decoder.end_decompress_message()
+                    self.assertEqual(data, b"hello" * 100)
+
+        def test_budget_counts_only_downgrades(self):
+            budget = PerMessageDeflateMemoryBudget(limit=1)
+            decompress_memory = budget.decompressor_memory(15)
+
+            # over the budget, but there is nothing left to downgrade
+            self.assertEqual(
+                budget.reserve(15, 8, True, decompress_memory),
+                (15, True, decompress_memory),
+            )
+            self.assertEqual(budget.downgrades, 0)
+
+            # over the budget and downgraded to no context takeover
+            window_bits, no_context_takeover, _ = budget.reserve(
+                9, 8, False, decompress_memory
+            )
+            self.assertEqual(window_bits, 9)
+            self.assertTrue(no_context_takeover)
+            self.assertEqual(budget.downgrades, 1)
+
+    class TestZstd(unittest.TestCase):
+        if compress.zstandard is None:
+            skip = "zstandard not installed"
+
+        def _pair(self, no_context_takeover, dictionary_id=0):
+            sender = compress.PerMessageZstd(
+                True, no_context_takeover, no_context_takeover, dictionary_id
+            )
+            receiver = compress.PerMessageZstd(
+                False, no_context_takeover, no_context_takeover, dictionary_id
+            )
+            return sender, receiver
+
+        def _roundtrip(self, sender, receiver, payload):
+            sender.start_compress_message()
+            data = sender.compress_message_data(payload)
+            data += sender.end_compress_message()
+            receiver.start_decompress_message()
+            result = receiver.decompress_message_data(data)
+            receiver.end_decompress_message()
+            return data, result
+
+        def _samples(self):
+            return [
+                f'[16, {i}, {{}}, "com.example.topic{i % 10}", [{i}, "hello"]]'.encode()
+                for i in range(1000)
+            ]
+
+        def test_context_takeover(self):
+            sender, receiver = self._pair(False)
+            payload = b"x" * 2000
+            data1, result1 = self._roundtrip(sender, receiver, payload)
+            data2, result2 = self._roundtrip(sender, receiver, payload)
+            self.assertEqual(result1, payload)
+            self.assertEqual(result2, payload)
+            # the second message refers back to the first one
+            self.assertTrue(len(data2) < len(data1))
+
+        def test_no_context_takeover(self):
+            sender, receiver = self._pair(True)
+            payload = b"x" * 2000
+            data1, result1 = self._roundtrip(sender, receiver, payload)
+            data2, result2 = self._roundtrip(sender, receiver, payload)
+            self.assertEqual(result2, payload)
+            self.assertEqual(data1, data2)
+
+        def test_dictionary(self):
+            from autobahn.websocket.compress_zstd import register_dictionary
+
+            samples = self._samples()
+            dict_id = register_dictionary(
+                compress.zstandard.train_dictionary(4096, samples)
+            )
+
+            offer = compress.PerMessageZstdOffer(dictionary_id=dict_id)
+            self.assertIn(f"dictionary_id={dict_id}", offer.get_extension_string())
+            parsed = compress.PerMessageZstdOffer.parse(
+                {"client_no_context_takeover": [True], "dictionary_id": [str(dict_id)]}
+            )
+            accept = compress.PerMessageZstdOfferAccept(parsed, level=5)
+            self.assertEqual(accept.dictionary_id, dict_id)
+            self.assertIn(f"dictionary_id={dict_id}", accept.get_extension_string())
+
+            server = compress.PerMessageZstd.create_from_offer_accept(True, accept)
+            self.assertEqual(server.level, 5)
+            self.assertEqual(server.dictionary_id, dict_id)
+
+            # small messages compress much better with the dictionary
+            sender, receiver = self._pair(True)
+            dict_sender, dict_receiver = self._pair(True, dict_id)
+            for payload in samples[:3]:
+                data, _ = self._roundtrip(sender, receiver, payload)
+                dict_data, result = self._roundtrip(dict_sender, dict_receiver, payload)
+                self.assertEqual(result, payload)
+                self.assertTrue(len(dict_data) < len(data))
+
+        def test_unknown_dictionary(self):
+            offer = compress.PerMessageZstdOffer.parse({"dictionary_id": ["12345"]})
+
+            # the server silently declines a dictionary it doesn't know ..
+            accept = compress.PerMessageZstdOfferAccept(offer)
+            self.assertEqual(accept.dictionary_id, 0)
+            self.assertNotIn("dictionary_id", accept.get_extension_string())
+
+            # .. but fails when explicitly asked to use it
+            self.assertRaises(
+                Exception,
+                compress.PerMessageZstdOfferAccept,
+                offer,
+                dictionary_id=12345,
+            )
+
+            response = compress.PerMessageZstdResponse.parse(
+                {"dictionary_id": ["12345"]}
+            )
+            self.assertRaises(Exception, compress.PerMessageZstdResponseAccept, response)
+
+            self.assertRaises(
+                Exception, compress.PerMessageZstdOffer.parse, {"dictionary_id": ["x"]}
+            )
+
     class TestClient(unittest.TestCase):
         def setUp(self):
             self.factory = WebSocketClientFactory(protocols=["wamp.2.json"])
@@ -32,14 +32,19 @@ from unittest.mock import Mock
 
 import txaio
 
+from autobahn.exception import Disconnected
+from autobahn.metrics import MetricsRegistry
 from autobahn.testutil import FakeTransport
 from autobahn.wamp.types import TransportDetails
+from autobahn.websocket.admission import TokenBucket
+from autobahn.websocket.compress_deflate import PerMessageDeflate
 from autobahn.websocket.protocol import (
     WebSocketClientFactory,
     WebSocketClientProtocol,
     WebSocketProtocol,
     WebSocketServerFactory,
     WebSocketServerProtocol,
+    parseHttpHeader,
 )
 from autobahn.websocket.types import ConnectingRequest
 
@@ -161,6 +166,22 @@ class WebSocketServerProtocolTests(unittest.TestCase):
         self.assertEqual(self.transport._written, b"\x88\x00")
         self.assertEqual(self.protocol.state, self.protocol.STATE_CLOSING)
 
+    def test_cork(self):
+        """
+        While corked, the frames of several messages are written at once.
+        """
+        writes = []
+        self.transport.write = writes.append
+        self.protocol._cork()
+        self.protocol.sendMessage(b"hello")
+        self.protocol.sendMessage(b"world", isBinary=True)
+        self.assertEqual(writes, [])
+        self.protocol._uncork()
+        self.assertEqual(writes, [b"\x81\x05hello\x82\x05world"])
+
+        self.protocol.sendMessage(b"!")
+        self.assertEqual(writes[-1], b"\x81\x01!")
+
     def test_sendClose_str_reason(self):
         """
         sendClose with a str reason works.
@@ -238,6 +259,528 @@ class WebSocketServerProtocolTests(unittest.TestCase):
         self.assertTrue(len(s) > 0)
 
 
+class HandshakeParsingTests(unittest.TestCase):
+    def test_parse_http_header(self):
+        status, headers, counts = parseHttpHeader(
+            b"GET /ws HTTP/1.1\x0d\x0a"
+            b"Host: example.com\x0d\x0a"
+            b"X-Multi: a\x0d\x0a"
+            b"bad header line\x0d\x0a"
+            b"SEC-WebSocket-Protocol :  wamp.2.json \x0d\x0a"
+            b"x-multi: b\x0d\x0a"
+            b"X-Latin: caf\xe9\x0d\x0a\x0d\x0a"
+        )
+        self.assertEqual(status, "GET /ws HTTP/1.1")
+        self.assertEqual(
+            headers,
+            {
+                "host": "example.com",
+                "x-multi": "a, b",
+                "sec-websocket-protocol": "wamp.2.json",
+                "x-latin": "caf\xe9",
+            },
+        )
+        self.assertEqual(counts["x-multi"], 2)
+        self.assertEqual(counts["host"], 1)
+
+    def test_parse_extensions_header(self):
+        p = WebSocketServerProtocol()
+        header = 'permessage-deflate; client_max_window_bits; server_max_window_bits="10"'
+        expected = [
+            (
+                "permessage-deflate",
+                {"client_max_window_bits": [True], "server_max_window_bits": ["10"]},
+            )
+        ]
+        extensions = p._parseExtensionsHeader(header)
+        self.assertEqual(extensions, expected)
+
+        # parse results are cached, but callers get their own copy
+        extensions[0][1]["client_max_window_bits"].append(False)
+        self.assertEqual(p._parseExtensionsHeader(header), expected)
+        self.assertEqual(
+            p._parseExtensionsHeader(header, removeQuotes=False)[0][1][
+                "server_max_window_bits"
+            ],
+            ['"10"'],
+        )
+
+    def test_handshake_response_head(self):
+        f = WebSocketServerFactory(server="MyServer", headers={"X-Foo": "bar"})
+        head = f._getHandshakeResponseHead()
+        self.assertEqual(
+            head,
+            "HTTP/1.1 101 Switching Protocols\x0d\x0a"
+            "Server: MyServer\x0d\x0a"
+            "Upgrade: WebSocket\x0d\x0a"
+            "Connection: Upgrade\x0d\x0a"
+            "X-Foo: bar\x0d\x0a",
+        )
+        self.assertIs(f._getHandshakeResponseHead(), head)
+
+        # headers changed in place are picked up
+        f.headers["X-Bar"] = ["1", "2"]
+        self.assertTrue(
+            f._getHandshakeResponseHead().endswith(
+                "X-Foo: bar\x0d\x0aX-Bar: 1\x0d\x0aX-Bar: 2\x0d\x0a"
+            )
+        )
+        f.setSessionParameters(server=None)
+        self.assertNotIn("Server:", f._getHandshakeResponseHead())
+
+    def _handshake(self, request):
+        f = WebSocketServerFactory()
+        f.setProtocolOptions(openHandshakeTimeout=0)
+        p = WebSocketServerProtocol()
+        p.log = txaio.make_logger()
+        p.factory = f
+        p.transport = FakeTransport()
+        p.peer = "tcp4:127.0.0.1:50000"
+        p._connectionMade()
+        p.onConnect = Mock(return_value="wamp.2.json")
+        p._onOpen = Mock()
+        p.dropConnection = Mock()
+        p.data = request
+        p.processHandshake()
+        if txaio.using_asyncio:
+            # onConnect() results are delivered from the event loop
+            import asyncio
+
+            loop = txaio.config.loop or asyncio.get_event_loop()
+            loop.run_until_complete(asyncio.sleep(0))
+        return p
+
+    def test_handshake(self):
+        p = self._handshake(
+            b"GET /ws HTTP/1.1\x0d\x0a"
+            b"Host: localhost\x0d\x0a"
+            b"Upgrade: websocket\x0d\x0a"
+            b"Connection: Upgrade\x0d\x0a"
+            b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\x0d\x0a"
+            b"Sec-WebSocket-Protocol: wamp.2.cbor, wamp.2.json\x0d\x0a"
+            b"Sec-WebSocket-Version: 13\x0d\x0a\x0d\x0a"
+        )
+        self.assertEqual(p.state, WebSocketProtocol.STATE_OPEN)
+        self.assertEqual(p.websocket_protocols, ["wamp.2.cbor", "wamp.2.json"])
+        self.assertIn(
+            "Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=\x0d\x0a",
+            p.http_response_data,
+        )
+        self.assertIn(
+            "Sec-WebSocket-Protocol: wamp.2.json\x0d\x0a", p.http_response_data
+        )
+
+    def test_handshake_bad_requests(self):
+        request = (
+            b"GET /ws HTTP/1.1\x0d\x0a"
+            b"Host: localhost\x0d\x0a"
+            b"Upgrade: websocket\x0d\x0a"
+            b"Connection: Upgrade\x0d\x0a"
+            b"Sec-WebSocket-Key: %s\x0d\x0a"
+            b"Sec-WebSocket-Protocol: %s\x0d\x0a"
+            b"Sec-WebSocket-Version: 13\x0d\x0a\x0d\x0a"
+        )
+        p = self._handshake(request % (b"dGhlIHNhbXBsZ*Bub25jZQ==", b"wamp.2.json"))
+        self.assertIn('bad character "*"', p.wasNotCleanReason)
+        p = self._handshake(
+            request % (b"dGhlIHNhbXBsZSBub25jZQ==", b"wamp.2.json, wamp.2.json")
+        )
+        self.assertIn('duplicate protocol "wamp.2.json"', p.wasNotCleanReason)
+
+
+class AdaptiveCompressionTests(unittest.TestCase):
+    """
+    Tests for the adaptive per-message compression options.
+    """
+
+    def _server(self, **options):
+        t = FakeTransport()
+        f = WebSocketServerFactory()
+        f.log = txaio.make_logger()
+        f.setProtocolOptions(**options)
+        p = WebSocketServerProtocol()
+        p.log = txaio.make_logger()
+        p.factory = f
+        p.transport = t
+
+        p._connectionMade()
+        p.state = p.STATE_OPEN
+        p.websocket_version = 18
+        p._perMessageCompress = PerMessageDeflate(True, False, False, 15, 15, 8)
+        p.sendFrame = Mock()
+        for call in [p.autoPingPendingCall, p.openHandshakeTimeoutCall]:
+            if call is not None:
+                call.cancel()
+        return p
+
+    def _compressed(self, p):
+        return [call.kwargs["rsv"] == 4 for call in p.sendFrame.call_args_list]
+
+    def test_disabled_by_default(self):
+        p = self._server()
+        p.sendMessage(b"x")
+        p.sendMessage(os.urandom(1024), isBinary=True)
+        self.assertEqual(self._compressed(p), [True, True])
+        self.assertEqual(p.trafficStats.outgoingCompressedMessages, 2)
+
+    def test_min_size(self):
+        p = self._server(compressMinSize=100)
+        p.sendMessage(b"x" * 99)
+        p.sendMessage(b"x" * 100)
+        self.assertEqual(self._compressed(p), [False, True])
+        self.assertEqual(p.sendFrame.call_args_list[0].kwargs["payload"], b"x" * 99)
+        self.assertEqual(p.trafficStats.outgoingCompressSkippedSize, 1)
+        self.assertEqual(p.trafficStats.outgoingCompressedMessages, 1)
+
+    def test_max_entropy(self):
+        p = self._server(compressMaxEntropy=7)
+        p.sendMessage(os.urandom(1024), isBinary=True)
+        p.sendMessage(b'{"args": [1, 2, 3], "kwargs": {}}' * 30)
+        self.assertEqual(self._compressed(p), [False, True])
+        self.assertEqual(p.trafficStats.outgoingCompressSkippedEntropy, 1)
+
+    def test_max_entropy_utf8(self):
+        # non-ASCII text uses many distinct octet values, but has a low entropy
+        p = self._server(compressMaxEntropy=6)
+        text = (
+            "Größenordnung der Übertragung: 日本語のテキストも圧縮できます。"
+            "Съешь же ещё этих мягких французских булок, да выпей чаю. "
+            "Ελληνικά κείμενα χωρίς πρόβλημα. "
+        ) * 10
+        sample = text.encode("utf8")[: p.COMPRESS_ENTROPY_SAMPLE_SIZE]
+        self.assertGreater(len(set(sample)), 2**6)
+        p.sendMessage(text.encode("utf8"))
+        p.sendMessage(os.urandom(1024), isBinary=True)
+        self.assertEqual(self._compressed(p), [True, False])
+
+    def test_max_ratio(self):
+        p = self._server(compressMaxRatio=0.9)
+        window = p.COMPRESS_RATIO_WINDOW
+        for _ in range(window + 3):
+            p.sendMessage(os.urandom(256), isBinary=True)
+        # compression stops after one window of messages that didn't shrink
+        self.assertEqual(self._compressed(p), [True] * window + [False] * 3)
+        self.assertEqual(p.trafficStats.outgoingCompressSkippedRatio, 3)
+
+        # .. and is tried again after the backoff
+        p._compressBackoff = 1
+        p.sendMessage(b"x" * 1000)
+        p.sendMessage(b"x" * 1000)
+        self.assertEqual(self._compressed(p)[-2:], [False, True])
+
+
+class FactoryMetricsTests(unittest.TestCase):
+    """
+    Tests for metrics aggregated over the connections of a factory.
+    """
+
+    def _connect(self, f):
+        p = WebSocketServerProtocol()
+        p.log = txaio.make_logger()
+        p.factory = f
+        p.transport = FakeTransport()
+        p._onClose = Mock()
+        p._connectionMade()
+        p.state = p.STATE_OPEN
+        p.websocket_version = 18
+        if p.openHandshakeTimeoutCall is not None:
+            p.openHandshakeTimeoutCall.cancel()
+            p.openHandshakeTimeoutCall = None
+        return p
+
+    def test_aggregation(self):
+        f = WebSocketServerFactory()
+        f.log = txaio.make_logger()
+        registry = MetricsRegistry()
+        registry.register(f)
+
+        p1 = self._connect(f)
+        p2 = self._connect(f)
+        p1.sendMessage(b"hello")
+        p2.sendMessage(b"hello")
+        p2.sendMessage(b"world")
+
+        metrics = registry.collect()
+        self.assertEqual(metrics.get("autobahn_websocket_connections"), 2)
+        self.assertEqual(metrics.get("autobahn_websocket_outgoing_messages_total"), 3)
+        self.assertEqual(metrics.get("autobahn_websocket_outgoing_app_octets_total"), 15)
+
+        # counters of closed connections are retained
+        p2._connectionLost(None)
+        metrics = registry.collect()
+        self.assertEqual(metrics.get("autobahn_websocket_connections"), 1)
+        self.assertEqual(metrics.get("autobahn_websocket_connections_total"), 2)
+        self.assertEqual(metrics.get("autobahn_websocket_outgoing_messages_total"), 3)
+        self.assertIn(
+            "autobahn_websocket_outgoing_messages_total 3\n", registry.to_prometheus()
+        )
+
+
+
+class _FakeClock:
+    """
+    Manually advanced clock and timer scheduler.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.calls = []
+
+    def __call__(self):
+        return self.now
+
+    def call_later(self, delay, fun):
+        self.calls.append((self.now + delay, fun))
+
+    def advance(self, seconds):
+        self.now += seconds
+        due = [call for call in self.calls if call[0] <= self.now]
+        self.calls = [call for call in self.calls if call[0] > self.now]
+        for _, fun in due:
+            fun()
+
+
+class AdmissionControlTests(unittest.TestCase):
+    """
+    Tests for rate limiting of opening handshakes.
+    """
+
+    REQUEST = (
+        b"GET /ws HTTP/1.1\x0d\x0a"
+        b"Host: localhost\x0d\x0a"
+        b"Upgrade: websocket\x0d\x0a"
+        b"Connection: Upgrade\x0d\x0a"
+        b"X-Forwarded-For: %s\x0d\x0a"
+        b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\x0d\x0a"
+        b"Sec-WebSocket-Version: 13\x0d\x0a\x0d\x0a"
+    )
+
+    def setUp(self):
+        self.clock = _FakeClock()
+        self.factory = WebSocketServerFactory()
+        self.factory._handshakeAdmission.clock = self.clock
+        self.factory._handshakeAdmission.call_later = self.clock.call_later
+
+    def _handshake(self, peer=b"10.0.0.1"):
+        p = WebSocketServerProtocol()
+        p.log = txaio.make_logger()
+        p.factory = self.factory
+        p.transport = FakeTransport()
+        p.peer = "tcp4:127.0.0.1:50000"
+        p._connectionMade()
+        if p.openHandshakeTimeoutCall is not None:
+            p.openHandshakeTimeoutCall.cancel()
+            p.openHandshakeTimeoutCall = None
+        p._admitHandshake = Mock()
+        p.sendHttpErrorResponse = Mock()
+        p.dropConnection = Mock()
+        p.data = self.REQUEST % peer
+        p.processHandshake()
+        return p
+
+    def _retry_after(self, p):
+        code, reason, headers = p.sendHttpErrorResponse.call_args[0]
+        self.assertEqual(code, 503)
+        return dict(headers)["Retry-After"]
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(2, 2, 0.0)
+        self.assertEqual(bucket.take(0.0), 0)
+        self.assertEqual(bucket.take(0.0), 0)
+        self.assertEqual(bucket.take(0.0), 0.5)
+        self.assertEqual(bucket.take(0.25), 0.25)
+        self.assertEqual(bucket.take(0.5), 0)
+        self.assertFalse(bucket.is_full(1.0))
+        self.assertTrue(bucket.is_full(10.0))
+        self.assertEqual(bucket.tokens, 2)
+
+    def test_disabled(self):
+        p = self._handshake()
+        p._admitHandshake.assert_called_once_with()
+        self.assertFalse(self.factory._handshakeAdmission.enabled)
+
+    def test_reject(self):
+        self.factory.setProtocolOptions(handshakeRate=0.5, handshakeBurst=2)
+        protos = [self._handshake() for _ in range(3)]
+        protos[0]._admitHandshake.assert_called_once_with()
+        protos[1]._admitHandshake.assert_called_once_with()
+        protos[2]._admitHandshake.assert_not_called()
+        self.assertEqual(self._retry_after(protos[2]), "2")
+        protos[2].dropConnection.assert_called_once_with(abort=False)
+
+        self.clock.advance(2)
+        self._handshake()._admitHandshake.assert_called_once_with()
+
+    def test_queue(self):
+        self.factory.setProtocolOptions(
+            handshakeRate=10, handshakeBurst=1, handshakeQueueSize=2
+        )
+        protos = [self._handshake() for _ in range(4)]
+        protos[0]._admitHandshake.assert_called_once_with()
+        for p in protos[1:3]:
+            p._admitHandshake.assert_not_called()
+            p.sendHttpErrorResponse.assert_not_called()
+        # queue is full
+        self.assertEqual(self._retry_after(protos[3]), "1")
+
+        # queued handshakes are admitted in order as tokens become available
+        self.clock.advance(0.1)
+        protos[1]._admitHandshake.assert_called_once_with()
+        protos[2]._admitHandshake.assert_not_called()
+
+        # connections lost while queued are skipped
+        protos[2].state = protos[2].STATE_CLOSED
+        p = self._handshake()
+        self.clock.advance(0.1)
+        protos[2]._admitHandshake.assert_not_called()
+        p._admitHandshake.assert_called_once_with()
+        self.assertEqual(self.clock.calls, [])
+
+    def test_per_peer(self):
+        self.factory.setProtocolOptions(
+            trustXForwardedFor=1, handshakeRatePerPeer=1, handshakeBurstPerPeer=1
+        )
+        self._handshake(b"10.0.0.1")._admitHandshake.assert_called_once_with()
+        self._handshake(b"10.0.0.2")._admitHandshake.assert_called_once_with()
+        p = self._handshake(b"10.0.0.1")
+        p._admitHandshake.assert_not_called()
+        self.assertEqual(self._retry_after(p), "1")
+
+        # idle peers are forgotten when too many peers are tracked
+        admission = self.factory._handshakeAdmission
+        admission.max_peers = 2
+        self.clock.advance(1)
+        self._handshake(b"10.0.0.3")._admitHandshake.assert_called_once_with()
+        self.assertEqual(list(admission._peers), ["10.0.0.3"])
+
+    def test_metrics(self):
+        registry = MetricsRegistry()
+        registry.register(self.factory)
+        self.assertIsNone(
+            registry.collect().get("autobahn_websocket_handshakes_admitted_total")
+        )
+
+        self.factory.setProtocolOptions(
+            handshakeRate=1, handshakeQueueSize=1, handshakeRatePerPeer=2
+        )
+        for _ in range(4):
+            self._handshake()
+        metrics = registry.collect()
+        self.assertEqual(metrics.get("autobahn_websocket_handshakes_admitted_total"), 1)
+        self.assertEqual(metrics.get("autobahn_websocket_handshakes_queued_total"), 1)
+        self.assertEqual(metrics.get("autobahn_websocket_handshake_queue_length"), 1)
+        for reason, count in [("rate", 0), ("peer_rate", 2), ("queue_full", 0)]:
+            self.assertEqual(
+                metrics.get(
+                    "autobahn_websocket_handshakes_rejected_total", reason=reason
+                ),
+                count,
+            )
+
+        # reconfiguring admits queued handshakes
+        self.factory.setProtocolOptions(handshakeRate=0, handshakeRatePerPeer=0)
+        self.assertEqual(self.factory._handshakeAdmission.admitted, 2)
+
+class CompactConnectionTests(unittest.TestCase):
+    """
+    Tests for the ``compactConnection`` protocol option.
+    """
+
+    def _client(self, compact):
+        t = FakeTransport()
+        f = WebSocketClientFactory()
+        f.log = txaio.make_logger()
+        f.setProtocolOptions(compactConnection=compact)
+        p = WebSocketClientProtocol()
+        p.log = txaio.make_logger()
+        p.factory = f
+        p.transport = t
+        p._transport_details = TransportDetails()
+        p._connectionMade()
+        self.addCleanup(self._cancel_calls, p)
+        return p
+
+    def _cancel_calls(self, p):
+        for call in [
+            p.autoPingPendingCall,
+            p.autoPingTimeoutCall,
+            p.openHandshakeTimeoutCall,
+            p.closeHandshakeTimeoutCall,
+        ]:
+            if call is not None:
+                call.cancel()
+
+    def _open(self, p):
+        p._onOpen = lambda: None
+        p._onConnect = Mock()
+        p._closeConnection = Mock()
+        p.peer = Mock()
+        p._actuallyStartHandshake(
+            ConnectingRequest(
+                host="example.com",
+                port=80,
+                resource="/ws",
+            )
+        )
+        key = p.websocket_key + WebSocketProtocol._WS_MAGIC
+        p.data = (
+            b"HTTP/1.1 101 Switching Protocols\x0d\x0a"
+            b"Upgrade: websocket\x0d\x0a"
+            b"Connection: upgrade\x0d\x0a"
+            b"Sec-Websocket-Accept: "
+            + b64encode(sha1(key).digest())
+            + b"\x0d\x0a\x0d\x0a"
+        )
+        d = p.processHandshake()
+        if not txaio.using_twisted:
+            # onConnect callbacks run on the next loop iteration
+            d.get_loop().run_until_complete(d)
+        self.assertEqual(p.state, p.STATE_OPEN)
+
+    def test_helper_objects_slotted(self):
+        from autobahn.websocket.protocol import FrameHeader, Timings, TrafficStats
+
+        for obj in [TrafficStats(), Timings(), FrameHeader(1, True, 0, 0, None)]:
+            self.assertFalse(hasattr(obj, "__dict__"))
+
+    def test_default_allocates_eagerly(self):
+        p = self._client(False)
+        self.assertIsNotNone(p._trafficStats)
+        self.assertIsNotNone(p.utf8validator)
+        self._open(p)
+        self.assertIsNotNone(p.http_headers)
+        self.assertIsNotNone(p.http_response_data)
+        self.assertIsNotNone(p.websocket_key)
+
+    def test_compact_drops_handshake_state(self):
+        p = self._client(True)
+        self.assertIsNone(p._trafficStats)
+        self.assertIsNone(p.utf8validator)
+        self._open(p)
+        self.assertIsNone(p.http_request_data)
+        self.assertIsNone(p.http_response_data)
+        self.assertIsNone(p.http_headers)
+        self.assertIsNone(p.http_status_line)
+        self.assertIsNone(p.websocket_key)
+        self.assertEqual(p.websocket_extensions_in_use, [])
+
+    def test_compact_traffic_stats_on_first_access(self):
+        p = self._client(True)
+        p.state = p.STATE_OPEN
+        p.websocket_version = 18
+
+        p.sendMessage(b"hello")
+        self.assertIsNone(p._trafficStats)
+
+        stats = p.trafficStats
+        self.assertIs(stats, p.trafficStats)
+        self.assertEqual(stats.outgoingWebSocketMessages, 0)
+
+        p.sendMessage(b"hello")
+        self.assertEqual(stats.outgoingWebSocketMessages, 1)
+        self.assertEqual(stats.outgoingOctetsAppLevel, 5)
+
+
 if os.environ.get("USE_TWISTED", False):
 
     class TwistedProtocolTests(unittest.TestCase):
@@ -288,3 +831,176 @@ if os.environ.get("USE_TWISTED", False):
 
         def test_send_server_status(self):
             self.protocol.sendServerStatus()
+
+    class TwistedCompressOffloadTests(unittest.TestCase):
+        """
+        Tests for the ``compressOffloadSize`` protocol option.
+        """
+
+        def setUp(self):
+            from autobahn.twisted.websocket import (
+                WebSocketServerFactory,
+                WebSocketServerProtocol,
+            )
+
+            f = WebSocketServerFactory()
+            f.setProtocolOptions(compressOffloadSize=1000)
+            p = WebSocketServerProtocol()
+            p.factory = f
+            p.transport = FakeTransport()
+
+            p._connectionMade()
+            p.state = p.STATE_OPEN
+            p.websocket_version = 18
+            p.inside_message = False
+            p.current_frame = None
+            p._perMessageCompress = PerMessageDeflate(True, False, False, 15, 15, 8)
+            p.sendFrame = Mock()
+            p.onMessage = Mock()
+            for call in [p.autoPingPendingCall, p.openHandshakeTimeoutCall]:
+                if call is not None:
+                    call.cancel()
+
+            # run "worker thread" jobs when the test says so
+            self.jobs = []
+
+            def run_in_thread(fun, *args):
+                d = txaio.create_future()
+                self.jobs.append((fun, args, d))
+                return d
+
+            p._runInThread = run_in_thread
+            self.protocol = p
+
+        def _run_jobs(self):
+            while self.jobs:
+                fun, args, d = self.jobs.pop(0)
+                d.callback(fun(*args))
+
+        def _frame(self, payload, compress):
+            # masked (with an all-zero mask) text frame as sent by a client
+            if compress:
+                pmce = PerMessageDeflate(False, False, False, 15, 15, 8)
+                pmce.start_compress_message()
+                payload = pmce.compress_message_data(payload)
+                payload += pmce.end_compress_message()
+                b0 = 0xC1
+            else:
+                b0 = 0x81
+            n = len(payload)
+            if n < 126:
+                header = bytes([b0, 0x80 | n])
+            else:
+                header = bytes([b0, 0x80 | 126]) + n.to_bytes(2, "big")
+            return header + b"\x00" * 4 + payload
+
+        def test_small_message_sent_inline(self):
+            p = self.protocol
+            self.assertIsNone(p.sendMessage(b"x" * 999))
+            self.assertEqual(self.jobs, [])
+            self.assertEqual(p.sendFrame.call_count, 1)
+
+        def test_send_order_preserved(self):
+            p = self.protocol
+            big = b"hello world " * 1000
+            d1 = p.sendMessage(big)
+            d2 = p.sendMessage(b"small")
+            d3 = p.sendMessage(big, doNotCompress=True)
+            self.assertEqual(p.sendFrame.call_count, 0)
+            self.assertEqual(len(self.jobs), 1)
+
+            self._run_jobs()
+            self.assertEqual(p.sendFrame.call_count, 3)
+            sent = [call.kwargs for call in p.sendFrame.call_args_list]
+            self.assertEqual([kw["rsv"] for kw in sent], [4, 4, 0])
+            self.assertLess(len(sent[0]["payload"]), len(big))
+            self.assertEqual(sent[2]["payload"], big)
+            for d in [d1, d2, d3]:
+                self.assertTrue(d.called)
+            self.assertEqual(p.trafficStats.outgoingCompressedMessages, 2)
+
+        def test_other_send_apis(self):
+            p = self.protocol
+            sent = []
+            p.sendFrame.side_effect = lambda **kw: sent.append("message")
+            p.sendData = lambda data, **kw: sent.append("prepared")
+
+            d1 = p.sendMessage(b"hello world " * 1000)
+            prepared = p.factory.prepareMessage(b"prepared", doNotCompress=True)
+            d2 = p.sendPreparedMessage(prepared)
+            self.assertEqual(sent, [])
+
+            # the compressor is busy in the worker thread
+            self.assertRaises(Exception, p.beginMessage)
+
+            self._run_jobs()
+            self.assertEqual(sent, ["message", "prepared"])
+            for d in [d1, d2]:
+                self.assertTrue(d.called)
+
+        def test_send_failed_on_close(self):
+            p = self.protocol
+            d1 = p.sendMessage(b"hello world " * 1000)
+            d2 = p.sendMessage(b"small")
+            errors = []
+            for d in [d1, d2]:
+                d.addErrback(errors.append)
+            p.state = p.STATE_CLOSED
+            self._run_jobs()
+            self.assertEqual(p.sendFrame.call_count, 0)
+            self.assertEqual(len(errors), 2)
+
+        def test_connection_lost_while_compressing(self):
+            p = self.protocol
+            pmce = p._perMessageCompress
+            pmce.close = Mock(wraps=pmce.close)
+            d = p.sendMessage(b"hello world " * 1000)
+            errors = []
+            d.addErrback(errors.append)
+
+            # the compressor is closed once the worker thread is done with it
+            p.openHandshakeTimeoutCall = p.autoPingPendingCall = None
+            p._connectionLost(txaio.create_failure(RuntimeError("testing")))
+            self.assertEqual(pmce.close.call_count, 0)
+            self._run_jobs()
+            self.assertEqual(pmce.close.call_count, 1)
+            self.assertEqual(len(errors), 1)
+            self.assertIsInstance(errors[0].value, Disconnected)
+
+        def test_receive_order_preserved(self):
+            p = self.protocol
+            big = os.urandom(2000).hex().encode()
+            p.dataReceived(
+                self._frame(big, True)
+                + self._frame(b"small", True)
+                + self._frame(b"plain", False)
+            )
+            # the large frame is being decompressed, nothing after it is processed
+            self.assertEqual(len(self.jobs), 1)
+            self.assertEqual(p.onMessage.call_count, 0)
+
+            p.dataReceived(self._frame(b"later", False))
+            self.assertEqual(p.onMessage.call_count, 0)
+
+            self._run_jobs()
+            self.assertEqual(
+                [call.args[0] for call in p.onMessage.call_args_list],
+                [big, b"small", b"plain", b"later"],
+            )
+            self.assertEqual(p.trafficStats.incomingWebSocketMessages, 4)
+
+        def test_worker_thread(self):
+            from twisted.internet import reactor
+
+            p = self.protocol
+            p.factory.reactor = reactor
+            del p._runInThread
+            big = b"hello world " * 1000
+            d = p.sendMessage(big)
+
+            def sent(_):
+                self.assertEqual(p.sendFrame.call_count, 1)
+                self.assertLess(len(p.sendFrame.call_args.kwargs["payload"]), len(big))
+
+            d.addCallback(sent)
+            return d